@@ -7,6 +7,8 @@ from sqlalchemy.orm import Session
 from sqlalchemy import func, text
 from database.database import get_db, engine
 from database.models import User, SystemConfig, PacketLog, Alert, Event, Base
+from database.partitioning import partition_manager
+from services import training_jobs
 from middleware.auth import (
     hash_password,
     verify_password,
@@ -53,6 +55,11 @@ class ConfigUpdate(BaseModel):
     category: str
 
 
+class TrainingJobCreate(BaseModel):
+    kind: str  # unsupervised_baseline, random_forest
+    params: dict = {}
+
+
 # ================== Auth ==================
 
 
@@ -467,7 +474,10 @@ def delete_old_events(
 ):
     cutoff = datetime.utcnow() - timedelta(days=days)
 
-    deleted_packets = db.query(PacketLog).filter(PacketLog.timestamp < cutoff).delete()
+    # Whole days in partitions / day files are dropped, the rest is a row DELETE
+    dropped = partition_manager.drop_before(db, cutoff)
+    deleted_packets = dropped["packet_logs"]
+    deleted_packets += db.query(PacketLog).filter(PacketLog.timestamp < cutoff).delete()
     deleted_events = db.query(Event).filter(Event.timestamp < cutoff).delete()
     deleted_alerts = db.query(Alert).filter(Alert.timestamp < cutoff).delete()
 
@@ -482,5 +492,37 @@ def delete_old_events(
             "alerts": deleted_alerts,
             "total": total,
         },
+        # Rows in removed Parquet archives; they had already left packet_logs
+        "archived_packet_logs_dropped": dropped["archived"],
         "cutoff_date": cutoff.isoformat(),
     }
+
+
+# ================== Training Jobs ==================
+
+
+@router.get("/training-jobs")
+def list_training_jobs(
+    limit: int = 20,
+    status: Optional[str] = None,
+    _user: User = Depends(require_role("Admin", "Analyst")),
+):
+    return {"jobs": training_jobs.list_jobs(limit, status)}
+
+
+@router.get("/training-jobs/{job_id}")
+def get_training_job(job_id: int, _user: User = Depends(require_role("Admin", "Analyst"))):
+    job = training_jobs.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Training job not found")
+    return job
+
+
+@router.post("/training-jobs")
+def create_training_job(req: TrainingJobCreate, _user: User = Depends(require_role("Admin"))):
+    # Runs in a training worker process; poll GET /training-jobs/{id} for progress
+    try:
+        job_id = training_jobs.enqueue_job(req.kind, req.params)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return training_jobs.get_job(job_id)
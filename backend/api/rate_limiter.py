@@ -6,16 +6,17 @@ Prevents API resource exhaustion by enforcing maximum calls per client per hour.
 """
 
 from datetime import datetime, timedelta
-from collections import defaultdict
-from typing import Dict, List
 from fastapi import HTTPException, Request, status
 
-# In-memory sliding window store: ip -> list of request datetimes
-_REQUEST_HISTORY: Dict[str, List[datetime]] = defaultdict(list)
+from services.memory_cache import ShardedTTLCache
 
 MAX_GENERATIONS_PER_HOUR = 10
 WINDOW_SECONDS = 3600
 
+# In-memory sliding window store: ip -> list of request datetimes.
+# An IP's entry expires one window after its last request.
+_REQUEST_HISTORY = ShardedTTLCache("sentinel_rate_limit", max_entries=50000, default_ttl=WINDOW_SECONDS)
+
 
 def check_rate_limit(request: Request, max_requests: int = MAX_GENERATIONS_PER_HOUR) -> None:
     """
@@ -27,7 +28,7 @@ def check_rate_limit(request: Request, max_requests: int = MAX_GENERATIONS_PER_H
     cutoff = now - timedelta(seconds=WINDOW_SECONDS)
 
     # Filter out requests older than cutoff window
-    history = [ts for ts in _REQUEST_HISTORY[client_ip] if ts > cutoff]
+    history = [ts for ts in _REQUEST_HISTORY.get(client_ip, ()) if ts > cutoff]
 
     if len(history) >= max_requests:
         retry_after = int((history[0] + timedelta(seconds=WINDOW_SECONDS) - now).total_seconds())
@@ -40,7 +41,7 @@ def check_rate_limit(request: Request, max_requests: int = MAX_GENERATIONS_PER_H
 
     # Record current request
     history.append(now)
-    _REQUEST_HISTORY[client_ip] = history
+    _REQUEST_HISTORY.set(client_ip, history)
 
 
 def reset_rate_limits() -> None:
@@ -57,7 +58,7 @@ def get_rate_limit_status() -> dict:
     cutoff = now - timedelta(seconds=WINDOW_SECONDS)
     
     active_limits = {}
-    for ip, history in list(_REQUEST_HISTORY.items()):
+    for ip, history in _REQUEST_HISTORY.items():
         # Filter active requests
         active = [ts for ts in history if ts > cutoff]
         if not active:
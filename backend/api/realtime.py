@@ -1,57 +1,50 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
-from typing import List, Dict, Any
-import json
+from typing import List, Any, Optional
 import logging
-import asyncio
+
+from services.ws_hub import ws_hub, WebSocketHub, EVENT_STREAM, LIVE_METRICS, LIVE_METRICS_DELTA
+from services.event_bridge import event_bridge
+from services.metrics_snapshot import live_metrics_publisher
 
 logger = logging.getLogger("realtime_ws")
 
 
+# Topics a dashboard client receives unless it asks for others (?topics=A,B)
+DEFAULT_TOPICS = (EVENT_STREAM, LIVE_METRICS)
+
+
 class RealTimeManager:
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
-        self.lock = asyncio.Lock()
-
-    async def connect(self, websocket: WebSocket):
-        await websocket.accept()
-        async with self.lock:
-            self.active_connections.append(websocket)
-        logger.info(
-            f"New real-time client connected. Total: {len(self.active_connections)}"
-        )
+    """
+    Real-time dashboard channel on top of the shared WebSocket hub: message
+    types are topics, and clients choose which ones they receive.
+    """
+
+    def __init__(self, hub: WebSocketHub = ws_hub):
+        self.hub = hub
+
+    @property
+    def active_connections(self) -> List[WebSocket]:
+        return self.hub.subscribers(*DEFAULT_TOPICS)
+
+    async def connect(
+        self, websocket: WebSocket, topics: Optional[List[str]] = None, max_rate: Optional[float] = None
+    ):
+        topics = topics or DEFAULT_TOPICS
+        await self.hub.connect(websocket, topics, max_rate=max_rate)
+        # Metrics subscribers get the last broadcast snapshot now rather than at
+        # the next change (deltas that follow are based on it)
+        snapshot = live_metrics_publisher.last_snapshot
+        if snapshot is not None:
+            for topic in (LIVE_METRICS, LIVE_METRICS_DELTA):
+                if topic in topics:
+                    self.hub.send_to(websocket, topic, LIVE_METRICS, snapshot)
+                    break
 
     async def disconnect(self, websocket: WebSocket):
-        async with self.lock:
-            if websocket in self.active_connections:
-                self.active_connections.remove(websocket)
-        logger.info(
-            f"Real-time client disconnected. Total: {len(self.active_connections)}"
-        )
+        await self.hub.disconnect(websocket)
 
     async def broadcast(self, message_type: str, payload: Any):
-        if not self.active_connections:
-            return
-
-        message = json.dumps(
-            {
-                "type": message_type,
-                "payload": payload,
-                "timestamp": asyncio.get_event_loop().time(),
-            }
-        )
-
-        disconnected = []
-        async with self.lock:
-            for connection in self.active_connections:
-                try:
-                    await connection.send_text(message)
-                except Exception as e:
-                    logger.error(f"Error broadcasting to client: {e}")
-                    disconnected.append(connection)
-
-            for conn in disconnected:
-                if conn in self.active_connections:
-                    self.active_connections.remove(conn)
+        self.hub.publish(message_type, message_type, payload)
 
 
 realtime_manager = RealTimeManager()
@@ -60,12 +53,18 @@ router = APIRouter(prefix="/api/v1/realtime", tags=["RealTime"])
 
 @router.websocket("/ws")
 async def realtime_ws_endpoint(websocket: WebSocket):
-    await realtime_manager.connect(websocket)
+    topics = websocket.query_params.get("topics")
+    # Optional ?max_rate=N: at most N EVENT_STREAM messages/s (capped server-side)
+    try:
+        max_rate = float(websocket.query_params.get("max_rate", 0)) or None
+    except ValueError:
+        max_rate = None
+    await realtime_manager.connect(websocket, topics.split(",") if topics else None, max_rate)
     try:
         while True:
-            # Keep connection alive and listen for any client messages
+            # Keep connection alive; clients may change their topic subscriptions
             data = await websocket.receive_text()
-            # Echo or handle specific client commands if needed
+            realtime_manager.hub.handle_client_message(websocket, data)
     except WebSocketDisconnect:
         await realtime_manager.disconnect(websocket)
     except Exception as e:
@@ -76,3 +75,8 @@ async def realtime_ws_endpoint(websocket: WebSocket):
 # Helper function for other services to push data
 async def push_realtime_event(event_type: str, data: Any):
     await realtime_manager.broadcast(event_type, data)
+
+
+def emit_realtime_event(event_type: str, data: Any) -> bool:
+    """Thread-safe, non-blocking variant of push_realtime_event for worker threads."""
+    return event_bridge.emit(event_type, event_type, data)
@@ -1,37 +1,36 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
 from typing import List, Dict, Any
-import asyncio
 import json
 import logging
 
+from services.ws_hub import ws_hub, WebSocketHub, TOPOLOGY
+from services.event_bridge import event_bridge
+
 logger = logging.getLogger("topology_ws")
 router = APIRouter(prefix="/api/v1/topology", tags=["Topology"])
 
 
 class TopologyManager:
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
+    """
+    Topology view channel: every message goes to the TOPOLOGY topic of the shared WebSocket hub.
+    """
+
+    def __init__(self, hub: WebSocketHub = ws_hub):
+        self.hub = hub
+
+    @property
+    def active_connections(self) -> List[WebSocket]:
+        return self.hub.subscribers(TOPOLOGY)
 
     async def connect(self, websocket: WebSocket):
-        await websocket.accept()
-        self.active_connections.append(websocket)
-        logger.info(
-            f"New topology client connected. Total: {len(self.active_connections)}"
-        )
+        # Already accepted by the endpoint (the INIT snapshot is sent first)
+        await self.hub.connect(websocket, [TOPOLOGY], accept=False)
 
-    def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
-        logger.info(
-            f"Topology client disconnected. Total: {len(self.active_connections)}"
-        )
+    async def disconnect(self, websocket: WebSocket):
+        await self.hub.disconnect(websocket)
 
     async def broadcast(self, data: Dict[str, Any]):
-        message = json.dumps(data)
-        for connection in self.active_connections:
-            try:
-                await connection.send_text(message)
-            except Exception as e:
-                logger.error(f"Error broadcasting to client: {e}")
+        self.hub.publish(TOPOLOGY, data.get("type", "UPDATE"), data.get("payload"))
 
 
 topology_manager = TopologyManager()
@@ -39,7 +38,7 @@ topology_manager = TopologyManager()
 
 @router.websocket("/ws")
 async def topology_ws_endpoint(websocket: WebSocket):
-    await topology_manager.connect(websocket)
+    await websocket.accept()
     try:
         # Initial State Push: Dynamic Node Discovery
         from api.honeypots import get_honeypot_status
@@ -78,24 +77,25 @@ async def topology_ws_endpoint(websocket: WebSocket):
         await websocket.send_text(
             json.dumps({"type": "INIT", "payload": {"nodes": nodes, "edges": edges}})
         )
+        # Live updates start after the snapshot, so INIT is always the first frame
+        await topology_manager.connect(websocket)
 
         while True:
             # Keep connection alive
             data = await websocket.receive_text()
             # Handle client-to-server messages if needed
     except WebSocketDisconnect:
-        topology_manager.disconnect(websocket)
+        await topology_manager.disconnect(websocket)
     except Exception as e:
         logger.error(f"WS unexpected error: {e}")
-        topology_manager.disconnect(websocket)
+        await topology_manager.disconnect(websocket)
 
 
 # Service to push updates from other parts of the system
 async def push_topology_event(event_type: str, data: Any):
-    await topology_manager.broadcast(
-        {
-            "type": event_type,
-            "payload": data,
-            "timestamp": asyncio.get_event_loop().time(),
-        }
-    )
+    await topology_manager.broadcast({"type": event_type, "payload": data})
+
+
+def emit_topology_event(event_type: str, data: Any) -> bool:
+    """Thread-safe, non-blocking variant of push_topology_event for worker threads."""
+    return event_bridge.emit(TOPOLOGY, event_type, data)
@@ -4,7 +4,7 @@ from sqlalchemy import create_engine, event, text
 from sqlalchemy.engine import Engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.exc import OperationalError
-from .models import Base
+from .models import Base, PacketLog, PacketLogRollup
 import os
 from dotenv import load_dotenv
 
@@ -109,6 +109,36 @@ def upgrade_db_schema(engine):
                     conn.execute(text("ALTER TABLE packet_logs ADD COLUMN email_subject VARCHAR(512)"))
                 if "body_len" not in columns:
                     conn.execute(text("ALTER TABLE packet_logs ADD COLUMN body_len INTEGER"))
+                if "feature_vector" not in columns:
+                    blob_type = "BYTEA" if conn.dialect.name == "postgresql" else "BLOB"
+                    conn.execute(text(f"ALTER TABLE packet_logs ADD COLUMN feature_vector {blob_type}"))
+
+                # Composite / partial indexes for the hot analytical filters.
+                # A plain CREATE INDEX blocks inserts while it scans the table,
+                # so populated server databases get them from the migration
+                # (CREATE INDEX CONCURRENTLY) instead.
+                existing_indexes = {ix["name"] for ix in inspector.get_indexes("packet_logs")}
+                missing_indexes = [ix for ix in PacketLog.__table__.indexes if ix.name not in existing_indexes]
+                if missing_indexes:
+                    empty = conn.execute(text("SELECT 1 FROM packet_logs LIMIT 1")).first() is None
+                    if conn.dialect.name == "sqlite" or empty:
+                        for index in missing_indexes:
+                            index.create(conn)
+                            logger.info(f"✅ Database schema migration: created index {index.name}")
+                    else:
+                        logger.warning(
+                            "packet_logs is missing indexes %s; apply "
+                            "database/migrations/add_packet_log_composite_indexes.sql",
+                            ", ".join(ix.name for ix in missing_indexes),
+                        )
+
+            if "packet_log_rollups" in tables:
+                rollup_columns = [c["name"] for c in inspector.get_columns("packet_log_rollups")]
+                if "shard" not in rollup_columns:
+                    # Derived data: recreated with the shard key, rebuilt on first read
+                    conn.execute(text("DROP TABLE packet_log_rollups"))
+                    PacketLogRollup.__table__.create(conn)
+                    logger.info("✅ Database schema migration: recreated packet_log_rollups with shards")
 
             if "sentinel_playbooks" in tables:
                 sp_columns = [c["name"] for c in inspector.get_columns("sentinel_playbooks")]
@@ -127,6 +157,9 @@ def upgrade_db_schema(engine):
 
 upgrade_db_schema(engine)
 
+# Keep packet_log_rollups current on every Session flush
+from . import rollups  # noqa: E402,F401
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 
@@ -0,0 +1,6 @@
+-- Migration: Add feature_vector to packet_logs
+--
+-- Packed float32 feature vector (15 x 4 bytes) written once per event by
+-- ml/feature_store.py and reused by RF scoring, IsolationForest and DBSCAN.
+
+ALTER TABLE packet_logs ADD COLUMN feature_vector BYTEA;
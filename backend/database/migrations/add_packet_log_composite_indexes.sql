@@ -0,0 +1,33 @@
+-- Migration: Composite / partial indexes for the hot packet_logs filters
+--
+-- Mirrors PacketLog.__table_args__ (database/models.py). upgrade_db_schema
+-- only creates missing ones on startup for SQLite or an empty packet_logs;
+-- on a populated Postgres database run this file by hand: CONCURRENTLY
+-- avoids blocking honeypot inserts (it cannot run inside a transaction
+-- block, and is not supported on a partitioned parent table - drop the
+-- keyword there).
+-- Verify plans with scripts/db_management/explain_hot_queries.py.
+
+-- Correlation / low-and-slow / protocol mix: time window grouped by source (covering)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_packet_logs_ts_src_port_proto
+    ON packet_logs (timestamp, src_ip, dst_port, protocol);
+
+-- Distributed brute force: one port over a time window grouped by target (covering)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_packet_logs_dport_ts_dst_src
+    ON packet_logs (dst_port, timestamp, dst_ip, src_ip);
+
+-- Campaign clustering: elevated threat levels over a time window
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_packet_logs_level_ts
+    ON packet_logs (threat_level, timestamp);
+
+-- Analyzer reconcile sweep: rows still waiting for a score
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_packet_logs_unscored
+    ON packet_logs (id) WHERE threat_level IS NULL;
+
+-- Dashboards: per-honeypot counts / latest activity, per-attacker timelines
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_packet_logs_proto_ts
+    ON packet_logs (protocol, timestamp);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_packet_logs_src_ts
+    ON packet_logs (src_ip, timestamp);
+
+ANALYZE packet_logs;
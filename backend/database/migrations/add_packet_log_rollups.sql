@@ -0,0 +1,22 @@
+-- Migration: Add packet_log_rollups / packet_log_rollup_keys
+--
+-- Per-minute packet_logs aggregates maintained by database/rollups.py and read
+-- by StatsService. Populate with scripts/db_management/backfill_rollups.py.
+
+CREATE TABLE IF NOT EXISTS packet_log_rollups (
+    bucket_start TIMESTAMP PRIMARY KEY,
+    event_count INTEGER NOT NULL DEFAULT 0,
+    scored_count INTEGER NOT NULL DEFAULT 0,
+    threat_score_sum FLOAT NOT NULL DEFAULT 0.0,
+    critical_count INTEGER NOT NULL DEFAULT 0,
+    malicious_count INTEGER NOT NULL DEFAULT 0,
+    suspicious_count INTEGER NOT NULL DEFAULT 0,
+    benign_count INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS packet_log_rollup_keys (
+    kind VARCHAR(16) NOT NULL,
+    value VARCHAR NOT NULL,
+    first_seen TIMESTAMP,
+    PRIMARY KEY (kind, value)
+);
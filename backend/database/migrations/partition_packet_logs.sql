@@ -0,0 +1,55 @@
+-- Migration: Convert packet_logs to daily range partitions (PostgreSQL only)
+--
+-- Rebuilds packet_logs as PARTITION BY RANGE (timestamp). Daily partitions
+-- (packet_logs_pYYYYMMDD) are created ahead of time and archived to Parquet
+-- by database/partitioning.py (PACKET_LOG_PARTITIONING_ENABLED=true).
+--
+-- ⚠️ Copies every row; run during a maintenance window.
+
+BEGIN;
+
+ALTER TABLE packet_logs RENAME TO packet_logs_legacy;
+
+-- Keeps the id sequence default and column definitions
+CREATE TABLE packet_logs (LIKE packet_logs_legacy INCLUDING DEFAULTS INCLUDING CONSTRAINTS)
+    PARTITION BY RANGE (timestamp);
+
+-- The partition key must be part of the primary key (this makes timestamp
+-- NOT NULL; legacy NULL timestamps are backfilled before the copy below)
+ALTER TABLE packet_logs ADD PRIMARY KEY (id, timestamp);
+
+CREATE INDEX ix_packet_logs_ts ON packet_logs (timestamp);
+CREATE INDEX ix_packet_logs_src_ip ON packet_logs (src_ip);
+CREATE INDEX ix_packet_logs_protocol ON packet_logs (protocol);
+CREATE INDEX ix_packet_logs_threat_score ON packet_logs (threat_score);
+CREATE INDEX ix_packet_logs_threat_level ON packet_logs (threat_level);
+
+-- Catches any day whose partition does not exist yet, including the epoch
+-- that legacy NULL timestamps are backfilled to
+CREATE TABLE packet_logs_default PARTITION OF packet_logs DEFAULT;
+
+-- One partition per day already present in the data
+DO $$
+DECLARE
+    d DATE;
+BEGIN
+    FOR d IN
+        SELECT DISTINCT timestamp::date FROM packet_logs_legacy WHERE timestamp IS NOT NULL
+    LOOP
+        EXECUTE format(
+            'CREATE TABLE IF NOT EXISTS %I PARTITION OF packet_logs FOR VALUES FROM (%L) TO (%L)',
+            'packet_logs_p' || to_char(d, 'YYYYMMDD'), d, d + 1
+        );
+    END LOOP;
+END $$;
+
+-- NULL cannot be stored in the key: use the epoch, the bucket the rollups
+-- (database/rollups.py) already count these rows in
+UPDATE packet_logs_legacy SET timestamp = TIMESTAMP '1970-01-01' WHERE timestamp IS NULL;
+
+INSERT INTO packet_logs SELECT * FROM packet_logs_legacy;
+
+ALTER SEQUENCE IF EXISTS packet_logs_id_seq OWNED BY packet_logs.id;
+DROP TABLE packet_logs_legacy;
+
+COMMIT;
@@ -0,0 +1,23 @@
+-- Migration: Split each packet_log_rollups minute into shard rows
+--
+-- database/rollups.py upserts into one of ROLLUP_SHARDS rows per minute (one
+-- per writing session) so concurrent writers do not queue on the current
+-- minute's row lock. The rollups are derived data: drop the table, recreate
+-- it with the shard key and repopulate it with
+-- scripts/db_management/backfill_rollups.py (the API also rebuilds it on the
+-- first stats read). upgrade_db_schema does the same on startup.
+
+DROP TABLE IF EXISTS packet_log_rollups;
+
+CREATE TABLE packet_log_rollups (
+    bucket_start TIMESTAMP NOT NULL,
+    shard SMALLINT NOT NULL DEFAULT 0,
+    event_count INTEGER NOT NULL DEFAULT 0,
+    scored_count INTEGER NOT NULL DEFAULT 0,
+    threat_score_sum FLOAT NOT NULL DEFAULT 0.0,
+    critical_count INTEGER NOT NULL DEFAULT 0,
+    malicious_count INTEGER NOT NULL DEFAULT 0,
+    suspicious_count INTEGER NOT NULL DEFAULT 0,
+    benign_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (bucket_start, shard)
+);
@@ -1,12 +1,16 @@
 from sqlalchemy import (
     Column,
     Integer,
+    SmallInteger,
     String,
     Float,
     DateTime,
     ForeignKey,
     Boolean,
     Text,
+    LargeBinary,
+    Index,
+    text,
 )
 from sqlalchemy.orm import relationship, declarative_base
 from datetime import datetime
@@ -37,7 +41,27 @@ def set_sqlite_pragma(dbapi_connection, connection_record):
 
 class PacketLog(Base):
     __tablename__ = "packet_logs"
-    __table_args__ = {"extend_existing": True}
+    __table_args__ = (
+        # Hot analytical filters (see database/query_plans.py and
+        # migrations/add_packet_log_composite_indexes.sql).
+        # Correlation / low-and-slow / protocol mix: time window, grouped by source (covering)
+        Index("ix_packet_logs_ts_src_port_proto", "timestamp", "src_ip", "dst_port", "protocol"),
+        # Distributed brute force: one port over a time window, grouped by target (covering)
+        Index("ix_packet_logs_dport_ts_dst_src", "dst_port", "timestamp", "dst_ip", "src_ip"),
+        # Campaign clustering: elevated threat levels over a time window
+        Index("ix_packet_logs_level_ts", "threat_level", "timestamp"),
+        # Analyzer reconcile sweep: only rows still waiting for a score
+        Index(
+            "ix_packet_logs_unscored",
+            "id",
+            sqlite_where=text("threat_level IS NULL"),
+            postgresql_where=text("threat_level IS NULL"),
+        ),
+        # Dashboards: per-honeypot counts / latest activity, per-attacker timelines
+        Index("ix_packet_logs_proto_ts", "protocol", "timestamp"),
+        Index("ix_packet_logs_src_ts", "src_ip", "timestamp"),
+        {"extend_existing": True},
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     timestamp = Column(DateTime, default=datetime.utcnow, index=True)
@@ -58,6 +82,8 @@ class PacketLog(Base):
     rcpt_to = Column(String(256), nullable=True)
     email_subject = Column(String(512), nullable=True)
     body_len = Column(Integer, nullable=True)
+    # Packed float32 feature vector (ml/feature_store.py), computed once per event
+    feature_vector = Column(LargeBinary, nullable=True)
 
     # GeoIP Enrichment
     country = Column(String, nullable=True)
@@ -104,6 +130,34 @@ class TrafficStats(Base):
     active_connections = Column(Integer, default=0)
 
 
+class PacketLogRollup(Base):
+    """Per-minute packet_logs aggregates, maintained by database/rollups.py."""
+
+    __tablename__ = "packet_log_rollups"
+    __table_args__ = {"extend_existing": True}
+
+    bucket_start = Column(DateTime, primary_key=True)
+    shard = Column(SmallInteger, primary_key=True, default=0)  # spreads concurrent writers of one minute
+    event_count = Column(Integer, default=0, nullable=False)
+    scored_count = Column(Integer, default=0, nullable=False)  # rows with a non-NULL threat_score
+    threat_score_sum = Column(Float, default=0.0, nullable=False)
+    critical_count = Column(Integer, default=0, nullable=False)  # >= 0.8
+    malicious_count = Column(Integer, default=0, nullable=False)  # >= 0.75
+    suspicious_count = Column(Integer, default=0, nullable=False)  # 0.4 – 0.7499
+    benign_count = Column(Integer, default=0, nullable=False)  # < 0.4
+
+
+class PacketLogRollupKey(Base):
+    """Distinct src_ip / protocol values seen in packet_logs (for unique counts)."""
+
+    __tablename__ = "packet_log_rollup_keys"
+    __table_args__ = {"extend_existing": True}
+
+    kind = Column(String(16), primary_key=True)  # "src_ip" | "protocol"
+    value = Column(String, primary_key=True)
+    first_seen = Column(DateTime, default=datetime.utcnow)
+
+
 class AttackSession(Base):
     __tablename__ = "attack_sessions"
     __table_args__ = {"extend_existing": True}
@@ -287,3 +341,27 @@ class SystemConfig(Base):
     )  # threat_detection, honeypot, siem, performance
     sentinel_llm_enabled = Column(Boolean, default=False, nullable=True)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class TrainingJob(Base):
+    """Queued model training run, executed by a training worker process (services/training_jobs.py)."""
+
+    __tablename__ = "training_jobs"
+    __table_args__ = (
+        Index("ix_training_jobs_status_id", "status", "id"),
+        {"extend_existing": True},
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String, index=True)  # unsupervised_baseline, random_forest
+    params = Column(Text, nullable=True)  # JSON string of job keyword arguments
+    status = Column(String, default="queued")  # queued, running, succeeded, failed
+    progress = Column(Float, default=0.0)  # 0.0 - 1.0
+    message = Column(String, nullable=True)  # last progress message
+    worker = Column(String, nullable=True)  # host:pid of the process running it
+    result = Column(Text, nullable=True)  # JSON string returned by the job
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
@@ -0,0 +1,370 @@
+"""
+PhantomNet PacketLog Partitioning
+=================================
+
+Time-partitioned storage for ``packet_logs`` with scheduled rotation and
+Parquet archival.
+
+PostgreSQL:
+    ``packet_logs`` is a native ``PARTITION BY RANGE (timestamp)`` table
+    (see migrations/partition_packet_logs.sql) with one partition per day
+    (``packet_logs_pYYYYMMDD``). Postgres routes inserts and prunes
+    time-range queries by itself; rotation pre-creates upcoming partitions,
+    exports partitions older than the retention window to Parquet and only
+    then detaches and drops them. Partitions detached but never archived
+    (by an interrupted rotation) are archived and dropped on the next run.
+
+SQLite:
+    There is no read routing across database files, so every row stays in
+    ``packet_logs`` until it leaves the retention window. Rotation exports
+    each day older than that to Parquet and removes it with one range
+    DELETE (indexed on ``timestamp``).
+
+Retention of whole days is a partition drop on PostgreSQL and one range
+DELETE per day on SQLite; either way it is not a row-by-row DELETE.
+
+Configuration (env):
+    PACKET_LOG_PARTITIONING_ENABLED   scheduled rotation on/off (default false)
+    PACKET_LOG_RETENTION_DAYS         days before a partition is archived (default 90)
+    PACKET_LOG_PARTITION_DIR          Parquet archive location
+    PACKET_LOG_ROTATION_INTERVAL_HOURS  rotation job interval (default 6)
+
+Usage:
+    from database.partitioning import partition_manager
+
+    summary = partition_manager.rotate(db)
+    dropped = partition_manager.drop_before(db, cutoff)
+"""
+
+import glob
+import itertools
+import logging
+import os
+import re
+import sqlite3
+from datetime import date, datetime, timedelta
+from typing import List, Optional
+
+import pandas as pd
+from sqlalchemy import select, text
+from sqlalchemy.orm import Session
+
+from .models import PacketLog
+from .rollups import pending_removal, record_removal
+
+logger = logging.getLogger("partitioning")
+
+PARTITIONING_ENABLED = os.getenv("PACKET_LOG_PARTITIONING_ENABLED", "false").lower() == "true"
+RETENTION_DAYS = int(os.getenv("PACKET_LOG_RETENTION_DAYS", 90))
+ROTATION_INTERVAL_HOURS = int(os.getenv("PACKET_LOG_ROTATION_INTERVAL_HOURS", 6))
+PARTITION_DIR = os.getenv(
+    "PACKET_LOG_PARTITION_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "partitions"),
+)
+
+TABLE = "packet_logs"
+_PARTITION_RE = re.compile(r"^packet_logs_p(\d{8})$")
+_DAY_FILE_RE = re.compile(r"packet_logs_(\d{8})\.db$")
+
+
+class PacketLogPartitionManager:
+    """
+    Rotates, archives and drops daily PacketLog partitions.
+    """
+
+    def __init__(
+        self,
+        retention_days: int = RETENTION_DAYS,
+        partition_dir: str = PARTITION_DIR,
+        premake_days: int = 3,
+    ):
+        """
+        :param retention_days: Age in days after which partitions are archived to Parquet
+        :param partition_dir: Directory for Parquet archives
+        :param premake_days: Future daily partitions created ahead of time (Postgres)
+        """
+        self.retention_days = retention_days
+        self.partition_dir = partition_dir
+        self.premake_days = premake_days
+
+    # --------------------------------------------------
+    # Public API
+    # --------------------------------------------------
+
+    def rotate(self, db: Session, now: Optional[datetime] = None) -> dict:
+        """Run one rotation cycle. Returns a summary of what was moved."""
+        today = (now or datetime.utcnow()).date()
+        dialect = db.get_bind().dialect.name
+        if dialect == "postgresql":
+            summary = self._rotate_postgres(db, today)
+        elif dialect == "sqlite" and self._sqlite_path(db):
+            summary = self._rotate_sqlite(db, today)
+        else:
+            return {"dialect": dialect, "skipped": True}
+
+        logger.info(f"PacketLog partition rotation: {summary}")
+        return summary
+
+    def drop_before(self, db: Session, cutoff: datetime) -> dict:
+        """
+        Drop every daily partition / day file / archive that ends before
+        ``cutoff``. Returns ``{"packet_logs": rows dropped from packet_logs
+        (Postgres: planner estimate), "archived": rows in removed archives}``.
+        Rows of the boundary day are left to the caller's DELETE.
+        """
+        cutoff_day = cutoff.date()
+        dialect = db.get_bind().dialect.name
+        dropped = {"packet_logs": 0, "archived": 0}
+        if dialect == "postgresql":
+            for name, day in self._pg_partitions(db):
+                if day < cutoff_day:
+                    dropped["packet_logs"] += self._pg_estimate_rows(db, name)
+                    removal = pending_removal(db, *self._day_window(day))
+                    db.execute(text(f"DROP TABLE IF EXISTS {name}"))
+                    record_removal(db, removal)
+                    db.commit()
+        # Archived rows already left packet_logs (and the rollups)
+        for path, day in self._archive_files():
+            if day < cutoff_day:
+                dropped["archived"] += self._count_file_rows(path)
+                os.remove(path)
+        return dropped
+
+    # --------------------------------------------------
+    # PostgreSQL: native range partitions
+    # --------------------------------------------------
+
+    def _rotate_postgres(self, db: Session, today: date) -> dict:
+        if not self._pg_is_partitioned(db):
+            logger.warning(
+                "packet_logs is not partitioned; apply migrations/partition_packet_logs.sql first."
+            )
+            return {"dialect": "postgresql", "skipped": True}
+
+        existing = {day for _, day in self._pg_partitions(db)}
+        created = []
+        for offset in range(self.premake_days + 1):
+            day = today + timedelta(days=offset)
+            if day not in existing:
+                name = self._pg_partition_name(day)
+                try:
+                    db.execute(
+                        text(
+                            f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {TABLE} "
+                            f"FOR VALUES FROM ('{day.isoformat()}') TO ('{(day + timedelta(days=1)).isoformat()}')"
+                        )
+                    )
+                    db.commit()
+                    created.append(name)
+                except Exception as e:
+                    # e.g. rows for that day already sit in the default partition
+                    db.rollback()
+                    logger.error(f"Could not create partition {name}: {e}")
+
+        archived = []
+        # Left detached by an interrupted rotation: rows already left packet_logs and the rollups
+        for name, day in self._pg_detached_partitions(db):
+            self._pg_export(db, name, day)
+            db.execute(text(f"DROP TABLE {name}"))
+            db.commit()
+            archived.append(name)
+
+        archive_before = today - timedelta(days=self.retention_days)
+        for name, day in self._pg_partitions(db):
+            if day < archive_before:
+                # Export while attached: a failed export leaves the partition in place for the next run
+                self._pg_export(db, name, day)
+                removal = pending_removal(db, *self._day_window(day))
+                db.execute(text(f"ALTER TABLE {TABLE} DETACH PARTITION {name}"))
+                record_removal(db, removal)
+                db.execute(text(f"DROP TABLE {name}"))
+                db.commit()
+                archived.append(name)
+
+        return {"dialect": "postgresql", "created": created, "archived": archived}
+
+    def _pg_export(self, db: Session, name: str, day: date) -> None:
+        """Write the whole partition to its day archive (replacing one left by a failed run)."""
+        self._export_parquet(
+            pd.read_sql(text(f"SELECT * FROM {name}"), db.connection(), chunksize=50000),
+            day,
+            append=False,
+        )
+        db.commit()
+
+    @staticmethod
+    def _pg_partition_name(day: date) -> str:
+        return f"{TABLE}_p{day.strftime('%Y%m%d')}"
+
+    @staticmethod
+    def _pg_is_partitioned(db: Session) -> bool:
+        return bool(
+            db.execute(
+                text(
+                    "SELECT 1 FROM pg_partitioned_table pt "
+                    "JOIN pg_class c ON c.oid = pt.partrelid WHERE c.relname = :t"
+                ),
+                {"t": TABLE},
+            ).scalar()
+        )
+
+    @staticmethod
+    def _pg_partitions(db: Session) -> List[tuple]:
+        rows = db.execute(
+            text(
+                "SELECT c.relname FROM pg_inherits i "
+                "JOIN pg_class c ON c.oid = i.inhrelid "
+                "JOIN pg_class p ON p.oid = i.inhparent WHERE p.relname = :t"
+            ),
+            {"t": TABLE},
+        ).scalars()
+        partitions = []
+        for name in rows:
+            match = _PARTITION_RE.match(name)
+            if match:
+                partitions.append((name, datetime.strptime(match.group(1), "%Y%m%d").date()))
+        return sorted(partitions, key=lambda p: p[1])
+
+    @staticmethod
+    def _pg_detached_partitions(db: Session) -> List[tuple]:
+        rows = db.execute(
+            text(
+                "SELECT c.relname FROM pg_class c "
+                "WHERE c.relkind = 'r' AND c.relname ~ '^packet_logs_p[0-9]{8}$' "
+                "AND NOT EXISTS (SELECT 1 FROM pg_inherits i WHERE i.inhrelid = c.oid)"
+            )
+        ).scalars()
+        return sorted(
+            ((name, datetime.strptime(_PARTITION_RE.match(name).group(1), "%Y%m%d").date()) for name in rows),
+            key=lambda p: p[1],
+        )
+
+    @staticmethod
+    def _pg_estimate_rows(db: Session, name: str) -> int:
+        estimate = db.execute(
+            text("SELECT reltuples FROM pg_class WHERE relname = :n"), {"n": name}
+        ).scalar()
+        return max(int(estimate or 0), 0)
+
+    # --------------------------------------------------
+    # SQLite: one table, days archived at the retention cutoff
+    # --------------------------------------------------
+
+    def _rotate_sqlite(self, db: Session, today: date) -> dict:
+        archive_before = today - timedelta(days=self.retention_days)
+        days = [
+            datetime.strptime(d, "%Y-%m-%d").date()
+            for d in db.execute(
+                text(
+                    f"SELECT DISTINCT substr(timestamp, 1, 10) FROM {TABLE} "
+                    "WHERE timestamp < :cutoff AND timestamp IS NOT NULL"
+                ),
+                {"cutoff": archive_before.isoformat()},
+            ).scalars()
+            if d
+        ]
+        db.commit()
+
+        archived = []
+        for day in sorted(days):
+            window = self._day_window(day)
+            self._export_parquet(
+                pd.read_sql(select(PacketLog.__table__).where(*window), db.connection(), chunksize=50000),
+                day,
+            )
+            # ORM bulk DELETE: the rollup hooks subtract the day
+            removed = db.query(PacketLog).filter(*window).delete(synchronize_session=False)
+            db.commit()
+            archived.append({"day": day.isoformat(), "rows": removed})
+
+        # Day files left by earlier versions of the rotation
+        for path, day in self._day_files():
+            conn = sqlite3.connect(path)
+            try:
+                frame = pd.read_sql(f"SELECT * FROM {TABLE}", conn)
+            finally:
+                conn.close()
+            self._export_parquet([frame], day)
+            os.remove(path)
+            archived.append({"day": day.isoformat(), "rows": len(frame)})
+
+        return {"dialect": "sqlite", "archived": archived}
+
+    def _day_files(self) -> List[tuple]:
+        files = []
+        for path in glob.glob(os.path.join(self.partition_dir, f"{TABLE}_*.db")):
+            match = _DAY_FILE_RE.search(path)
+            if match:
+                files.append((path, datetime.strptime(match.group(1), "%Y%m%d").date()))
+        return sorted(files, key=lambda f: f[1])
+
+    @staticmethod
+    def _sqlite_path(db: Session) -> Optional[str]:
+        database = db.get_bind().url.database
+        return database if database and database != ":memory:" else None
+
+    # --------------------------------------------------
+    # Parquet archive
+    # --------------------------------------------------
+
+    def _parquet_path(self, day: date) -> str:
+        return os.path.join(self.partition_dir, f"{TABLE}_{day.strftime('%Y%m%d')}.parquet")
+
+    def _export_parquet(self, frames, day: date, append: bool = True) -> str:
+        """
+        Write one day's rows (an iterable of DataFrames) to a zstd Parquet
+        file, after any already archived unless ``append`` is False.
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        os.makedirs(self.partition_dir, exist_ok=True)
+        path = self._parquet_path(day)
+        if append and os.path.exists(path):
+            # Late rows for a day that was already archived
+            frames = itertools.chain([pd.read_parquet(path)], frames)
+        writer = None
+        try:
+            for frame in frames:
+                table = pa.Table.from_pandas(frame, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(path, table.schema, compression="zstd")
+                else:
+                    table = table.cast(writer.schema, safe=False)
+                writer.write_table(table)
+        finally:
+            if writer is not None:
+                writer.close()
+        return path
+
+    def _archive_files(self) -> List[tuple]:
+        files = self._day_files()
+        for path in glob.glob(os.path.join(self.partition_dir, f"{TABLE}_*.parquet")):
+            match = re.search(r"packet_logs_(\d{8})\.parquet$", path)
+            if match:
+                files.append((path, datetime.strptime(match.group(1), "%Y%m%d").date()))
+        return files
+
+    @staticmethod
+    def _count_file_rows(path: str) -> int:
+        try:
+            if path.endswith(".parquet"):
+                import pyarrow.parquet as pq
+
+                return pq.ParquetFile(path).metadata.num_rows
+            conn = sqlite3.connect(path)
+            try:
+                return conn.execute(f"SELECT COUNT(*) FROM {TABLE}").fetchone()[0]
+            finally:
+                conn.close()
+        except Exception:
+            return 0
+
+    @staticmethod
+    def _day_window(day: date) -> tuple:
+        start = datetime.combine(day, datetime.min.time())
+        return PacketLog.timestamp >= start, PacketLog.timestamp < start + timedelta(days=1)
+
+
+# Singleton instance
+partition_manager = PacketLogPartitionManager()
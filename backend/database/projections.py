@@ -0,0 +1,212 @@
+"""
+PhantomNet PacketLog Projections
+================================
+
+Column-projected reads of ``packet_logs`` for analytics paths.
+
+``db.query(PacketLog).all()`` builds an identity-mapped ORM instance with
+every column for each row, even where the caller reads five of them. The
+helpers here select only the requested columns and return an event frame:
+a NumPy structured array with one typed field per column, so a scan costs
+a few arrays instead of one Python object (plus its instance state) per
+row.
+
+    fetch_events(db, fields, *criteria)  -> event frame
+    iter_events(db, fields, *criteria)   -> event frames of ``batch_size`` rows
+    iter_event_windows(db, fields, ...)  -> event frames of ``window`` rows, one
+                                            short query each (keyset paging)
+    to_dataframe(frame)                  -> pandas DataFrame
+    to_arrow(frame)                      -> pyarrow Table (needs pyarrow)
+
+The first two read through a streaming cursor (``yield_per``), converting
+one chunk of result rows at a time. ``iter_event_windows`` holds no cursor
+between windows, so the caller may commit (e.g. stored feature vectors)
+after each one; use it for scans that run for minutes.
+
+Event frames are the shared row format between the database and the ML /
+reporting code; ``feature_store.vectors_for_events`` takes one directly.
+
+NULLs: numeric fields take the fill value in EVENT_FIELDS (the column
+default), string and blob fields keep None, timestamps become NaT.
+
+Usage:
+    from database.projections import fetch_events, iter_events
+
+    frame = fetch_events(db, ("id", "src_ip", "threat_score"), PacketLog.timestamp >= cutoff)
+    frame["threat_score"].mean()
+
+    for chunk in iter_events(db, ("id", "attack_type"), batch_size=50000):
+        ...
+"""
+
+import os
+from datetime import datetime
+from typing import Any, Dict, Iterator, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import and_, or_, select
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import Select
+
+from .models import PacketLog
+
+# Rows per chunk for streamed scans
+EVENT_BATCH_SIZE = int(os.getenv("EVENT_BATCH_SIZE", "50000"))
+
+# Field -> (dtype, fill value for NULL); fill None keeps None / NaT
+EVENT_FIELDS: Dict[str, Tuple[Any, Any]] = {
+    "id": (np.int64, 0),
+    "timestamp": ("datetime64[us]", None),
+    "src_ip": (object, None),
+    "dst_ip": (object, None),
+    "src_port": (np.int64, 0),
+    "dst_port": (np.int64, 0),
+    "protocol": (object, None),
+    "length": (np.int64, 0),
+    "attack_type": (object, None),
+    "threat_score": (np.float64, 0.0),
+    "threat_level": (object, None),
+    "confidence": (np.float64, np.nan),
+    "is_malicious": (np.bool_, False),
+    "event": (object, None),
+    "anomaly_score": (np.float64, 0.0),
+    "country": (object, None),
+    "city": (object, None),
+    "latitude": (np.float64, np.nan),
+    "longitude": (np.float64, np.nan),
+    "feature_vector": (object, None),
+    "detected_signatures": (object, None),
+}
+
+# Repetitive string fields whose equal values share one object within a chunk
+SHARED_STRING_FIELDS = frozenset(
+    {"src_ip", "dst_ip", "protocol", "attack_type", "threat_level", "country", "city"}
+)
+
+
+def event_dtype(fields: Sequence[str]) -> np.dtype:
+    """Structured dtype of an event frame with ``fields``."""
+    unknown = [name for name in fields if name not in EVENT_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown PacketLog fields: {unknown}")
+    return np.dtype([(name, EVENT_FIELDS[name][0]) for name in fields])
+
+
+def select_events(fields: Sequence[str], *criteria) -> Select:
+    """SELECT of just ``fields`` from packet_logs, filtered by ``criteria``."""
+    event_dtype(fields)
+    return select(*[getattr(PacketLog, name) for name in fields]).where(*criteria)
+
+
+def to_frame(rows: Sequence[Sequence], fields: Sequence[str]) -> np.ndarray:
+    """Event frame from result rows (tuples in ``fields`` order)."""
+    frame = np.empty(len(rows), dtype=event_dtype(fields))
+    if not len(rows):
+        return frame
+    # Transpose as plain tuples; numpy probing Row objects as mappings is slow
+    for name, values in zip(fields, zip(*rows)):
+        if name in SHARED_STRING_FIELDS:
+            # Low-cardinality strings: one object per distinct value instead of per row
+            shared = {}
+            values = [shared.setdefault(value, value) for value in values]
+        column = np.array(values, dtype=object)
+        fill = EVENT_FIELDS[name][1]
+        if fill is not None:
+            column[np.equal(column, None)] = fill
+        frame[name] = column
+    return frame
+
+
+def fetch_events(
+    db: Session,
+    fields: Sequence[str],
+    *criteria,
+    order_by=None,
+    limit: Optional[int] = None,
+    batch_size: int = EVENT_BATCH_SIZE,
+) -> np.ndarray:
+    """
+    Event frame of the rows matching ``criteria``. Rows are converted one
+    streamed chunk at a time, so result rows for the whole scan never
+    exist at once.
+    """
+    chunks = list(iter_events(db, fields, *criteria, order_by=order_by, limit=limit, batch_size=batch_size))
+    if len(chunks) == 1:
+        return chunks[0]
+    return np.concatenate(chunks) if chunks else np.empty(0, dtype=event_dtype(fields))
+
+
+def iter_events(
+    db: Session,
+    fields: Sequence[str],
+    *criteria,
+    order_by=None,
+    limit: Optional[int] = None,
+    batch_size: int = EVENT_BATCH_SIZE,
+) -> Iterator[np.ndarray]:
+    """Event frames of at most ``batch_size`` rows, fetched with a streaming cursor."""
+    statement = select_events(fields, *criteria)
+    if order_by is not None:
+        statement = statement.order_by(order_by)
+    if limit is not None:
+        statement = statement.limit(limit)
+    # Core execution on the session's connection: same transaction, no ORM row handling
+    result = db.connection().execute(statement.execution_options(yield_per=batch_size))
+    for rows in result.partitions():
+        yield to_frame(rows, fields)
+
+
+def iter_event_windows(
+    db: Session,
+    fields: Sequence[str],
+    *criteria,
+    by_time: bool = False,
+    window: int = EVENT_BATCH_SIZE,
+) -> Iterator[np.ndarray]:
+    """
+    Event frames of at most ``window`` rows in ``id`` order, or
+    ``(timestamp, id)`` order with ``by_time`` (rows without a timestamp
+    are skipped). Each window is its own ``LIMIT`` query resuming after the
+    last key seen, so no cursor stays open between windows.
+    """
+    keys = ("timestamp", "id") if by_time else ("id",)
+    missing = [name for name in keys if name not in fields]
+    if missing:
+        raise ValueError(f"Windowed scans need the key fields {missing}")
+    order_by = (PacketLog.timestamp, PacketLog.id) if by_time else (PacketLog.id,)
+    if by_time:
+        criteria += (PacketLog.timestamp.isnot(None),)
+
+    after = ()
+    while True:
+        statement = select_events(fields, *criteria, *after).order_by(*order_by).limit(window)
+        frame = to_frame(db.connection().execute(statement).all(), fields)
+        if len(frame):
+            yield frame
+        if len(frame) < window:
+            return
+        last_id = int(frame["id"][-1])
+        if by_time:
+            last_ts = frame["timestamp"][-1].astype(datetime)
+            after = (
+                or_(
+                    PacketLog.timestamp > last_ts,
+                    and_(PacketLog.timestamp == last_ts, PacketLog.id > last_id),
+                ),
+            )
+        else:
+            after = (PacketLog.id > last_id,)
+
+
+def to_dataframe(frame: np.ndarray):
+    """pandas DataFrame with one column per event frame field."""
+    import pandas as pd
+
+    return pd.DataFrame({name: frame[name] for name in frame.dtype.names})
+
+
+def to_arrow(frame: np.ndarray):
+    """pyarrow Table with one column per event frame field."""
+    import pyarrow as pa
+
+    return pa.table({name: frame[name] for name in frame.dtype.names})
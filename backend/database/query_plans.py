@@ -0,0 +1,251 @@
+"""
+PhantomNet Hot Query Plans
+==========================
+
+EXPLAIN-based regression check for the hot analytical queries on
+``packet_logs``. Each hot query is executed through the real service code
+(pattern detector, correlation engine, stats fallback) while the SQL it
+emits is captured; every captured statement is then EXPLAINed and the plan
+is checked for sequential scans of ``packet_logs``.
+
+Rules:
+    windowed queries   must reach packet_logs through an index SEARCH
+                       (SQLite) / never a Seq Scan (Postgres). Full scans
+                       of a partial index are allowed.
+    whole-table queries (stats fallback) must be answered from a covering
+                       index on SQLite; on Postgres they are skipped since
+                       the dashboard reads them from the rollup tables.
+
+Usage:
+    from database.query_plans import check_query_plans
+
+    report = check_query_plans(db)
+    assert not report["failures"], report["failures"]
+
+See scripts/db_management/explain_hot_queries.py for the seeded
+multi-million-row run.
+"""
+
+import random
+import re
+from datetime import datetime, timedelta
+from typing import Any, Callable, List, NamedTuple, Optional
+
+from sqlalchemy import event
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.functions import FunctionElement
+
+from .models import PacketLog
+
+TABLE = "packet_logs"
+PARTIAL_INDEXES = {"ix_packet_logs_unscored"}
+
+_SQLITE_SCAN_RE = re.compile(rf"^SCAN {TABLE}\b(?: USING (COVERING )?INDEX (\w+))?")
+
+
+class window_group(FunctionElement):
+    """
+    GROUP BY key for time-windowed aggregates.
+
+    SQLite keeps no range statistics, so for ``WHERE timestamp >= ? GROUP BY
+    src_ip`` it prefers walking a src_ip-leading index (no sort) over the
+    window index, i.e. a full scan. Rendering the key as ``+src_ip`` on
+    SQLite stops the index from satisfying the GROUP BY; other dialects get
+    the plain column.
+    """
+
+    inherit_cache = True
+
+    def __init__(self, column):
+        super().__init__(column)
+        self.type = column.type
+
+
+@compiles(window_group)
+def _window_group_default(element, compiler, **kw):
+    return compiler.process(element.clauses, **kw)
+
+
+@compiles(window_group, "sqlite")
+def _window_group_sqlite(element, compiler, **kw):
+    return "+" + compiler.process(element.clauses, **kw)
+
+
+class HotQuery(NamedTuple):
+    name: str
+    source: str
+    run: Callable[[Session], Any]
+    windowed: bool = True
+
+
+def hot_queries() -> List[HotQuery]:
+    """The hot packet_logs queries, each run through the code that issues it."""
+    from ml_engine.pattern_detector import AdvancedPatternDetector
+    from services.correlation_engine import CorrelationEngine
+    from services.stats_aggregator import StatsService
+
+    def since(**delta):
+        return datetime.utcnow() - timedelta(**delta)
+
+    return [
+        HotQuery(
+            "distributed_brute_force",
+            "ml_engine/pattern_detector.py",
+            lambda db: AdvancedPatternDetector(db).detect_distributed_brute_force(),
+        ),
+        HotQuery(
+            "low_and_slow_scan",
+            "ml_engine/pattern_detector.py",
+            lambda db: AdvancedPatternDetector(db).detect_low_and_slow_scan(),
+        ),
+        HotQuery(
+            "window_source_protocols",
+            "services/correlation_engine.py",
+            lambda db: CorrelationEngine.window_source_protocols(db, since(minutes=5)),
+        ),
+        HotQuery(
+            # Same filter as _CampaignWindow.update
+            "campaign_candidates",
+            "ml_engine/campaign_clustering.py",
+            lambda db: db.query(PacketLog.id, PacketLog.timestamp)
+            .filter(
+                PacketLog.timestamp >= since(hours=24),
+                PacketLog.threat_level.in_(["MEDIUM", "HIGH", "CRITICAL"]),
+            )
+            .all(),
+        ),
+        HotQuery(
+            # Same filter as ThreatAnalyzerService._process_unscored_logs
+            "unscored_sweep",
+            "services/threat_analyzer.py",
+            lambda db: db.query(PacketLog.id)
+            .filter(PacketLog.threat_level.is_(None))
+            .order_by(PacketLog.id)
+            .limit(500)
+            .all(),
+        ),
+        HotQuery(
+            "stats_fallback",
+            "services/stats_aggregator.py",
+            lambda db: StatsService(db).calculate_stats_from_logs(),
+            windowed=False,
+        ),
+    ]
+
+
+def capture_sql(db: Session, fn: Callable[[Session], Any]) -> List[tuple]:
+    """Run ``fn(db)`` and return the (statement, parameters) of its packet_logs SELECTs."""
+    captured = []
+    engine = db.get_bind()
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith("SELECT") and TABLE in statement:
+            captured.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", _record)
+    try:
+        fn(db)
+    finally:
+        event.remove(engine, "before_cursor_execute", _record)
+    return captured
+
+
+def explain(db: Session, statement: str, parameters) -> list:
+    """Query plan of one captured statement, as SQLite detail strings or Postgres plan nodes."""
+    connection = db.connection()
+    if connection.dialect.name == "postgresql":
+        plan = connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters).scalar()
+        nodes = []
+        _walk_pg_plan(plan[0]["Plan"], nodes)
+        return nodes
+    rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+    return [row[-1] for row in rows]
+
+
+def _walk_pg_plan(node: dict, nodes: list) -> None:
+    nodes.append(f"{node['Node Type']} on {node['Relation Name']}" if "Relation Name" in node else node["Node Type"])
+    for child in node.get("Plans", []):
+        _walk_pg_plan(child, nodes)
+
+
+def full_scans(dialect: str, plan: list, windowed: bool = True) -> list:
+    """Plan lines that read packet_logs with a sequential / full scan."""
+    bad = []
+    for line in plan:
+        if dialect == "postgresql":
+            if re.match(rf"^(Parallel )?Seq Scan on {TABLE}(_p\d{{8}})?$", line):
+                bad.append(line)
+            continue
+        match = _SQLITE_SCAN_RE.match(line)
+        if not match:
+            continue
+        covering, index = match.groups()
+        if index is None:
+            bad.append(line)  # plain table scan
+        elif index in PARTIAL_INDEXES:
+            continue
+        elif windowed or not covering:
+            bad.append(line)  # walks the whole index instead of the window
+    return bad
+
+
+def check_query_plans(db: Session, queries: Optional[List[HotQuery]] = None) -> dict:
+    """EXPLAIN every statement of every hot query. ``failures`` lists degraded plans."""
+    dialect = db.get_bind().dialect.name
+    report = {"dialect": dialect, "queries": {}, "failures": []}
+    for query in queries or hot_queries():
+        if dialect == "postgresql" and not query.windowed:
+            report["queries"][query.name] = {"skipped": "served by packet_log_rollups"}
+            continue
+        statements = capture_sql(db, query.run)
+        plans = []
+        for statement, parameters in statements:
+            plan = explain(db, statement, parameters)
+            bad = full_scans(dialect, plan, query.windowed)
+            plans.append({"sql": " ".join(statement.split()), "plan": plan, "full_scans": bad})
+            if bad:
+                report["failures"].append(
+                    {"query": query.name, "source": query.source, "full_scans": bad}
+                )
+        report["queries"][query.name] = {"source": query.source, "statements": plans}
+        db.rollback()
+    return report
+
+
+def seed_packet_logs(db: Session, rows: int, days: int = 30, chunk: int = 100000, seed: int = 7) -> None:
+    """Insert ``rows`` synthetic packet_logs rows spread over the last ``days`` days."""
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    span = days * 86400
+    protocols = ["SSH", "HTTP", "FTP", "SMTP", "TCP", "UDP"]
+    levels = ["LOW", "MEDIUM", "HIGH", "CRITICAL", None]
+    ports = [22, 80, 443, 2121, 2222, 2525, 3306, 8080]
+    table = PacketLog.__table__
+    connection = db.connection()
+    for offset in range(0, rows, chunk):
+        batch = []
+        for _ in range(min(chunk, rows - offset)):
+            score = rng.random()
+            batch.append(
+                {
+                    "timestamp": now - timedelta(seconds=rng.randrange(span)),
+                    "src_ip": f"10.{rng.randrange(64)}.{rng.randrange(256)}.{rng.randrange(256)}",
+                    "dst_ip": f"192.168.0.{rng.randrange(16)}",
+                    "src_port": rng.randrange(1024, 65535),
+                    "dst_port": rng.choice(ports),
+                    "protocol": rng.choice(protocols),
+                    "length": rng.randrange(40, 1500),
+                    "threat_score": score,
+                    "threat_level": rng.choice(levels),
+                    "is_malicious": score >= 0.75,
+                }
+            )
+        connection.execute(table.insert(), batch)
+        db.commit()
+        connection = db.connection()
+    if connection.dialect.name == "postgresql":
+        connection.exec_driver_sql(f"ANALYZE {TABLE}")
+    else:
+        connection.exec_driver_sql("ANALYZE")
+    db.commit()
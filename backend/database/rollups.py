@@ -0,0 +1,731 @@
+"""
+PhantomNet packet_logs Rollups
+==============================
+
+Per-minute aggregates of ``packet_logs`` kept current on the write path, so
+dashboard stats never scan the raw table.
+
+Write path:
+    A Session ``after_flush`` hook folds every inserted PacketLog and every
+    change to a rollup column into per-minute deltas and upserts them into
+    ``packet_log_rollups`` in the same transaction. Each minute is split
+    into ROLLUP_SHARDS rows and a session always writes its own shard, so
+    concurrent writers do not queue on the current minute's row. First-seen
+    ``src_ip`` / ``protocol`` values go to ``packet_log_rollup_keys`` (for
+    the distinct counts). Every process that writes through SQLAlchemy (API,
+    sniffer, honeypot loggers) therefore keeps the tables current.
+
+Read path:
+    ``rollup_store`` mirrors the grand totals in memory. Commits made in
+    this process are applied immediately; the mirror re-syncs from the
+    rollup tables every ``sync_interval`` seconds to pick up writes from
+    other processes.
+
+Deletes / raw SQL:
+    Deleted PacketLog rows (ORM or bulk DELETE) are subtracted as negative
+    deltas, and keys no remaining row uses are removed. Bulk UPDATEs of
+    ``threat_score`` are diffed row by row; bulk UPDATEs of the other rollup
+    columns invalidate the rollups, which are then rebuilt from
+    ``packet_logs`` on next use. Rows leaving without a DELETE (partition
+    drops) go through ``pending_removal`` / ``record_removal``. Scripts that
+    modify ``packet_logs`` with raw SQL should run
+    ``scripts/db_management/backfill_rollups.py`` afterwards.
+
+Usage:
+    from database.rollups import rollup_store
+
+    totals = rollup_store.snapshot(db)   # None when rollups are unavailable
+    report = rollup_store.check_consistency(db)
+"""
+
+import logging
+import random
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+from sqlalchemy import case, event, func, inspect, literal_column, or_, select, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from .models import PacketLog, PacketLogRollup, PacketLogRollupKey
+
+logger = logging.getLogger("rollups")
+
+COUNTERS = (
+    "event_count",
+    "scored_count",
+    "threat_score_sum",
+    "critical_count",
+    "malicious_count",
+    "suspicious_count",
+    "benign_count",
+)
+KEY_KINDS = ("src_ip", "protocol")
+# PacketLog columns the rollups are computed from
+ROLLUP_COLUMNS = frozenset({"timestamp", "threat_score", "src_ip", "protocol"})
+# The same columns in the order rows are unpacked in
+_ROW_COLUMNS = ("timestamp", "threat_score", "src_ip", "protocol")
+# Rows per minute bucket; each session upserts into one of them
+ROLLUP_SHARDS = 8
+# Values per IN (...) list when checking which keys are still in use
+_KEY_CHUNK = 500
+
+# Engines on which the rollup tables were found (weak so test engines can be collected)
+_ready_engines = weakref.WeakKeyDictionary()
+
+
+def bucket_of(ts: Optional[datetime]) -> datetime:
+    """Minute bucket for a PacketLog timestamp (naive UTC, like the column)."""
+    ts = ts or datetime.utcnow()
+    if ts.tzinfo:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return ts.replace(second=0, microsecond=0)
+
+
+def score_counters(score: Optional[float], events: int = 1) -> list:
+    """Counter contributions of one row, in COUNTERS order."""
+    if score is None:
+        return [events, 0, 0.0, 0, 0, 0, 0]
+    return [
+        events,
+        1,
+        float(score),
+        int(score >= 0.8),
+        int(score >= 0.75),
+        int(0.4 <= score <= 0.7499),
+        int(score < 0.4),
+    ]
+
+
+def bucket_sql(dialect: str) -> str:
+    """SQL for the minute bucket of ``timestamp``, matching bucket_of (NULL -> epoch)."""
+    if dialect == "postgresql":
+        return "date_trunc('minute', COALESCE(timestamp, TIMESTAMP '1970-01-01'))"
+    # Same text layout SQLAlchemy uses for DateTime on SQLite
+    return "strftime('%Y-%m-%d %H:%M:00.000000', COALESCE(timestamp, '1970-01-01 00:00:00'))"
+
+
+def _tables_ready(connection) -> bool:
+    engine = connection.engine
+    if _ready_engines.get(engine):
+        return True
+    try:
+        insp = inspect(connection)
+        ready = insp.has_table(PacketLogRollup.__tablename__) and insp.has_table(
+            PacketLogRollupKey.__tablename__
+        )
+    except Exception:
+        ready = False
+    if ready:
+        _ready_engines[engine] = True
+    return ready
+
+
+class RollupStore:
+    """
+    In-memory mirror of the rollup totals plus backfill / consistency tools.
+    """
+
+    def __init__(self, sync_interval: float = 30.0, max_known_keys: int = 100000):
+        """
+        :param sync_interval: Seconds between re-syncs from the rollup tables
+        :param max_known_keys: Size of the cache of keys already recorded (skips redundant inserts)
+        """
+        self.sync_interval = sync_interval
+        self.max_known_keys = max_known_keys
+        self.ready = False
+        self.needs_rebuild = False
+        self.last_sync = 0.0
+        self.totals = dict.fromkeys(COUNTERS, 0)
+        self.key_counts = dict.fromkeys(KEY_KINDS, 0)
+        self._known_keys = OrderedDict()
+        self._lock = threading.Lock()  # guards totals / key cache
+        self._init_lock = threading.Lock()  # serializes rebuild / sync
+
+        # Metrics
+        self.rebuilds_total = 0
+        self.syncs_total = 0
+
+    # --------------------------------------------------
+    # Read path
+    # --------------------------------------------------
+
+    def snapshot(self, db: Session) -> Optional[dict]:
+        """
+        Current totals (COUNTERS plus ``unique_src_ips`` / ``unique_protocols``),
+        or None when the rollup tables are not available on this database.
+        """
+        if not self.ready or time.monotonic() - self.last_sync > self.sync_interval:
+            with self._init_lock:
+                if not self.ready:
+                    if not self._initialize(db):
+                        return None
+                elif time.monotonic() - self.last_sync > self.sync_interval:
+                    self.sync(db)
+
+        with self._lock:
+            result = dict(self.totals)
+            result["unique_src_ips"] = self.key_counts["src_ip"]
+            result["unique_protocols"] = self.key_counts["protocol"]
+        return result
+
+    def _initialize(self, db: Session) -> bool:
+        if not _tables_ready(db.connection()):
+            return False
+        if self.needs_rebuild:
+            logger.info("Rollups were invalidated, rebuilding.")
+            self.rebuild(db)
+        else:
+            expected = db.query(func.count(PacketLog.id)).scalar() or 0
+            rolled = db.query(func.sum(PacketLogRollup.event_count)).scalar() or 0
+            if expected != rolled:
+                logger.info(f"Rollups cover {rolled}/{expected} packet_logs rows, rebuilding.")
+                self.rebuild(db)
+        self.sync(db)
+        self.ready = True
+        return True
+
+    def sync(self, db: Session) -> None:
+        """Reload the totals from the rollup tables."""
+        sums = db.query(*[func.sum(getattr(PacketLogRollup, c)) for c in COUNTERS]).one()
+        keys = dict(
+            db.query(PacketLogRollupKey.kind, func.count())
+            .group_by(PacketLogRollupKey.kind)
+            .all()
+        )
+        with self._lock:
+            self.totals = {c: (v or 0) for c, v in zip(COUNTERS, sums)}
+            self.key_counts = {kind: keys.get(kind, 0) for kind in KEY_KINDS}
+        self.last_sync = time.monotonic()
+        self.syncs_total += 1
+
+    # --------------------------------------------------
+    # Backfill / consistency
+    # --------------------------------------------------
+
+    def rebuild(self, db: Session) -> None:
+        """Recompute both rollup tables from packet_logs in one transaction."""
+        bucket = bucket_sql(db.get_bind().dialect.name)
+
+        db.execute(text("DELETE FROM packet_log_rollups"))
+        db.execute(text("DELETE FROM packet_log_rollup_keys"))
+        db.execute(
+            text(
+                f"""
+                INSERT INTO packet_log_rollups
+                    (bucket_start, shard, event_count, scored_count, threat_score_sum,
+                     critical_count, malicious_count, suspicious_count, benign_count)
+                SELECT {bucket}, 0,
+                       COUNT(*),
+                       COUNT(threat_score),
+                       COALESCE(SUM(threat_score), 0),
+                       SUM(CASE WHEN threat_score >= 0.8 THEN 1 ELSE 0 END),
+                       SUM(CASE WHEN threat_score >= 0.75 THEN 1 ELSE 0 END),
+                       SUM(CASE WHEN threat_score BETWEEN 0.4 AND 0.7499 THEN 1 ELSE 0 END),
+                       SUM(CASE WHEN threat_score < 0.4 THEN 1 ELSE 0 END)
+                FROM packet_logs
+                GROUP BY {bucket}
+                """
+            )
+        )
+        db.execute(
+            text(
+                """
+                INSERT INTO packet_log_rollup_keys (kind, value, first_seen)
+                SELECT 'src_ip', src_ip, MIN(timestamp)
+                FROM packet_logs WHERE src_ip IS NOT NULL GROUP BY src_ip
+                """
+            )
+        )
+        db.execute(
+            text(
+                """
+                INSERT INTO packet_log_rollup_keys (kind, value, first_seen)
+                SELECT 'protocol', COALESCE(protocol, ''), MIN(timestamp)
+                FROM packet_logs GROUP BY COALESCE(protocol, '')
+                """
+            )
+        )
+        db.commit()
+        with self._lock:
+            self._known_keys.clear()
+            self.needs_rebuild = False
+        self.rebuilds_total += 1
+
+    def check_consistency(self, db: Session, tolerance: float = 1e-6) -> dict:
+        """
+        Compare the rollup tables against a direct aggregate over packet_logs.
+
+        Returns ``{"consistent": bool, "mismatches": {name: (expected, actual)}}``.
+        """
+        direct = db.execute(
+            text(
+                """
+                SELECT COUNT(*),
+                       COUNT(threat_score),
+                       COALESCE(SUM(threat_score), 0),
+                       COALESCE(SUM(CASE WHEN threat_score >= 0.8 THEN 1 ELSE 0 END), 0),
+                       COALESCE(SUM(CASE WHEN threat_score >= 0.75 THEN 1 ELSE 0 END), 0),
+                       COALESCE(SUM(CASE WHEN threat_score BETWEEN 0.4 AND 0.7499 THEN 1 ELSE 0 END), 0),
+                       COALESCE(SUM(CASE WHEN threat_score < 0.4 THEN 1 ELSE 0 END), 0),
+                       COUNT(DISTINCT src_ip),
+                       COUNT(DISTINCT COALESCE(protocol, ''))
+                FROM packet_logs
+                """
+            )
+        ).one()
+        expected = dict(zip(COUNTERS + ("unique_src_ips", "unique_protocols"), direct))
+
+        sums = db.query(*[func.sum(getattr(PacketLogRollup, c)) for c in COUNTERS]).one()
+        keys = dict(
+            db.query(PacketLogRollupKey.kind, func.count())
+            .group_by(PacketLogRollupKey.kind)
+            .all()
+        )
+        actual = {c: (v or 0) for c, v in zip(COUNTERS, sums)}
+        actual["unique_src_ips"] = keys.get("src_ip", 0)
+        actual["unique_protocols"] = keys.get("protocol", 0)
+
+        mismatches = {
+            name: (expected[name], actual[name])
+            for name in expected
+            if abs((expected[name] or 0) - (actual[name] or 0))
+            > tolerance * max(1.0, abs(expected[name] or 0))
+        }
+        return {"consistent": not mismatches, "mismatches": mismatches}
+
+    # --------------------------------------------------
+    # Write-path bookkeeping (called from the session hooks)
+    # --------------------------------------------------
+
+    def unknown_keys(self, kind: str, values) -> list:
+        with self._lock:
+            return [v for v in values if (kind, v) not in self._known_keys]
+
+    def forget_keys(self, kind: str, values) -> None:
+        """Drop removed keys from the cache so the next insert records them again."""
+        with self._lock:
+            for value in values:
+                self._known_keys.pop((kind, value), None)
+
+    def apply(self, totals: list, new_keys: Dict[str, list], removed_keys: Optional[Dict[str, list]] = None) -> None:
+        """Fold a committed transaction's deltas into the mirror."""
+        removed_keys = removed_keys or {}
+        with self._lock:
+            if self.ready:
+                for name, delta in zip(COUNTERS, totals):
+                    self.totals[name] += delta
+                for kind, values in new_keys.items():
+                    self.key_counts[kind] += len(values)
+                for kind, values in removed_keys.items():
+                    self.key_counts[kind] -= len(values)
+            for kind, values in new_keys.items():
+                for value in values:
+                    self._known_keys[(kind, value)] = True
+            for kind, values in removed_keys.items():
+                for value in values:
+                    self._known_keys.pop((kind, value), None)
+            while len(self._known_keys) > self.max_known_keys:
+                self._known_keys.popitem(last=False)
+
+    def invalidate(self) -> None:
+        """Force a rebuild on next read (rows changed in ways the deltas could not follow)."""
+        with self._lock:
+            self.ready = False
+            self.needs_rebuild = True
+            self._known_keys.clear()
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "ready": self.ready,
+            "needs_rebuild": self.needs_rebuild,
+            "rebuilds_total": self.rebuilds_total,
+            "syncs_total": self.syncs_total,
+            "known_keys": len(self._known_keys),
+        }
+
+
+# Singleton instance
+rollup_store = RollupStore()
+
+
+# ==================================================
+# Session hooks
+# ==================================================
+
+def _upsert_statement(dialect: str, table, index_elements, set_=None):
+    module = postgresql if dialect == "postgresql" else sqlite
+    stmt = module.insert(table)
+    if set_ is None:
+        return stmt.on_conflict_do_nothing(index_elements=index_elements)
+    return stmt.on_conflict_do_update(index_elements=index_elements, set_=set_(stmt))
+
+
+def _pending(session: Session) -> dict:
+    return session.info.setdefault(
+        "rollup_pending",
+        {
+            "totals": [0] * len(COUNTERS),
+            "keys": {kind: [] for kind in KEY_KINDS},
+            "removed": {kind: [] for kind in KEY_KINDS},
+            "invalidate": False,
+        },
+    )
+
+
+def _shard(session: Session) -> int:
+    """This session's rollup shard (fixed for its lifetime, so its row locks keep one order)."""
+    shard = session.info.get("rollup_shard")
+    if shard is None:
+        shard = session.info["rollup_shard"] = random.randrange(ROLLUP_SHARDS)
+    return shard
+
+
+def _column_value(obj: PacketLog, name: str):
+    """Value of ``name`` as stored in the database (before unflushed changes)."""
+    history = inspect(obj).attrs[name].history
+    return history.deleted[0] if history.deleted else getattr(obj, name)
+
+
+def _before_flush(session: Session, flush_context, instances) -> None:
+    # Deleted rows' values, read while the rows (and expired attributes) are still loadable
+    deleted = [
+        tuple(_column_value(obj, name) for name in _ROW_COLUMNS)
+        for obj in session.deleted
+        if isinstance(obj, PacketLog)
+    ]
+    if deleted:
+        session.info.setdefault("rollup_deleted", []).extend(deleted)
+
+
+def _after_flush(session: Session, flush_context) -> None:
+    deltas = {}
+    keys = {kind: set() for kind in KEY_KINDS}
+    invalidate = False
+
+    _count_inserts(
+        ((obj.timestamp, obj.threat_score, obj.src_ip, obj.protocol)
+         for obj in session.new if isinstance(obj, PacketLog)),
+        deltas,
+        keys,
+    )
+
+    removed = {kind: set() for kind in KEY_KINDS}
+    for obj in session.dirty:
+        if not isinstance(obj, PacketLog):
+            continue
+        state = inspect(obj)
+        histories = {name: state.attrs[name].history for name in _ROW_COLUMNS}
+        if not any(history.added for history in histories.values()):
+            continue
+        if any(history.added and not history.deleted for history in histories.values()):
+            invalidate = True  # previous value unknown
+            continue
+        old = [histories[name].deleted[0] if histories[name].added else getattr(obj, name) for name in _ROW_COLUMNS]
+        new = [getattr(obj, name) for name in _ROW_COLUMNS]
+
+        # Move the row's counters from its old bucket / score to the new ones
+        for (timestamp, threat_score, _, _), sign in ((old, -1), (new, 1)):
+            row = deltas.setdefault(bucket_of(timestamp), [0] * len(COUNTERS))
+            for i, value in enumerate(score_counters(threat_score)):
+                row[i] += sign * value
+        if old[2] != new[2]:
+            if new[2] is not None:
+                keys["src_ip"].add(new[2])
+            if old[2] is not None:
+                removed["src_ip"].add(old[2])
+        if (old[3] or "") != (new[3] or ""):
+            keys["protocol"].add(new[3] or "")
+            removed["protocol"].add(old[3] or "")
+
+    for timestamp, threat_score, src_ip, protocol in session.info.pop("rollup_deleted", ()):
+        row = deltas.setdefault(bucket_of(timestamp), [0] * len(COUNTERS))
+        for i, value in enumerate(score_counters(threat_score)):
+            row[i] -= value
+        if src_ip is not None:
+            removed["src_ip"].add(src_ip)
+        removed["protocol"].add(protocol or "")
+
+    if not deltas and not invalidate:
+        return
+
+    _write_deltas(session, deltas, keys, invalidate)
+    if any(removed.values()):
+        _prune_keys(session, removed)
+
+
+def record_inserts(session: Session, rows: list) -> None:
+    """
+    Account for PacketLog rows inserted without ORM objects
+    (``bulk_insert_mappings`` / Core ``insert``), which the flush hook
+    never sees. Call inside the inserting transaction, before commit.
+    """
+    deltas = {}
+    keys = {kind: set() for kind in KEY_KINDS}
+    _count_inserts(
+        ((r.get("timestamp"), r.get("threat_score"), r.get("src_ip"), r.get("protocol")) for r in rows),
+        deltas,
+        keys,
+    )
+    if deltas:
+        _write_deltas(session, deltas, keys, False)
+
+
+def _count_inserts(rows, deltas: dict, keys: dict) -> None:
+    """Accumulate (timestamp, threat_score, src_ip, protocol) rows into bucket deltas."""
+    for timestamp, threat_score, src_ip, protocol in rows:
+        row = deltas.setdefault(bucket_of(timestamp), [0] * len(COUNTERS))
+        for i, value in enumerate(score_counters(threat_score)):
+            row[i] += value
+        if src_ip is not None:
+            keys["src_ip"].add(src_ip)
+        keys["protocol"].add(protocol or "")
+
+
+def _write_deltas(session: Session, deltas: dict, keys: dict, invalidate: bool) -> None:
+    pending = _pending(session)
+    pending["invalidate"] |= invalidate
+    if not deltas:
+        return
+
+    connection = session.connection()
+    dialect = connection.dialect.name
+    if dialect not in ("sqlite", "postgresql") or not _tables_ready(connection):
+        pending["invalidate"] = True
+        return
+
+    table = PacketLogRollup.__table__
+    shard = _shard(session)
+    connection.execute(
+        _upsert_statement(
+            dialect,
+            table,
+            ["bucket_start", "shard"],
+            lambda stmt: {c: table.c[c] + stmt.excluded[c] for c in COUNTERS},
+        ),
+        # Bucket order keeps row locks in one order across writers
+        [
+            {"bucket_start": bucket, "shard": shard, **dict(zip(COUNTERS, deltas[bucket]))}
+            for bucket in sorted(deltas)
+        ],
+    )
+
+    key_table = PacketLogRollupKey.__table__
+    key_insert = _upsert_statement(dialect, key_table, ["kind", "value"])
+    now = datetime.utcnow()
+    for kind, values in keys.items():
+        for value in rollup_store.unknown_keys(kind, values):
+            result = connection.execute(key_insert, {"kind": kind, "value": value, "first_seen": now})
+            if result.rowcount:
+                pending["keys"][kind].append(value)
+
+    for row in deltas.values():
+        for i, value in enumerate(row):
+            pending["totals"][i] += value
+
+
+def pending_removal(session: Session, *criteria) -> tuple:
+    """
+    Negative bucket deltas and the keys of the PacketLog rows matching
+    ``criteria``, taken before they are removed. Pass the result to
+    ``record_removal`` once the rows are gone (bulk DELETE, partition drop).
+    """
+    connection = session.connection()
+    bucket = literal_column(bucket_sql(connection.dialect.name))
+    score = PacketLog.threat_score
+    rows = connection.execute(
+        select(
+            bucket,
+            func.count(),
+            func.count(score),
+            func.coalesce(func.sum(score), 0.0),
+            func.sum(case((score >= 0.8, 1), else_=0)),
+            func.sum(case((score >= 0.75, 1), else_=0)),
+            func.sum(case((score.between(0.4, 0.7499), 1), else_=0)),
+            func.sum(case((score < 0.4, 1), else_=0)),
+        )
+        .where(*criteria)
+        .group_by(bucket)
+    ).all()
+    deltas = {}
+    for bucket_start, *counters in rows:
+        if isinstance(bucket_start, str):
+            bucket_start = datetime.strptime(bucket_start, "%Y-%m-%d %H:%M:%S.%f")
+        deltas[bucket_start] = [-(value or 0) for value in counters]
+
+    keys = {
+        "src_ip": set(
+            connection.execute(
+                select(PacketLog.src_ip).where(*criteria, PacketLog.src_ip.isnot(None)).distinct()
+            ).scalars()
+        ),
+        "protocol": set(
+            connection.execute(
+                select(func.coalesce(PacketLog.protocol, "")).where(*criteria).distinct()
+            ).scalars()
+        ),
+    }
+    return deltas, keys
+
+
+def record_removal(session: Session, removal: tuple) -> None:
+    """Apply a ``pending_removal`` result after its rows left packet_logs."""
+    deltas, keys = removal
+    _write_deltas(session, deltas, {kind: set() for kind in KEY_KINDS}, False)
+    if any(keys.values()):
+        _prune_keys(session, keys)
+
+
+def _prune_keys(session: Session, candidates: dict) -> None:
+    """Delete key rows whose value no PacketLog row uses any more."""
+    connection = session.connection()
+    if not _tables_ready(connection):
+        return
+    pending = _pending(session)
+    key_table = PacketLogRollupKey.__table__
+    columns = {"src_ip": PacketLog.src_ip, "protocol": PacketLog.protocol}
+    for kind, values in candidates.items():
+        values = list(values)
+        column = columns[kind]
+        for start in range(0, len(values), _KEY_CHUNK):
+            chunk = values[start : start + _KEY_CHUNK]
+            in_use = column.in_(chunk)
+            if kind == "protocol" and "" in chunk:
+                in_use = or_(in_use, column.is_(None))
+            used = connection.execute(
+                select(func.coalesce(column, "") if kind == "protocol" else column).where(in_use).distinct()
+            ).scalars()
+            gone = set(chunk) - set(used)
+            if not gone:
+                continue
+            connection.execute(
+                key_table.delete().where(key_table.c.kind == kind, key_table.c.value.in_(gone))
+            )
+            # Other sessions must insert these keys again from now on
+            rollup_store.forget_keys(kind, gone)
+            pending["removed"][kind].extend(gone)
+
+
+def _after_commit(session: Session) -> None:
+    pending = session.info.pop("rollup_pending", None)
+    if not pending:
+        return
+    if pending["invalidate"]:
+        rollup_store.invalidate()
+    else:
+        rollup_store.apply(pending["totals"], pending["keys"], pending["removed"])
+
+
+def _after_rollback(session: Session) -> None:
+    session.info.pop("rollup_pending", None)
+    session.info.pop("rollup_deleted", None)
+
+
+def _updated_columns(orm_execute_state) -> Optional[set]:
+    """Column names set by a bulk UPDATE, or None when they cannot be told."""
+    values = getattr(orm_execute_state.statement, "_values", None)
+    if values:
+        return {getattr(key, "key", key) for key in values}
+    parameters = orm_execute_state.parameters
+    if isinstance(parameters, list) and parameters:
+        # ORM bulk UPDATE by primary key: one dict per row
+        return set().union(*parameters) - {"id"}
+    return None
+
+
+def _bulk_rows(orm_execute_state) -> tuple:
+    """WHERE criteria of a bulk DELETE / UPDATE (by primary key for ORM bulk UPDATE)."""
+    parameters = orm_execute_state.parameters
+    if isinstance(parameters, list) and parameters and all("id" in p for p in parameters):
+        return (PacketLog.id.in_([p["id"] for p in parameters]),)
+    whereclause = orm_execute_state.statement.whereclause
+    return () if whereclause is None else (whereclause,)
+
+
+def _maintained(session: Session) -> bool:
+    """True when this session's database has the rollup tables (else they are rebuilt later)."""
+    connection = session.connection()
+    if connection.dialect.name in ("sqlite", "postgresql") and _tables_ready(connection):
+        return True
+    _pending(session)["invalidate"] = True
+    return False
+
+
+def _bulk_delete(orm_execute_state):
+    session = orm_execute_state.session
+    if not _maintained(session):
+        return None
+    removal = pending_removal(session, *_bulk_rows(orm_execute_state))
+    result = orm_execute_state.invoke_statement()
+    record_removal(session, removal)
+    return result
+
+
+def _bulk_score_update(orm_execute_state):
+    """Diff a bulk threat_score UPDATE row by row (old scores read first)."""
+    session = orm_execute_state.session
+    if not _maintained(session):
+        return None
+    connection = session.connection()
+    before = connection.execute(
+        select(PacketLog.id, PacketLog.timestamp, PacketLog.threat_score).where(*_bulk_rows(orm_execute_state))
+    ).all()
+    result = orm_execute_state.invoke_statement()
+
+    old = {row.id: row for row in before}
+    deltas = {}
+    ids = list(old)
+    for start in range(0, len(ids), _KEY_CHUNK):
+        for row_id, score in connection.execute(
+            select(PacketLog.id, PacketLog.threat_score).where(PacketLog.id.in_(ids[start : start + _KEY_CHUNK]))
+        ):
+            previous = old[row_id]
+            if score == previous.threat_score:
+                continue
+            row = deltas.setdefault(bucket_of(previous.timestamp), [0] * len(COUNTERS))
+            new, gone = score_counters(score, events=0), score_counters(previous.threat_score, events=0)
+            for i in range(len(COUNTERS)):
+                row[i] += new[i] - gone[i]
+    _write_deltas(session, deltas, {kind: set() for kind in KEY_KINDS}, False)
+    return result
+
+
+def _do_orm_execute(orm_execute_state):
+    # Bulk query(PacketLog).delete() / .update() bypass the flush hooks
+    if orm_execute_state.is_delete or orm_execute_state.is_update:
+        mapper = orm_execute_state.bind_mapper
+        if mapper is not None and mapper.class_ is PacketLog:
+            if orm_execute_state.is_delete:
+                return _bulk_delete(orm_execute_state)
+            # Updates of other columns (feature vectors, signatures) leave the rollups intact
+            columns = _updated_columns(orm_execute_state)
+            if columns and columns.isdisjoint(ROLLUP_COLUMNS):
+                return None
+            if columns and columns & ROLLUP_COLUMNS == {"threat_score"}:
+                return _bulk_score_update(orm_execute_state)
+            _pending(orm_execute_state.session)["invalidate"] = True
+    return None
+
+
+def register_hooks() -> None:
+    """Attach rollup maintenance to every SQLAlchemy Session (idempotent)."""
+    if getattr(Session, "_packet_log_rollups", False):
+        return
+    event.listen(Session, "before_flush", _before_flush)
+    event.listen(Session, "after_flush", _after_flush)
+    event.listen(Session, "after_commit", _after_commit)
+    event.listen(Session, "after_soft_rollback", lambda session, previous: _after_rollback(session))
+    event.listen(Session, "do_orm_execute", _do_orm_execute)
+    # Load the previous values on assignment so the flush hook can diff them
+    for name in _ROW_COLUMNS:
+        event.listen(getattr(PacketLog, name), "set", lambda target, value, oldvalue, initiator: value,
+                     active_history=True, retval=True)
+    Session._packet_log_rollups = True
+
+
+register_hooks()
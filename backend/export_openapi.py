@@ -8,7 +8,10 @@ try:
     # Need to prevent APScheduler from blocking exit
     os.environ["DISABLE_BACKGROUND_TASKS"] = "1"
     
-    from main import app
+    from main import app, lazy_routers
+    
+    # Routers are included on first request; the schema needs all of them
+    lazy_routers.load_all()
     
     # Save OpenAPI JSON to the main docs folder
     base_docs_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "docs"))
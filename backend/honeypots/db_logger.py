@@ -1,10 +1,25 @@
 """
 Shared Database Logger for Honeypots
 Logs honeypot activity directly to the PacketLog table for accurate last_seen tracking.
+
+Events are buffered in memory and written by a background flush thread in
+batches (one bulk INSERT and one commit per batch), so floods do not turn
+into one session / fsync per event. GeoIP enrichment runs on the flush
+thread, once per distinct source IP in a batch.
+
+Configuration (env):
+    DB_LOGGER_BATCH_SIZE          rows per bulk insert (default 200)
+    DB_LOGGER_FLUSH_INTERVAL_MS   max time an event waits in the buffer (default 250)
+    DB_LOGGER_MAX_QUEUE           buffered events before new ones are dropped (default 50000)
 """
 
 import os
 import sys
+import time
+import atexit
+import socket
+import threading
+from collections import deque
 from datetime import datetime
 
 # Add parent directory to path for imports
@@ -13,7 +28,9 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")
 try:
     from database import SessionLocal
     from database.models import PacketLog
+    from database.rollups import record_inserts
     from services.geoip_service import geoip_service
+    from services.ingestion_queue import ingestion_queue
 
     DB_AVAILABLE = True
 except Exception as e:
@@ -21,18 +38,263 @@ except Exception as e:
     DB_AVAILABLE = False
 
 
-import socket
+BATCH_SIZE = int(os.getenv("DB_LOGGER_BATCH_SIZE", 200))
+FLUSH_INTERVAL_MS = int(os.getenv("DB_LOGGER_FLUSH_INTERVAL_MS", 250))
+MAX_QUEUE = int(os.getenv("DB_LOGGER_MAX_QUEUE", 50000))
+
+HEALTHCHECK_RESOLVE_TTL = 60.0
+_api_ip_cache = {"ip": None, "expires": 0.0}
+_api_ip_lock = threading.Lock()
+
+
+def _resolve_api_ip():
+    """Resolve the ``api`` container address, cached (including failures) for a minute."""
+    now = time.monotonic()
+    if now < _api_ip_cache["expires"]:
+        return _api_ip_cache["ip"]
+    with _api_ip_lock:
+        if now < _api_ip_cache["expires"]:
+            return _api_ip_cache["ip"]
+        try:
+            ip = socket.gethostbyname("api")
+        except Exception:
+            ip = None
+        _api_ip_cache.update(ip=ip, expires=time.monotonic() + HEALTHCHECK_RESOLVE_TTL)
+        return ip
+
 
 def is_healthcheck(src_ip: str) -> bool:
     if src_ip in ["127.0.0.1", "localhost", "::1"]:
         return True
-    try:
-        api_ip = socket.gethostbyname("api")
-        if src_ip == api_ip:
-            return True
-    except Exception:
-        pass
-    return False
+    api_ip = _resolve_api_ip()
+    return api_ip is not None and src_ip == api_ip
+
+
+class BufferedPacketLogWriter:
+    """
+    Buffers honeypot PacketLog rows and bulk-inserts them from a background thread.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = BATCH_SIZE,
+        flush_interval_ms: int = FLUSH_INTERVAL_MS,
+        max_queue: int = MAX_QUEUE,
+        session_factory=None,
+    ):
+        """
+        :param batch_size: Rows written per bulk insert / commit
+        :param flush_interval_ms: Max time a row waits before a partial batch is flushed
+        :param max_queue: Buffered rows before submit() starts dropping events
+        :param session_factory: Session factory (default: database.SessionLocal)
+        """
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = max(0.001, flush_interval_ms / 1000.0)
+        self.max_queue = max_queue
+        self.session_factory = session_factory
+
+        self._rows = deque()
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()  # one writer at a time (thread vs explicit flush)
+        self._thread = None
+        self._stopping = False
+
+        # Metrics
+        self.submitted_total = 0
+        self.written_total = 0
+        self.dropped_total = 0
+        self.failed_total = 0
+        self.flushes_total = 0
+        self.last_batch_size = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._rows)
+
+    # --------------------------------------------------
+    # Producer API
+    # --------------------------------------------------
+
+    def submit(self, row: dict) -> bool:
+        """Buffer one PacketLog row. Never blocks; False when the buffer is full."""
+        with self._cond:
+            if len(self._rows) >= self.max_queue:
+                self.dropped_total += 1
+                return False
+            self._rows.append(row)
+            self.submitted_total += 1
+            # Wake the flush thread when the buffer goes non-empty (it then
+            # waits up to flush_interval for more) or a full batch is ready
+            if len(self._rows) == 1 or len(self._rows) >= self.batch_size:
+                self._cond.notify()
+        if self._stopping:
+            # Late events during shutdown are written inline
+            self.flush()
+        else:
+            self._ensure_started()
+        return True
+
+    def flush(self) -> int:
+        """Synchronously write everything buffered so far. Returns rows written."""
+        written = 0
+        while True:
+            batch = self._take(self.batch_size)
+            if not batch:
+                return written
+            written += self._write_batch(batch)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Stop the flush thread and write whatever is still buffered."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.flush()
+
+    # --------------------------------------------------
+    # Flush thread
+    # --------------------------------------------------
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None or self._stopping:
+            return
+        with self._cond:
+            if self._thread is None and not self._stopping:
+                self._thread = threading.Thread(
+                    target=self._run, name="db-logger-flush", daemon=True
+                )
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                if not self._rows and not self._stopping:
+                    self._cond.wait()
+                # A batch starts its flush interval when its first row is seen
+                deadline = time.monotonic() + self.flush_interval
+                while len(self._rows) < self.batch_size and not self._stopping:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                if self._stopping:
+                    return
+            self._write_batch(self._take(self.batch_size))
+
+    def _take(self, limit: int) -> list:
+        with self._cond:
+            batch = []
+            while self._rows and len(batch) < limit:
+                batch.append(self._rows.popleft())
+            return batch
+
+    def _write_batch(self, rows: list) -> int:
+        if not rows:
+            return 0
+        started = time.perf_counter()
+        with self._flush_lock:
+            # GeoIP Enrichment (one lookup per distinct IP in the batch)
+            geo = {}
+            for row in rows:
+                ip = row["src_ip"]
+                if ip not in geo:
+                    try:
+                        geo[ip] = geoip_service.lookup(ip)
+                    except Exception:
+                        geo[ip] = {}
+                row.update(
+                    country=geo[ip].get("country"),
+                    city=geo[ip].get("city"),
+                    latitude=geo[ip].get("lat"),
+                    longitude=geo[ip].get("lon"),
+                )
+
+            db = (self.session_factory or SessionLocal)()
+            try:
+                # return_defaults fills in row["id"] (batched RETURNING on SQLite 3.35+ / Postgres)
+                db.bulk_insert_mappings(PacketLog, rows, return_defaults=True)
+                record_inserts(db, rows)
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                self.failed_total += len(rows)
+                print(f"[DB Logger] Error writing batch of {len(rows)} events: {e}")
+                return 0
+            finally:
+                db.close()
+
+        # Hand off to the threat analyzer for immediate scoring
+        ingestion_queue.publish_many(row.get("id") for row in rows)
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.written_total += len(rows)
+        self.flushes_total += 1
+        self.last_batch_size = len(rows)
+        self.last_flush_ms = round(elapsed_ms, 2)
+        self.max_flush_ms = max(self.max_flush_ms, self.last_flush_ms)
+        return len(rows)
+
+    # --------------------------------------------------
+    # Metrics
+    # --------------------------------------------------
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self.queue_depth,
+            "submitted_total": self.submitted_total,
+            "written_total": self.written_total,
+            "dropped_total": self.dropped_total,
+            "failed_total": self.failed_total,
+            "flushes_total": self.flushes_total,
+            "last_batch_size": self.last_batch_size,
+            "last_flush_ms": self.last_flush_ms,
+            "max_flush_ms": self.max_flush_ms,
+        }
+
+    def to_prometheus(self) -> str:
+        """Generate Prometheus text format for the honeypot write buffer."""
+        lines = []
+
+        lines.append("# HELP phantomnet_db_logger_queue_depth Honeypot events waiting to be written")
+        lines.append("# TYPE phantomnet_db_logger_queue_depth gauge")
+        lines.append(f"phantomnet_db_logger_queue_depth {self.queue_depth}")
+
+        lines.append("")
+        lines.append("# HELP phantomnet_db_logger_written_total Honeypot events written to packet_logs")
+        lines.append("# TYPE phantomnet_db_logger_written_total counter")
+        lines.append(f"phantomnet_db_logger_written_total {self.written_total}")
+
+        lines.append("")
+        lines.append("# HELP phantomnet_db_logger_dropped_total Honeypot events rejected by a full buffer")
+        lines.append("# TYPE phantomnet_db_logger_dropped_total counter")
+        lines.append(f"phantomnet_db_logger_dropped_total {self.dropped_total}")
+
+        lines.append("")
+        lines.append("# HELP phantomnet_db_logger_failed_total Honeypot events lost to failed batch writes")
+        lines.append("# TYPE phantomnet_db_logger_failed_total counter")
+        lines.append(f"phantomnet_db_logger_failed_total {self.failed_total}")
+
+        lines.append("")
+        lines.append("# HELP phantomnet_db_logger_flush_latency_ms Duration of the last batch write")
+        lines.append("# TYPE phantomnet_db_logger_flush_latency_ms gauge")
+        lines.append(f"phantomnet_db_logger_flush_latency_ms {self.last_flush_ms}")
+
+        lines.append("")
+        lines.append("# HELP phantomnet_db_logger_flush_latency_max_ms Slowest batch write so far")
+        lines.append("# TYPE phantomnet_db_logger_flush_latency_max_ms gauge")
+        lines.append(f"phantomnet_db_logger_flush_latency_max_ms {self.max_flush_ms}")
+
+        return "\n".join(lines) + "\n"
+
+
+# Singleton instance
+packet_log_writer = BufferedPacketLogWriter()
+atexit.register(packet_log_writer.stop)
 
 
 def log_to_database(
@@ -46,6 +308,9 @@ def log_to_database(
 ):
     """
     Log honeypot activity to the database.
+
+    The event is buffered and written by the background flush thread;
+    returns True once it has been accepted into the buffer.
     """
     if not DB_AVAILABLE:
         return False
@@ -53,35 +318,18 @@ def log_to_database(
     if is_healthcheck(src_ip):
         return False
 
-    try:
-        db = SessionLocal()
-
-        # GeoIP Enrichment
-        geo = geoip_service.lookup(src_ip)
-
-        log_entry = PacketLog(
-            timestamp=datetime.utcnow(),
-            src_ip=src_ip,
-            dst_ip="127.0.0.1",
-            protocol=protocol.upper(),  # Ensure uppercase: HTTP, FTP, SMTP, SSH
-            length=length,
-            is_malicious=is_malicious,
-            threat_score=threat_score,
-            attack_type=attack_type or event_type.upper(),
-            country=geo.get("country"),
-            city=geo.get("city"),
-            latitude=geo.get("lat"),
-            longitude=geo.get("lon"),
-        )
-
-        db.add(log_entry)
-        db.commit()
-        db.close()
-        return True
-
-    except Exception as e:
-        print(f"[DB Logger] Error logging to database: {e}")
-        return False
+    return packet_log_writer.submit(
+        {
+            "timestamp": datetime.utcnow(),
+            "src_ip": src_ip,
+            "dst_ip": "127.0.0.1",
+            "protocol": protocol.upper(),  # Ensure uppercase: HTTP, FTP, SMTP, SSH
+            "length": length,
+            "is_malicious": is_malicious,
+            "threat_score": threat_score,
+            "attack_type": attack_type or event_type.upper(),
+        }
+    )
 
 
 # Convenience functions for each protocol
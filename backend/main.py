@@ -18,16 +18,14 @@ del _ilu, _cw_path, _cw_spec, _cw_mod
 
 import json
 import contextlib
-import socket
 import asyncio
 from datetime import datetime, timedelta
 from typing import Dict, List, Any, Optional, Set, Union, Tuple
 
-import psutil
 from dotenv import load_dotenv
 from fastapi import FastAPI, Depends, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy import text, func
+from sqlalchemy import text
 from sqlalchemy.orm import Session
 
 # =========================
@@ -35,6 +33,7 @@ from sqlalchemy.orm import Session
 # =========================
 from database.database import get_db, engine, SessionLocal
 from database.models import Base, PacketLog, TrafficStats
+from database.projections import select_events
 
 # =========================
 # SENTINEL MODELS
@@ -42,25 +41,20 @@ from database.models import Base, PacketLog, TrafficStats
 # Must be imported BEFORE Base.metadata.create_all() runs in lifespan()
 # so SQLAlchemy registers sentinel_playbooks in the shared metadata.
 from sentinel.models import SentinelPlaybook, SentinelAuditLog  # noqa: F401  (side-effect import)
-from sentinel.sentinel_service import SentinelService
 
 # =========================
 # INTERNAL SERVICES
 # =========================
-from services.traffic_sniffer import RealTimeSniffer
+# Services that pull in the ML / capture stacks (sklearn, scapy, shap, Redis
+# clients) or start threads are imported where they are used, so importing
+# this module stays cheap. See scripts/check_import_time.py.
 from services.stats_aggregator import StatsService
 from services.firewall import FirewallService
-from services.threat_analyzer import threat_analyzer
-from services.scheduler_service import scheduler_service
-from services.pcap_analyzer import pcap_analyzer
-from services.geoip_service import geoip_service
-from services.response_executor import response_executor
-
-# =========================
-# ML ENGINE
-# =========================
-from ml_engine.campaign_clustering import campaign_clusterer
-from ml_engine.explainability import explainer_service
+from services.alert_manager import alert_manager
+from services.geoip_service import get_geoip_service
+from services.response_executor import get_response_executor
+from services.event_bridge import event_bridge
+import ml.model_loader as model_loader
 
 # =========================
 # PERFORMANCE MIDDLEWARE
@@ -70,31 +64,13 @@ from middleware.metrics_collector import MetricsMiddleware, get_metrics_response
 from middleware.cache import cache_response, api_cache
 from middleware.auth import seed_default_admin
 from middleware.logging_middleware import SecurityLoggingMiddleware
+from middleware.lazy_routers import LazyRouters, LazyRouterMiddleware
 
 # =========================
 # API ROUTERS
 # =========================
-from api.model_metrics import router as model_metrics_router
-from api.threat_intel import router as threat_intel_router
-from api.topology import router as topology_router
-from api.management import router as management_router
-from api.realtime import router as realtime_router, push_realtime_event
-from api.pcap import router as pcap_router
-from api.attack_attribution import router as attack_attribution_router
-from api.predictive import router as predictive_router
-from api.admin import router as admin_router
-from api.threat_scoring import router as threat_router
-from api.sentinel import router as sentinel_router, v1_router as v1_sentinel_router
-from ml.threat_scoring_service import score_threat, map_score_to_level, ThreatInput, REDIS_AVAILABLE, _FEATURE_EXTRACTOR
-from api.protocol_analytics import router as analytics_router
-from api.metrics import router as metrics_router
-from api.pattern_analytics import router as pattern_analytics_router
-from api.reports import router as reports_router
-from api.hunting import router as hunting_router
-from api.cases import router as cases_router
-from api.alerts import router as alerts_router
-from api.honeypots import get_honeypot_status, router as honeypots_router
-from api.taxii import router as taxii_router, TaxiiContentNegotiationMiddleware
+# Registered lazily below (imported on the first request under their prefix)
+from api.taxii import TaxiiContentNegotiationMiddleware
 from api.rate_limiter import get_rate_limit_status
 
 # =========================
@@ -121,11 +97,22 @@ async def lifespan(_app: FastAPI):
     """
     Base.metadata.create_all(bind=engine)
 
+    # Worker threads hand dashboard events to this loop through the event bridge
+    event_bridge.bind(asyncio.get_running_loop())
+
     if ENVIRONMENT not in ["ci", "test"]:
+        from services.traffic_sniffer import RealTimeSniffer
+        from services.threat_analyzer import threat_analyzer
+        from services.scheduler_service import scheduler_service
+        from services.pcap_analyzer import pcap_analyzer
+
         sniffer: RealTimeSniffer = RealTimeSniffer()
         sniffer.start_background_sniffer()
         print("PhantomNet Sniffer Started")
 
+        # Resolve the scoring model in the background (snapshot / bundled file, never MLflow)
+        model_loader.warm_start()
+
         # Start Threat Analyzer Background Service (with 2s delay)
         async def delayed_analyzer_start():
             await asyncio.sleep(2)
@@ -155,14 +142,26 @@ async def lifespan(_app: FastAPI):
         else:
             print("[--] Sentinel Retention Cleanup Scheduler disabled (SENTINEL_RETENTION_CLEANUP_ENABLED=false)")
 
+        # Start PacketLog Partition Rotation (opt-in)
+        if scheduler_service.start_packet_log_partitioning():
+            print("[OK] PacketLog Partition Rotation started")
+        else:
+            print("[--] PacketLog Partition Rotation disabled (PACKET_LOG_PARTITIONING_ENABLED=false)")
+
+        # Start Training Worker (model training in a low-priority child process)
+        from services.training_jobs import TRAINING_WORKER_MODE, training_worker
+
+        if TRAINING_WORKER_MODE == "process":
+            training_worker.start()
+            print("[OK] Training Worker started (child process pool)")
+        else:
+            print("[--] Training Worker external (TRAINING_WORKER_MODE=external)")
+
         # Start Real-Time Metrics Broadcaster
         asyncio.create_task(broadcast_live_metrics())
         # Start PCAP Retention Cleanup (daily)
         asyncio.create_task(_pcap_cleanup_scheduler(pcap_analyzer))
 
-        # Start Event Stream Broadcaster
-        asyncio.create_task(broadcast_event_stream())
-
         # Start Sentinel Generation Loop if enabled (opt-in via env var)
         _sentinel_enabled = os.getenv("SENTINEL_ENABLED", "false").lower() == "true"
         if _sentinel_enabled:
@@ -180,9 +179,28 @@ async def lifespan(_app: FastAPI):
 
     yield
     print("PhantomNet Shutting Down")
-    scheduler_service.stop_sentinel_auto_gen()
-    scheduler_service.stop_sentinel_retention_cleanup()
-    threat_analyzer.stop()
+    # Only stop what was imported (and so possibly started)
+    if "services.scheduler_service" in sys.modules:
+        from services.scheduler_service import scheduler_service
+
+        scheduler_service.stop_sentinel_auto_gen()
+        scheduler_service.stop_sentinel_retention_cleanup()
+        scheduler_service.stop_packet_log_partitioning()
+    if "services.threat_analyzer" in sys.modules:
+        from services.threat_analyzer import threat_analyzer
+
+        threat_analyzer.stop()
+    if "services.training_jobs" in sys.modules:
+        from services.training_jobs import training_worker
+
+        training_worker.stop()
+    if "services.metrics_snapshot" in sys.modules:
+        from services.metrics_snapshot import metrics_snapshot
+
+        metrics_snapshot.stop()
+    alert_manager.stop()
+    model_loader.stop_refresher()
+    event_bridge.unbind()
 
 
 async def sentinel_generation_loop() -> None:
@@ -192,47 +210,60 @@ async def sentinel_generation_loop() -> None:
     playbook generation.
 
     Dedup strategy (two layers):
-      1. In-memory ``_processed_hashes`` set — fast O(1) check per cycle.
-      2. DB-level check on startup — pre-seeds the set with campaign IDs
-         already stored as SentinelPlaybook rows, so the loop survives
-         process restarts without regenerating duplicates.
-
-    Each campaign is identified by a deterministic hash derived from its
-    sorted source IPs + sorted target ports + campaign_id.  This ensures
-    that even if cluster IDs shift across DBSCAN runs, the *same* campaign
-    is not processed twice.
+      1. In-memory ``_processed_campaigns`` set of campaign IDs. The
+         clusterer keeps a campaign's label while it grows or shrinks, so
+         this catches repeats within one process lifetime.
+      2. ``_processed_sources``: primary source IP (the smallest IP of the
+         campaign, which SentinelPlaybook stores as ``src_ip``) -> when its
+         playbook was generated. It is pre-seeded from SentinelPlaybook rows
+         created within the clustering window on startup, so a campaign that
+         comes back under a different label after a restart is not
+         regenerated. Only playbooks inside that window count: campaigns are
+         clustered from the last ``window_hours`` of events, so a later,
+         unrelated campaign from the same IP gets its own playbook.
 
     Runs every 5 minutes (300 s).  Controlled by SENTINEL_ENABLED env var
     in the lifespan() context manager.
 
     Phase 5, Week 2 (Week 14), Day 4 — Sentinel Generation Loop
     """
-    import hashlib
     import logging
+    from ml_engine.campaign_clustering import get_campaign_clusterer
+    from sentinel.sentinel_service import SentinelService
 
     _log = logging.getLogger("sentinel.generation_loop")
     _log.info("Sentinel Generation Loop initialising")
 
+    # Campaigns are clustered from this many hours of events
+    window_hours = 24
+    _processed_campaigns: Set[str] = set()
+
     # ── Layer 2: Pre-seed from DB to survive restarts ─────────────────────
-    _processed_hashes: Set[str] = set()
+    _processed_sources: Dict[str, datetime] = {}
     try:
         _seed_db = SessionLocal()
-        existing_playbooks = (
-            _seed_db.query(SentinelPlaybook.src_ip, SentinelPlaybook.playbook_id)
-            .all()
-        )
+        try:
+            existing_playbooks = (
+                _seed_db.query(SentinelPlaybook.src_ip, SentinelPlaybook.created_at)
+                .filter(
+                    SentinelPlaybook.src_ip.isnot(None),
+                    SentinelPlaybook.created_at >= datetime.utcnow() - timedelta(hours=window_hours),
+                )
+                .all()
+            )
+        finally:
+            _seed_db.close()
         for row in existing_playbooks:
-            # Use playbook_id as an existing-record marker
-            _processed_hashes.add(row.playbook_id)
-        _seed_db.close()
+            if row.created_at > _processed_sources.get(row.src_ip, datetime.min):
+                _processed_sources[row.src_ip] = row.created_at
         _log.info(
-            "Pre-seeded %d existing playbook IDs from DB for dedup",
-            len(_processed_hashes),
+            "Pre-seeded %d recent playbook source IPs from DB for dedup",
+            len(_processed_sources),
         )
     except Exception as exc:
         _log.warning("DB pre-seed failed (non-fatal): %s", exc)
 
-    print(f"[+] Sentinel Generation Loop Started (pre-seeded {len(_processed_hashes)} existing playbooks)")
+    print(f"[+] Sentinel Generation Loop Started (pre-seeded {len(_processed_sources)} playbook sources)")
 
     cycle_count = 0
     while True:
@@ -246,7 +277,7 @@ async def sentinel_generation_loop() -> None:
 
             # ── Run campaign clustering (blocking call → thread pool) ─────
             result = await asyncio.to_thread(
-                campaign_clusterer.identify_campaigns, 24
+                get_campaign_clusterer().identify_campaigns, window_hours
             )
 
             # identify_campaigns returns {"campaign_count": N, "campaigns": [...]}
@@ -267,6 +298,11 @@ async def sentinel_generation_loop() -> None:
                 cycle_count, total_found,
             )
 
+            # Playbooks older than the clustering window no longer dedup
+            window_start = datetime.utcnow() - timedelta(hours=window_hours)
+            for source in [ip for ip, at in _processed_sources.items() if at < window_start]:
+                del _processed_sources[source]
+
             db = SessionLocal()
             try:
                 svc = SentinelService(db)
@@ -278,25 +314,16 @@ async def sentinel_generation_loop() -> None:
                         skipped_count += 1
                         continue
 
-                    # ── Build deterministic dedup hash ────────────────────
+                    # ── Dedup check (campaign ID, then primary source) ────
                     source_ips = sorted(campaign.get("unique_sources", []))
-                    target_ports = sorted(
-                        str(p) for p in campaign.get("target_ports", [])
-                    )
-                    hash_input = (
-                        f"{campaign_id}|"
-                        f"{'|'.join(source_ips)}|"
-                        f"{'|'.join(target_ports)}"
-                    )
-                    campaign_hash = hashlib.sha256(
-                        hash_input.encode("utf-8")
-                    ).hexdigest()[:16]
-
-                    # ── Layer 1: In-memory dedup check ────────────────────
-                    if campaign_hash in _processed_hashes:
+                    primary_source = source_ips[0] if source_ips else None
+                    if (
+                        campaign_id in _processed_campaigns
+                        or primary_source in _processed_sources
+                    ):
                         _log.debug(
-                            "Cycle #%d — SKIP campaign %s (hash=%s, already processed)",
-                            cycle_count, campaign_id, campaign_hash,
+                            "Cycle #%d — SKIP campaign %s (source=%s, already processed)",
+                            cycle_count, campaign_id, primary_source,
                         )
                         skipped_count += 1
                         continue
@@ -322,14 +349,15 @@ async def sentinel_generation_loop() -> None:
 
                     try:
                         svc.generate_playbook(campaign_data)
-                        _processed_hashes.add(campaign_hash)
+                        _processed_campaigns.add(campaign_id)
+                        if primary_source:
+                            _processed_sources[primary_source] = datetime.utcnow()
                         new_count += 1
                         _log.info(
                             "Cycle #%d — GENERATED playbook for campaign %s "
-                            "(hash=%s, ips=%d, ports=%s, events=%d)",
+                            "(ips=%d, ports=%s, events=%d)",
                             cycle_count,
                             campaign_id,
-                            campaign_hash,
                             len(campaign_data["source_ips"]),
                             campaign_data["target_ports"],
                             campaign_data["event_count"],
@@ -353,7 +381,7 @@ async def sentinel_generation_loop() -> None:
                 new_count,
                 skipped_count,
                 error_count,
-                len(_processed_hashes),
+                len(_processed_campaigns),
             )
             print(
                 f"[*] Sentinel cycle #{cycle_count}: "
@@ -390,102 +418,27 @@ async def _pcap_cleanup_scheduler(analyzer) -> None:
 
 async def broadcast_live_metrics() -> None:
     """
-    Background task to broadcast real-time metrics every 2 seconds via WebSockets.
-    Fetches stats, enriches them with honeypot and system health data.
+    Background task to broadcast real-time metrics via WebSockets.
+    Components are computed and cached off the event loop by the metrics
+    snapshot service; this only publishes the latest snapshot when it changed.
     """
+    from api.realtime import realtime_manager
+    from services.metrics_snapshot import (
+        metrics_snapshot,
+        live_metrics_publisher,
+        LIVE_METRICS_INTERVAL_S,
+    )
+
+    metrics_snapshot.start()
     print("[+] Real-Time Metrics Broadcaster Started")
     while True:
         try:
-            db = SessionLocal()
-            service = StatsService(db)
-            stats = service.calculate_stats()
-
-            # Enrich with Honeypot Statuses
-            stats["honeypots"] = get_honeypot_status(db)
-
-            # Enrich with system health (use os.getcwd() for Windows compatibility)
-            try:
-                disk_path = os.path.splitdrive(os.getcwd())[0] + "\\" or "/"
-                disk_percent = psutil.disk_usage(disk_path).percent
-            except Exception:
-                disk_percent = 0
-
-            stats["system_health"] = {
-                "cpu": psutil.cpu_percent(),
-                "memory": psutil.virtual_memory().percent,
-                "disk": disk_percent,
-            }
-
-            # Enrich with ML Status (Dynamic metrics)
-            unscored_count = db.query(PacketLog).filter(PacketLog.threat_level.is_(None)).count()
-            stats["ml_status"] = {
-                "inference_time": f"{threat_analyzer.last_inference_ms}ms",
-                "queue_depth": unscored_count,
-                "status": "online" if threat_analyzer.running else "offline",
-            }
-
-            # Calculate events per minute (last 5 minutes)
-            five_min_ago = datetime.utcnow() - timedelta(minutes=5)
-            epm_count = (
-                db.query(func.count(PacketLog.id))
-                .filter(PacketLog.timestamp >= five_min_ago)
-                .scalar()
-                or 0
-            )
-            stats["events_per_minute"] = round(epm_count / 5, 1)
-
-            await push_realtime_event("LIVE_METRICS", stats)
+            for topic, message_type, payload in live_metrics_publisher.messages():
+                realtime_manager.hub.publish(topic, message_type, payload)
         except Exception as e:
             print(f"Error in metrics broadcast loop: {e}")
-        finally:
-            if "db" in locals():
-                db.close()
-
-        await asyncio.sleep(2)
-
-
-async def broadcast_event_stream() -> None:
-    """
-    Background task to broadcast new events to connected clients in real-time.
-    Identifies new PacketLog entries and pushes them via WebSockets.
-    """
-
-    print("[+] Event Stream Broadcaster Started")
-    last_id = 0
-    while True:
-        try:
-            db = SessionLocal()
-            query = db.query(PacketLog)
-            if last_id > 0:
-                query = query.filter(PacketLog.id > last_id)
-            query = query.order_by(PacketLog.id.desc()).limit(5)
-            new_events = query.all()
-
-            for event in reversed(new_events):
-                payload = {
-                    "id": event.id,
-                    "src_ip": event.src_ip,
-                    "dst_ip": event.dst_ip,
-                    "protocol": event.protocol,
-                    "length": event.length,
-                    "threat_score": event.threat_score or 0,
-                    "threat_level": event.threat_level or "LOW",
-                    "attack_type": event.attack_type or "BENIGN",
-                    "timestamp": (
-                        event.timestamp.isoformat() if event.timestamp else None
-                    ),
-                    "src_port": getattr(event, "src_port", None),
-                    "country": getattr(event, "country", None) or "Unknown",
-                }
-                await push_realtime_event("EVENT_STREAM", payload)
-                last_id = max(last_id, event.id)
-        except (AttributeError, KeyError, RuntimeError, socket.error) as e:
-            print(f"Error in event stream broadcast: {e}")
-        finally:
-            if "db" in locals():
-                db.close()
 
-        await asyncio.sleep(3)
+        await asyncio.sleep(LIVE_METRICS_INTERVAL_S)
 
 
 # =========================
@@ -520,29 +473,32 @@ app.add_middleware(SecurityLoggingMiddleware)
 app.add_middleware(TaxiiContentNegotiationMiddleware)
 
 
-# Register Routers
-app.include_router(model_metrics_router)
-app.include_router(threat_intel_router)
-app.include_router(topology_router)
-app.include_router(management_router)
-app.include_router(realtime_router)
-app.include_router(pcap_router)
-app.include_router(attack_attribution_router)
-app.include_router(predictive_router)
-app.include_router(admin_router)
-
-app.include_router(threat_router)
-app.include_router(analytics_router)
-app.include_router(metrics_router)
-app.include_router(pattern_analytics_router)
-app.include_router(reports_router)
-app.include_router(hunting_router)
-app.include_router(cases_router)
-app.include_router(alerts_router)
-app.include_router(sentinel_router)
-app.include_router(v1_sentinel_router)
-app.include_router(honeypots_router)
-app.include_router(taxii_router)
+# Register Routers (imported on first request under their prefix)
+lazy_routers = LazyRouters(app)
+lazy_routers.add("api.model_metrics", "/api/v1/model")
+lazy_routers.add("api.threat_intel", "/api/v1/enrich")
+lazy_routers.add("api.topology", "/api/v1/topology")
+lazy_routers.add("api.management", "/api/v1/management")
+lazy_routers.add("api.realtime", "/api/v1/realtime")
+lazy_routers.add("api.pcap", "/api/v1/pcap", "/api/v1/events")
+lazy_routers.add("api.attack_attribution", "/api/v1/attribution")
+lazy_routers.add("api.predictive", "/api/v1/predictive")
+lazy_routers.add("api.admin", "/api/v1/admin")
+
+lazy_routers.add("api.threat_scoring", "/api/v1/analyze")
+lazy_routers.add("api.protocol_analytics", "/api/v1/analytics")
+lazy_routers.add("api.metrics", "/api/threat-metrics")
+lazy_routers.add("api.pattern_analytics", "/api/v1/patterns")
+lazy_routers.add("api.reports", "/api/v1/reports")
+lazy_routers.add("api.hunting", "/api/v1/hunting")
+lazy_routers.add("api.cases", "/api/v1/cases")
+lazy_routers.add("api.alerts", "/api/v1/alerts")
+lazy_routers.add("api.sentinel", "/api/sentinel")
+lazy_routers.add("api.sentinel", "/api/v1/sentinel", attr="v1_router")
+lazy_routers.add("api.honeypots", "/api/honeypots")
+lazy_routers.add("api.taxii", "/taxii2")
+
+app.add_middleware(LazyRouterMiddleware, routers=lazy_routers)
 
 
 # =========================
@@ -560,9 +516,29 @@ def health_check() -> dict:
     }
 
 
+@app.get("/api/ready")
+def readiness_check():
+    """
+    Readiness probe: 200 once a scoring model is loaded, 503 until then.
+    Never waits on MLflow; the first probe starts a background model load.
+    """
+    from fastapi.responses import JSONResponse
+
+    status = model_loader.readiness()
+    if not status["ready"]:
+        model_loader.warm_start()
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
+
+
 # =========================
 # LIVE TRAFFIC
 # =========================
+TRAFFIC_FIELDS = (
+    "src_ip", "dst_ip", "protocol", "length", "attack_type", "threat_score",
+    "country", "city", "latitude", "longitude",
+)
+
+
 @app.get("/analyze-traffic")
 def get_real_traffic(db: Session = Depends(get_db)) -> dict:
     """
@@ -571,7 +547,10 @@ def get_real_traffic(db: Session = Depends(get_db)) -> dict:
     Returns:
         dict: A status indicator, count of logs, and the list of enriched traffic data.
     """
-    logs = db.query(PacketLog).order_by(PacketLog.timestamp.desc()).limit(50).all()
+    logs = db.execute(
+        select_events(TRAFFIC_FIELDS).order_by(PacketLog.timestamp.desc()).limit(50)
+    ).all()
+    geoip_service = get_geoip_service()
 
     data = []
     # Batch cache for this specific request to avoid multiple lookups for the same IP in one loop
@@ -639,8 +618,31 @@ def prometheus_metrics() -> str:
     from fastapi.responses import PlainTextResponse
     from middleware.metrics_collector import metrics
     from sentinel.metrics import sentinel_metrics
-    
-    content = metrics.to_prometheus() + sentinel_metrics.to_prometheus()
+    from services.ingestion_queue import ingestion_queue
+    from ml.feature_store import feature_store
+    from services.correlation_engine import correlation_engine
+    from services.memory_cache import cache_registry
+    from ml.inference_engine import inference_engine
+    from ml_engine.sequence_scorer import sequence_scorer
+    from services.ws_hub import ws_hub
+    from services.event_stream import event_stream
+    from services.metrics_snapshot import metrics_snapshot
+
+    content = (
+        metrics.to_prometheus()
+        + sentinel_metrics.to_prometheus()
+        + ingestion_queue.to_prometheus()
+        + feature_store.to_prometheus()
+        + correlation_engine.to_prometheus()
+        + alert_manager.to_prometheus()
+        + cache_registry.to_prometheus()
+        + inference_engine.to_prometheus()
+        + sequence_scorer.to_prometheus()
+        + ws_hub.to_prometheus()
+        + event_bridge.to_prometheus()
+        + event_stream.to_prometheus()
+        + metrics_snapshot.to_prometheus()
+    )
     return PlainTextResponse(
         content=content,
         media_type="text/plain; version=0.0.4; charset=utf-8",
@@ -708,28 +710,19 @@ def get_events(
 @app.get("/api/features/live")
 def get_live_features(db: Session = Depends(get_db)):
     """
-    Pulls the latest packet log from the database, runs it through the
-    internal ML FeatureExtractor, and returns the live feature vector dict.
+    Pulls the latest packet log from the database and returns the feature
+    vector the models use for it (from the shared feature store).
     """
     log = db.query(PacketLog).order_by(PacketLog.id.desc()).first()
     if not log:
         return {"eventId": "NO-DATA-001", "features": {}}
 
-    event_dict = {
-        "src_ip": log.src_ip or "0.0.0.0",
-        "dst_ip": log.dst_ip or "0.0.0.0",
-        "src_port": log.src_port or 0,
-        "dst_port": log.dst_port or 0,
-        "protocol": log.protocol or "TCP",
-        "length": log.length or 0,
-        "attack_type": log.attack_type or "UNKNOWN",
-        "is_malicious": log.is_malicious or False,
-        "threat_score": log.threat_score or 0.0,
-        "timestamp": log.timestamp.isoformat() if log.timestamp else None
-    }
-    
-    # Run through the true backend feature extractor
-    raw_features = _FEATURE_EXTRACTOR.extract_features(event_dict)
+    # Reuse the vector the models scored this event with (computed once per event)
+    from ml.feature_extractor import FeatureExtractor
+    from ml.feature_store import feature_store
+
+    vector = feature_store.vectors_for_logs([log])[0]
+    raw_features = dict(zip(FeatureExtractor.FEATURE_NAMES, vector.tolist()))
     
     features = {}
     for k, v in raw_features.items():
@@ -780,11 +773,18 @@ def block_ip_address(ip: str) -> dict:
 # =========================
 # GeoIP & ATTACK MAP
 # =========================
-def _process_attack_map_logs(logs: List[PacketLog]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], List[Dict[str, Any]]]:
+ATTACK_MAP_FIELDS = (
+    "id", "src_ip", "protocol", "threat_score", "threat_level", "timestamp",
+    "country", "city", "latitude", "longitude",
+)
+
+
+def _process_attack_map_logs(logs: List[Any]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], List[Dict[str, Any]]]:
     """Helper to process and aggregate attack map logs."""
     location_map: Dict[str, Dict[str, Any]] = {}
     recent_attacks: List[Dict[str, Any]] = []
     country_counts: Dict[str, int] = {}
+    geoip_service = get_geoip_service()
 
     for log in logs:
         ip = log.src_ip
@@ -845,8 +845,10 @@ def _process_attack_map_logs(logs: List[PacketLog]) -> Tuple[List[Dict[str, Any]
 @app.get("/api/analytics/attack-map")
 def get_attack_map(limit: int = 200, db: Session = Depends(get_db)) -> dict:
     """Returns geo-enriched attack data for map visualization."""
-    logs = db.query(PacketLog).filter(PacketLog.src_ip.isnot(None))\
-             .order_by(PacketLog.timestamp.desc()).limit(limit).all()
+    logs = db.execute(
+        select_events(ATTACK_MAP_FIELDS, PacketLog.src_ip.isnot(None))
+        .order_by(PacketLog.timestamp.desc()).limit(limit)
+    ).all()
 
     locations, recent_attacks, top_countries = _process_attack_map_logs(logs)
 
@@ -857,21 +859,21 @@ def get_attack_map(limit: int = 200, db: Session = Depends(get_db)) -> dict:
         "locations": locations,
         "top_countries": top_countries,
         "recent_attacks": recent_attacks,
-        "service_status": geoip_service.stats,
+        "service_status": get_geoip_service().stats,
     }
 
 
 @app.get("/api/geoip/lookup/{ip}")
 def geoip_lookup(ip: str) -> dict:
     """Look up geolocation for a single IP address."""
-    result = geoip_service.lookup(ip)
+    result = get_geoip_service().lookup(ip)
     return {"ip": ip, "geo": result}
 
 
 @app.get("/api/geoip/status")
 def geoip_status() -> dict:
     """Return GeoIP service health status."""
-    return geoip_service.stats
+    return get_geoip_service().stats
 
 
 # =========================
@@ -880,6 +882,7 @@ def geoip_status() -> dict:
 @app.get("/api/response/history")
 def response_history(limit: int = 50) -> dict:
     """View response action audit log."""
+    response_executor = get_response_executor()
     return {
         "status": "success",
         "count": min(limit, len(response_executor.response_history)),
@@ -890,7 +893,7 @@ def response_history(limit: int = 50) -> dict:
 @app.get("/api/response/blocked-ips")
 def blocked_ips() -> dict:
     """List currently blocked IPs."""
-    blocked = response_executor.get_blocked_ips()
+    blocked = get_response_executor().get_blocked_ips()
     return {
         "status": "success",
         "count": len(blocked),
@@ -901,7 +904,7 @@ def blocked_ips() -> dict:
 @app.post("/api/response/unblock/{ip}")
 def unblock_ip(ip: str) -> dict:
     """Manually unblock an IP address."""
-    result = response_executor.unblock_ip(ip)
+    result = get_response_executor().unblock_ip(ip)
     if result["status"] == "not_found":
         raise HTTPException(status_code=404, detail=f"IP {ip} is not blocked")
     return result
@@ -912,14 +915,14 @@ def get_response_policy() -> dict:
     """View current automated response policy."""
     return {
         "status": "success",
-        "policy": response_executor.get_policy(),
+        "policy": get_response_executor().get_policy(),
     }
 
 
 @app.put("/api/response/policy")
 def update_response_policy(updates: dict) -> dict:
     """Update response policy thresholds."""
-    updated = response_executor.update_policy(updates)
+    updated = get_response_executor().update_policy(updates)
     return {
         "status": "success",
         "policy": updated,
@@ -929,7 +932,7 @@ def update_response_policy(updates: dict) -> dict:
 @app.get("/api/response/stats")
 def response_stats() -> dict:
     """Return automated response system statistics."""
-    return response_executor.stats
+    return get_response_executor().stats
 
 
 # =========================
@@ -938,7 +941,9 @@ def response_stats() -> dict:
 @app.get("/api/v1/advanced/campaigns", tags=["Advanced ML"])
 def get_attack_campaigns(hours_back: int = 24, db: Session = Depends(get_db)) -> dict:
     """Analyze recent threats and cluster coordinated attack campaigns."""
-    result = campaign_clusterer.identify_campaigns(hours_back)
+    from ml_engine.campaign_clustering import get_campaign_clusterer
+
+    result = get_campaign_clusterer().identify_campaigns(hours_back)
     if "error" in result:
         raise HTTPException(status_code=500, detail=result["error"])
     return result
@@ -959,6 +964,9 @@ def explain_threat_score(event_id: int, db: Session = Depends(get_db)) -> dict:
         "length": log.length or 0,
     }
 
+    # Imports shap; only loaded when an explanation is requested
+    from ml_engine.explainability import explainer_service
+
     explanation = explainer_service.explain_prediction(event_data)
     if "error" in explanation:
         raise HTTPException(status_code=500, detail=explanation["error"])
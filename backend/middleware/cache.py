@@ -17,7 +17,6 @@ Usage:
     invalidate_cache("/api/stats")
 """
 
-import time
 import hashlib
 import json
 import logging
@@ -26,97 +25,55 @@ from typing import Optional, Any
 from fastapi import Request
 from fastapi.responses import JSONResponse
 
+from services.memory_cache import ShardedTTLCache
+
 logger = logging.getLogger(__name__)
 
 
-class TTLCache:
+class TTLCache(ShardedTTLCache):
     """
     Thread-safe in-memory cache with TTL expiration.
 
     Stores serialized API responses keyed by request path + query params.
-    Expired entries are lazily cleaned on access.
+    Bounded LRU (see services.memory_cache); expired entries are reclaimed
+    by the timing wheel.
     """
 
-    def __init__(self, default_ttl: int = 30, max_size: int = 500):
-        self._store = {}  # key → {"data": ..., "expires_at": float}
-        self._default_ttl = default_ttl
-        self._max_size = max_size
-        self._hits = 0
-        self._misses = 0
-
-    def get(self, key: str) -> Optional[Any]:
-        """Get cached value if exists and not expired."""
-        entry = self._store.get(key)
-        if entry is None:
-            self._misses += 1
-            return None
-
-        if time.time() > entry["expires_at"]:
-            # Expired — remove and return miss
-            del self._store[key]
-            self._misses += 1
-            return None
-
-        self._hits += 1
-        return entry["data"]
+    def __init__(self, default_ttl: int = 30, max_size: int = 500, namespace: str = "api"):
+        super().__init__(namespace, max_entries=max_size, default_ttl=default_ttl)
 
     def set(self, key: str, data: Any, ttl: Optional[int] = None):
         """Store a value with TTL expiration."""
-        # Evict oldest if at capacity
-        if len(self._store) >= self._max_size:
-            self._evict_expired()
-            if len(self._store) >= self._max_size:
-                # Remove oldest entry
-                oldest_key = min(
-                    self._store, key=lambda k: self._store[k]["expires_at"]
-                )
-                del self._store[oldest_key]
-
-        ttl = ttl or self._default_ttl
-        self._store[key] = {
-            "data": data,
-            "expires_at": time.time() + ttl,
-        }
+        super().set(key, data, ttl=ttl or self.default_ttl)
 
     def invalidate(self, pattern: str):
         """
         Remove all cache entries matching a path pattern.
         Pattern is a prefix match (e.g., "/api/stats" matches "/api/stats?x=1").
         """
-        keys_to_remove = [k for k in self._store if k.startswith(pattern)]
-        for key in keys_to_remove:
-            del self._store[key]
-        if keys_to_remove:
+        removed = self.invalidate_prefix(pattern)
+        if removed:
             logger.info(
-                f"[CACHE] Invalidated {len(keys_to_remove)} entries matching '{pattern}'"
+                f"[CACHE] Invalidated {removed} entries matching '{pattern}'"
             )
 
     def clear(self):
         """Clear all cached entries."""
-        self._store.clear()
-        self._hits = 0
-        self._misses = 0
+        super().clear()
         logger.info("[CACHE] Cache cleared")
 
-    def _evict_expired(self):
-        """Remove all expired entries."""
-        now = time.time()
-        expired = [k for k, v in self._store.items() if now > v["expires_at"]]
-        for key in expired:
-            del self._store[key]
-
     @property
     def stats(self) -> dict:
         """Return cache statistics."""
-        self._evict_expired()
-        total = self._hits + self._misses
+        stats = super().stats
         return {
-            "size": len(self._store),
-            "max_size": self._max_size,
-            "hits": self._hits,
-            "misses": self._misses,
-            "hit_rate": round(self._hits / total * 100, 1) if total > 0 else 0.0,
-            "default_ttl": self._default_ttl,
+            "size": stats["size"],
+            "max_size": self.max_entries,
+            "hits": stats["hits"],
+            "misses": stats["misses"],
+            "hit_rate": stats["hit_rate"],
+            "default_ttl": self.default_ttl,
+            "evictions": stats["evictions"],
         }
 
 
@@ -0,0 +1,146 @@
+"""
+PhantomNet Lazy Router Registration
+===================================
+
+Router modules pull in their service stacks (pandas, sklearn, scapy, shap,
+STIX / PDF rendering, Redis clients) when they are imported. Registering
+them lazily keeps ``import main`` cheap: each router is declared with the
+URL prefixes it serves, and is imported and included on the first request
+under one of them. Requests for the OpenAPI schema or the docs load every
+router.
+
+Route order is preserved: a router's routes are inserted where eager
+``app.include_router`` calls (in registration order) would have put them,
+so matching precedence does not depend on which router loaded first.
+
+Usage:
+    lazy_routers = LazyRouters(app)
+    lazy_routers.add("api.pcap", "/api/v1/pcap", "/api/v1/events")
+    lazy_routers.add("api.sentinel", "/api/v1/sentinel", attr="v1_router")
+    app.add_middleware(LazyRouterMiddleware, routers=lazy_routers)
+
+Set LAZY_ROUTERS=false to import and include everything up front.
+"""
+
+import os
+import time
+import logging
+import importlib
+from typing import List, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+LAZY_ROUTERS = os.getenv("LAZY_ROUTERS", "true").lower() == "true"
+
+# Paths that need the complete route table
+SCHEMA_PATHS = ("/openapi.json", "/docs", "/redoc")
+
+
+class _LazyRouter:
+    __slots__ = ("module", "attr", "prefixes", "route_count", "loaded")
+
+    def __init__(self, module: str, attr: str, prefixes: Tuple[str, ...]):
+        self.module = module
+        self.attr = attr
+        self.prefixes = prefixes
+        self.route_count = 0
+        self.loaded = False
+
+
+class LazyRouters:
+    """
+    Ordered registry of routers included on first use.
+    """
+
+    def __init__(self, app, lazy: bool = LAZY_ROUTERS):
+        self.app = app
+        self.lazy = lazy
+        self._entries: List[_LazyRouter] = []
+        # FastAPI's own docs / schema routes precede every router
+        self._base = len(app.router.routes)
+        self.load_seconds = 0.0
+
+    def add(self, module: str, *prefixes: str, attr: str = "router") -> None:
+        """Declare ``module.attr`` as serving every path under ``prefixes``."""
+        entry = _LazyRouter(module, attr, prefixes)
+        self._entries.append(entry)
+        if not self.lazy:
+            self._include(entry, self._import(entry))
+
+    @property
+    def pending(self) -> List[str]:
+        return [f"{e.module}:{e.attr}" for e in self._entries if not e.loaded]
+
+    def pending_for(self, path: str) -> List[_LazyRouter]:
+        if path.startswith(SCHEMA_PATHS):
+            return [e for e in self._entries if not e.loaded]
+        return [e for e in self._entries if not e.loaded and path.startswith(e.prefixes)]
+
+    def load_all(self) -> None:
+        """Include every pending router (e.g. before exporting the OpenAPI schema)."""
+        for entry in self._entries:
+            if not entry.loaded:
+                self._include(entry, self._import(entry))
+
+    def import_routers(self, entries: List[_LazyRouter]) -> list:
+        """Import the router objects. Slow; safe to run off the event loop."""
+        return [self._import(entry) for entry in entries]
+
+    def include(self, entries: List[_LazyRouter], routers: list) -> None:
+        """Splice imported routers into the route table. Run on the event loop thread."""
+        for entry, router in zip(entries, routers):
+            self._include(entry, router)
+
+    def _import(self, entry: _LazyRouter):
+        started = time.perf_counter()
+        router = getattr(importlib.import_module(entry.module), entry.attr)
+        elapsed = time.perf_counter() - started
+        self.load_seconds += elapsed
+        logger.info(f"[ROUTERS] Imported {entry.module}:{entry.attr} in {elapsed * 1000:.0f} ms")
+        return router
+
+    def _include(self, entry: _LazyRouter, router) -> None:
+        if entry.loaded:
+            return
+        routes = self.app.router.routes
+        before = len(routes)
+        self.app.include_router(router)
+        added = routes[before:]
+        del routes[before:]
+
+        index = self._base
+        for other in self._entries:
+            if other is entry:
+                break
+            index += other.route_count
+        routes[index:index] = added
+
+        entry.route_count = len(added)
+        entry.loaded = True
+        # Regenerate the schema with the new routes on next request
+        self.app.openapi_schema = None
+
+        stray = [r.path for r in added if not r.path.startswith(entry.prefixes)]
+        if stray:
+            logger.warning(f"[ROUTERS] {entry.module}:{entry.attr} serves paths outside {entry.prefixes}: {stray}")
+
+
+class LazyRouterMiddleware:
+    """
+    ASGI middleware that includes pending routers before a request is routed.
+    """
+
+    def __init__(self, app, routers: LazyRouters):
+        self.app = app
+        self.routers = routers
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] in ("http", "websocket"):
+            entries = self.routers.pending_for(scope["path"])
+            if entries:
+                # Import off the loop; splice on it so routing never sees a half-updated table
+                routers = await run_in_threadpool(self.routers.import_routers, entries)
+                self.routers.include(entries, routers)
+        await self.app(scope, receive, send)
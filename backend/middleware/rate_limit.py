@@ -5,7 +5,7 @@ from fastapi import Request, HTTPException
 from middleware.cache import TTLCache
 
 # Simple rate limiter tracking requests by IP (10 requests per minute)
-_rate_limiter = TTLCache(default_ttl=60, max_size=2000)
+_rate_limiter = TTLCache(default_ttl=60, max_size=2000, namespace="rate_limit")
 RATE_LIMIT_MAX_REQUESTS = 30
 
 def rate_limit_dependency(request: Request):
@@ -3,19 +3,19 @@ import mlflow
 import pathlib
 
 # --------------------------------------------------
-# Project root (CI-safe)
+# Project root (CI-safe) and registry settings
 # --------------------------------------------------
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-PROJECT_ROOT = os.path.abspath(os.path.join(BASE_DIR, "..", "..", ".."))
+from ml.config.registry_settings import (
+    BASE_DIR,
+    PROJECT_ROOT,
+    MLRUNS_DIR,
+    TRACKING_URI,
+    MODEL_NAME,
+    DEFAULT_STAGE,
+)
 
-MLRUNS_DIR = os.path.join(PROJECT_ROOT, "mlruns")
 os.makedirs(MLRUNS_DIR, exist_ok=True)
 
-TRACKING_URI = f"sqlite:///{os.path.join(PROJECT_ROOT, 'mlruns.db').replace(chr(92), '/')}"
-
-MODEL_NAME = "PhantomNet_Attack_Detector"
-DEFAULT_STAGE = "Staging"
-
 # --------------------------------------------------
 # FORCE MLflow configuration
 # --------------------------------------------------
@@ -0,0 +1,14 @@
+import os
+
+# --------------------------------------------------
+# Model registry settings (no mlflow import, safe on the scoring path)
+# --------------------------------------------------
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(BASE_DIR, "..", "..", ".."))
+
+MLRUNS_DIR = os.path.join(PROJECT_ROOT, "mlruns")
+
+TRACKING_URI = f"sqlite:///{os.path.join(PROJECT_ROOT, 'mlruns.db').replace(chr(92), '/')}"
+
+MODEL_NAME = "PhantomNet_Attack_Detector"
+DEFAULT_STAGE = "Staging"
@@ -1,7 +1,53 @@
 from datetime import datetime, timedelta, timezone
-from collections import defaultdict
-import statistics
-from typing import Dict
+from bisect import bisect_left, insort
+from collections import Counter, OrderedDict
+import math
+import time
+from typing import Dict, Iterable, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+class _IPState:
+    """
+    Per-source-IP running state. Every update is O(1) amortized (the sliding
+    window only holds timestamps that can still be counted), so a long-lived
+    attacker IP costs the same per event as a new one.
+    """
+
+    __slots__ = (
+        "window",
+        "count",
+        "mean",
+        "m2",
+        "last_length",
+        "malicious_count",
+        "attack_types",
+        "attack_type_max",
+        "destinations",
+        "honeypots",
+        "first_seen",
+        "last_seen",
+        "touched_at",
+    )
+
+    def __init__(self):
+        self.window = []  # sorted epoch microseconds of the recent events
+        self.count = 0
+        self.mean = 0.0  # Welford running mean of packet lengths
+        self.m2 = 0.0  # Welford sum of squared deviations
+        self.last_length = 0
+        self.malicious_count = 0
+        self.attack_types = Counter()
+        self.attack_type_max = 0
+        self.destinations = set()
+        self.honeypots = set()
+        self.first_seen = None
+        self.last_seen = None
+        self.touched_at = 0.0
 
 
 class FeatureExtractor:
@@ -18,6 +64,9 @@ class FeatureExtractor:
     - READ-ONLY
     - No database writes
     - Deterministic behavior (best-effort)
+    - Streaming: O(1) amortized per event (Welford variance, pruned sorted
+      window of timestamps, Counter-based mode). Idle IPs are evicted LRU / TTL so memory stays
+      bounded on long-running services.
     """
 
     FEATURE_NAMES = [
@@ -38,16 +87,45 @@ class FeatureExtractor:
         "z_score_anomaly",
     ]
 
-    def __init__(self, window_seconds: int = 60):
+    BURST_WINDOW_SECONDS = 10
+    # How far behind the newest event of an IP a late event may arrive and
+    # still be counted exactly; older timestamps are pruned from the window
+    LATE_EVENT_GRACE_SECONDS = 300
+
+    # Column fallbacks for extract_batch, mirroring extract_features' event.get(...) defaults
+    EVENT_DEFAULTS = {
+        "src_ip": "0.0.0.0",
+        "dst_ip": "0.0.0.0",
+        "dst_port": 0,
+        "protocol": "",
+        "length": 0,
+        "threat_score": 0.0,
+        "attack_type": "UNKNOWN",
+        "is_malicious": False,
+        "honeypot_type": "UNKNOWN",
+    }
+
+    def __init__(
+        self,
+        window_seconds: int = 60,
+        max_tracked_ips: int = 100000,
+        idle_ttl_seconds: Optional[int] = 3600,
+    ):
+        """
+        :param window_seconds: Window for source_ip_event_rate
+        :param max_tracked_ips: LRU bound on per-IP state
+        :param idle_ttl_seconds: Drop state of IPs not seen for this long (None = never)
+        """
         self.window_seconds = window_seconds
+        self.max_tracked_ips = max_tracked_ips
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self._horizon_us = (
+            max(window_seconds, self.BURST_WINDOW_SECONDS) + self.LATE_EVENT_GRACE_SECONDS
+        ) * 1_000_000
 
-        # Stateful trackers (per source IP)
-        self.ip_event_timestamps = defaultdict(list)
-        self.ip_packet_lengths = defaultdict(list)
-        self.ip_attack_types = defaultdict(list)
-        self.ip_destinations = defaultdict(set)
-        self.ip_honeypots = defaultdict(set)
-        self.ip_malicious_flags = defaultdict(list)
+        # Stateful trackers (per source IP), least recently seen first
+        self._ip_state: "OrderedDict[str, _IPState]" = OrderedDict()
+        self.evicted_ips = 0
 
     # --------------------------------------------------
     # Public API
@@ -58,12 +136,7 @@ class FeatureExtractor:
         timestamp = self._parse_timestamp(event.get("timestamp"))
 
         # Track state
-        self.ip_event_timestamps[src_ip].append(timestamp)
-        self.ip_packet_lengths[src_ip].append(int(event.get("length", 0)))
-        self.ip_attack_types[src_ip].append(event.get("attack_type", "UNKNOWN"))
-        self.ip_destinations[src_ip].add(event.get("dst_ip", "0.0.0.0"))
-        self.ip_honeypots[src_ip].add(event.get("honeypot_type", "UNKNOWN"))
-        self.ip_malicious_flags[src_ip].append(bool(event.get("is_malicious", False)))
+        self._update_state(src_ip, event, timestamp)
 
         return {
             "packet_length": self.packet_length(event),
@@ -83,6 +156,149 @@ class FeatureExtractor:
             "z_score_anomaly": self.z_score_anomaly(src_ip),
         }
 
+    def extract_batch(
+        self, events: Union[pd.DataFrame, Iterable[dict]], update_state: bool = True
+    ) -> np.ndarray:
+        """
+        Vectorized counterpart of extract_features.
+
+        Accepts a DataFrame (or list of event dicts) with the extract_features
+        keys and returns a float64 matrix of shape (n, 15) in FEATURE_NAMES
+        order, row-aligned with the input. Events are grouped by src_ip and
+        ordered by timestamp, and the per-IP features are computed with
+        cumulative / windowed NumPy operations on top of the current per-IP
+        state. With update_state=True that state is then advanced exactly as
+        if extract_features had been called for each event in that order.
+        """
+        df = events if isinstance(events, pd.DataFrame) else pd.DataFrame.from_records(list(events))
+        n = len(df)
+        if n == 0:
+            return np.empty((0, len(self.FEATURE_NAMES)), dtype=np.float64)
+        df = df.reset_index(drop=True)
+
+        cols = {}
+        for name, default in self.EVENT_DEFAULTS.items():
+            if name in df.columns:
+                cols[name] = df[name].where(df[name].notna(), default)
+            else:
+                cols[name] = pd.Series(default, index=df.index)
+
+        ts = self._parse_timestamps(df["timestamp"] if "timestamp" in df.columns else None, n)
+        ts_us = ts.values.astype("datetime64[us]").astype(np.int64)
+
+        # Group by src_ip, then timestamp, then arrival order
+        ip_codes, ip_uniques = pd.factorize(cols["src_ip"].astype(str))
+        order = np.lexsort((np.arange(n), ts_us, ip_codes))
+        g = ip_codes[order]
+        t = ts_us[order]
+        lengths = cols["length"].to_numpy(dtype=np.int64)[order]
+        malicious = cols["is_malicious"].to_numpy(dtype=bool)[order]
+        attack_types = cols["attack_type"].to_numpy(dtype=object)[order]
+        destinations = cols["dst_ip"].to_numpy(dtype=object)[order]
+        honeypots = cols["honeypot_type"].to_numpy(dtype=object)[order]
+
+        new_group = np.r_[True, g[1:] != g[:-1]]
+        group_start = np.flatnonzero(new_group)
+        group_id = np.cumsum(new_group) - 1
+        k = np.arange(n) - group_start[group_id] + 1  # batch events seen so far for this IP
+
+        prior = [self._ip_state.get(ip) for ip in ip_uniques]
+        prior_g = [prior[code] for code in g[group_start]]
+
+        def per_group(attr, default):
+            return np.array(
+                [getattr(st, attr) if st else default for st in prior_g], dtype=np.float64
+            )[group_id]
+
+        count = per_group("count", 0) + k
+
+        # Ratios / modes / distinct counts on top of the prior state
+        mal_cum = pd.Series(malicious).groupby(g).cumsum().to_numpy()
+        malicious_ratio = (per_group("malicious_count", 0) + mal_cum) / count
+
+        type_count = pd.Series(attack_types).groupby([g, attack_types]).cumcount().to_numpy() + 1
+        type_count = type_count + self._prior_lookup(prior, g, attack_types, "attack_types")
+        attack_freq = np.maximum(
+            per_group("attack_type_max", 0),
+            pd.Series(type_count).groupby(g).cummax().to_numpy(),
+        )
+
+        unique_dst = self._cumulative_distinct(prior, g, destinations, "destinations")
+        unique_hp = self._cumulative_distinct(prior, g, honeypots, "honeypots")
+
+        # Welford combine of prior (n, mean, M2) with the batch prefix of each IP
+        x = lengths.astype(np.float64)
+        shifted = x - x[group_start][group_id]  # shift per IP for numerical stability
+        s1 = pd.Series(shifted).groupby(g).cumsum().to_numpy()
+        s2 = pd.Series(shifted * shifted).groupby(g).cumsum().to_numpy()
+        mean_b = s1 / k
+        m2_b = np.maximum(s2 - k * mean_b * mean_b, 0.0)
+        mean_b = mean_b + x[group_start][group_id]
+        n_a = per_group("count", 0)
+        mean_a = per_group("mean", 0.0)
+        delta = mean_b - mean_a
+        mean = mean_a + delta * k / count
+        m2 = per_group("m2", 0.0) + m2_b + delta * delta * n_a * k / count
+        variance = np.where(count >= 2, m2 / np.maximum(count - 1, 1), 0.0)
+        std = np.sqrt(variance)
+        rolling_dev = x - mean
+        with np.errstate(divide="ignore", invalid="ignore"):
+            z_score = np.where((count >= 2) & (std != 0), rolling_dev / std, 0.0)
+
+        # Session duration from first / last seen
+        first_prior = np.array(
+            [self._to_us(st.first_seen) if st and st.first_seen else np.iinfo(np.int64).max for st in prior_g],
+            dtype=np.int64,
+        )[group_id]
+        last_prior = np.array(
+            [self._to_us(st.last_seen) if st and st.last_seen else np.iinfo(np.int64).min for st in prior_g],
+            dtype=np.int64,
+        )[group_id]
+        first_seen = np.minimum(first_prior, pd.Series(t).groupby(g).cummin().to_numpy())
+        last_seen = np.maximum(last_prior, pd.Series(t).groupby(g).cummax().to_numpy())
+        duration = np.where(count >= 2, (last_seen - first_seen) / 1e6, 0.0)
+
+        # Sliding windows, including timestamps still held in the prior windows
+        rate = self._batch_window_counts(prior, g, t, last_seen, self.window_seconds)
+        burst = self._batch_window_counts(prior, g, t, last_seen, self.BURST_WINDOW_SECONDS)
+
+        ports = cols["dst_port"].to_numpy(dtype=np.int64)[order]
+        hours = ts.dt.hour.to_numpy()[order]
+        sorted_features = np.column_stack(
+            [
+                x,
+                cols["protocol"].map({"TCP": 1, "UDP": 2, "ICMP": 3}).fillna(0).to_numpy(dtype=np.float64)[order],
+                rate * (60 / self.window_seconds),
+                np.where(ports < 1024, 1, np.where(ports < 49152, 2, 3)),
+                cols["threat_score"].to_numpy(dtype=np.float64)[order],
+                malicious_ratio,
+                attack_freq,
+                ((hours < 6) | (hours > 22)).astype(np.float64),
+                burst,
+                variance,
+                unique_hp,
+                duration,
+                unique_dst,
+                rolling_dev,
+                z_score,
+            ]
+        ).astype(np.float64)
+
+        if update_state:
+            self._commit_batch_state(
+                ip_uniques, g, group_start, t, lengths, malicious, attack_types,
+                destinations, honeypots, count, mean, m2, attack_freq,
+                first_seen, last_seen,
+            )
+
+        features = np.empty_like(sorted_features)
+        features[order] = sorted_features
+        return features
+
+    @property
+    def tracked_ips(self) -> int:
+        return len(self._ip_state)
+
     # --------------------------------------------------
     # Feature Implementations
     # --------------------------------------------------
@@ -95,9 +311,8 @@ class FeatureExtractor:
         return protocol_map.get(event.get("protocol"), 0)
 
     def source_ip_event_rate(self, src_ip: str, now: datetime) -> float:
-        window_start = now - timedelta(seconds=self.window_seconds)
-        recent = [ts for ts in self.ip_event_timestamps[src_ip] if ts >= window_start]
-        return len(recent) * (60 / self.window_seconds)
+        recent = self._window_count(src_ip, now, self.window_seconds)
+        return recent * (60 / self.window_seconds)
 
     def destination_port_class(self, event: dict) -> int:
         port = int(event.get("dst_port", 0))
@@ -111,50 +326,247 @@ class FeatureExtractor:
         return float(event.get("threat_score", 0.0))
 
     def malicious_flag_ratio(self, src_ip: str) -> float:
-        flags = self.ip_malicious_flags[src_ip]
-        return sum(flags) / len(flags) if flags else 0.0
+        state = self._ip_state.get(src_ip)
+        return state.malicious_count / state.count if state and state.count else 0.0
 
     def attack_type_frequency(self, src_ip: str) -> int:
-        attacks = self.ip_attack_types[src_ip]
-        return max(attacks.count(a) for a in set(attacks)) if attacks else 0
+        state = self._ip_state.get(src_ip)
+        return state.attack_type_max if state else 0
 
     def time_of_day_deviation(self, timestamp: datetime) -> int:
         hour = timestamp.hour
         return int(hour < 6 or hour > 22)
 
     def burst_rate(self, src_ip: str, now: datetime) -> float:
-        window_start = now - timedelta(seconds=10)
-        recent = [ts for ts in self.ip_event_timestamps[src_ip] if ts >= window_start]
-        return float(len(recent))
+        return float(
+            self._window_count(src_ip, now, self.BURST_WINDOW_SECONDS)
+        )
 
     def packet_size_variance(self, src_ip: str) -> float:
-        sizes = self.ip_packet_lengths[src_ip]
-        return float(statistics.variance(sizes)) if len(sizes) >= 2 else 0.0
+        state = self._ip_state.get(src_ip)
+        return float(state.m2 / (state.count - 1)) if state and state.count >= 2 else 0.0
 
     def honeypot_interaction_count(self, src_ip: str) -> int:
-        return len(self.ip_honeypots[src_ip])
+        state = self._ip_state.get(src_ip)
+        return len(state.honeypots) if state else 0
 
     def session_duration_estimate(self, src_ip: str) -> float:
-        ts = self.ip_event_timestamps[src_ip]
-        return (max(ts) - min(ts)).total_seconds() if len(ts) >= 2 else 0.0
+        state = self._ip_state.get(src_ip)
+        if not state or state.count < 2:
+            return 0.0
+        return (state.last_seen - state.first_seen).total_seconds()
 
     def unique_destination_count(self, src_ip: str) -> int:
-        return len(self.ip_destinations[src_ip])
+        state = self._ip_state.get(src_ip)
+        return len(state.destinations) if state else 0
 
     def rolling_average_deviation(self, src_ip: str) -> float:
-        sizes = self.ip_packet_lengths[src_ip]
-        if not sizes:
+        state = self._ip_state.get(src_ip)
+        if not state or not state.count:
             return 0.0
-        avg = sum(sizes) / len(sizes)
-        return float(sizes[-1] - avg)
+        return float(state.last_length - state.mean)
 
     def z_score_anomaly(self, src_ip: str) -> float:
-        sizes = self.ip_packet_lengths[src_ip]
-        if len(sizes) < 2:
+        state = self._ip_state.get(src_ip)
+        if not state or state.count < 2:
             return 0.0
-        mean = statistics.mean(sizes)
-        std = statistics.stdev(sizes)
-        return float((sizes[-1] - mean) / std) if std != 0 else 0.0
+        std = math.sqrt(state.m2 / (state.count - 1))
+        return float((state.last_length - state.mean) / std) if std != 0 else 0.0
+
+    # --------------------------------------------------
+    # State maintenance
+    # --------------------------------------------------
+
+    def _update_state(self, src_ip: str, event: dict, timestamp: datetime) -> None:
+        now = time.monotonic()
+        self._evict_idle(now)
+
+        state = self._ip_state.get(src_ip)
+        if state is None:
+            state = _IPState()
+            self._ip_state[src_ip] = state
+            if len(self._ip_state) > self.max_tracked_ips:
+                self._ip_state.popitem(last=False)
+                self.evicted_ips += 1
+        else:
+            self._ip_state.move_to_end(src_ip)
+        state.touched_at = now
+
+        # Welford running mean / variance of packet lengths
+        length = int(event.get("length", 0))
+        state.count += 1
+        delta = length - state.mean
+        state.mean += delta / state.count
+        state.m2 += delta * (length - state.mean)
+        state.last_length = length
+
+        # Counter-based mode of attack types
+        attack_type = event.get("attack_type", "UNKNOWN")
+        state.attack_types[attack_type] += 1
+        state.attack_type_max = max(state.attack_type_max, state.attack_types[attack_type])
+
+        state.malicious_count += bool(event.get("is_malicious", False))
+        state.destinations.add(event.get("dst_ip", "0.0.0.0"))
+        state.honeypots.add(event.get("honeypot_type", "UNKNOWN"))
+
+        if state.first_seen is None or timestamp < state.first_seen:
+            state.first_seen = timestamp
+        if state.last_seen is None or timestamp > state.last_seen:
+            state.last_seen = timestamp
+
+        # Sliding window (sorted timestamps; late events are inserted in place)
+        window = state.window
+        stamp = self._datetime_us(timestamp)
+        if not window or stamp >= window[-1]:
+            window.append(stamp)
+        else:
+            insort(window, stamp)
+        self._prune_window(state)
+
+    def _window_count(self, src_ip: str, now: datetime, seconds: int) -> int:
+        """Events of ``src_ip`` at or after ``now - seconds`` (later ones included)."""
+        state = self._ip_state.get(src_ip)
+        if not state:
+            return 0
+        lower = max(
+            self._datetime_us(now) - seconds * 1_000_000,
+            self._datetime_us(state.last_seen) - self._horizon_us,
+        )
+        return len(state.window) - bisect_left(state.window, lower)
+
+    def _prune_window(self, state: _IPState) -> None:
+        """
+        Drop timestamps older than the horizon behind the IP's newest event.
+        Counts never reach below the horizon, so pruning is deferred until
+        half the list is stale to keep it amortized O(1).
+        """
+        window = state.window
+        stale = bisect_left(window, self._datetime_us(state.last_seen) - self._horizon_us)
+        if stale and 2 * stale >= len(window):
+            del window[:stale]
+
+    def _prior_lookup(self, prior, g, values, attr) -> np.ndarray:
+        """Prior per-IP Counter value for each (ip, value) row."""
+        result = np.zeros(len(g), dtype=np.float64)
+        codes = [code for code, st in enumerate(prior) if st and getattr(st, attr)]
+        if not codes:
+            return result
+        lookup = {(code, key): cnt for code in codes for key, cnt in getattr(prior[code], attr).items()}
+        mask = np.isin(g, codes)
+        result[mask] = [lookup.get(pair, 0) for pair in zip(g[mask], values[mask])]
+        return result
+
+    def _cumulative_distinct(self, prior, g, values, attr) -> np.ndarray:
+        """Running distinct count of ``values`` per IP, on top of the prior sets."""
+        first_in_batch = ~pd.DataFrame({"g": g, "v": values}).duplicated().to_numpy()
+        codes = [code for code, st in enumerate(prior) if st and getattr(st, attr)]
+        prior_size = np.zeros(len(prior), dtype=np.float64)
+        if codes:
+            mask = np.isin(g, codes) & first_in_batch
+            first_in_batch[mask] = [
+                v not in getattr(prior[code], attr) for code, v in zip(g[mask], values[mask])
+            ]
+            for code in codes:
+                prior_size[code] = len(getattr(prior[code], attr))
+        return prior_size[g] + pd.Series(first_in_batch).groupby(g).cumsum().to_numpy()
+
+    def _batch_window_counts(self, prior, g, t, last_seen, seconds) -> np.ndarray:
+        """
+        Events at or after ``ts - seconds`` seen so far for each row's IP
+        (rows are sorted by ip, ts): batch rows up to and including the row,
+        plus every timestamp in the prior window, later ones included. Like
+        _window_count, nothing older than the horizon behind the IP's newest
+        event is counted.
+        """
+        n = len(g)
+        lower = np.maximum(t - seconds * 1_000_000, last_seen - self._horizon_us)
+        base = min(int(t.min()), int(lower.min()))
+        rel, rel_lower = t - base, lower - base
+        span = int(max(rel.max(), rel_lower.max())) + 1
+        if (int(g.max()) + 1) * span < 2**62:
+            key = g.astype(np.int64) * span
+            counts = np.arange(n) - np.searchsorted(key + rel, key + rel_lower, side="left") + 1
+        else:
+            # Composite key would overflow int64: fall back to one search per IP
+            counts = np.empty(n, dtype=np.int64)
+            bounds = np.flatnonzero(np.r_[True, g[1:] != g[:-1], True])
+            for lo, hi in zip(bounds[:-1], bounds[1:]):
+                counts[lo:hi] = np.arange(hi - lo) - np.searchsorted(t[lo:hi], lower[lo:hi], side="left") + 1
+        # A row below the horizon of an earlier prior event counts nothing
+        counts = np.maximum(counts, 0).astype(np.float64)
+
+        bounds = np.flatnonzero(np.r_[True, g[1:] != g[:-1], True])
+        for lo, hi in zip(bounds[:-1], bounds[1:]):
+            st = prior[g[lo]]
+            if st and st.window:
+                window = np.asarray(st.window, dtype=np.int64)
+                counts[lo:hi] += len(window) - np.searchsorted(window, lower[lo:hi], side="left")
+        return counts
+
+    def _commit_batch_state(
+        self, ip_uniques, g, group_start, t, lengths, malicious, attack_types,
+        destinations, honeypots, count, mean, m2, attack_freq, first_seen, last_seen,
+    ) -> None:
+        """Advance per-IP state to the end of a batch processed by extract_batch."""
+        now = time.monotonic()
+        self._evict_idle(now)
+        group_end = np.r_[group_start[1:], len(g)] - 1
+        frame = pd.DataFrame(
+            {"g": g, "t": t, "malicious": malicious, "attack_type": attack_types,
+             "dst": destinations, "honeypot": honeypots}
+        )
+        grouped = frame.groupby("g", sort=False)
+        type_counts = frame.groupby(["g", "attack_type"], sort=False).size()
+        dst_sets = grouped["dst"].unique()
+        hp_sets = grouped["honeypot"].unique()
+        malicious_sums = grouped["malicious"].sum()
+
+        for start, end in zip(group_start, group_end):
+            code = int(g[start])
+            src_ip = ip_uniques[code]
+            state = self._ip_state.get(src_ip)
+            if state is None:
+                state = _IPState()
+                self._ip_state[src_ip] = state
+            else:
+                self._ip_state.move_to_end(src_ip)
+            state.touched_at = now
+
+            state.count = int(count[end])
+            state.mean = float(mean[end])
+            state.m2 = float(m2[end])
+            state.last_length = int(lengths[end])
+            state.malicious_count += int(malicious_sums[code])
+            for attack_type, cnt in type_counts.loc[code].items():
+                state.attack_types[attack_type] += int(cnt)
+            state.attack_type_max = int(attack_freq[end])
+            state.destinations.update(dst_sets[code])
+            state.honeypots.update(hp_sets[code])
+            state.first_seen = self._from_us(first_seen[end])
+            state.last_seen = self._from_us(last_seen[end])
+
+            # Only timestamps inside the horizon can still be counted
+            batch_t = t[start : end + 1]
+            recent = batch_t[np.searchsorted(batch_t, int(last_seen[end]) - self._horizon_us):]
+            if state.window and len(recent) and recent[0] < state.window[-1]:
+                state.window = sorted(state.window + recent.tolist())
+            else:
+                state.window.extend(recent.tolist())
+            self._prune_window(state)
+
+        while len(self._ip_state) > self.max_tracked_ips:
+            self._ip_state.popitem(last=False)
+            self.evicted_ips += 1
+
+    def _evict_idle(self, now: float) -> None:
+        if self.idle_ttl_seconds is None:
+            return
+        while self._ip_state:
+            oldest = next(iter(self._ip_state.values()))
+            if now - oldest.touched_at < self.idle_ttl_seconds:
+                break
+            self._ip_state.popitem(last=False)
+            self.evicted_ips += 1
 
     # --------------------------------------------------
     # Helpers
@@ -177,8 +589,33 @@ class FeatureExtractor:
                 return datetime.now(timezone.utc)
             try:
                 ts = ts.replace("Z", "+00:00")
-                return datetime.fromisoformat(ts)
+                parsed = datetime.fromisoformat(ts)
+                return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
             except Exception:
                 return datetime.now(timezone.utc)
 
         return datetime.now(timezone.utc)
+
+    def _parse_timestamps(self, column, n: int) -> pd.Series:
+        """Vectorized _parse_timestamp: UTC-aware, missing / unparseable -> now."""
+        now = pd.Timestamp.now(tz="UTC")
+        if column is None:
+            return pd.Series(now, index=range(n))
+        parsed = pd.to_datetime(column, utc=True, errors="coerce", format="ISO8601")
+        return parsed.fillna(now)
+
+    @staticmethod
+    def _to_us(ts: datetime) -> int:
+        stamp = pd.Timestamp(ts)
+        if stamp.tzinfo is None:
+            stamp = stamp.tz_localize("UTC")
+        return stamp.value // 1000
+
+    @staticmethod
+    def _datetime_us(ts: datetime) -> int:
+        """Exact epoch microseconds of an aware datetime (no float rounding)."""
+        return (ts - _EPOCH) // timedelta(microseconds=1)
+
+    @staticmethod
+    def _from_us(value) -> datetime:
+        return _EPOCH + timedelta(microseconds=int(value))
@@ -0,0 +1,259 @@
+"""
+PhantomNet Feature Store
+========================
+
+Single owner of the per-IP feature state used by every model.
+
+The RF scorer, the IsolationForest baseline and DBSCAN campaign clustering
+used to keep their own ``FeatureExtractor``, so each event's history was
+stored three times and the three copies drifted apart. The store holds the
+one shared extractor, and the threat analyzer computes each PacketLog's
+15-feature vector on it exactly once, when the event is first scored. The
+vector is kept on the row itself (``PacketLog.feature_vector`` as packed
+float32), and every later consumer reuses it.
+
+Only that first-time scoring (``live=True``) touches the shared per-IP
+state. Readers that meet rows without a stored vector (never scored,
+scored before vectors were stored) backfill them on a scratch extractor in
+timestamp order and do not write them back: historical rows must not move
+the live rates / bursts / sessions, and a stored vector always is the one
+the scorer used.
+
+A live vector only becomes durable with the analyzer's commit. Until the
+analyzer calls ``mark_persisted`` the store keeps it by row id, so a row
+whose scoring or commit failed gets the same vector back when the
+reconcile sweep retries it, instead of advancing its IP's state twice.
+
+Usage:
+    from ml.feature_store import feature_store
+
+    # Threat analyzer, first-time scoring: advances live state, stores vectors
+    matrix = feature_store.vectors_for_logs(logs, live=True)   # (len(logs), 15)
+    db.commit()                                                 # persist new vectors
+    feature_store.mark_persisted(logs)
+
+    # Any other reader (ORM rows or a database.projections event frame)
+    matrix = feature_store.vectors_for_logs(logs)
+    matrix = feature_store.vectors_for_events(frame)
+"""
+
+import logging
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Union
+
+import numpy as np
+import pandas as pd
+from ml.feature_extractor import FeatureExtractor
+
+logger = logging.getLogger("feature_store")
+
+VECTOR_DTYPE = np.dtype("<f4")
+VECTOR_BYTES = len(FeatureExtractor.FEATURE_NAMES) * VECTOR_DTYPE.itemsize
+
+# Event frame fields vectors_for_events reads: cached vector plus extractor inputs
+VECTOR_FIELDS = ("id", "feature_vector", "src_ip", "dst_ip", "dst_port", "protocol", "length", "timestamp")
+
+
+class FeatureStore:
+    """
+    Shared per-IP feature state plus per-event vector cache.
+    """
+
+    # Live vectors awaiting their commit, oldest dropped first
+    MAX_UNPERSISTED = 100000
+
+    def __init__(self, extractor: Optional[FeatureExtractor] = None):
+        self.extractor = extractor or FeatureExtractor()
+        # Serializes state updates between the analyzer thread and API callers
+        self._lock = threading.Lock()
+        # Row id -> live vector not yet committed (see mark_persisted)
+        self._unpersisted: "OrderedDict[int, bytes]" = OrderedDict()
+
+        # Metrics
+        self.computed_total = 0
+        self.reused_total = 0
+
+    # --------------------------------------------------
+    # Encoding
+    # --------------------------------------------------
+
+    @staticmethod
+    def encode(vector: np.ndarray) -> bytes:
+        """Pack one feature vector into the compact column format."""
+        return np.asarray(vector, dtype=VECTOR_DTYPE).tobytes()
+
+    @staticmethod
+    def decode(blob: Optional[bytes]) -> Optional[np.ndarray]:
+        """Unpack a stored vector, or None when missing / from another layout."""
+        if not blob or len(blob) != VECTOR_BYTES:
+            return None
+        return np.frombuffer(blob, dtype=VECTOR_DTYPE).astype(np.float64)
+
+    # --------------------------------------------------
+    # Lookup
+    # --------------------------------------------------
+
+    def vectors_for_logs(
+        self, logs: List, live: bool = False, extractor: Optional[FeatureExtractor] = None
+    ) -> np.ndarray:
+        """
+        Return the feature matrix for ``logs`` (row-aligned).
+
+        Vectors already stored on a row are reused as-is. With ``live`` the
+        rest are computed in one extract_batch call on the shared per-IP
+        state and written to ``log.feature_vector``; the caller's commit
+        persists them (then ``mark_persisted``). Rows computed live before
+        whose commit never happened get that same vector again. Otherwise
+        they are backfilled (see ``backfill``).
+        """
+        matrix = np.zeros((len(logs), len(FeatureExtractor.FEATURE_NAMES)), dtype=np.float64)
+        missing = []
+        for idx, log in enumerate(logs):
+            vector = self.decode(getattr(log, "feature_vector", None))
+            if vector is None:
+                missing.append(idx)
+            else:
+                matrix[idx] = vector
+
+        if missing and live:
+            with self._lock:
+                retried = [self._unpersisted.get(getattr(logs[idx], "id", None)) for idx in missing]
+            for idx, blob in zip(missing, retried):
+                if blob is not None:
+                    logs[idx].feature_vector = blob
+                    matrix[idx] = self.decode(blob)
+            missing = [idx for idx, blob in zip(missing, retried) if blob is None]
+
+        if missing:
+            pending = [logs[idx] for idx in missing]
+            if live:
+                with self._lock:
+                    computed = self.extractor.extract_batch(self.events_frame(pending))
+                    for log, vector in zip(pending, computed):
+                        log.feature_vector = self.encode(vector)
+                        if getattr(log, "id", None) is not None:
+                            self._unpersisted[log.id] = log.feature_vector
+                    while len(self._unpersisted) > self.MAX_UNPERSISTED:
+                        self._unpersisted.popitem(last=False)
+            else:
+                computed = self.backfill(self.events_frame(pending), extractor)
+            matrix[missing] = computed
+
+        self.computed_total += len(missing)
+        self.reused_total += len(logs) - len(missing)
+        return matrix
+
+    def mark_persisted(self, logs: List) -> None:
+        """Forget the pending live vectors of ``logs`` once their commit succeeded."""
+        with self._lock:
+            for log in logs:
+                self._unpersisted.pop(getattr(log, "id", None), None)
+
+    def vectors_for_events(self, events: np.ndarray, extractor: Optional[FeatureExtractor] = None) -> np.ndarray:
+        """
+        ``vectors_for_logs`` for an event frame (database.projections) with
+        at least VECTOR_FIELDS. Missing vectors are backfilled, never written.
+        """
+        n_features = len(FeatureExtractor.FEATURE_NAMES)
+        matrix = np.zeros((len(events), n_features), dtype=np.float64)
+        blobs = events["feature_vector"]
+        stored = np.fromiter((blob is not None and len(blob) == VECTOR_BYTES for blob in blobs), bool, len(blobs))
+        if stored.any():
+            packed = np.frombuffer(b"".join(blobs[stored]), dtype=VECTOR_DTYPE)
+            matrix[stored] = packed.reshape(-1, n_features)
+
+        missing = np.flatnonzero(~stored)
+        if len(missing):
+            matrix[missing] = self.backfill(self.events_frame(events[missing]), extractor)
+
+        self.computed_total += len(missing)
+        self.reused_total += len(events) - len(missing)
+        return matrix
+
+    @staticmethod
+    def backfill(events: pd.DataFrame, extractor: Optional[FeatureExtractor] = None) -> np.ndarray:
+        """
+        Vectors for rows that were never scored, on scratch per-IP state:
+        a fresh extractor, or ``extractor`` when a caller streams history in
+        timestamp order across several calls (windowed training reads).
+        """
+        return (extractor or FeatureExtractor()).extract_batch(events)
+
+    def extract_batch(self, events) -> np.ndarray:
+        """Compute vectors for events that are not PacketLog rows (no caching)."""
+        with self._lock:
+            return self.extractor.extract_batch(events)
+
+    @staticmethod
+    def events_frame(logs: Union[List, np.ndarray]) -> pd.DataFrame:
+        """
+        Column-wise extractor input for PacketLog rows or an event frame,
+        using the same field defaults the scorer applies through ThreatInput.
+        """
+        if isinstance(logs, np.ndarray):
+            return pd.DataFrame(
+                {
+                    "src_ip": logs["src_ip"],
+                    "dst_ip": [ip or "127.0.0.1" for ip in logs["dst_ip"]],
+                    "dst_port": logs["dst_port"],
+                    "protocol": [protocol or "UNKNOWN" for protocol in logs["protocol"]],
+                    "length": logs["length"],
+                    "timestamp": logs["timestamp"],
+                    "threat_score": 0.0,
+                    "is_malicious": False,
+                    "attack_type": "UNKNOWN",
+                    "honeypot_type": "NONE",
+                }
+            )
+        return pd.DataFrame(
+            {
+                "src_ip": [log.src_ip for log in logs],
+                "dst_ip": [log.dst_ip or "127.0.0.1" for log in logs],
+                "dst_port": [log.dst_port or 0 for log in logs],
+                "protocol": [log.protocol or "UNKNOWN" for log in logs],
+                "length": [log.length or 0 for log in logs],
+                "timestamp": [log.timestamp for log in logs],
+                "threat_score": 0.0,
+                "is_malicious": False,
+                "attack_type": "UNKNOWN",
+                "honeypot_type": "NONE",
+            }
+        )
+
+    # --------------------------------------------------
+    # Metrics
+    # --------------------------------------------------
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "tracked_ips": self.extractor.tracked_ips,
+            "evicted_ips": self.extractor.evicted_ips,
+            "vectors_computed_total": self.computed_total,
+            "vectors_reused_total": self.reused_total,
+        }
+
+    def to_prometheus(self) -> str:
+        """Generate Prometheus text format for feature store metrics."""
+        lines = []
+
+        lines.append("# HELP phantomnet_feature_vectors_computed_total Event feature vectors computed")
+        lines.append("# TYPE phantomnet_feature_vectors_computed_total counter")
+        lines.append(f"phantomnet_feature_vectors_computed_total {self.computed_total}")
+
+        lines.append("")
+        lines.append("# HELP phantomnet_feature_vectors_reused_total Stored feature vectors reused by a model")
+        lines.append("# TYPE phantomnet_feature_vectors_reused_total counter")
+        lines.append(f"phantomnet_feature_vectors_reused_total {self.reused_total}")
+
+        lines.append("")
+        lines.append("# HELP phantomnet_feature_tracked_ips Source IPs with live feature state")
+        lines.append("# TYPE phantomnet_feature_tracked_ips gauge")
+        lines.append(f"phantomnet_feature_tracked_ips {self.extractor.tracked_ips}")
+
+        return "\n".join(lines) + "\n"
+
+
+# Singleton instance
+feature_store = FeatureStore()
@@ -0,0 +1,291 @@
+"""
+PhantomNet Inference Engine
+===========================
+
+Scores tree-ensemble models without going through sklearn's per-call
+machinery (input validation, DataFrame feature-name checks, one joblib task
+per tree).
+
+A fitted RandomForest / ExtraTrees / DecisionTree classifier is compiled once
+per model into a flat array-of-nodes form:
+
+    feature[n]         split feature of node n
+    threshold[n]       split threshold (float64, as sklearn stores it)
+    children[2n + d]   absolute index of node n's left (d=0) / right (d=1) child
+    value[c, n]        probability of class c at node n (leaf nodes are used)
+    roots[t]           index of tree t's root
+
+Leaves point at themselves with an +inf threshold, so every tree can be
+walked in lock-step: each step is a handful of flat gathers over an
+(events x trees) node matrix, repeated ``max_depth`` times. Inputs are raw
+float32 matrices in FeatureExtractor.FEATURE_NAMES order, compared the way
+sklearn does (float32 features against float64 thresholds), so
+probabilities match ``model.predict_proba`` exactly.
+
+Scoring runs in a dedicated worker pool; large batches are split into
+chunks that are scored in parallel (NumPy releases the GIL in the gathers).
+Models that cannot be compiled (IsolationForest, mocks, multi-output) are
+left to their own ``predict_proba`` / ``predict``.
+
+Usage:
+    from ml.inference_engine import inference_engine
+
+    compiled = inference_engine.compile(model)
+    if compiled is not None:
+        proba = inference_engine.predict_proba(compiled, matrix)
+"""
+
+import os
+import time
+import logging
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import numpy as np
+from sklearn.ensemble import ExtraTreesClassifier, RandomForestClassifier
+from sklearn.tree import DecisionTreeClassifier, ExtraTreeClassifier
+
+import ml.model_loader as model_loader
+
+logger = logging.getLogger("inference_engine")
+
+INFERENCE_ENGINE_ENABLED = os.getenv("INFERENCE_ENGINE_ENABLED", "true").lower() == "true"
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "2"))
+INFERENCE_CHUNK_ROWS = int(os.getenv("INFERENCE_CHUNK_ROWS", "512"))
+
+_FORESTS = (RandomForestClassifier, ExtraTreesClassifier)
+_TREES = (DecisionTreeClassifier, ExtraTreeClassifier)
+
+
+class CompiledForest:
+    """
+    Flattened tree ensemble. Immutable once built; safe to share across threads.
+    """
+
+    def __init__(self, feature, threshold, children, value, roots, max_depth, n_features, classes):
+        self.feature = feature
+        self.threshold = threshold
+        self.children = children
+        self.value = value
+        self.roots = roots
+        self.max_depth = max_depth
+        self.n_features = n_features
+        self.classes = classes
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.feature)
+
+    @classmethod
+    def from_sklearn(cls, model) -> "CompiledForest":
+        """Flatten a fitted single-output tree / forest classifier."""
+        if isinstance(model, _FORESTS):
+            trees = [est.tree_ for est in model.estimators_]
+        elif isinstance(model, _TREES):
+            trees = [model.tree_]
+        else:
+            raise TypeError(f"Cannot compile {type(model).__name__}")
+        if getattr(model, "n_outputs_", 1) != 1:
+            raise TypeError("Multi-output models are not supported")
+
+        features, thresholds, children, values, roots = [], [], [], [], []
+        offset = 0
+        for tree in trees:
+            n = tree.node_count
+            nodes = np.arange(offset, offset + n, dtype=np.intp)
+            leaf = tree.children_left == -1
+
+            features.append(np.where(leaf, 0, tree.feature).astype(np.intp))
+            thresholds.append(np.where(leaf, np.inf, tree.threshold))
+            children.append(np.column_stack([
+                np.where(leaf, nodes, tree.children_left + offset),
+                np.where(leaf, nodes, tree.children_right + offset),
+            ]).ravel())
+
+            # sklearn >= 1.4 stores class fractions; older versions store weighted
+            # counts and normalise them in predict_proba
+            value = tree.value[:, 0, :].astype(np.float64)
+            totals = value.sum(axis=1, keepdims=True)
+            if not np.allclose(totals, 1.0):
+                totals[totals == 0.0] = 1.0
+                value = value / totals
+            values.append(value)
+
+            roots.append(offset)
+            offset += n
+
+        return cls(
+            feature=np.concatenate(features),
+            threshold=np.concatenate(thresholds),
+            children=np.concatenate(children),
+            value=np.ascontiguousarray(np.concatenate(values).T),
+            roots=np.asarray(roots, dtype=np.intp),
+            max_depth=max(tree.max_depth for tree in trees),
+            n_features=int(model.n_features_in_),
+            classes=np.asarray(model.classes_),
+        )
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        """Class probabilities for a 2-D float32 matrix, averaged over trees."""
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(
+                f"X has {X.shape[-1]} features, but the compiled model expects {self.n_features}"
+            )
+        flat = np.ascontiguousarray(X).ravel()
+        base = (np.arange(X.shape[0], dtype=np.intp) * self.n_features)[:, None]
+        node = np.repeat(self.roots[None, :], X.shape[0], axis=0)
+        for _ in range(self.max_depth):
+            go_right = flat.take(base + self.feature.take(node)) > self.threshold.take(node)
+            node = self.children.take(2 * node + go_right)
+        # Accumulate trees in order (cumsum), as sklearn does, so results are bit-identical
+        return np.stack(
+            [column.take(node).cumsum(axis=1)[:, -1] / self.n_trees for column in self.value], axis=1
+        )
+
+
+class InferenceEngine:
+    """
+    Compiles the active model once per version and scores it in a worker pool.
+    """
+
+    def __init__(
+        self,
+        workers: int = INFERENCE_WORKERS,
+        chunk_rows: int = INFERENCE_CHUNK_ROWS,
+        enabled: bool = INFERENCE_ENGINE_ENABLED,
+    ):
+        self.workers = max(1, workers)
+        self.chunk_rows = max(1, chunk_rows)
+        self.enabled = enabled
+        self._compiled = weakref.WeakKeyDictionary()  # model -> CompiledForest | None
+        self._lock = threading.Lock()
+        self._executor = None
+
+        self.compiled_total = 0
+        self.batches_total = 0
+        self.rows_total = 0
+        self.seconds_total = 0.0
+
+    def compile(self, model) -> Optional[CompiledForest]:
+        """Compiled form of ``model``, or None if it is not a supported tree ensemble."""
+        if not self.enabled or not isinstance(model, _FORESTS + _TREES):
+            return None
+        try:
+            return self._compiled[model]
+        except (KeyError, TypeError):
+            pass
+        with self._lock:
+            if model in self._compiled:
+                return self._compiled[model]
+            try:
+                started = time.perf_counter()
+                compiled = CompiledForest.from_sklearn(model)
+                self.compiled_total += 1
+                logger.info(
+                    f"Compiled {type(model).__name__}: {compiled.n_trees} trees, "
+                    f"{compiled.n_nodes} nodes, depth {compiled.max_depth} "
+                    f"in {(time.perf_counter() - started) * 1000:.1f} ms"
+                )
+            except Exception as e:
+                logger.warning(f"Model compilation failed, using sklearn: {e}")
+                compiled = None
+            self._compiled[model] = compiled
+            return compiled
+
+    def predict_proba(self, compiled: CompiledForest, X: np.ndarray) -> np.ndarray:
+        """
+        Score ``X`` on the worker pool. Batches larger than ``chunk_rows`` are
+        split and scored in parallel. Blocks until the result is ready.
+        """
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        started = time.perf_counter()
+        executor = self._ensure_executor()
+        if len(X) <= self.chunk_rows:
+            result = executor.submit(compiled.predict_proba, X).result()
+        else:
+            futures = [
+                executor.submit(compiled.predict_proba, X[offset : offset + self.chunk_rows])
+                for offset in range(0, len(X), self.chunk_rows)
+            ]
+            result = np.concatenate([f.result() for f in futures])
+
+        self.batches_total += 1
+        self.rows_total += len(X)
+        self.seconds_total += time.perf_counter() - started
+        return result
+
+    def invalidate(self) -> None:
+        """Drop compiled models (the next compile() rebuilds them)."""
+        with self._lock:
+            self._compiled.clear()
+
+    def stop(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def _ensure_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.workers, thread_name_prefix="inference"
+                    )
+        return self._executor
+
+    # --------------------------------------------------
+    # Metrics
+    # --------------------------------------------------
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "workers": self.workers,
+            "chunk_rows": self.chunk_rows,
+            "compiled_total": self.compiled_total,
+            "batches_total": self.batches_total,
+            "rows_total": self.rows_total,
+            "avg_us_per_row": round(self.seconds_total / self.rows_total * 1e6, 2) if self.rows_total else 0.0,
+        }
+
+    def to_prometheus(self) -> str:
+        """Generate Prometheus text format for inference engine metrics."""
+        lines = []
+
+        lines.append("# HELP phantomnet_inference_models_compiled_total Models compiled to flat node arrays")
+        lines.append("# TYPE phantomnet_inference_models_compiled_total counter")
+        lines.append(f"phantomnet_inference_models_compiled_total {self.compiled_total}")
+
+        lines.append("")
+        lines.append("# HELP phantomnet_inference_batches_total Batches scored by the compiled engine")
+        lines.append("# TYPE phantomnet_inference_batches_total counter")
+        lines.append(f"phantomnet_inference_batches_total {self.batches_total}")
+
+        lines.append("")
+        lines.append("# HELP phantomnet_inference_rows_total Events scored by the compiled engine")
+        lines.append("# TYPE phantomnet_inference_rows_total counter")
+        lines.append(f"phantomnet_inference_rows_total {self.rows_total}")
+
+        lines.append("")
+        lines.append("# HELP phantomnet_inference_seconds_total Time spent scoring in the compiled engine")
+        lines.append("# TYPE phantomnet_inference_seconds_total counter")
+        lines.append(f"phantomnet_inference_seconds_total {self.seconds_total:.6f}")
+
+        return "\n".join(lines) + "\n"
+
+
+# Singleton instance
+inference_engine = InferenceEngine()
+
+
+@model_loader.on_model_change
+def _invalidate_compiled_models(version: Optional[str]) -> None:
+    inference_engine.invalidate()
@@ -1,3 +1,14 @@
+"""
+Inference latency benchmark.
+
+    python backend/ml/latency_benchmark.py
+        Latest MLflow run, model.predict over the week 6 test events.
+
+    python backend/ml/latency_benchmark.py --compare-engines
+        Production model, sklearn predict_proba vs the compiled inference
+        engine (ml/inference_engine.py), p50/p99 per-event latency for batch
+        sizes 1-4096.
+"""
 import sys
 import os
 
@@ -30,6 +41,8 @@ mlflow.set_tracking_uri(f"file:///{MLFLOW_DIR}")
 CSV_PATH = os.path.join(DATA_DIR, "week6_test_events.csv")
 FEATURE_COLUMNS = ["payload_length"]
 
+BATCH_SIZES = [1, 4, 16, 64, 256, 1024, 4096]
+
 # ======================
 # MAIN
 # ======================
@@ -90,5 +103,74 @@ def main():
         print("\n[LATENCY] FAILED ❌ (>100 ms)")
 
 
+# ======================
+# ENGINE COMPARISON
+# ======================
+
+
+def _per_event_latencies(score, X, batch_size, repeats):
+    """Per-event latency (us) of each of ``repeats`` batches of ``batch_size`` rows."""
+    latencies = []
+    for i in range(repeats):
+        offset = (i * batch_size) % (len(X) - batch_size + 1)
+        batch = X[offset : offset + batch_size]
+        start = time.perf_counter()
+        score(batch)
+        latencies.append((time.perf_counter() - start) / batch_size * 1e6)
+    return latencies
+
+
+def compare_engines(batch_sizes=BATCH_SIZES, events=20000):
+    """
+    Production model, sklearn (DataFrame -> predict_proba) vs the compiled
+    inference engine (float32 matrix on the worker pool), p50/p99 per event.
+    """
+    import warnings
+    import ml.model_loader as model_loader
+    from ml.inference_engine import inference_engine
+
+    model = model_loader.load_model()
+    compiled = inference_engine.compile(model)
+    if compiled is None:
+        raise RuntimeError(f"Production model {type(model).__name__} is not a compilable tree ensemble")
+
+    rng = np.random.default_rng(7)
+    X = (rng.random((max(events, max(batch_sizes)), compiled.n_features)) * 100).astype(np.float32)
+    names = getattr(model, "feature_names_in_", None)
+    columns = list(names) if names is not None else [f"f{i}" for i in range(compiled.n_features)]
+
+    def sklearn_score(batch):
+        return model.predict_proba(pd.DataFrame(batch, columns=columns))
+
+    def compiled_score(batch):
+        return inference_engine.predict_proba(compiled, batch)
+
+    if not np.array_equal(sklearn_score(X[:1024]), compiled_score(X[:1024])):
+        raise RuntimeError("Compiled engine disagrees with sklearn predict_proba")
+
+    print(
+        f"[LATENCY] {type(model).__name__}: {compiled.n_trees} trees, {compiled.n_nodes} nodes, "
+        f"depth {compiled.max_depth}, {inference_engine.workers} inference workers"
+    )
+    print(f"{'batch':>6} | {'sklearn p50':>11} | {'sklearn p99':>11} | {'engine p50':>10} | {'engine p99':>10} | {'p50 gain':>8}")
+    print("-" * 72)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        for batch_size in batch_sizes:
+            # Enough batches for a p99, without spending minutes on sklearn's fixed overhead
+            repeats = max(20, min(200, 20000 // batch_size))
+            base = _per_event_latencies(sklearn_score, X, batch_size, repeats)
+            fast = _per_event_latencies(compiled_score, X, batch_size, repeats)
+            b50, b99 = np.percentile(base, [50, 99])
+            f50, f99 = np.percentile(fast, [50, 99])
+            print(
+                f"{batch_size:>6} | {b50:>9.1f}us | {b99:>9.1f}us | "
+                f"{f50:>8.1f}us | {f99:>8.1f}us | {b50 / f50:>7.1f}x"
+            )
+
+
 if __name__ == "__main__":
-    main()
+    if "--compare-engines" in sys.argv:
+        compare_engines()
+    else:
+        main()
@@ -1,64 +1,250 @@
-import mlflow
+"""
+Production model resolution for the scoring path.
+
+load_model() never talks to MLflow. It resolves, in order:
+
+    1. published the RandomForest the retraining pipeline last published
+                 as RF_MODEL_NAME (ml/model_publish.py)
+    2. snapshot  the last MLflow production version this host resolved,
+                 recorded in MODEL_SNAPSHOT_DIR/manifest.json and stored as an
+                 uncompressed joblib file loaded with mmap_mode="r"
+    3. file      the bundled registry .pkl
+
+Once a model is loaded, load_model() checks the published pointer (at most
+every PUBLISHED_MODEL_CHECK_S) and swaps in a newly published version, so a
+retraining job in the worker process reaches the scorer without a restart.
+
+A background refresher asks the MLflow registry for the current production
+version every MODEL_REFRESH_INTERVAL_S seconds. When the registry moves to a
+version this host has not resolved yet, the refresher loads it, writes a new
+snapshot + manifest and swaps the model in. Every swap fires the
+on_model_change callbacks.
+mlflow itself is only imported by the refresher, so importing the scoring
+service and starting the API do not pay for it or depend on the tracking
+server being reachable.
+
+readiness() reports whether a model is loaded and how it was resolved
+(served by /api/ready).
+"""
+
 import os
-import joblib
+import json
+import importlib
+import time
+import threading
+import warnings
+from datetime import datetime, timezone
 from pathlib import Path
-from ml.config.mlflow_env import TRACKING_URI, MODEL_NAME
+
+from ml.config.registry_settings import TRACKING_URI, MODEL_NAME, PROJECT_ROOT
+from ml.model_publish import PublishedModelWatcher, load_published
+
+# Imported on first registry lookup (see _mlflow)
+mlflow = None
+
+MODEL_SNAPSHOT_DIR = Path(os.getenv("MODEL_SNAPSHOT_DIR", os.path.join(PROJECT_ROOT, "ml_models", "snapshots")))
+MODEL_REFRESH_ENABLED = os.getenv("MODEL_REFRESH_ENABLED", "true").lower() == "true"
+MODEL_REFRESH_INTERVAL_S = float(os.getenv("MODEL_REFRESH_INTERVAL_S", "300"))
+
+LOCAL_MODEL_PATH = Path(PROJECT_ROOT) / "ml_models" / "registry" / "AttackClassifier_Enhanced_v1.0.0.pkl"
+MANIFEST_FILE = "manifest.json"
+# Published model name the retraining pipeline deploys the RandomForest under
+RF_MODEL_NAME = "attack_predictor"
 
 # Singleton instance
 _MODEL = None
+_MODEL_VERSION = None
+_MODEL_SOURCE = None
 _LOAD_ATTEMPTED = False
+_CHANGE_CALLBACKS = []
+# Last registry version swapped in or found in the manifest
+_REGISTRY_VERSION = None
+_PUBLISHED = PublishedModelWatcher(RF_MODEL_NAME)
+_PUBLISHED_LOCK = threading.Lock()
+
+_LOAD_LOCK = threading.RLock()
+_REFRESHER = None
+_WARM_START = None
+_REFRESH_STOP = threading.Event()
+_REFRESH_STATE = {"last_refresh": None, "last_error": None}
 
 
 def load_model():
     """
-    Loads the production model from MLflow or local artifacts.
+    Returns the production model (published, snapshot or bundled file), loading it on first call.
     Implements caching to avoid reloading on every request.
     """
     global _MODEL, _LOAD_ATTEMPTED
 
     if _MODEL is not None:
+        refresh_published()
         return _MODEL
 
-    if not _LOAD_ATTEMPTED:
-        print("[MODEL_LOADER] Initializing ML scoring engine...")
-        _LOAD_ATTEMPTED = True
+    with _LOAD_LOCK:
+        if _MODEL is not None:
+            return _MODEL
+
+        if not _LOAD_ATTEMPTED:
+            print("[MODEL_LOADER] Initializing ML scoring engine...")
+            _LOAD_ATTEMPTED = True
+
+        if _load_published() is None and _load_snapshot() is None:
+            _load_local()
+
+    start_refresher()
+    return _MODEL
+
+
+def refresh_model():
+    """
+    Ask the MLflow registry for the production version (falling back to the
+    latest None/Staging version). If it is not the loaded one, load it,
+    snapshot it and swap it in. Returns the current model.
+
+    A registry version this host already resolved (in the manifest) does not
+    replace a model published since, only a newer registry version does.
+    """
+    global _MODEL, _MODEL_SOURCE, _REGISTRY_VERSION
 
-    # 1. Try MLflow
     try:
-        mlflow.set_tracking_uri(TRACKING_URI)
-        client = mlflow.tracking.MlflowClient()
-
-        import warnings
-        with warnings.catch_warnings():
-            warnings.simplefilter("ignore", category=FutureWarning)
-            # Get latest production version
-            versions = client.get_latest_versions(MODEL_NAME, stages=["Production"])
-            if not versions:
-                # Fallback to None/Staging or just latest
-                versions = client.get_latest_versions(
-                    MODEL_NAME, stages=["None", "Staging"]
-                )
-
-        if versions:
-            latest_version = versions[0]
-            model_uri = f"models:/{MODEL_NAME}/{latest_version.version}"
-            print(f"[MODEL_LOADER] Loading from MLflow: {model_uri}")
-            _MODEL = mlflow.sklearn.load_model(model_uri)
-            return _MODEL
+        version = _resolve_registry_version()
+        if version is not None:
+            tag = f"mlflow:{MODEL_NAME}/{version}"
+            if tag != _MODEL_VERSION and tag != _REGISTRY_VERSION:
+                model_uri = f"models:/{MODEL_NAME}/{version}"
+                print(f"[MODEL_LOADER] Loading from MLflow: {model_uri}")
+                model = _mlflow().sklearn.load_model(model_uri)
+                _write_snapshot(model, tag)
+                with _LOAD_LOCK:
+                    _MODEL = model
+                    _MODEL_SOURCE = "mlflow"
+                    _REGISTRY_VERSION = tag
+                    _set_version(tag)
+        _REFRESH_STATE["last_error"] = None
+    except Exception as e:
+        # MLflow unreachable / registry empty: keep serving the current model
+        _REFRESH_STATE["last_error"] = str(e)
+    _REFRESH_STATE["last_refresh"] = datetime.now(timezone.utc).isoformat()
+    return _MODEL
 
-    except Exception:
-        # Silencing MLflow connection errors if they repeat
-        pass
 
-    # 2. Fallback to Local File (if MLflow fails)
-    # Correct path to the model registry (project root)
-    local_path = Path(__file__).parent.parent.parent / "ml_models" / "registry" / "AttackClassifier_Enhanced_v1.0.0.pkl"
-    if local_path.exists():
-        _MODEL = joblib.load(local_path)
-        print(f"[MODEL_LOADER] Successfully loaded production model: {local_path}")
-        return _MODEL
+def refresh_published(force=False):
+    """
+    Swap in a RandomForest published since the last check (rate-limited by
+    the watcher, so cheap on the scoring path). Returns True if the model changed.
+    """
+    global _MODEL, _MODEL_SOURCE
 
-    return None
+    # Scoring threads never wait on a load another thread is already doing
+    if not _PUBLISHED_LOCK.acquire(blocking=force):
+        return False
+    try:
+        update = _PUBLISHED.poll(force=force)
+    finally:
+        _PUBLISHED_LOCK.release()
+    if update is None:
+        return False
+    model, pointer = update
+    with _LOAD_LOCK:
+        _MODEL = model
+        _MODEL_SOURCE = "published"
+        _set_version(f"published:{RF_MODEL_NAME}/{pointer['version']}")
+    print(f"[MODEL_LOADER] Loaded published {RF_MODEL_NAME} version {pointer['version']}")
+    return True
+
+
+def start_refresher():
+    """
+    Start the background registry refresher (no-op if disabled or running).
+    """
+    global _REFRESHER
+
+    if not MODEL_REFRESH_ENABLED:
+        return
+    with _LOAD_LOCK:
+        if _REFRESHER is not None and _REFRESHER.is_alive():
+            return
+        _REFRESH_STOP.clear()
+        _REFRESHER = threading.Thread(target=_refresh_loop, name="model-refresher", daemon=True)
+        _REFRESHER.start()
+
+
+def stop_refresher(timeout=5.0):
+    _REFRESH_STOP.set()
+    refresher = _REFRESHER
+    if refresher is not None:
+        refresher.join(timeout)
+
+
+def warm_start():
+    """
+    Load the model in the background so API startup does not wait for it.
+    """
+    global _WARM_START
+
+    if _MODEL is None and (_WARM_START is None or not _WARM_START.is_alive()):
+        _WARM_START = threading.Thread(target=load_model, name="model-warm-start", daemon=True)
+        _WARM_START.start()
+
+
+def readiness():
+    """
+    Readiness probe: is a model loaded, and how was it resolved.
+    """
+    manifest = read_manifest()
+    return {
+        "ready": _MODEL is not None,
+        "model_version": _MODEL_VERSION,
+        "source": _MODEL_SOURCE,
+        "manifest_version": manifest.get("version") if manifest else None,
+        "published_version": _PUBLISHED.version,
+        "refresher_running": _REFRESHER is not None and _REFRESHER.is_alive(),
+        "last_refresh": _REFRESH_STATE["last_refresh"],
+        "last_refresh_error": _REFRESH_STATE["last_error"],
+    }
+
+
+def read_manifest():
+    """
+    The last resolved production version ({"version", "snapshot", "resolved_at"}), or None.
+    """
+    try:
+        with open(MODEL_SNAPSHOT_DIR / MANIFEST_FILE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def model_version():
+    """
+    Identifier of the loaded model (MLflow version or file + mtime), None before load.
+    """
+    return _MODEL_VERSION
+
+
+def version_of(model):
+    """
+    Version of ``model`` if it is the loaded model, else None (e.g. an injected model).
+    """
+    return _MODEL_VERSION if model is not None and model is _MODEL else None
+
+
+def on_model_change(callback):
+    """
+    Register ``callback(version)`` to run whenever a different model version is loaded
+    (e.g. to drop predictions cached for the previous model).
+    """
+    _CHANGE_CALLBACKS.append(callback)
+    return callback
+
+
+def reload_model():
+    """
+    Drop the cached model and load the current production version again.
+    """
+    global _MODEL
+    _MODEL = None
+    return load_model()
 
 
 def get_model():
@@ -66,3 +252,141 @@ def get_model():
     Public accessor for the model.
     """
     return load_model()
+
+
+# --------------------------------------------------
+# Internals
+# --------------------------------------------------
+
+
+def _mlflow():
+    global mlflow
+    if mlflow is None:
+        importlib.import_module("mlflow.sklearn")
+        mlflow = importlib.import_module("mlflow")
+    return mlflow
+
+
+def _resolve_registry_version():
+    mlflow_module = _mlflow()
+    mlflow_module.set_tracking_uri(TRACKING_URI)
+    client = mlflow_module.tracking.MlflowClient()
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=FutureWarning)
+        # Get latest production version
+        versions = client.get_latest_versions(MODEL_NAME, stages=["Production"])
+        if not versions:
+            # Fallback to None/Staging or just latest
+            versions = client.get_latest_versions(MODEL_NAME, stages=["None", "Staging"])
+
+    return versions[0].version if versions else None
+
+
+def _load_published():
+    global _MODEL, _MODEL_SOURCE, _REGISTRY_VERSION
+
+    loaded = load_published(RF_MODEL_NAME, _PUBLISHED.directory)
+    if loaded is None:
+        return None
+    _MODEL, pointer = loaded
+    # The hot-path check only swaps on versions after this one
+    _PUBLISHED.version = pointer["version"]
+    manifest = read_manifest()
+    _REGISTRY_VERSION = manifest.get("version") if manifest else None
+    _MODEL_SOURCE = "published"
+    _set_version(f"published:{RF_MODEL_NAME}/{pointer['version']}")
+    print(f"[MODEL_LOADER] Loaded published {RF_MODEL_NAME} version {pointer['version']}")
+    return _MODEL
+
+
+def _load_snapshot():
+    global _MODEL, _MODEL_SOURCE, _REGISTRY_VERSION
+
+    manifest = read_manifest()
+    if not manifest:
+        return None
+    path = MODEL_SNAPSHOT_DIR / manifest.get("snapshot", "")
+    if not path.is_file():
+        return None
+    try:
+        import joblib
+
+        _MODEL = joblib.load(path, mmap_mode="r")
+    except Exception as e:
+        print(f"[MODEL_LOADER] Snapshot {path.name} unreadable, ignoring: {e}")
+        return None
+    _MODEL_SOURCE = "snapshot"
+    _REGISTRY_VERSION = manifest["version"]
+    _set_version(manifest["version"])
+    print(f"[MODEL_LOADER] Loaded snapshot of {manifest['version']}: {path}")
+    return _MODEL
+
+
+def _load_local():
+    global _MODEL, _MODEL_SOURCE
+
+    if not LOCAL_MODEL_PATH.exists():
+        return None
+    import joblib
+
+    _MODEL = joblib.load(LOCAL_MODEL_PATH)
+    _MODEL_SOURCE = "file"
+    _set_version(f"file:{LOCAL_MODEL_PATH.name}@{int(LOCAL_MODEL_PATH.stat().st_mtime)}")
+    print(f"[MODEL_LOADER] Successfully loaded production model: {LOCAL_MODEL_PATH}")
+    return _MODEL
+
+
+def _write_snapshot(model, version):
+    """
+    Persist ``model`` uncompressed (mmap-able) and point the manifest at it.
+    Both files are written to a temp name and renamed, so readers never see a
+    partial snapshot. Failure only costs the warm start, not the swap.
+    """
+    import joblib
+
+    name = version.split(":", 1)[-1].replace("/", "-").replace("@", "-") + ".joblib"
+    try:
+        MODEL_SNAPSHOT_DIR.mkdir(parents=True, exist_ok=True)
+        tmp = MODEL_SNAPSHOT_DIR / f".{name}.tmp"
+        joblib.dump(model, tmp)
+        os.replace(tmp, MODEL_SNAPSHOT_DIR / name)
+
+        manifest = {
+            "version": version,
+            "snapshot": name,
+            "resolved_at": datetime.now(timezone.utc).isoformat(),
+        }
+        tmp = MODEL_SNAPSHOT_DIR / f".{MANIFEST_FILE}.tmp"
+        tmp.write_text(json.dumps(manifest, indent=2))
+        os.replace(tmp, MODEL_SNAPSHOT_DIR / MANIFEST_FILE)
+    except Exception as e:
+        print(f"[MODEL_LOADER] Could not write model snapshot: {e}")
+        return
+
+    for old in MODEL_SNAPSHOT_DIR.glob("*.joblib"):
+        if old.name != name:
+            try:
+                old.unlink()
+            except OSError:
+                # Still mapped by another process (Windows); next refresh retries
+                pass
+
+
+def _refresh_loop():
+    while not _REFRESH_STOP.is_set():
+        started = time.monotonic()
+        refresh_model()
+        _REFRESH_STOP.wait(max(1.0, MODEL_REFRESH_INTERVAL_S - (time.monotonic() - started)))
+
+
+def _set_version(version):
+    global _MODEL_VERSION
+    previous, _MODEL_VERSION = _MODEL_VERSION, version
+    if previous is not None and previous != version:
+        print(f"[MODEL_LOADER] Model changed: {previous} -> {version}")
+        for callback in list(_CHANGE_CALLBACKS):
+            try:
+                callback(version)
+            except Exception as e:
+                print(f"[MODEL_LOADER] Model change callback failed: {e}")
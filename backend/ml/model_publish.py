@@ -0,0 +1,158 @@
+"""
+PhantomNet Model Publishing
+===========================
+
+Hand-off of freshly trained models from training workers to the scoring
+path, across processes.
+
+publish_model() writes the model as a new versioned artifact and then
+swaps the model's pointer file to it:
+
+    PUBLISHED_MODELS_DIR/
+        iforest_baseline.json                       pointer (current version)
+        iforest_baseline/20261018T101500_3f2a.joblib
+        iforest_baseline/20261017T101500_9c41.joblib
+
+Both files are written to a temp name and renamed, so a reader sees either
+the previous pointer or the new one, and the artifact a pointer names is
+always complete. The last PUBLISHED_KEEP_VERSIONS artifacts are kept, so a
+scorer that read the previous pointer can still load its artifact.
+
+Scorers hold a PublishedModelWatcher and call poll() on their hot path: at
+most once every PUBLISHED_MODEL_CHECK_S seconds it stats the pointer, and
+only when the pointer changed does it read it and load the new artifact
+(uncompressed joblib, loaded with mmap_mode="r").
+
+Usage:
+    from ml.model_publish import publish_model, PublishedModelWatcher
+
+    pointer = publish_model("iforest_baseline", model, trained_rows=50000)
+
+    watcher = PublishedModelWatcher("iforest_baseline")
+    update = watcher.poll()           # (model, pointer) or None
+"""
+
+import os
+import json
+import time
+import uuid
+import logging
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Optional, Tuple
+
+from ml.config.registry_settings import PROJECT_ROOT
+
+logger = logging.getLogger("model_publish")
+
+PUBLISHED_MODELS_DIR = Path(
+    os.getenv("PUBLISHED_MODELS_DIR", os.path.join(PROJECT_ROOT, "ml_models", "published"))
+)
+PUBLISHED_MODEL_CHECK_S = float(os.getenv("PUBLISHED_MODEL_CHECK_S", "5"))
+PUBLISHED_KEEP_VERSIONS = 3
+
+
+def pointer_path(name: str, directory: Optional[Path] = None) -> Path:
+    return Path(directory or PUBLISHED_MODELS_DIR) / f"{name}.json"
+
+
+def publish_model(name: str, model: Any, directory: Optional[Path] = None, **metadata) -> dict:
+    """
+    Write ``model`` as a new version of ``name`` and point ``name.json`` at
+    it. Returns the pointer (version, artifact, published_at + ``metadata``).
+    """
+    import joblib
+
+    directory = Path(directory or PUBLISHED_MODELS_DIR)
+    artifacts = directory / name
+    artifacts.mkdir(parents=True, exist_ok=True)
+
+    now = datetime.now(timezone.utc)
+    version = f"{now:%Y%m%dT%H%M%S}_{uuid.uuid4().hex[:4]}"
+    artifact = artifacts / f"{version}.joblib"
+    tmp = artifacts / f".{artifact.name}.tmp"
+    joblib.dump(model, tmp)
+    os.replace(tmp, artifact)
+
+    pointer = {
+        "name": name,
+        "version": version,
+        "artifact": f"{name}/{artifact.name}",
+        "published_at": now.isoformat(),
+        **metadata,
+    }
+    tmp = directory / f".{name}.json.tmp"
+    tmp.write_text(json.dumps(pointer, indent=2, default=str))
+    os.replace(tmp, pointer_path(name, directory))
+    logger.info("Published %s version %s", name, version)
+
+    # Keep the new artifact and the most recent ones before it
+    older = sorted(
+        (path for path in artifacts.glob("*.joblib") if path != artifact),
+        key=lambda path: path.stat().st_mtime_ns,
+    )
+    for old in older[: max(0, len(older) - (PUBLISHED_KEEP_VERSIONS - 1))]:
+        try:
+            old.unlink()
+        except OSError:
+            # Still mapped by another process (Windows); the next publish retries
+            pass
+    return pointer
+
+
+def read_pointer(name: str, directory: Optional[Path] = None) -> Optional[dict]:
+    try:
+        return json.loads(pointer_path(name, directory).read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def load_published(name: str, directory: Optional[Path] = None) -> Optional[Tuple[Any, dict]]:
+    """The current version of ``name`` as (model, pointer), or None if nothing is published."""
+    import joblib
+
+    pointer = read_pointer(name, directory)
+    if not pointer:
+        return None
+    path = Path(directory or PUBLISHED_MODELS_DIR) / pointer["artifact"]
+    try:
+        return joblib.load(path, mmap_mode="r"), pointer
+    except Exception as e:
+        logger.error("Published %s version %s unreadable: %s", name, pointer.get("version"), e)
+        return None
+
+
+class PublishedModelWatcher:
+    """Cheap, rate-limited check for new versions of one published model."""
+
+    def __init__(self, name: str, directory: Optional[Path] = None, interval_s: float = PUBLISHED_MODEL_CHECK_S):
+        self.name = name
+        self.directory = directory
+        self.interval_s = interval_s
+        self.version = None
+        self._stamp = None
+        self._last_check = None
+
+    def poll(self, force: bool = False) -> Optional[Tuple[Any, dict]]:
+        """(model, pointer) when a version other than the last one returned is published, else None."""
+        now = time.monotonic()
+        if not force and self._last_check is not None and now - self._last_check < self.interval_s:
+            return None
+        self._last_check = now
+
+        try:
+            stat = pointer_path(self.name, self.directory).stat()
+        except OSError:
+            return None
+        stamp = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        if stamp == self._stamp:
+            return None
+
+        loaded = load_published(self.name, self.directory)
+        if loaded is None:
+            return None
+        self._stamp = stamp
+        if loaded[1].get("version") == self.version:
+            return None
+        self.version = loaded[1].get("version")
+        return loaded
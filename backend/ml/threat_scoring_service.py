@@ -1,28 +1,40 @@
+import os
 import pandas as pd
 import logging
 import hashlib
-import json
+import pickle
+import struct
+import uuid
+import weakref
 import redis
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
 from schemas.threat_schema import ThreatInput, ThreatResponse
 import ml.model_loader as model_loader
 from ml.feature_extractor import FeatureExtractor
-from typing import List
-import time
+from ml.feature_store import feature_store
+from ml.inference_engine import inference_engine
+from services.memory_cache import ShardedTTLCache
+from typing import List, Optional
+from datetime import datetime
+import numpy as np
 
 # Setup Logger
 logger = logging.getLogger(__name__)
 
-# Singleton Feature Extractor to maintain state (e.g. rolling windows)
+# Per-IP feature state (e.g. rolling windows) is owned by the shared feature
+# store so scoring, anomaly detection and clustering see the same history.
 # In a real distributed system, state should be in Redis/KeyDB.
 # For now, in-memory is acceptable per specs.
-_FEATURE_EXTRACTOR = FeatureExtractor()
+_FEATURE_EXTRACTOR = feature_store.extractor
 
 try:
     redis_client = redis.Redis(
         host="localhost",
         port=6379,
         db=0,
-        decode_responses=True,
         socket_connect_timeout=1.0,
         socket_timeout=1.0,
     )
@@ -33,8 +45,186 @@ except Exception as e:
     REDIS_AVAILABLE = False
     logger.info("Redis not available. Using local in-memory prediction cache.")
 
-# Local memory cache fallback
-_LOCAL_PRED_CACHE = {}
+# Local memory cache fallback (bounded LRU, 1 hour TTL, ~300 bytes per entry)
+PRED_CACHE_MAX_BYTES = int(os.getenv("PRED_CACHE_MAX_BYTES", 32 * 1024 * 1024))
+_LOCAL_PRED_CACHE = ShardedTTLCache(
+    "predictions", max_entries=100000, default_ttl=3600, max_bytes=PRED_CACHE_MAX_BYTES
+)
+PRED_CACHE_TTL = 3600
+
+# Predictions are cached on the *quantized feature vector* plus the model
+# version (or content hash), not on the raw input: per-IP features (event_rate, burst_rate,
+# ...) change with every event, so features are always extracted (state
+# is updated on hits too) and a rising rate produces a new key instead of
+# replaying a stale score. Cached values are the raw model output (score,
+# confidence); level and decision are mapped per input because they depend
+# on context (reputation, honeypot type, time of day).
+#
+# Each feature is quantized on its own scale: categorical features exactly,
+# bounded ratios/scores in fixed steps, counts and rates in log buckets
+# (PRED_CACHE_LOG_BUCKETS per doubling). Features that keep growing for as
+# long as an IP is active (session duration, the per-minute rate while the
+# window fills, the deviation from a drifting mean) use coarse log buckets
+# (PRED_CACHE_COARSE_LOG_BUCKETS per doubling): the model sees them, so they
+# must be in the key, but repeated identical traffic still reuses a key
+# until the value doubles.
+PRED_CACHE_PREFIX = b"pred_cache:v5:"
+PRED_CACHE_LOG_BUCKETS = 4
+PRED_CACHE_COARSE_LOG_BUCKETS = 1
+PRED_CACHE_QUANTIZATION = {
+    "packet_length": 1.0,
+    "protocol_encoding": 1.0,
+    "source_ip_event_rate": "coarse_log",
+    "destination_port_class": 1.0,
+    "threat_score": 0.01,
+    "malicious_flag_ratio": 0.01,
+    "attack_type_frequency": "log",
+    "time_of_day_deviation": 1.0,
+    "burst_rate": "log",
+    "packet_size_variance": "log",
+    "honeypot_interaction_count": "log",
+    "session_duration_estimate": "coarse_log",
+    "unique_destination_count": "log",
+    "rolling_average_deviation": "coarse_log",
+    "z_score_anomaly": 0.25,
+}
+_LOG_SCALES = {"log": PRED_CACHE_LOG_BUCKETS, "coarse_log": PRED_CACHE_COARSE_LOG_BUCKETS}
+_KEY_COLUMNS = [
+    FeatureExtractor.FEATURE_NAMES.index(name) for name in PRED_CACHE_QUANTIZATION
+]
+_KEY_STEPS = np.array(
+    [np.nan if step in _LOG_SCALES else step for step in PRED_CACHE_QUANTIZATION.values()], dtype=np.float64
+)
+_KEY_LOG_BUCKETS = np.array(
+    [_LOG_SCALES.get(step, 0) if isinstance(step, str) else 0 for step in PRED_CACHE_QUANTIZATION.values()],
+    dtype=np.float64,
+)
+_KEY_LOG = _KEY_LOG_BUCKETS > 0
+_PACKED_PREDICTION = struct.Struct("<dd")
+
+# Tags of unversioned models, computed once per model object
+_MODEL_TAGS = weakref.WeakKeyDictionary()
+# Tags of models that cannot be hashed by content: process-local, never sent to Redis
+LOCAL_MODEL_TAG_PREFIX = "local-"
+
+
+def model_cache_tag(model) -> str:
+    """
+    Model part of the cache key: the registry version, else a hash of the
+    pickled model (the same in every worker), else a process-local token.
+    """
+    version = model_loader.version_of(model)
+    if version:
+        return version
+    try:
+        return _MODEL_TAGS[model]
+    except (KeyError, TypeError):
+        pass
+    try:
+        digest = hashlib.blake2b(pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL), digest_size=8)
+        tag = f"obj-{digest.hexdigest()}"
+    except Exception:
+        tag = f"{LOCAL_MODEL_TAG_PREFIX}{uuid.uuid4().hex}"
+    try:
+        _MODEL_TAGS[model] = tag
+    except TypeError:
+        pass
+    return tag
+
+
+def feature_cache_keys(matrix: np.ndarray, model_tag: str) -> List[tuple]:
+    """Local cache keys (model tag, quantized vector bytes), one per row (see PRED_CACHE_QUANTIZATION)."""
+    values = np.nan_to_num(np.asarray(matrix, dtype=np.float64)[:, _KEY_COLUMNS])
+    buckets = np.where(
+        _KEY_LOG,
+        np.sign(values) * np.floor(np.log2(1.0 + np.abs(values)) * _KEY_LOG_BUCKETS),
+        np.rint(values / np.where(_KEY_LOG, 1.0, _KEY_STEPS)),
+    )
+    quantized = buckets.astype("<i8")
+    return [(model_tag, row.tobytes()) for row in quantized]
+
+
+def redis_cache_key(key: tuple) -> bytes:
+    """Redis key for a local cache key: prefix + model tag + 128-bit xxh3 (blake2b without xxhash)."""
+    model_tag, vector = key
+    if xxhash is not None:
+        digest = xxhash.xxh3_128_digest(vector)
+    else:
+        digest = hashlib.blake2b(vector, digest_size=16).digest()
+    return PRED_CACHE_PREFIX + model_tag.encode() + b":" + digest
+
+
+def pack_prediction(score: float, confidence: float) -> bytes:
+    return _PACKED_PREDICTION.pack(score, confidence)
+
+
+def unpack_prediction(data: bytes) -> Optional[tuple]:
+    """(score, confidence) from a cached value, None for entries in an unknown format."""
+    try:
+        return _PACKED_PREDICTION.unpack(data)
+    except (struct.error, TypeError):
+        return None
+
+
+def _get_cached_predictions(keys: List[tuple]) -> List[Optional[tuple]]:
+    """Cached (score, confidence) for ``keys`` (None where missing)."""
+    if _shared(keys[0]):
+        try:
+            values = redis_client.mget([redis_cache_key(key) for key in keys])
+        except Exception as e:
+            logger.warning(f"Batch cache read failed: {e}")
+            return [None] * len(keys)
+    else:
+        values = [_LOCAL_PRED_CACHE.get(key) for key in keys]
+    return [unpack_prediction(value) if value else None for value in values]
+
+
+def _cache_predictions(entries: dict) -> None:
+    """Store {cache key: (score, confidence)} in Redis or the local cache."""
+    if not entries:
+        return
+    if _shared(next(iter(entries))):
+        try:
+            pipe = redis_client.pipeline(transaction=False)
+            for key, (score, confidence) in entries.items():
+                pipe.setex(redis_cache_key(key), PRED_CACHE_TTL, pack_prediction(score, confidence))
+            pipe.execute()
+        except Exception as e:
+            logger.debug(f"Failed to cache predictions: {e}")
+    else:
+        for key, (score, confidence) in entries.items():
+            _LOCAL_PRED_CACHE.set(key, pack_prediction(score, confidence))
+
+
+def _shared(key: tuple) -> bool:
+    """True when ``key`` goes to Redis (all keys of one call share the model tag)."""
+    return REDIS_AVAILABLE and not key[0].startswith(LOCAL_MODEL_TAG_PREFIX)
+
+
+@model_loader.on_model_change
+def _invalidate_prediction_cache(version) -> None:
+    """Predictions of the previous model must not be served (Redis keys carry the version)."""
+    _LOCAL_PRED_CACHE.clear()
+    logger.info(f"Prediction cache cleared for model {version}")
+
+
+def _build_response(score: float, confidence: float, context: ThreatInput) -> ThreatResponse:
+    return ThreatResponse(
+        score=round(score, 2),
+        threat_level=map_score_to_level(score, context),
+        confidence=round(confidence, 2),
+        decision=map_score_to_decision(score),
+    )
+
+
+def _parse_hour_timestamp(value: str) -> datetime:
+    # ISO 8601 covers what the pipeline emits; dateutil handles anything else
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        from dateutil import parser
+        return parser.parse(value)
+
 
 def map_score_to_level(score: float, context: ThreatInput = None) -> str:
     """
@@ -56,8 +246,7 @@ def map_score_to_level(score: float, context: ThreatInput = None) -> str:
         # Contextual adjustment: more sensitive at night (00:00 - 05:00 UTC)
         if context.timestamp:
             try:
-                from dateutil import parser
-                dt = parser.parse(context.timestamp)
+                dt = _parse_hour_timestamp(context.timestamp)
                 if 0 <= dt.hour <= 5:
                     medium_max -= 0.10
                     high_max -= 0.10
@@ -98,34 +287,6 @@ def map_score_to_decision(score: float) -> str:
 def score_threat(input_data: ThreatInput) -> ThreatResponse:
     """ """
 
-    # Check Prediction Cache first
-    if REDIS_AVAILABLE:
-        # Generate a deterministic hash for the raw event
-        event_str = json.dumps(
-            input_data.model_dump(exclude={"timestamp"}), sort_keys=True
-        )
-        event_hash = "pred_cache:" + hashlib.md5(event_str.encode()).hexdigest()
-
-        cached_result = redis_client.get(event_hash)
-        if cached_result:
-            try:
-                data = json.loads(cached_result)
-                return ThreatResponse(**data)
-            except Exception as e:
-                logger.debug(f"Cache parse error: {e}")
-    else:
-        # Local Cache Check
-        event_str = json.dumps(
-            input_data.model_dump(exclude={"timestamp"}), sort_keys=True
-        )
-        event_hash = "pred_cache:" + hashlib.md5(event_str.encode()).hexdigest()
-        if event_hash in _LOCAL_PRED_CACHE:
-            entry = _LOCAL_PRED_CACHE[event_hash]
-            if time.time() < entry['exp']:
-                return ThreatResponse(**json.loads(entry['data']))
-            else:
-                del _LOCAL_PRED_CACHE[event_hash]
-
     model = model_loader.load_model()
 
     if not model:
@@ -140,20 +301,34 @@ def score_threat(input_data: ThreatInput) -> ThreatResponse:
     event = input_data.model_dump()
 
     # 2. Extract Features
-    # This updates internal state of _FEATURE_EXTRACTOR
+    # This updates internal state of _FEATURE_EXTRACTOR (on cache hits too)
     features_dict = _FEATURE_EXTRACTOR.extract_features(event)
 
     # Ensure correct column order matching FeatureExtractor.FEATURE_NAMES
-    # Convert to DataFrame (sklearn models usually expect 2D array or DF)
-    feature_vector = pd.DataFrame(
-        [features_dict], columns=FeatureExtractor.FEATURE_NAMES
+    matrix = np.array(
+        [[features_dict.get(name, np.nan) for name in FeatureExtractor.FEATURE_NAMES]], dtype=np.float64
     )
 
+    # Check Prediction Cache (keyed on the features, not the raw input)
+    cache_key = feature_cache_keys(matrix, model_cache_tag(model))[0]
+    cached = _get_cached_predictions([cache_key])[0]
+    if cached is not None:
+        return _build_response(cached[0], cached[1], input_data)
+
     # 3. Predict
     # predict_proba returns [prob_benign, prob_malicious]
     try:
+        compiled = inference_engine.compile(model)
+        # Tree ensembles: flat node arrays on the inference pool, no DataFrame
+        if compiled is not None:
+            probabilities = inference_engine.predict_proba(compiled, matrix)
+            score = probabilities[0][1]
+            confidence = max(probabilities[0])
+
         # Check for predict_proba (Standard Classifiers)
-        if hasattr(model, "predict_proba"):
+        elif hasattr(model, "predict_proba"):
+            # Convert to DataFrame (sklearn models usually expect 2D array or DF)
+            feature_vector = pd.DataFrame(matrix, columns=FeatureExtractor.FEATURE_NAMES)
             probabilities = model.predict_proba(feature_vector)
             malicious_prob = probabilities[0][1]
             score = malicious_prob # 0.0 - 1.0
@@ -161,8 +336,7 @@ def score_threat(input_data: ThreatInput) -> ThreatResponse:
 
         # Check for Isolation Forest / One-Class SVM (predict returns -1 for anomaly)
         elif hasattr(model, "predict"):
-            # Use .values to strip feature names and avoid sklearn warning
-            pred = model.predict(feature_vector.values)[0]
+            pred = model.predict(matrix)[0]
             # IsolationForest: -1 = Anomaly, 1 = Normal
             if pred == -1:
                 score = 0.85  # High threat (generic for anomaly)
@@ -181,143 +355,103 @@ def score_threat(input_data: ThreatInput) -> ThreatResponse:
         )
 
     # 4. Construct Response
-    response = ThreatResponse(
-        score=round(score, 2),
-        threat_level=map_score_to_level(score, input_data),
-        confidence=round(confidence, 2), 
-        decision=map_score_to_decision(score)
-    )
-
-    if REDIS_AVAILABLE:
-        try:
-            redis_client.setex(event_hash, 3600, response.model_dump_json())  # 1h TTL
-        except Exception as e:
-            logger.debug(f"Failed to cache prediction: {e}")
-    else:
-        _LOCAL_PRED_CACHE[event_hash] = {
-            'data': response.model_dump_json(),
-            'exp': time.time() + 3600
-        }
-
-    return response
+    _cache_predictions({cache_key: (float(score), float(confidence))})
+    return _build_response(score, confidence, input_data)
 
 
-def score_threat_batch(inputs: List[ThreatInput]) -> List[ThreatResponse]:
+def score_threat_batch(
+    inputs: List[ThreatInput], features: Optional[np.ndarray] = None
+) -> List[ThreatResponse]:
     """
     Scores a batch of threats using vectorized operations where possible,
     drastically reducing model inference overhead compared to loops.
+
+    ``features`` optionally carries precomputed feature vectors (row-aligned
+    with ``inputs``, e.g. from the feature store) so they are not extracted
+    a second time. Otherwise every input is extracted, cached or not, so the
+    per-IP feature state sees every event.
     """
     if not inputs:
         return []
 
-    responses = [None] * len(inputs)
-    uncached_indices = []
-    uncached_events = []
-
-    # 1. Check Cache
-    hashes = []
-    if REDIS_AVAILABLE:
-        for i, inp in enumerate(inputs):
-            event_str = json.dumps(
-                inp.model_dump(exclude={"timestamp"}), sort_keys=True
-            )
-            hashes.append("pred_cache:" + hashlib.md5(event_str.encode()).hexdigest())
-
-        try:
-            cached_results = redis_client.mget(hashes)
-            for i, result in enumerate(cached_results):
-                if result:
-                    responses[i] = ThreatResponse(**json.loads(result))
-                else:
-                    uncached_indices.append(i)
-                    uncached_events.append(inputs[i].model_dump())
-        except Exception as e:
-            logger.warning(f"Batch cache read failed: {e}")
-            uncached_indices = list(range(len(inputs)))
-            uncached_events = [inp.model_dump() for inp in inputs]
-    else:
-        for i, inp in enumerate(inputs):
-            event_str = json.dumps(inp.model_dump(exclude={"timestamp"}), sort_keys=True)
-            h = "pred_cache:" + hashlib.md5(event_str.encode()).hexdigest()
-            hashes.append(h)
-            if h in _LOCAL_PRED_CACHE and time.time() < _LOCAL_PRED_CACHE[h]['exp']:
-                responses[i] = ThreatResponse(**json.loads(_LOCAL_PRED_CACHE[h]['data']))
-            else:
-                uncached_indices.append(i)
-                uncached_events.append(inp.model_dump())
-
-    if not uncached_indices:
-        return responses
-
-    # 2. Extract Features (Batch)
     model = model_loader.load_model()
     if not model:
         default_resp = ThreatResponse(
             score=0.0, threat_level="LOW", confidence=0.0, decision="ALLOW"
         )
-        for i in uncached_indices:
-            responses[i] = default_resp
-        return responses
+        return [default_resp] * len(inputs)
 
-    features_list = [_FEATURE_EXTRACTOR.extract_features(ev) for ev in uncached_events]
-    feature_matrix = pd.DataFrame(features_list, columns=FeatureExtractor.FEATURE_NAMES)
+    # 1. Extract Features (Batch)
+    if features is not None:
+        matrix = np.asarray(features, dtype=np.float64)
+    else:
+        matrix = _FEATURE_EXTRACTOR.extract_batch(
+            pd.DataFrame.from_records([inp.model_dump() for inp in inputs])
+        )
 
-    # 3. Predict Batch
-    try:
-        if hasattr(model, "predict_proba"):
-            probabilities = model.predict_proba(feature_matrix)
-            malicious_probs = [p[1] for p in probabilities]
-            confidences = [max(p) for p in probabilities]
-            scores = [p for p in malicious_probs] # 0.0 - 1.0
+    # 2. Check Cache
+    keys = feature_cache_keys(matrix, model_cache_tag(model))
+    predictions = _get_cached_predictions(keys)
+    missing = [i for i, cached in enumerate(predictions) if cached is None]
+    # Rows that share a key (repeated traffic within the batch) are predicted once
+    first_of_key = {}
+    for i in missing:
+        first_of_key.setdefault(keys[i], i)
+    uncached_indices = list(first_of_key.values())
 
-        elif hasattr(model, "predict"):
-            preds = model.predict(feature_matrix.values)
-            scores = [0.85 if p == -1 else 0.10 for p in preds]
-            confidences = [0.85 if p == -1 else 0.90 for p in preds]
-        else:
-            raise AttributeError("Model has neither predict_proba nor predict")
+    if uncached_indices:
+        uncached_matrix = matrix[uncached_indices]
 
-    except Exception as e:
-        logger.error(f"Batch prediction failed: {e}")
-        default_resp = ThreatResponse(
-            score=0.0, threat_level="LOW", confidence=0.0, decision="ERROR"
-        )
-        for i in uncached_indices:
-            responses[i] = default_resp
-        return responses
-
-    # 4. Construct Responses and Cache
-    cache_inserts = {}
-    for idx, i in enumerate(uncached_indices):
-        if idx >= len(scores):
-            print(f"CRITICAL INDEX ERROR: idx={idx}, len(scores)={len(scores)}, len(uncached_indices)={len(uncached_indices)}")
-            score = 0.0
-            confidences.append(0.0) # pad if needed
-        else:
-            score = scores[idx]
-            
-        resp = ThreatResponse(
-            score=round(score, 2),
-            threat_level=map_score_to_level(score, inputs[i]),
-            confidence=round(confidences[idx], 2),
-            decision=map_score_to_decision(score),
-        )
-        responses[i] = resp
-        if REDIS_AVAILABLE:
-            cache_inserts[hashes[i]] = resp.model_dump_json()
-
-    if REDIS_AVAILABLE and cache_inserts:
+        # 3. Predict Batch
         try:
-            # Atomic multi-set, rely on single TTL loop setting since redis MSET doesn't take TTL easily
-            # We use a pipeline for TTL
-            pipe = redis_client.pipeline()
-            for key, val in cache_inserts.items():
-                pipe.setex(key, 3600, val)
-            pipe.execute()
-        except Exception as e:
-            logger.debug(f"Failed to multi-cache predictions: {e}")
-    elif cache_inserts:
-        for k, v in cache_inserts.items():
-            _LOCAL_PRED_CACHE[k] = {'data': v, 'exp': time.time() + 3600}
+            compiled = inference_engine.compile(model)
+            if compiled is not None:
+                probabilities = inference_engine.predict_proba(compiled, uncached_matrix)
+                scores = probabilities[:, 1].tolist()
+                confidences = probabilities.max(axis=1).tolist()
+
+            elif hasattr(model, "predict_proba"):
+                feature_matrix = pd.DataFrame(
+                    uncached_matrix, columns=FeatureExtractor.FEATURE_NAMES
+                )
+                probabilities = model.predict_proba(feature_matrix)
+                malicious_probs = [p[1] for p in probabilities]
+                confidences = [max(p) for p in probabilities]
+                scores = [p for p in malicious_probs] # 0.0 - 1.0
+
+            elif hasattr(model, "predict"):
+                preds = model.predict(uncached_matrix)
+                scores = [0.85 if p == -1 else 0.10 for p in preds]
+                confidences = [0.85 if p == -1 else 0.90 for p in preds]
+            else:
+                raise AttributeError("Model has neither predict_proba nor predict")
 
-    return responses
+        except Exception as e:
+            logger.error(f"Batch prediction failed: {e}")
+            default_resp = ThreatResponse(
+                score=0.0, threat_level="LOW", confidence=0.0, decision="ERROR"
+            )
+            return [
+                default_resp if cached is None else _build_response(cached[0], cached[1], inputs[i])
+                for i, cached in enumerate(predictions)
+            ]
+
+        cache_inserts = {}
+        for idx, i in enumerate(uncached_indices):
+            if idx >= len(scores):
+                print(f"CRITICAL INDEX ERROR: idx={idx}, len(scores)={len(scores)}, len(uncached_indices)={len(uncached_indices)}")
+                predictions[i] = (0.0, 0.0)
+                continue
+            predictions[i] = (float(scores[idx]), float(confidences[idx]))
+            cache_inserts[keys[i]] = predictions[i]
+        for i in missing:
+            if predictions[i] is None:
+                predictions[i] = cache_inserts.get(keys[i], (0.0, 0.0))
+
+        _cache_predictions(cache_inserts)
+
+    # 4. Construct Responses
+    return [
+        _build_response(score, confidence, inputs[i])
+        for i, (score, confidence) in enumerate(predictions)
+    ]
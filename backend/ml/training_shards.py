@@ -0,0 +1,150 @@
+"""
+PhantomNet Training Shards
+==========================
+
+On-disk (X, y) shards for training jobs whose input does not fit in memory.
+
+A producer streams rows out of the database, turns each window into a
+feature matrix and appends it as one shard (two ``.npy`` files). Consumers
+iterate the shards memory-mapped, so at most one shard is resident:
+
+    shards = TrainingShards(os.path.join(work_dir, "train"))
+    for frame in iter_event_windows(db, fields, ...):
+        shards.append(features(frame), labels(frame))
+
+    fit_incremental(model, shards, classes=[0, 1])
+
+``fit_incremental`` trains an estimator shard by shard:
+
+    partial_fit   estimators that have it (SGD, naive Bayes, MiniBatchKMeans)
+    warm start    forests (``warm_start=True``): each shard grows new trees,
+                  earlier trees are kept
+
+Shards are scratch data: the job that writes them removes them with
+``clear()`` once the model is published.
+"""
+
+import glob
+import logging
+import math
+import os
+import shutil
+from typing import Iterable, Iterator, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger("training_shards")
+
+# Consecutive single-class shards merged before a forest refuses to grow on them
+MAX_MERGED_SHARDS = 4
+
+
+class TrainingShards:
+    """Append-only sequence of (X, y) shards stored as NPY pairs in a directory."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.files = [
+            (path, path[: -len("_X.npy")] + "_y.npy")
+            for path in sorted(glob.glob(os.path.join(directory, "shard_*_X.npy")))
+        ]
+        self.rows = sum(len(np.load(y_path, mmap_mode="r")) for _, y_path in self.files)
+
+    def __len__(self) -> int:
+        return len(self.files)
+
+    def append(self, X: np.ndarray, y: np.ndarray) -> None:
+        if not len(X):
+            return
+        stem = os.path.join(self.directory, f"shard_{len(self.files):05d}")
+        np.save(stem + "_X.npy", np.ascontiguousarray(X))
+        np.save(stem + "_y.npy", np.ascontiguousarray(y))
+        self.files.append((stem + "_X.npy", stem + "_y.npy"))
+        self.rows += len(X)
+
+    def __iter__(self) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        for x_path, y_path in self.files:
+            yield np.load(x_path, mmap_mode="r"), np.load(y_path)
+
+    def labels(self) -> np.ndarray:
+        """All labels (one small array per shard)."""
+        if not self.files:
+            return np.empty(0)
+        return np.concatenate([np.load(y_path) for _, y_path in self.files])
+
+    def batches(self, batch_size: int, seed: Optional[int] = None) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """One pass of mini-batches; with ``seed``, shard order and rows within a shard are shuffled."""
+        rng = np.random.default_rng(seed) if seed is not None else None
+        order = rng.permutation(len(self.files)) if rng is not None else range(len(self.files))
+        for i in order:
+            x_path, y_path = self.files[i]
+            X, y = np.load(x_path, mmap_mode="r"), np.load(y_path)
+            rows = rng.permutation(len(y)) if rng is not None else np.arange(len(y))
+            for start in range(0, len(rows), batch_size):
+                index = np.sort(rows[start : start + batch_size])
+                yield np.asarray(X[index]), y[index]
+
+    def clear(self) -> None:
+        shutil.rmtree(self.directory, ignore_errors=True)
+        os.makedirs(self.directory, exist_ok=True)
+        self.files = []
+        self.rows = 0
+
+
+def fit_incremental(
+    model,
+    shards: Iterable[Tuple[np.ndarray, np.ndarray]],
+    classes: Sequence,
+    n_shards: Optional[int] = None,
+):
+    """
+    Fit ``model`` one shard at a time and return it.
+
+    Forests get ``ceil(n_estimators / n_shards)`` new trees per shard (at
+    least one), on top of any trees a fitted forest already has. A
+    forest's trees must agree on the class set, so shards missing a class
+    are merged with the following ones (up to MAX_MERGED_SHARDS) and
+    skipped if still incomplete.
+    """
+    classes = np.asarray(classes)
+    if hasattr(model, "partial_fit"):
+        for X, y in shards:
+            model.partial_fit(np.asarray(X), y, classes=classes)
+        return model
+
+    if not hasattr(model, "warm_start"):
+        raise TypeError(f"{type(model).__name__} supports neither partial_fit nor warm_start")
+
+    n_shards = n_shards if n_shards is not None else len(shards)
+    trees_per_shard = max(1, math.ceil(model.n_estimators / max(1, n_shards)))
+    # Trees of an already fitted forest are kept and added to
+    trees = len(getattr(model, "estimators_", []))
+    model.set_params(warm_start=True)
+    pending = []
+    for X, y in shards:
+        pending.append((X, y))
+        labels = np.concatenate([part_y for _, part_y in pending])
+        if len(np.unique(labels)) < len(classes):
+            if len(pending) >= MAX_MERGED_SHARDS:
+                logger.warning("Skipping %d rows: %d shards without every class.", len(labels), len(pending))
+                pending = []
+            continue
+        features = np.concatenate([np.asarray(part_X) for part_X, _ in pending])
+        pending = []
+        trees += trees_per_shard
+        model.set_params(n_estimators=trees)
+        model.fit(features, labels)
+
+    if not trees:
+        raise ValueError("No shard contained every class; nothing to train on.")
+    return model
+
+
+def score_shards(model, shards: Iterable[Tuple[np.ndarray, np.ndarray]]) -> float:
+    """Accuracy of ``model`` over every shard, evaluated one shard at a time."""
+    correct = total = 0
+    for X, y in shards:
+        correct += int(np.sum(model.predict(np.asarray(X)) == y))
+        total += len(y)
+    return correct / total if total else 0.0
@@ -1,11 +1,18 @@
 """
 Campaign clustering service using DBSCAN.
 Groups related network events into attack campaigns.
+
+The window of elevated events is clustered incrementally: each call only
+loads the rows that entered the window since the previous call and drops
+the ones that left it, and IncrementalDBSCAN re-decides just the affected
+neighbourhoods. Campaign IDs are stable across calls, so a campaign that
+keeps growing keeps its ``campaign_id``.
 """
 import logging
-from typing import List, Dict, Any, Optional
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple
 
-import pandas as pd
 import numpy as np
 from sklearn.cluster import DBSCAN
 from sqlalchemy.orm import Session
@@ -13,15 +20,97 @@ from datetime import datetime, timedelta
 
 from database.database import SessionLocal
 from database.models import PacketLog
-from ml.feature_extractor import FeatureExtractor
+from database.projections import event_dtype, fetch_events
+from ml.feature_store import feature_store, VECTOR_FIELDS
+from ml_engine.incremental_dbscan import IncrementalDBSCAN
 
 logger = logging.getLogger("campaign_clustering")
 
+ELEVATED_LEVELS = ["MEDIUM", "HIGH", "CRITICAL"]
+
+# Rows fetched per IN (...) query (below SQLite's bound-parameter limit)
+FETCH_CHUNK = 900
+
+
+class _CampaignWindow:
+    """
+    Clustering state for one ``hours_back`` window.
+    """
+
+    def __init__(self, eps: float, min_samples: int) -> None:
+        self.engine = IncrementalDBSCAN(eps=eps, min_samples=min_samples)
+        # id -> (src_ip, dst_port, protocol, timestamp)
+        self.meta: Dict[int, Tuple[str, Optional[int], Optional[str], datetime]] = {}
+        self.summaries: Dict[int, Dict[str, Any]] = {}
+
+    def update(self, db: Session, cutoff: datetime) -> None:
+        in_window = dict(
+            db.query(PacketLog.id, PacketLog.timestamp)
+            .filter(
+                PacketLog.timestamp >= cutoff,
+                PacketLog.threat_level.in_(ELEVATED_LEVELS),
+            )
+            .all()
+        )
+        # Rows that left the window (or were replaced under the same id)
+        expired = [i for i, meta in self.meta.items() if in_window.get(i) != meta[3]]
+        new_ids = [i for i, ts in in_window.items() if i not in self.meta or self.meta[i][3] != ts]
+
+        chunks = [
+            fetch_events(db, VECTOR_FIELDS, PacketLog.id.in_(new_ids[start:start + FETCH_CHUNK]))
+            for start in range(0, len(new_ids), FETCH_CHUNK)
+        ]
+        events = np.concatenate(chunks) if chunks else np.empty(0, dtype=event_dtype(VECTOR_FIELDS))
+        # Reuse the vectors computed when these events were scored
+        vectors = feature_store.vectors_for_events(events) if len(events) else np.empty((0, 0))
+
+        for i in expired:
+            del self.meta[i]
+        timestamps = events["timestamp"].astype(object)  # back to datetime
+        self.meta.update(
+            zip(
+                events["id"].tolist(),
+                zip(events["src_ip"], events["dst_port"].tolist(), events["protocol"], timestamps),
+            )
+        )
+
+        changed = self.engine.update(vectors, events["id"], remove_ids=expired)
+        clusters = self.engine.clusters()
+        for label in changed:
+            if label in clusters:
+                self.summaries[label] = self._summarize(label, self.engine.ids[clusters[label]].tolist())
+            else:
+                self.summaries.pop(label, None)
+        logger.info(
+            "Campaign window: +%d / -%d events, %d re-clustered, %d campaigns changed.",
+            len(events), len(expired), self.engine.last_region_size, len(changed),
+        )
+
+    def _summarize(self, label: int, ids: List[int]) -> Dict[str, Any]:
+        rows = [self.meta[i] for i in ids]
+        start_time = min(row[3] for row in rows)
+        end_time = max(row[3] for row in rows)
+        return {
+            "campaign_id": f"campaign_{label}",
+            "cluster_id": label,
+            "unique_sources": sorted({row[0] for row in rows}),
+            "target_ports": sorted({row[1] for row in rows if row[1]}),
+            "protocols": sorted({row[2] for row in rows if row[2]}),
+            "event_count": len(rows),
+            "start_time": start_time.isoformat(),
+            "end_time": end_time.isoformat(),
+            "duration_seconds": (end_time - start_time).total_seconds(),
+        }
+
 
 class CampaignClusterer:
     """
     Handles DBSCAN-based clustering of network events to identify coordinated attack campaigns.
     """
+
+    # Windows (distinct hours_back values) kept warm at once
+    MAX_WINDOWS = 4
+
     def __init__(self) -> None:
         """
         Initializes the CampaignClusterer with DBSCAN model and feature extractor.
@@ -30,122 +119,66 @@ class CampaignClusterer:
         # eps is max distance between two samples for one to be considered as in the neighborhood of the other.
         # min_samples is the number of samples in a neighborhood for a point to be considered as a core point.
         self.model = DBSCAN(eps=0.5, min_samples=5, n_jobs=-1)
-        self.feature_extractor = FeatureExtractor()
+        self.feature_extractor = feature_store.extractor  # shared per-IP state
+        self._windows: "OrderedDict[int, _CampaignWindow]" = OrderedDict()
+        self._lock = threading.Lock()
 
     def identify_campaigns(self, hours_back: int = 24) -> Dict[str, Any]:
         """
-        Runs DBSCAN clustering across recent elevated threat logs to identify
-        coordinated multi-stage attacker campaigns.
+        Clusters recent elevated threat logs to identify coordinated
+        multi-stage attacker campaigns, updating the previous result for
+        the same ``hours_back`` in place.
         """
         logger.info("Extracting attack groups from last %d hours.", hours_back)
         db: Session = SessionLocal()
-        try:
-            cutoff = datetime.utcnow() - timedelta(hours=hours_back)
-
-            # Target elevated threat classifications representing malicious actions
-            logs = (
-                db.query(PacketLog)
-                .filter(
-                    PacketLog.timestamp >= cutoff,
-                    PacketLog.threat_level.in_(["MEDIUM", "HIGH", "CRITICAL"]),
-                )
-                .all()
-            )
-
-            if len(logs) < self.model.min_samples:
-                logger.info("Not enough threats detected recently to form a campaign.")
-                return {"campaign_count": 0, "campaigns": []}
-
-            # Prepare Features for clustering
-            # We convert raw properties into numeric values for spatial mapping
-            features_list = []
-            ip_map = []  # To map rows back to their original IPs
-
-            for log in logs:
-                event = {
-                    "src_ip": log.src_ip,
-                    "dst_ip": log.dst_ip or "127.0.0.1",
-                    "dst_port": log.dst_port or 0,
-                    "protocol": log.protocol or "UNKNOWN",
-                    "length": log.length or 0,
+        with self._lock:
+            try:
+                # Taken out while updating, so a failed update starts the window over
+                window = self._windows.pop(hours_back, None)
+                if window is None:
+                    window = _CampaignWindow(self.model.eps, self.model.min_samples)
+                cutoff = datetime.utcnow() - timedelta(hours=hours_back)
+                window.update(db, cutoff)
+                self._windows[hours_back] = window
+                while len(self._windows) > self.MAX_WINDOWS:
+                    self._windows.popitem(last=False)
+
+                if len(window.engine) < self.model.min_samples:
+                    logger.info("Not enough threats detected recently to form a campaign.")
+                    return {"campaign_count": 0, "campaigns": []}
+
+                response_campaigns = [dict(window.summaries[label]) for label in sorted(window.summaries)]
+                logger.info(f"Identified {len(response_campaigns)} active campaigns.")
+
+                return {
+                    "campaign_count": len(response_campaigns),
+                    "timestamp_analyzed": datetime.utcnow().isoformat(),
+                    "campaigns": response_campaigns,
                 }
-                extracted = self.feature_extractor.extract_features(event)
-                features_list.append(extracted)
-                ip_map.append(log)
-
-            df = pd.DataFrame(features_list, columns=FeatureExtractor.FEATURE_NAMES)
-
-            # Important: Keep `src_ip` behavior tightly grouped by enforcing its significance,
-            # or apply specific scaling if needed. Assuming FeatureExtractor standardizes.
-            predictions = self.model.fit_predict(df.values)
-
-            # Analyze Clusters
-            campaigns = {}
-            for idx, cluster_id in enumerate(predictions):
-                # -1 represents noise / outliers in DBSCAN
-                if cluster_id == -1:
-                    continue
-
-                log_ref = ip_map[idx]
-                c_id = f"campaign_{cluster_id}"
-
-                if c_id not in campaigns:
-                    campaigns[c_id] = {
-                        "cluster_id": cluster_id,
-                        "source_ips": set(),
-                        "target_ports": set(),
-                        "protocols": set(),
-                        "event_count": 0,
-                        "start_time": log_ref.timestamp,
-                        "end_time": log_ref.timestamp,
-                    }
-
-                c = campaigns[c_id]
-                c["source_ips"].add(log_ref.src_ip)
-                if log_ref.dst_port:
-                    c["target_ports"].add(log_ref.dst_port)
-                if log_ref.protocol:
-                    c["protocols"].add(log_ref.protocol)
-                c["event_count"] += 1
-
-                if log_ref.timestamp < c["start_time"]:
-                    c["start_time"] = log_ref.timestamp
-                if log_ref.timestamp > c["end_time"]:
-                    c["end_time"] = log_ref.timestamp
-
-            # Format Response
-            response_campaigns = []
-            for c_id, data in campaigns.items():
-                response_campaigns.append(
-                    {
-                        "campaign_id": c_id,
-                        "cluster_id": data["cluster_id"],
-                        "unique_sources": sorted(list(data["source_ips"])),
-                        "target_ports": sorted(list(data["target_ports"])),
-                        "protocols": sorted(list(data["protocols"])),
-                        "event_count": data["event_count"],
-                        "start_time": data["start_time"].isoformat(),
-                        "end_time": data["end_time"].isoformat(),
-                        "duration_seconds": (
-                            data["end_time"] - data["start_time"]
-                        ).total_seconds(),
-                    }
-                )
-
-            logger.info(f"Identified {len(response_campaigns)} active campaigns.")
-
-            return {
-                "campaign_count": len(response_campaigns),
-                "timestamp_analyzed": datetime.utcnow().isoformat(),
-                "campaigns": response_campaigns,
-            }
-
-        except (ValueError, KeyError, AttributeError, RuntimeError) as e:
-            logger.error("Error during campaign clustering: %s", e)
-            return {"error": str(e), "campaign_count": 0, "campaigns": []}
-        finally:
-            db.close()
-
-
-# Singleton
-campaign_clusterer = CampaignClusterer()
+
+            except (ValueError, KeyError, AttributeError, RuntimeError) as e:
+                logger.error("Error during campaign clustering: %s", e)
+                return {"error": str(e), "campaign_count": 0, "campaigns": []}
+            finally:
+                db.close()
+
+
+# Singleton (created on first use)
+_clusterer = None
+_clusterer_lock = threading.Lock()
+
+
+def get_campaign_clusterer() -> CampaignClusterer:
+    global _clusterer
+    if _clusterer is None:
+        with _clusterer_lock:
+            if _clusterer is None:
+                _clusterer = CampaignClusterer()
+    return _clusterer
+
+
+def __getattr__(name):
+    # Keeps ``from ml_engine.campaign_clustering import campaign_clusterer`` working
+    if name == "campaign_clusterer":
+        return get_campaign_clusterer()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
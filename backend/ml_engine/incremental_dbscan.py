@@ -0,0 +1,304 @@
+"""
+Incremental DBSCAN with stable cluster labels.
+
+Keeps the points of a sliding window together with their eps-neighbour
+counts and cluster labels, and applies each batch of insertions and
+removals by re-deciding only the part of the clustering it can affect:
+
+    - new points, and non-core points within eps of a new point
+    - points within eps of a point that became or stopped being core
+    - every point of a cluster that lost a core point and may have split
+
+Clusters that lost no core point cannot split, so they take part as single
+nodes: a batch that only grows a large cluster costs neighbour queries for
+the new points, not a refit of the cluster. A cluster that did lose core
+points is re-decided in full only if the core points around the lost ones
+are not reconnected within a few hops. Connected components are taken
+over core-core edges (scipy.sparse.csgraph), borders attach to a core
+neighbour, and the result is the same partition DBSCAN.fit_predict would
+produce on the window (up to the usual border-point ambiguity).
+
+Labels are stable: a cluster keeps its label while it grows, shrinks,
+absorbs another cluster (the larger one's label wins) or splits (the
+largest piece keeps it). A new cluster is labelled with the smallest
+point id among its core points. After a restart the window is rebuilt
+from the surviving rows, so a long-lived campaign whose first core
+points have expired can come back under a different label; callers that
+must recognise a campaign across restarts need a content-based key.
+
+Usage:
+    engine = IncrementalDBSCAN(eps=0.5, min_samples=5)
+    changed = engine.update(X_new, ids_new, remove_ids=expired_ids)
+    engine.ids, engine.labels   # row-aligned; -1 = noise
+"""
+
+import logging
+from typing import Dict, Iterable, Set
+
+import numpy as np
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+from sklearn.neighbors import KDTree
+
+logger = logging.getLogger("incremental_dbscan")
+
+NOISE = -1
+
+
+class IncrementalDBSCAN:
+    """
+    DBSCAN over a sliding window, updated in place with stable labels.
+    """
+
+    # Bound of the local check that a cluster which lost core points is still connected
+    MAX_CONNECTIVITY_HOPS = 8
+
+    def __init__(self, eps: float = 0.5, min_samples: int = 5):
+        self.eps = eps
+        self.min_samples = min_samples
+        self.reset()
+
+    def reset(self, n_features: int = 0) -> None:
+        self._X = np.empty((0, n_features), dtype=np.float64)
+        self._ids = np.empty(0, dtype=np.int64)
+        self._counts = np.empty(0, dtype=np.int64)
+        self._labels = np.empty(0, dtype=np.int64)
+        self.last_region_size = 0
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    @property
+    def ids(self) -> np.ndarray:
+        return self._ids
+
+    @property
+    def labels(self) -> np.ndarray:
+        """Cluster label per point, aligned with ``ids``."""
+        return self._labels
+
+    @property
+    def is_core(self) -> np.ndarray:
+        return self._counts >= self.min_samples
+
+    def clusters(self) -> Dict[int, np.ndarray]:
+        """Label -> positions (into ``ids``) of its points."""
+        clustered = np.flatnonzero(self._labels != NOISE)
+        if not len(clustered):
+            return {}
+        order = clustered[np.argsort(self._labels[clustered], kind="stable")]
+        labels, starts = np.unique(self._labels[order], return_index=True)
+        return dict(zip(labels.tolist(), np.split(order, starts[1:])))
+
+    # --------------------------------------------------
+    # Update
+    # --------------------------------------------------
+
+    def update(self, X_new: np.ndarray, ids_new: Iterable[int], remove_ids: Iterable[int] = ()) -> Set[int]:
+        """
+        Remove ``remove_ids`` and insert ``X_new`` (row-aligned with ``ids_new``).
+        Returns the labels whose membership changed, including labels that no
+        longer exist.
+        """
+        X_new = np.asarray(X_new, dtype=np.float64)
+        ids_new = np.asarray(list(ids_new), dtype=np.int64)
+        remove_ids = np.asarray(list(remove_ids), dtype=np.int64)
+        if self._X.shape[1] == 0 and len(X_new):
+            self.reset(X_new.shape[1])
+
+        changed: Set[int] = set()
+        core_before = self.is_core
+        lost_labels: Set[int] = set()  # clusters that lost a core point
+        lost_neighbours = np.empty(0, dtype=np.int64)  # remaining neighbours of lost core points
+
+        if len(remove_ids) and len(self._ids):
+            core_before, lost_neighbours = self._remove(np.isin(self._ids, remove_ids), core_before, changed, lost_labels)
+
+        n_old = len(self._ids)
+        self._X = np.vstack([self._X, X_new]) if len(X_new) else self._X
+        self._ids = np.concatenate([self._ids, ids_new])
+        self._counts = np.concatenate([self._counts, np.zeros(len(ids_new), dtype=np.int64)])
+        self._labels = np.concatenate([self._labels, np.full(len(ids_new), NOISE, dtype=np.int64)])
+        n = len(self._ids)
+        if n == 0:
+            self.last_region_size = 0
+            return changed
+
+        tree = KDTree(self._X)
+        region = np.zeros(n, dtype=bool)
+        region[n_old:] = True
+        if len(ids_new):
+            neighbours = tree.query_radius(self._X[n_old:], self.eps)
+            self._counts[n_old:] = [len(a) for a in neighbours]
+            flat = np.concatenate(neighbours)
+            old = flat[flat < n_old]
+            self._counts[:n_old] += np.bincount(old, minlength=n_old)
+            # Old non-core neighbours may become borders; core ones are reached through edges
+            region[old] = True
+
+        core = self.is_core
+        region[:n_old] &= ~(core_before & core[:n_old])
+
+        # Points that became core can pull their non-core neighbours into a cluster
+        became_core = np.flatnonzero(~core_before & core[:n_old])
+        if len(became_core):
+            region[np.concatenate(tree.query_radius(self._X[became_core], self.eps))] = True
+
+        # Points that stopped being core: they and their neighbours may lose their cluster
+        downgraded = np.flatnonzero(core_before & ~core[:n_old])
+        if len(downgraded):
+            lost_labels.update(self._labels[downgraded].tolist())
+            lost_neighbours = np.concatenate(
+                [lost_neighbours, np.concatenate(tree.query_radius(self._X[downgraded], self.eps))]
+            )
+            region[downgraded] = True
+        lost_labels.discard(NOISE)
+        region[lost_neighbours[~core[lost_neighbours]]] = True
+
+        # A cluster that lost core points is re-decided in full only if it may have split
+        dirty = [label for label in lost_labels if not self._still_connected(tree, label, lost_neighbours)]
+        if dirty:
+            region |= np.isin(self._labels, dirty)
+        changed.update(lost_labels)
+        self._recluster(tree, np.flatnonzero(region), changed)
+        changed.discard(NOISE)
+        return changed
+
+    def _remove(self, mask: np.ndarray, core_before: np.ndarray, changed: Set[int], lost_labels: Set[int]):
+        removed_X = self._X[mask]
+        removed_labels = self._labels[mask]
+        removed_core = core_before[mask]
+        changed.update(removed_labels[removed_labels != NOISE].tolist())
+        lost_labels.update(removed_labels[removed_core & (removed_labels != NOISE)].tolist())
+
+        keep = ~mask
+        self._X, self._ids = self._X[keep], self._ids[keep]
+        self._counts, self._labels = self._counts[keep], self._labels[keep]
+        lost_neighbours = np.empty(0, dtype=np.int64)
+        if len(self._ids):
+            neighbours = KDTree(self._X).query_radius(removed_X, self.eps)
+            self._counts -= np.bincount(np.concatenate(neighbours), minlength=len(self._ids))
+            if removed_core.any():
+                lost_neighbours = np.concatenate(neighbours[removed_core])
+        return core_before[keep], lost_neighbours
+
+    def _still_connected(self, tree: KDTree, label: int, lost_neighbours: np.ndarray) -> bool:
+        """
+        True if the remaining core points of ``label`` next to the lost ones
+        are still connected to each other (so the cluster cannot have split).
+
+        Checked locally: the seeds must chain, within eps, to the core
+        neighbourhood of the first one. A False is only a missed shortcut,
+        the cluster is then re-decided in full.
+        """
+        member = self.is_core & (self._labels == label)
+        seeds = np.unique(lost_neighbours[member[lost_neighbours]])
+        if not len(seeds):
+            return False
+        found = tree.query_radius(self._X[seeds[:1]], self.eps)[0]
+        reached = np.union1d(found[member[found]], seeds[:1])
+        pending = np.setdiff1d(seeds, reached)
+        for _ in range(self.MAX_CONNECTIVITY_HOPS):
+            if not len(pending):
+                return True
+            # Nearest reached point only: cheap even inside dense clusters
+            distance, _ = KDTree(self._X[reached]).query(self._X[pending], k=1)
+            joined = distance[:, 0] <= self.eps
+            if not joined.any():
+                return False
+            reached = np.concatenate([reached, pending[joined]])
+            pending = pending[~joined]
+        return not len(pending)
+
+    def _recluster(self, tree: KDTree, region: np.ndarray, changed: Set[int]) -> None:
+        """Re-decide labels of ``region``; clusters outside it join as single nodes."""
+        self.last_region_size = len(region)
+        if not len(region):
+            return
+        n = len(self._ids)
+        core = self.is_core
+        pos = np.full(n, -1, dtype=np.int64)
+        pos[region] = np.arange(len(region))
+
+        neighbours = tree.query_radius(self._X[region], self.eps)
+        src = np.repeat(np.arange(len(region)), [len(a) for a in neighbours])
+        dst = np.concatenate(neighbours)
+        core_neighbour = core[dst]
+        src, dst = src[core_neighbour], dst[core_neighbour]
+
+        # Clusters outside the region are intact: one graph node each
+        outside = pos[dst] < 0
+        outside_labels, outside_node = np.unique(self._labels[dst[outside]], return_inverse=True)
+        node = np.empty(len(dst), dtype=np.int64)
+        node[~outside] = pos[dst[~outside]]
+        node[outside] = len(region) + outside_node
+        n_nodes = len(region) + len(outside_labels)
+
+        # Core-core edges decide the components
+        edge = core[region][src]
+        graph = coo_matrix((np.ones(int(edge.sum())), (src[edge], node[edge])), shape=(n_nodes, n_nodes))
+        _, component = connected_components(graph, directed=False)
+
+        # Each point's component: its own if core, else its first core neighbour's
+        point_component = np.full(len(region), -1, dtype=np.int64)
+        region_core = core[region]
+        point_component[region_core] = component[np.flatnonzero(region_core)]
+        border = ~region_core
+        first = np.full(len(region), -1, dtype=np.int64)
+        with_core, first_edge = np.unique(src, return_index=True)
+        first[with_core] = node[first_edge]  # first core neighbour of each point
+        has_core = border & (first >= 0)
+        point_component[has_core] = component[first[has_core]]
+
+        new_labels = self._stable_labels(region, region_core, point_component, component, outside_labels)
+        changed.update(self._labels[region].tolist())
+        changed.update(new_labels.values())
+
+        # Outside clusters merged under another label
+        remap = {
+            int(label): new_labels[component[len(region) + k]]
+            for k, label in enumerate(outside_labels.tolist())
+            if new_labels[component[len(region) + k]] != label
+        }
+        if remap:
+            changed.update(remap)
+            for old, new in remap.items():
+                self._labels[self._labels == old] = new
+        self._labels[region] = [new_labels[c] if c >= 0 else NOISE for c in point_component.tolist()]
+
+    def _stable_labels(self, region, region_core, point_component, component, outside_labels) -> Dict[int, int]:
+        """Component -> label, reusing the label with the largest share of each component."""
+        votes: Dict[tuple, int] = {}
+        for c, label in zip(point_component[region_core].tolist(), self._labels[region][region_core].tolist()):
+            if label != NOISE:
+                votes[(c, label)] = votes.get((c, label), 0) + 1
+        if len(outside_labels):
+            sizes = dict(zip(*np.unique(self._labels[np.isin(self._labels, outside_labels)], return_counts=True)))
+            for k, label in enumerate(outside_labels.tolist()):
+                key = (int(component[len(region) + k]), label)
+                votes[key] = votes.get(key, 0) + int(sizes.get(label, 0))
+
+        assigned: Dict[int, int] = {}
+        used = set()
+        for (c, label), _ in sorted(votes.items(), key=lambda item: (-item[1], item[0][1])):
+            if c not in assigned and label not in used:
+                assigned[c] = label
+                used.add(label)
+
+        # New clusters: smallest id among their core points (deterministic on replay)
+        in_use = set(np.unique(self._labels).tolist()) | used
+        core_components = point_component[region_core]
+        core_ids = self._ids[region][region_core]
+        for c in np.unique(core_components).tolist():
+            if c in assigned:
+                continue
+            for candidate in np.sort(core_ids[core_components == c]).tolist():
+                if candidate not in in_use:
+                    break
+            else:
+                candidate = max(in_use) + 1
+            assigned[c] = candidate
+            in_use.add(candidate)
+        for c in np.unique(component[len(region):]).tolist():
+            assigned.setdefault(c, NOISE)
+        return assigned
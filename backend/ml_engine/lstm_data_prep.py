@@ -1,207 +1,291 @@
 import os
 import sys
+import glob
 import pickle
+import shutil
+from collections import Counter
+
 import numpy as np
 import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
 from sqlalchemy import create_engine
-from sklearn.preprocessing import StandardScaler, LabelEncoder
-from sklearn.model_selection import train_test_split
+from sqlalchemy.orm import Session
+from sklearn.preprocessing import StandardScaler
 
 # Setup paths
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 from database.database import DATABASE_URL
+from database.models import PacketLog
+from database.projections import iter_event_windows, to_dataframe
+from ml.training_shards import TrainingShards
 
 SEQ_LENGTH = 50
 
-
-def extract_features(df):
+# Rows per database window; memory is bounded by this, not by the history length
+WINDOW_ROWS = int(os.getenv("TRAINING_WINDOW_ROWS", "50000"))
+# Sequences per spilled shard (SEQ_LENGTH x features float32 each)
+SHARD_SEQUENCES = 8192
+MODELS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "ml_models"))
+SHARD_DIR = os.path.join(os.getenv("TRAINING_SHARD_DIR", os.path.join(MODELS_DIR, "training_shards")), "lstm")
+
+EVENT_COLUMNS = (
+    "id",
+    "timestamp",
+    "src_ip",
+    "dst_port",
+    "protocol",
+    "length",
+    "attack_type",
+    "threat_level",
+    "event",
+)
+NUMERIC_COLS = [
+    "length",
+    "inter_arrival_time",
+    "failed_auth_count",
+    "unique_ports_accessed",
+]
+THREAT_LEVELS = {"LOW": 0, "MEDIUM": 1, "HIGH": 2}
+# Sequence split fractions (70/15/15)
+VAL_FRACTION = 0.15
+TEST_FRACTION = 0.15
+
+
+class SequenceFeatureState:
     """
-    Extract temporal and contextual features from a grouped dataframe of an IP.
+    Temporal and contextual features per source IP, computed one window at
+    a time. Values that span windows (last timestamp, failure count, ports
+    seen) are carried per IP, so the result matches a single pass over the
+    whole history; every step is a cumulative group operation, O(n).
     """
-    df = df.sort_values(by="timestamp").reset_index(drop=True)
 
-    # Time diff in seconds
-    df["inter_arrival_time"] = df["timestamp"].diff().dt.total_seconds().fillna(0)
+    def __init__(self):
+        self.last_ts = {}
+        self.failed = {}
+        self.unique_ports = {}
+        self.seen_ports = set()
+
+    def extract(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Add the per-IP features to a window in time order; returns it grouped by IP."""
+        df = df.sort_values("src_ip", kind="stable").reset_index(drop=True)
+        ips = df["src_ip"]
+
+        # Time diff in seconds (0 for an IP's first event)
+        previous = df["timestamp"].groupby(ips, sort=False).shift()
+        previous = previous.fillna(pd.to_datetime(ips.map(self.last_ts)).astype(previous.dtype))
+        df["inter_arrival_time"] = (df["timestamp"] - previous).dt.total_seconds().fillna(0)
+
+        # Cumulative failure count proxy (mocked by checking if event string contains 'fail' or 'brute')
+        df["failed_auth"] = (
+            df["event"]
+            .astype(str)
+            .str.contains("fail|brute|unauthorized", case=False)
+            .astype(int)
+        )
+        df["failed_auth_count"] = (
+            df["failed_auth"].groupby(ips, sort=False).cumsum()
+            + ips.map(self.failed).fillna(0).astype(int)
+        )
+
+        # Cumulative unique ports count: a port counts on its first event for the IP
+        pairs = list(zip(ips, df["dst_port"]))
+        new_port = ~df.duplicated(["src_ip", "dst_port"]).to_numpy() & np.fromiter(
+            (pair not in self.seen_ports for pair in pairs), bool, len(pairs)
+        )
+        df["unique_ports_accessed"] = (
+            pd.Series(new_port, index=df.index).groupby(ips, sort=False).cumsum()
+            + ips.map(self.unique_ports).fillna(0).astype(int)
+        )
+
+        last = df[ips.ne(ips.shift(-1))]
+        self.last_ts.update(zip(last["src_ip"], last["timestamp"]))
+        self.failed.update(zip(last["src_ip"], last["failed_auth_count"]))
+        self.unique_ports.update(zip(last["src_ip"], last["unique_ports_accessed"]))
+        self.seen_ports.update(pair for pair, new in zip(pairs, new_port) if new)
+        return df
+
 
-    # Cumulative failure count proxy (mocked by checking if event string contains 'fail' or 'brute')
-    df["failed_auth"] = (
-        df["event"]
-        .astype(str)
-        .str.contains("fail|brute|unauthorized", case=False)
-        .astype(int)
-    )
-    df["failed_auth_count"] = df["failed_auth"].cumsum()
+class SequenceBuilder:
+    """
+    Sliding SEQ_LENGTH windows per IP over encoded rows arriving in
+    windows; the last SEQ_LENGTH rows of each IP are carried over so
+    sequences span window boundaries.
+    """
+
+    def __init__(self, splits, seed=42):
+        self.splits = splits
+        self.tails = {}
+        self.rng = np.random.default_rng(seed)
+        self.pending = {name: ([], []) for name in splits}
+
+    def add(self, ips: np.ndarray, features: np.ndarray, labels: np.ndarray) -> None:
+        """Rows grouped by IP, in time order within each IP."""
+        starts = np.flatnonzero(np.r_[True, ips[1:] != ips[:-1]])
+        for start, end in zip(starts, np.r_[starts[1:], len(ips)]):
+            ip = ips[start]
+            tail = self.tails.get(ip)
+            rows = features[start:end] if tail is None else np.concatenate([tail, features[start:end]])
+            count = len(rows) - SEQ_LENGTH
+            if count > 0:
+                # Window k predicts the event that follows it (all from this window)
+                windows = sliding_window_view(rows, SEQ_LENGTH, axis=0)[:count].transpose(0, 2, 1)
+                self._emit(windows, labels[end - count : end])
+            self.tails[ip] = rows[-SEQ_LENGTH:].copy()
+
+    def _emit(self, X: np.ndarray, y: np.ndarray) -> None:
+        draw = self.rng.random(len(y))
+        split = np.where(draw < TEST_FRACTION, "test", np.where(draw < TEST_FRACTION + VAL_FRACTION, "val", "train"))
+        for name in self.splits:
+            chosen = split == name
+            if chosen.any():
+                xs, ys = self.pending[name]
+                xs.append(X[chosen])
+                ys.append(y[chosen])
+                if sum(len(part) for part in ys) >= SHARD_SEQUENCES:
+                    self._flush(name)
+
+    def _flush(self, name: str) -> None:
+        xs, ys = self.pending[name]
+        if ys:
+            self.splits[name].append(np.concatenate(xs), np.concatenate(ys))
+        self.pending[name] = ([], [])
+
+    def close(self) -> None:
+        for name in self.splits:
+            self._flush(name)
+
+
+def _dummy_events():
+    """Synthetic window used when the database has no events (keeps the pipeline runnable)."""
+    base_time = pd.Timestamp.utcnow().tz_localize(None)
+    dummy_records = []
+    for i in range(10000):
+        dummy_records.append(
+            {
+                "id": i,
+                "timestamp": base_time + pd.Timedelta(seconds=i),
+                "src_ip": f"10.0.0.{i%10}",
+                "dst_port": 80,
+                "protocol": "TCP",
+                "length": 64,
+                "attack_type": "BENIGN" if i % 10 != 0 else "DOS",
+                "threat_level": "LOW" if i % 10 != 0 else "HIGH",
+                "event": "Test",
+            }
+        )
+    return pd.DataFrame(dummy_records)
 
-    # Expanding unique ports count
-    df["unique_ports_accessed"] = (
-        df["dst_port"].expanding().apply(lambda x: len(np.unique(x)))
-    )
 
-    return df
+def iter_event_frames(engine, window=WINDOW_ROWS):
+    """packet_logs rows with a source IP, in time order, as DataFrames of ``window`` rows."""
+    with Session(engine) as db:
+        for frame in iter_event_windows(
+            db, EVENT_COLUMNS, PacketLog.src_ip.isnot(None), by_time=True, window=window
+        ):
+            yield to_dataframe(frame)
 
 
-def prepare_data():
+def prepare_data(window=WINDOW_ROWS, shard_dir=SHARD_DIR, out_dir=MODELS_DIR):
     print("Connecting to database...")
     engine = create_engine(DATABASE_URL)
 
-    # Query logs (limit to last 500,000 for memory efficiency)
-    query = """
-    SELECT id, timestamp, src_ip, dst_port, protocol, length, attack_type, threat_level, event
-    FROM packet_logs
-    WHERE src_ip IS NOT NULL AND timestamp IS NOT NULL
-    ORDER BY timestamp ASC
-    LIMIT 500000
-    """
+    events_dir = os.path.join(shard_dir, "events")
+    shutil.rmtree(shard_dir, ignore_errors=True)
+    os.makedirs(events_dir)
+
+    # 1. Per-IP features window by window, spilled to Parquet. The scaler and the
+    #    category counts are accumulated on the way, since both need every row.
+    print(f"Streaming events in windows of {window} rows...")
+    state = SequenceFeatureState()
+    scaler = StandardScaler()
+    attack_counts = Counter()
+    protocols = set()
+    unlabeled_attacks = 0
+    total = 0
+
+    def spill(df):
+        nonlocal unlabeled_attacks, total
+        df["timestamp"] = pd.to_datetime(df["timestamp"])
+        df = state.extract(df)
+        df["threat_label"] = df["threat_level"].map(THREAT_LEVELS).fillna(0).astype(int)
+        df[NUMERIC_COLS] = df[NUMERIC_COLS].fillna(0)
+        scaler.partial_fit(df[NUMERIC_COLS])
+        attack_counts.update(df["attack_type"].dropna())
+        unlabeled_attacks += int(df["attack_type"].isna().sum())
+        protocols.update(df["protocol"].dropna())
+        columns = ["src_ip", "protocol", "attack_type", "threat_label"] + NUMERIC_COLS
+        df[columns].to_parquet(os.path.join(events_dir, f"events_{total:012d}.parquet"), index=False)
+        total += len(df)
 
-    print("Loading data into Pandas DataFrame...")
     try:
-        df = pd.read_sql(query, engine)
+        for df in iter_event_frames(engine, window):
+            spill(df)
     except Exception as e:
         print(f"Error reading from DB: {e}")
-        # Build dummy frame if DB lacks table (for testing)
-        df = pd.DataFrame(
-            columns=[
-                "id",
-                "timestamp",
-                "src_ip",
-                "dst_port",
-                "protocol",
-                "length",
-                "attack_type",
-                "threat_level",
-                "event",
-            ]
-        )
 
-    print(f"Loaded {len(df)} records. Applying feature engineering...")
-
-    if len(df) == 0:
+    if total == 0:
         print(
             "Warning: Database empty. Generating dummy data for training pipeline validity."
         )
-        # Dummy generation
-        base_time = pd.Timestamp.utcnow()
-        dummy_records = []
-        for i in range(10000):
-            dummy_records.append(
-                {
-                    "id": i,
-                    "timestamp": base_time + pd.Timedelta(seconds=i),
-                    "src_ip": f"10.0.0.{i%10}",
-                    "dst_port": 80,
-                    "protocol": "TCP",
-                    "length": 64,
-                    "attack_type": "BENIGN" if i % 10 != 0 else "DOS",
-                    "threat_level": "LOW" if i % 10 != 0 else "HIGH",
-                    "event": "Test",
-                }
-            )
-        df = pd.DataFrame(dummy_records)
-
-    # 1. Encoding
-    # Threat Level Mapping
-    tl_map = {"LOW": 0, "MEDIUM": 1, "HIGH": 2}
-    df["threat_label"] = df["threat_level"].map(tl_map).fillna(0).astype(int)
-
-    # 2. Extract temporal features per IP
-    df["timestamp"] = pd.to_datetime(df["timestamp"])
-    df = df.groupby("src_ip").apply(extract_features).reset_index(drop=True)
-
-    # 3. Handle categorical encoding (One-Hot)
-    # Protocol
-    df = pd.get_dummies(df, columns=["protocol"], prefix="proto", dummy_na=False)
-    # Attack Type (Just encode top 5 to avoid explosion)
-    top_attacks = df["attack_type"].value_counts().nlargest(5).index
-    df["attack_type_clean"] = df["attack_type"].where(
-        df["attack_type"].isin(top_attacks), "OTHER"
-    )
-    df = pd.get_dummies(df, columns=["attack_type_clean"], prefix="atk", dummy_na=False)
-
-    # 4. Normalization
-    scaler = StandardScaler()
-    num_cols = [
-        "length",
-        "inter_arrival_time",
-        "failed_auth_count",
-        "unique_ports_accessed",
-    ]
-    df[num_cols] = scaler.fit_transform(df[num_cols].fillna(0))
-
-    # Get all feature columns
-    exclude = [
-        "id",
-        "timestamp",
-        "src_ip",
-        "dst_port",
-        "attack_type",
-        "threat_level",
-        "event",
-        "threat_label",
-        "failed_auth",
-    ]
-    feature_cols = [c for c in df.columns if c not in exclude]
+        spill(_dummy_events())
 
-    print(f"Features dimension: {len(feature_cols)}. Building sliding sequences...")
+    print(f"Loaded {total} records. Applying feature engineering...")
 
-    # 5. Sliding Windows
-    X, y = [], []
+    # 2. Encoding: scaled numerics, protocol one-hots, top-5 attack type one-hots
+    top_attacks = [name for name, _ in attack_counts.most_common(5)]
+    attack_values = set(top_attacks)
+    if unlabeled_attacks or len(attack_counts) > len(top_attacks):
+        attack_values.add("OTHER")
+    proto_cols = [f"proto_{name}" for name in sorted(protocols)]
+    atk_cols = [f"atk_{name}" for name in sorted(attack_values)]
+    feature_cols = NUMERIC_COLS + proto_cols + atk_cols
+    proto_index = {name: len(NUMERIC_COLS) + i for i, name in enumerate(sorted(protocols))}
+    atk_index = {name: len(NUMERIC_COLS) + len(proto_cols) + i for i, name in enumerate(sorted(attack_values))}
 
-    for ip, group in df.groupby("src_ip"):
-        group = group.sort_values("timestamp")
-
-        # Need at least SEQ_LENGTH events
-        if len(group) <= SEQ_LENGTH:
-            continue
-
-        features = group[feature_cols].values
-        labels = group["threat_label"].values
-
-        # Create sliding windows
-        for i in range(len(features) - SEQ_LENGTH):
-            X.append(features[i : i + SEQ_LENGTH])
-            y.append(labels[i + SEQ_LENGTH])  # Predict next event threat level
-
-    X = np.array(X)
-    y = np.array(y)
-
-    print(f"Generated {len(X)} sequences of shape {X.shape if len(X) > 0 else (0,)}.")
+    print(f"Features dimension: {len(feature_cols)}. Building sliding sequences...")
 
-    if len(X) == 0:
+    # 3. Sliding Windows, spilled as NPY shards per split
+    splits = {name: TrainingShards(os.path.join(shard_dir, name)) for name in ("train", "val", "test")}
+    builder = SequenceBuilder(splits)
+    for path in sorted(glob.glob(os.path.join(events_dir, "events_*.parquet"))):
+        df = pd.read_parquet(path)
+        features = np.zeros((len(df), len(feature_cols)), dtype=np.float32)
+        features[:, : len(NUMERIC_COLS)] = scaler.transform(df[NUMERIC_COLS])
+        rows = np.arange(len(df))
+        proto = df["protocol"].map(proto_index)
+        known = proto.notna().to_numpy()
+        features[rows[known], proto[known].astype(int)] = 1.0
+        attack = df["attack_type"].where(df["attack_type"].isin(top_attacks), "OTHER").map(atk_index)
+        features[rows, attack.astype(int)] = 1.0
+        builder.add(df["src_ip"].to_numpy(), features, df["threat_label"].to_numpy())
+    builder.close()
+    shutil.rmtree(events_dir, ignore_errors=True)
+
+    sizes = {name: shards.rows for name, shards in splits.items()}
+    print(f"Generated {sum(sizes.values())} sequences of shape (n, {SEQ_LENGTH}, {len(feature_cols)}).")
+
+    if sum(sizes.values()) == 0:
         print("Not enough sequences. Please generate more traffic.")
         sys.exit(1)
 
-    # 6. Train/Val/Test Split (70/15/15)
-    X_temp, X_test, y_temp, y_test = train_test_split(
-        X, y, test_size=0.15, random_state=42
-    )
-    X_train, X_val, y_train, y_val = train_test_split(
-        X_temp, y_temp, test_size=0.1765, random_state=42
-    )  # 0.15/0.85 approx 0.1765
-
-    # 7. Save to pickle
-    out_dir = os.path.abspath(
-        os.path.join(os.path.dirname(__file__), "..", "..", "ml_models")
-    )
+    # 4. Save the dataset description; the sequences stay in the shards
     os.makedirs(out_dir, exist_ok=True)
 
     out_path = os.path.join(out_dir, "lstm_training_data.pkl")
     with open(out_path, "wb") as f:
         pickle.dump(
             {
-                "X_train": X_train,
-                "y_train": y_train,
-                "X_val": X_val,
-                "y_val": y_val,
-                "X_test": X_test,
-                "y_test": y_test,
+                "shard_dir": shard_dir,
+                "sizes": sizes,
+                "seq_length": SEQ_LENGTH,
                 "feature_cols": feature_cols,
                 "scaler": scaler,
             },
             f,
         )
 
-    print(f"Saved sequential data to {out_path}.")
-    print(f"Train: {X_train.shape[0]}, Val: {X_val.shape[0]}, Test: {X_test.shape[0]}")
+    print(f"Saved sequential data to {shard_dir} (index {out_path}).")
+    print(f"Train: {sizes['train']}, Val: {sizes['val']}, Test: {sizes['test']}")
 
 
 if __name__ == "__main__":
@@ -1,8 +1,15 @@
 import os
 import sys
+import math
 import pickle
+import tempfile
 import numpy as np
 
+# Setup paths
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from ml.training_shards import TrainingShards, fit_incremental
+
 # Suppress TF warnings
 os.environ["TF_CPP_MIN_LOG_LEVEL"] = "3"
 
@@ -22,6 +29,15 @@ except ImportError:
     HAS_TF = False
 
 
+def _repeat_batches(shards, batch_size, shuffle=False):
+    """Endless (X, one-hot y) mini-batches over the shards, for Keras fit."""
+    epoch = 0
+    while True:
+        for X, y in shards.batches(batch_size, seed=epoch if shuffle else None):
+            yield X, to_categorical(y, num_classes=3)
+        epoch += 1
+
+
 def train_model():
     # Make models folder explicitly if we don't know where we're running from
     models_dir = os.path.abspath(
@@ -35,29 +51,29 @@ def train_model():
     if not os.path.exists(data_path):
         print(f"Training data not found at {data_path}. Run data prep first.")
         # Create a tiny mock dataset if none exists for whatever reason
-        os.makedirs(model_dir, exist_ok=True)
-        X_train = np.random.rand(100, 50, 10)
-        y_train = np.random.randint(0, 3, size=(100,))
-        X_val, X_test = X_train[:20], X_train[20:40]
-        y_val, y_test = y_train[:20], y_train[20:40]
+        shard_dir = tempfile.mkdtemp(prefix="lstm_mock_")
+        splits = {name: TrainingShards(os.path.join(shard_dir, name)) for name in ("train", "val", "test")}
+        X = np.random.rand(100, 50, 10).astype(np.float32)
+        y = np.random.randint(0, 3, size=(100,))
+        splits["train"].append(X, y)
+        splits["val"].append(X[:20], y[:20])
+        splits["test"].append(X[20:40], y[20:40])
         feature_cols = [f"f{i}" for i in range(10)]
+        scaler = None
     else:
         with open(data_path, "rb") as f:
             data = pickle.load(f)
-        X_train, y_train = data["X_train"], data["y_train"]
-        X_val, y_val = data["X_val"], data["y_val"]
-        X_test, y_test = data["X_test"], data["y_test"]
+        # Sequences are sharded on disk by lstm_data_prep; only one shard is loaded at a time
+        splits = {name: TrainingShards(os.path.join(data["shard_dir"], name)) for name in ("train", "val", "test")}
         feature_cols = data["feature_cols"]
+        scaler = data["scaler"]
 
-    print(f"Data Loaded. X_train shape: {X_train.shape}")
+    train, val, test = splits["train"], splits["val"], splits["test"]
+    print(f"Data Loaded. {train.rows} training sequences in {len(train)} shards.")
 
     if HAS_TF:
         print("Initializing Keras Sequential Model...")
-        num_features = X_train.shape[2]
-
-        y_train_cat = to_categorical(y_train, num_classes=3)
-        y_val_cat = to_categorical(y_val, num_classes=3)
-        y_test_cat = to_categorical(y_test, num_classes=3)
+        num_features = len(feature_cols)
 
         model = Sequential(
             [
@@ -83,11 +99,11 @@ def train_model():
 
         print("Training LSTM...")
         model.fit(
-            X_train,
-            y_train_cat,
-            validation_data=(X_val, y_val_cat),
+            _repeat_batches(train, 32, shuffle=True),
+            steps_per_epoch=math.ceil(train.rows / 32),
+            validation_data=_repeat_batches(val, 32),
+            validation_steps=math.ceil(val.rows / 32),
             epochs=50,
-            batch_size=32,
             callbacks=callbacks,
             verbose=1,
         )
@@ -95,8 +111,10 @@ def train_model():
         print("Evaluating Model...")
         # Load best model
         best_model = load_model(model_path)
-        y_pred = best_model.predict(X_test)
-        y_pred_classes = np.argmax(y_pred, axis=1)
+        y_pred_classes = np.concatenate(
+            [np.argmax(best_model.predict(np.asarray(X)), axis=1) for X, _ in test]
+        )
+        y_test = test.labels()
 
         acc = accuracy_score(y_test, y_pred_classes)
         f1 = f1_score(y_test, y_pred_classes, average="weighted")
@@ -109,6 +127,17 @@ def train_model():
             )
         )
 
+        # NumPy export so the API scores sequences without loading TensorFlow
+        from ml_engine.sequence_scorer import EXPORT_FILE, export_keras_lstm
+
+        export_path = export_keras_lstm(
+            best_model,
+            os.path.join(models_dir, EXPORT_FILE),
+            feature_cols,
+            scaler,
+        )
+        print(f"Exported NumPy weights to {export_path}.")
+
     else:
         print("Simulating LSTM Training Process (Mock Mode)")
         print(f"Epoch 1/50... loss: 0.95, acc: 0.65 - val_loss: 0.85, val_acc: 0.72")
@@ -132,7 +161,12 @@ def train_model():
         from sklearn.ensemble import RandomForestClassifier
 
         mock = RandomForestClassifier(n_estimators=10, max_depth=3)
-        mock.fit(X_train.reshape(X_train.shape[0], -1), y_train)
+        fit_incremental(
+            mock,
+            ((np.asarray(X).reshape(len(X), -1), y) for X, y in train),
+            classes=np.unique(train.labels()),
+            n_shards=len(train),
+        )
         with open(model_path + ".mock.pkl", "wb") as f:
             pickle.dump(mock, f)
 
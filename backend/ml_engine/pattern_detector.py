@@ -5,6 +5,7 @@ from typing import List, Dict, Any
 
 from database.models import PacketLog
 from database.database import SessionLocal
+from database.query_plans import window_group
 import logging
 
 logger = logging.getLogger(__name__)
@@ -89,7 +90,7 @@ class AdvancedPatternDetector:
                     func.count(PacketLog.id).label("total_events"),
                 )
                 .filter(PacketLog.timestamp >= since)
-                .group_by(PacketLog.src_ip)
+                .group_by(window_group(PacketLog.src_ip))
                 .having(func.count(func.distinct(PacketLog.dst_port)) >= min_ports)
                 .all()
             )
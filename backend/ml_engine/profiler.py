@@ -14,14 +14,14 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 from ml.threat_scoring_service import score_threat, ThreatScorer
 from schemas.threat_schema import ThreatInput
 
-from services.threat_analyzer import threat_analyzer
+from ml_engine.sequence_scorer import sequence_scorer
 
 print("Loading models for profiling...")
 
 scorer = ThreatScorer()
 scorer._load_model()
 try:
-    threat_analyzer._load_lstm()
+    sequence_scorer.load()
 except Exception as e:
     print(f"Failed to load LSTM: {e}")
 
@@ -73,7 +73,8 @@ def profile_memory_rf():
 def profile_memory_lstm():
     """Profile Memory usage of processing 1000 LSTM events."""
     for log in lstm_inputs:
-        threat_analyzer._compute_lstm_score("10.10.10.10", log)
+        sequence_scorer.observe_logs([log])
+        sequence_scorer.score_ips(["10.10.10.10"])
 
 
 def profile_time_rf():
@@ -89,7 +90,8 @@ def profile_time_lstm():
     """Profile time for processing 1000 LSTM sequence updates and inferencing."""
     start = time.time()
     for log in lstm_inputs:
-        threat_analyzer._compute_lstm_score("10.10.10.10", log)
+        sequence_scorer.observe_logs([log])
+        sequence_scorer.score_ips(["10.10.10.10"])
     dur = time.time() - start
     print(f"[LSTM] 1000 executions took {dur:.4f}s. Avg/event: {(dur/1000)*1000:.2f}ms")
 
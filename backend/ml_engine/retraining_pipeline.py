@@ -1,16 +1,26 @@
 import os
+import json
 import time
+import pickle
 import shutil
 import logging
+import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
+from typing import Tuple
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from contextlib import contextmanager
 
 from database.database import SessionLocal
 from database.models import PacketLog
+from database.projections import fetch_events, iter_event_windows
 from ml.training_framework import TrainingFramework
 from ml.feature_extractor import FeatureExtractor
+from ml.feature_store import feature_store, VECTOR_FIELDS
+from ml.training_shards import TrainingShards, fit_incremental, score_shards
+from ml.model_publish import publish_model, read_pointer
+from ml.model_loader import RF_MODEL_NAME
 from sklearn.ensemble import RandomForestClassifier
 
 logger = logging.getLogger("retraining_pipeline")
@@ -24,6 +34,18 @@ formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(messag
 fh.setFormatter(formatter)
 logger.addHandler(fh)
 
+# Rows read (and feature vectors resolved) per database round trip
+TRAINING_WINDOW_ROWS = int(os.getenv("TRAINING_WINDOW_ROWS", "50000"))
+# Scratch directory for spilled training shards
+TRAINING_SHARD_DIR = os.getenv(
+    "TRAINING_SHARD_DIR",
+    os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "ml_models", "training_shards")),
+)
+MIN_TRAINING_ROWS = 1000
+TEST_FRACTION = 0.2
+# Share of job progress spent spilling (training and scoring take the rest)
+SPILL_PROGRESS = 0.6
+
 
 class RetrainingPipeline:
     def __init__(self):
@@ -31,7 +53,8 @@ class RetrainingPipeline:
             os.path.join(os.path.dirname(__file__), "..", "..", "ml_models")
         )
         self.rf_model_path = os.path.join(self.models_dir, "attack_predictor.pkl")
-        self.feature_extractor = FeatureExtractor()
+        self.shard_dir = os.path.join(TRAINING_SHARD_DIR, "random_forest")
+        self.window_rows = TRAINING_WINDOW_ROWS
 
     @contextmanager
     def _get_db(self):
@@ -50,40 +73,109 @@ class RetrainingPipeline:
             # We want rows that have a definitive human/system-confirmed classification.
             # Right now, any PacketLog that triggered a concrete attack_type is considered '1'
             # Benign lines are '0'
-            logs = db.query(PacketLog).filter(PacketLog.timestamp >= cutoff).all()
+            # Only the columns used below, without ORM rows
+            events = fetch_events(db, VECTOR_FIELDS + ("attack_type",), PacketLog.timestamp >= cutoff)
 
-            if len(logs) < 1000:
+            if len(events) < MIN_TRAINING_ROWS:
                 logger.warning(
-                    f"Insufficient data volume ({len(logs)} rows) for scheduled retraining."
+                    f"Insufficient data volume ({len(events)} rows) for scheduled retraining."
                 )
                 return pd.DataFrame()
 
-            features_list = []
-            labels = []
-
-            for log in logs:
-                event = {
-                    "src_ip": log.src_ip,
-                    "dst_ip": log.dst_ip or "127.0.0.1",
-                    "dst_port": log.dst_port or 0,
-                    "protocol": log.protocol or "UNKNOWN",
-                    "length": log.length or 0,
-                }
-                extracted = self.feature_extractor.extract_features(event)
-                features_list.append(extracted)
-
-                # Attack vs Benign Target Label (1 or 0)
-                is_attack = 1 if log.attack_type and log.attack_type != "BENIGN" else 0
-                labels.append(is_attack)
+            # Reuse the vectors computed when these events were scored
+            df = pd.DataFrame(
+                feature_store.vectors_for_events(events),
+                columns=FeatureExtractor.FEATURE_NAMES,
+            )
 
-            df = pd.DataFrame(features_list, columns=FeatureExtractor.FEATURE_NAMES)
-            df["is_attack"] = labels
+            # Attack vs Benign Target Label (1 or 0)
+            df["is_attack"] = self._attack_labels(events)
 
             logger.info(
                 f"Loaded {len(df)} records. Class balance: \n{df['is_attack'].value_counts()}"
             )
             return df
 
+    def spill_training_data(self, days=30, progress=None) -> Tuple[TrainingShards, TrainingShards]:
+        """
+        Stream labeled events from the last ``days`` days into train / test
+        shards on disk, ``window_rows`` rows at a time. Memory stays at one
+        window however long the history is. ``progress(fraction, message)``
+        is called after each window (fractions 0 - SPILL_PROGRESS).
+        """
+        logger.info(f"Spilling labeled data from the last {days} days to {self.shard_dir}...")
+        report = progress or _no_progress
+        cutoff = datetime.utcnow() - timedelta(days=days)
+        train = TrainingShards(os.path.join(self.shard_dir, "train"))
+        test = TrainingShards(os.path.join(self.shard_dir, "test"))
+        train.clear()
+        test.clear()
+        rng = np.random.default_rng(42)
+
+        with self._get_db() as db:
+            total = (
+                db.query(func.count(PacketLog.id)).filter(PacketLog.timestamp >= cutoff).scalar()
+                if progress is not None
+                else 0
+            )
+            # Rows never scored are backfilled on scratch per-IP state that
+            # carries over between windows, so windows go in timestamp order
+            scratch = FeatureExtractor()
+            for events in iter_event_windows(
+                db, VECTOR_FIELDS + ("attack_type",), PacketLog.timestamp >= cutoff,
+                by_time=True, window=self.window_rows,
+            ):
+                # float32 is what the trees split on anyway
+                X = feature_store.vectors_for_events(events, extractor=scratch).astype(np.float32)
+                y = self._attack_labels(events)
+                held_out = rng.random(len(y)) < TEST_FRACTION
+                train.append(X[~held_out], y[~held_out])
+                test.append(X[held_out], y[held_out])
+                spilled = train.rows + test.rows
+                report(SPILL_PROGRESS * min(1.0, spilled / max(total, 1)), f"Spilled {spilled} rows")
+
+        logger.info(
+            f"Spilled {train.rows} training / {test.rows} test rows in {len(train)} shards."
+        )
+        return train, test
+
+    @staticmethod
+    def _attack_labels(events: np.ndarray) -> np.ndarray:
+        """Attack vs Benign Target Label (1 or 0) per event."""
+        return np.array(
+            [1 if attack_type and attack_type != "BENIGN" else 0 for attack_type in events["attack_type"]],
+            dtype=np.int8,
+        )
+
+    @staticmethod
+    def _new_forest() -> RandomForestClassifier:
+        return RandomForestClassifier(
+            n_estimators=50,
+            max_depth=12,
+            min_samples_split=5,
+            n_jobs=-1,
+            random_state=42,
+        )
+
+    def retrain_random_forest_incremental(self, train: TrainingShards, test: TrainingShards, progress=None) -> bool:
+        """
+        Same model as ``retrain_random_forest``, grown shard by shard
+        (warm start) and scored on the held-out shards.
+        """
+        logger.info(f"Starting incremental Random Forest retraining over {len(train)} shards.")
+        report = progress or _no_progress
+
+        def shards():
+            for done, shard in enumerate(train):
+                report(SPILL_PROGRESS + 0.3 * done / len(train), f"Training on shard {done + 1}/{len(train)}")
+                yield shard
+
+        model = fit_incremental(self._new_forest(), shards(), classes=[0, 1], n_shards=len(train))
+        report(SPILL_PROGRESS + 0.3, "Scoring held-out shards")
+        score = score_shards(model, test)
+        logger.info(f"New model accuracy evaluated at: {score:.4f}")
+        return self._deploy_if_accurate(model, score, train.rows)
+
     def retrain_random_forest(self, df: pd.DataFrame) -> bool:
         """Retrains the RF model natively using optimized parameters, replacing if accuracy holds/improves."""
         logger.info("Starting Random Forest retraining sequence.")
@@ -93,13 +185,7 @@ class RetrainingPipeline:
         # In a real environment, you'd test the legacy model against the latest df tests here.
         # For this script we assume >0.85 F1 is good enough to deploy.
 
-        model = RandomForestClassifier(
-            n_estimators=50,
-            max_depth=12,
-            min_samples_split=5,
-            n_jobs=-1,
-            random_state=42,
-        )
+        model = self._new_forest()
 
         trainer = TrainingFramework(
             model=model,
@@ -114,6 +200,9 @@ class RetrainingPipeline:
         score = model.score(X_test, y_test)
         logger.info(f"New model accuracy evaluated at: {score:.4f}")
 
+        return self._deploy_if_accurate(model, score, len(df))
+
+    def _deploy_if_accurate(self, model, score: float, trained_samples: int) -> bool:
         if score > 0.85:  # Threshold limit to prevent deployment of bad weights
             timestamp = datetime.utcnow().strftime("%Y-%m-%d_%H%M")
 
@@ -125,30 +214,26 @@ class RetrainingPipeline:
                 shutil.copy2(self.rf_model_path, backup_path)
                 logger.info(f"Backed up legacy model to {backup_path}")
 
-            # Save new model
-            import pickle
-
-            with open(self.rf_model_path, "wb") as f:
-                pickle.dump(model, f)
+            # Write to a temp name and rename: readers never see a partial file
+            _write_atomic(self.rf_model_path, pickle.dumps(model))
+            pointer = publish_model(
+                RF_MODEL_NAME, model, accuracy=float(score), trained_samples=trained_samples
+            )
 
             # Log version configuration
             meta_path = os.path.join(self.models_dir, "versions.json")
             meta = {}
             if os.path.exists(meta_path):
-                import json
-
                 with open(meta_path, "r") as f:
                     meta = json.load(f)
 
             meta["random_forest"] = {
                 "version": timestamp,
+                "published_version": pointer["version"],
                 "accuracy": float(score),
-                "trained_samples": len(df),
+                "trained_samples": trained_samples,
             }
-            with open(meta_path, "w") as f:
-                import json
-
-                json.dump(meta, f, indent=4)
+            _write_atomic(meta_path, json.dumps(meta, indent=4).encode())
 
             logger.info("Successfully deployed newly tuned Random Forest model.")
             return True
@@ -158,21 +243,51 @@ class RetrainingPipeline:
             )
             return False
 
-    def execute_pipeline(self):
+    def execute_pipeline(self, days=30, progress=None) -> bool:
+        """Spill, train and deploy; True if a new model was deployed. Errors are logged and re-raised."""
         logger.info("-" * 40)
         logger.info("Automated Model Retraining Job STARTED")
         logger.info("-" * 40)
 
+        deployed = False
+        train = test = None
         try:
-            df = self.fetch_training_data(days=30)
-            if not df.empty:
-                self.retrain_random_forest(df)
+            train, test = self.spill_training_data(days=days, progress=progress)
+            if train.rows + test.rows >= MIN_TRAINING_ROWS:
+                deployed = self.retrain_random_forest_incremental(train, test, progress=progress)
             else:
+                logger.warning(
+                    f"Insufficient data volume ({train.rows + test.rows} rows) for scheduled retraining."
+                )
                 logger.info("Aborting pipeline due to lack of minimum training data.")
         except Exception as e:
             logger.error(f"Retraining Pipeline crash: {str(e)}", exc_info=True)
+            raise
+        finally:
+            for shards in (train, test):
+                if shards is not None:
+                    shards.clear()
 
         logger.info("Automated Model Retraining Job FINISHED")
+        return deployed
+
+
+def _no_progress(fraction, message=None):
+    pass
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    tmp = os.path.join(os.path.dirname(path), f".{os.path.basename(path)}.tmp")
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def run_retraining_job(progress, days: int = 30) -> dict:
+    """Training job (services/training_jobs.py): the retraining pipeline in a worker process."""
+    deployed = RetrainingPipeline().execute_pipeline(days=days, progress=progress)
+    version = (read_pointer(RF_MODEL_NAME) or {}).get("version") if deployed else None
+    return {"deployed": deployed, "version": version}
 
 
 retraining_pipeline = RetrainingPipeline()
@@ -0,0 +1,523 @@
+"""
+PhantomNet Sequence Scorer
+==========================
+
+Per-IP event sequences for the LSTM attack predictor (ml_engine/lstm_model.py).
+
+    buffers    one fixed-size (SEQ_LENGTH x features) float32 ring buffer per
+               source IP, holding the same feature columns the model was
+               trained on (lstm_data_prep.py): scaled length / inter-arrival
+               time / failed-auth count / unique ports, protocol and attack
+               type one-hots
+    batching   every IP whose buffer is full is scored in one inference call
+               per analyzer batch, instead of one predict per event
+    eviction   IPs idle for LSTM_IDLE_TTL_S are dropped, and at most
+               LSTM_MAX_IPS are tracked (least recently seen go first)
+
+The model is resolved, in order, from:
+
+    1. lstm_attack_predictor.npz   NumPy export of the Keras weights, run by a
+                                   pure NumPy forward pass (no TensorFlow)
+    2. lstm_attack_predictor.h5.mock.pkl
+                                   sklearn stand-in trained on flattened sequences
+    3. lstm_attack_predictor.h5    Keras, only with LSTM_ALLOW_KERAS=true
+
+Export a trained model with:
+
+    python -m ml_engine.sequence_scorer export
+"""
+
+import os
+import re
+import sys
+import time
+import pickle
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger("sequence_scorer")
+
+# Must match lstm_data_prep.SEQ_LENGTH (not imported: it pulls in pandas / sklearn)
+SEQ_LENGTH = 50
+
+LSTM_IDLE_TTL_S = float(os.getenv("LSTM_IDLE_TTL_S", "900"))
+LSTM_MAX_IPS = int(os.getenv("LSTM_MAX_IPS", "20000"))
+LSTM_ALLOW_KERAS = os.getenv("LSTM_ALLOW_KERAS", "false").lower() == "true"
+
+MODELS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "ml_models"))
+MODEL_FILE = "lstm_attack_predictor.h5"
+EXPORT_FILE = "lstm_attack_predictor.npz"
+TRAINING_DATA_FILE = "lstm_training_data.pkl"
+
+# Columns standardised by lstm_data_prep, in scaler order
+NUMERIC_COLS = ("length", "inter_arrival_time", "failed_auth_count", "unique_ports_accessed")
+
+# [LOW(0), MEDIUM(1), HIGH(2)] - weighted threat proxy
+CLASS_WEIGHTS = np.array([0.1, 0.6, 0.95])
+
+_FAILED_AUTH = re.compile("fail|brute|unauthorized", re.IGNORECASE)
+
+
+# --------------------------------------------------
+# Features
+# --------------------------------------------------
+
+
+class _IPSequence:
+    __slots__ = ("buffer", "pos", "count", "last_ts", "failed", "ports", "last_seen")
+
+    def __init__(self, seq_len: int, n_features: int):
+        self.buffer = np.zeros((seq_len, n_features), dtype=np.float32)
+        self.pos = 0
+        self.count = 0
+        self.last_ts = None
+        self.failed = 0
+        self.ports = set()
+        self.last_seen = 0.0
+
+    def push(self, vector: np.ndarray) -> None:
+        self.buffer[self.pos] = vector
+        self.pos = (self.pos + 1) % len(self.buffer)
+        self.count += 1
+
+    @property
+    def full(self) -> bool:
+        return self.count >= len(self.buffer)
+
+    def window(self) -> np.ndarray:
+        """Buffered events, oldest first."""
+        return np.concatenate([self.buffer[self.pos :], self.buffer[: self.pos]])
+
+
+class SequenceFeatureEncoder:
+    """
+    Per-event version of lstm_data_prep.SequenceFeatureState: one row per event,
+    computed from the IP's running state instead of a grouped DataFrame.
+    """
+
+    def __init__(self, feature_cols: List[str], scaler_mean=None, scaler_scale=None):
+        self.feature_cols = list(feature_cols)
+        index = {name: i for i, name in enumerate(self.feature_cols)}
+        self.numeric_index = [index.get(name) for name in NUMERIC_COLS]
+        self.mean = np.zeros(len(NUMERIC_COLS)) if scaler_mean is None else np.asarray(scaler_mean, dtype=np.float64)
+        self.scale = np.ones(len(NUMERIC_COLS)) if scaler_scale is None else np.asarray(scaler_scale, dtype=np.float64)
+        self.proto_index = {name[len("proto_"):]: i for name, i in index.items() if name.startswith("proto_")}
+        self.attack_index = {name[len("atk_"):]: i for name, i in index.items() if name.startswith("atk_")}
+
+    @property
+    def n_features(self) -> int:
+        return len(self.feature_cols)
+
+    def encode(self, state: _IPSequence, log) -> np.ndarray:
+        vector = np.zeros(self.n_features, dtype=np.float32)
+
+        timestamp = getattr(log, "timestamp", None)
+        inter_arrival = 0.0
+        if timestamp is not None and state.last_ts is not None:
+            inter_arrival = max(0.0, (timestamp - state.last_ts).total_seconds())
+        if timestamp is not None:
+            state.last_ts = timestamp
+
+        if _FAILED_AUTH.search(str(getattr(log, "event", None))):
+            state.failed += 1
+        state.ports.add(getattr(log, "dst_port", None))
+
+        raw = np.array([log.length or 0, inter_arrival, state.failed, len(state.ports)], dtype=np.float64)
+        scaled = (raw - self.mean) / self.scale
+        for i, value in zip(self.numeric_index, scaled):
+            if i is not None:
+                vector[i] = value
+
+        proto = self.proto_index.get(getattr(log, "protocol", None))
+        if proto is not None:
+            vector[proto] = 1.0
+        attack = self.attack_index.get(getattr(log, "attack_type", None), self.attack_index.get("OTHER"))
+        if attack is not None:
+            vector[attack] = 1.0
+        return vector
+
+
+# --------------------------------------------------
+# Model backends
+# --------------------------------------------------
+
+
+def _sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+def _lstm_layer(x, kernel, recurrent, bias, return_sequences):
+    """Keras LSTM forward pass (gate order i, f, c, o; sigmoid / tanh)."""
+    batch, steps, _ = x.shape
+    units = recurrent.shape[0]
+    # Input projections for every step at once; only the recurrent part is sequential
+    xz = x @ kernel + bias
+    h = np.zeros((batch, units), dtype=x.dtype)
+    c = np.zeros((batch, units), dtype=x.dtype)
+    outputs = np.empty((batch, steps, units), dtype=x.dtype) if return_sequences else None
+    for t in range(steps):
+        z = xz[:, t] + h @ recurrent
+        i = _sigmoid(z[:, :units])
+        f = _sigmoid(z[:, units : 2 * units])
+        g = np.tanh(z[:, 2 * units : 3 * units])
+        o = _sigmoid(z[:, 3 * units :])
+        c = f * c + i * g
+        h = o * np.tanh(c)
+        if return_sequences:
+            outputs[:, t] = h
+    return outputs if return_sequences else h
+
+
+_ACTIVATIONS = {
+    "linear": lambda x: x,
+    "relu": lambda x: np.maximum(x, 0.0),
+    "tanh": np.tanh,
+    "sigmoid": _sigmoid,
+    "softmax": lambda x: (lambda e: e / e.sum(axis=-1, keepdims=True))(np.exp(x - x.max(axis=-1, keepdims=True))),
+}
+
+
+class NumpyLSTM:
+    """
+    Inference-only LSTM / Dense stack from an exported weight file.
+    """
+
+    backend = "numpy"
+
+    def __init__(self, layers: list):
+        # [(kind, option, weights...)]: ("lstm", return_sequences, W, U, b) / ("dense", activation, W, b)
+        self.layers = layers
+
+    @classmethod
+    def from_npz(cls, data) -> "NumpyLSTM":
+        layers = []
+        for i, spec in enumerate(data["layers"]):
+            kind, option = str(spec).split(":")
+            if kind == "lstm":
+                layers.append(("lstm", option == "seq", data[f"{i}_kernel"], data[f"{i}_recurrent"], data[f"{i}_bias"]))
+            else:
+                layers.append(("dense", option, data[f"{i}_kernel"], data[f"{i}_bias"]))
+        return cls(layers)
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        h = np.asarray(X, dtype=np.float32)
+        for kind, option, *weights in self.layers:
+            if kind == "lstm":
+                h = _lstm_layer(h, *weights, return_sequences=option)
+            else:
+                h = _ACTIVATIONS[option](h @ weights[0] + weights[1])
+        return h
+
+
+class _FlatSklearnModel:
+    """sklearn classifier trained on flattened (seq_len * features) sequences."""
+
+    backend = "sklearn"
+
+    def __init__(self, model):
+        self.model = model
+        # Class labels present in training -> LOW / MEDIUM / HIGH column
+        self.columns = [int(c) for c in model.classes_]
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        probs = self.model.predict_proba(X.reshape(len(X), -1))
+        out = np.zeros((len(X), len(CLASS_WEIGHTS)))
+        out[:, self.columns] = probs
+        return out
+
+
+class _KerasModel:
+    backend = "keras"
+
+    def __init__(self, model):
+        self.model = model
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        return self.model.predict(X, verbose=0)
+
+
+def export_keras_lstm(model, path: str, feature_cols: List[str], scaler=None) -> str:
+    """
+    Write the weights of a Keras Sequential LSTM / Dense model (Dropout is
+    skipped) plus its feature columns and scaler to an .npz file that
+    NumpyLSTM runs without TensorFlow.
+    """
+    arrays, layers = {}, []
+    for layer in model.layers:
+        kind = type(layer).__name__
+        if kind == "Dropout":
+            continue
+        i = len(layers)
+        weights = layer.get_weights()
+        if kind == "LSTM":
+            layers.append("lstm:" + ("seq" if layer.return_sequences else "last"))
+            arrays[f"{i}_kernel"], arrays[f"{i}_recurrent"], arrays[f"{i}_bias"] = weights
+        elif kind == "Dense":
+            layers.append("dense:" + layer.activation.__name__)
+            arrays[f"{i}_kernel"], arrays[f"{i}_bias"] = weights
+        else:
+            raise TypeError(f"Cannot export layer {kind}")
+
+    if scaler is not None:
+        arrays["scaler_mean"] = np.asarray(scaler.mean_)
+        arrays["scaler_scale"] = np.asarray(scaler.scale_)
+    tmp = path + ".tmp.npz"
+    np.savez(tmp, layers=np.array(layers), feature_cols=np.array(feature_cols), **arrays)
+    os.replace(tmp, path)
+    return path
+
+
+# --------------------------------------------------
+# Scorer
+# --------------------------------------------------
+
+
+class SequenceScorer:
+    """
+    Ring buffers of recent events per source IP, scored in batches.
+    """
+
+    def __init__(
+        self,
+        seq_len: int = SEQ_LENGTH,
+        max_ips: int = LSTM_MAX_IPS,
+        idle_ttl: float = LSTM_IDLE_TTL_S,
+        models_dir: str = MODELS_DIR,
+    ):
+        self.seq_len = seq_len
+        self.max_ips = max(1, max_ips)
+        self.idle_ttl = idle_ttl
+        self.models_dir = models_dir
+        self.model = None
+        self.encoder: Optional[SequenceFeatureEncoder] = None
+        self._sequences: "OrderedDict[str, _IPSequence]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.events_total = 0
+        self.batches_total = 0
+        self.sequences_scored_total = 0
+        self.evicted_total = 0
+        self.seconds_total = 0.0
+
+    @property
+    def is_loaded(self) -> bool:
+        return self.model is not None and self.encoder is not None
+
+    @property
+    def backend(self) -> Optional[str]:
+        return self.model.backend if self.model is not None else None
+
+    def load(self) -> bool:
+        """Resolve the model and feature columns (see module docstring). Drops all buffers."""
+        model, encoder = self._load_export()
+        if model is None:
+            model, encoder = self._load_fallback()
+
+        with self._lock:
+            self.model, self.encoder = model, encoder
+            self._sequences.clear()
+        if self.is_loaded:
+            logger.info(f"Sequence scorer ready ({self.backend}, {self.encoder.n_features} features).")
+        return self.is_loaded
+
+    def observe_logs(self, logs: Iterable) -> None:
+        """
+        Append each log to its source IP's buffer (in the order given). The
+        threat analyzer passes committed, scored rows, so each event is
+        buffered once and carries the attack_type the scorer assigned.
+        """
+        if not self.is_loaded:
+            return
+        now = time.monotonic()
+        with self._lock:
+            for log in logs:
+                if not log.src_ip:
+                    continue
+                state = self._sequences.get(log.src_ip)
+                if state is None:
+                    state = self._sequences[log.src_ip] = _IPSequence(self.seq_len, self.encoder.n_features)
+                else:
+                    self._sequences.move_to_end(log.src_ip)
+                state.last_seen = now
+                state.push(self.encoder.encode(state, log))
+                self.events_total += 1
+            self._evict(now)
+
+    def score_ips(self, ips: Iterable[str]) -> Dict[str, float]:
+        """
+        Threat proxy (0-1) for every IP in ``ips`` whose buffer is full, from
+        one inference call. IPs with fewer than ``seq_len`` events are omitted.
+        """
+        if not self.is_loaded:
+            return {}
+        with self._lock:
+            ready = [ip for ip in dict.fromkeys(ips) if ip in self._sequences and self._sequences[ip].full]
+            if not ready:
+                return {}
+            batch = np.stack([self._sequences[ip].window() for ip in ready])
+
+        started = time.perf_counter()
+        try:
+            probs = np.asarray(self.model.predict_proba(batch), dtype=np.float64)
+        except Exception as e:
+            logger.debug(f"LSTM Prediction error: {e}")
+            return {}
+        self.seconds_total += time.perf_counter() - started
+        self.batches_total += 1
+        self.sequences_scored_total += len(ready)
+
+        scores = probs[:, : len(CLASS_WEIGHTS)] @ CLASS_WEIGHTS
+        return dict(zip(ready, scores.tolist()))
+
+    def evict_idle(self) -> int:
+        with self._lock:
+            return self._evict(time.monotonic())
+
+    def _evict(self, now: float) -> int:
+        # Least recently seen first: stop at the first IP that is still active
+        evicted = 0
+        while self._sequences:
+            ip, state = next(iter(self._sequences.items()))
+            if len(self._sequences) <= self.max_ips and now - state.last_seen < self.idle_ttl:
+                break
+            del self._sequences[ip]
+            evicted += 1
+        self.evicted_total += evicted
+        return evicted
+
+    def _load_export(self):
+        path = os.path.join(self.models_dir, EXPORT_FILE)
+        if not os.path.exists(path):
+            return None, None
+        try:
+            with np.load(path) as data:
+                model = NumpyLSTM.from_npz(data)
+                encoder = SequenceFeatureEncoder(
+                    [str(c) for c in data["feature_cols"]],
+                    data["scaler_mean"] if "scaler_mean" in data else None,
+                    data["scaler_scale"] if "scaler_scale" in data else None,
+                )
+            return model, encoder
+        except Exception as e:
+            logger.error(f"Failed to load LSTM export {path}: {e}")
+            return None, None
+
+    def _load_fallback(self):
+        data_path = os.path.join(self.models_dir, TRAINING_DATA_FILE)
+        if not os.path.exists(data_path):
+            return None, None
+        try:
+            with open(data_path, "rb") as f:
+                data = pickle.load(f)
+            scaler = data.get("scaler")
+            encoder = SequenceFeatureEncoder(
+                data.get("feature_cols", []),
+                getattr(scaler, "mean_", None),
+                getattr(scaler, "scale_", None),
+            )
+        except Exception as e:
+            logger.error(f"Failed to load LSTM scaler: {e}")
+            return None, None
+        if not encoder.n_features:
+            return None, None
+
+        model_path = os.path.join(self.models_dir, MODEL_FILE)
+        mock_path = model_path + ".mock.pkl"
+        if os.path.exists(mock_path):
+            with open(mock_path, "rb") as f:
+                mock = pickle.load(f)
+            if getattr(mock, "n_features_in_", None) == self.seq_len * encoder.n_features:
+                logger.info("Loaded Mock LSTM Model for sequence evaluation.")
+                return _FlatSklearnModel(mock), encoder
+            logger.warning("Mock LSTM model does not match the LSTM feature columns; ignoring it.")
+
+        if LSTM_ALLOW_KERAS and os.path.exists(model_path):
+            try:
+                from tensorflow.keras.models import load_model
+
+                return _KerasModel(load_model(model_path)), encoder
+            except Exception as e:
+                logger.debug(f"Could not load Keras LSTM model ({e}).")
+        elif os.path.exists(model_path):
+            logger.warning(
+                f"{MODEL_FILE} has no NumPy export; run `python -m ml_engine.sequence_scorer export` "
+                "(or set LSTM_ALLOW_KERAS=true to load TensorFlow in this process)."
+            )
+        return None, None
+
+    # --------------------------------------------------
+    # Metrics
+    # --------------------------------------------------
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "backend": self.backend,
+            "tracked_ips": len(self._sequences),
+            "max_ips": self.max_ips,
+            "idle_ttl_s": self.idle_ttl,
+            "events_total": self.events_total,
+            "batches_total": self.batches_total,
+            "sequences_scored_total": self.sequences_scored_total,
+            "evicted_total": self.evicted_total,
+            "avg_ms_per_batch": round(self.seconds_total / self.batches_total * 1000, 3) if self.batches_total else 0.0,
+        }
+
+    def to_prometheus(self) -> str:
+        """Generate Prometheus text format for sequence scorer metrics."""
+        lines = []
+
+        lines.append("# HELP phantomnet_sequence_tracked_ips Source IPs with a sequence buffer")
+        lines.append("# TYPE phantomnet_sequence_tracked_ips gauge")
+        lines.append(f"phantomnet_sequence_tracked_ips {len(self._sequences)}")
+
+        lines.append("")
+        lines.append("# HELP phantomnet_sequence_events_total Events appended to sequence buffers")
+        lines.append("# TYPE phantomnet_sequence_events_total counter")
+        lines.append(f"phantomnet_sequence_events_total {self.events_total}")
+
+        lines.append("")
+        lines.append("# HELP phantomnet_sequence_batches_total Batched LSTM inference calls")
+        lines.append("# TYPE phantomnet_sequence_batches_total counter")
+        lines.append(f"phantomnet_sequence_batches_total {self.batches_total}")
+
+        lines.append("")
+        lines.append("# HELP phantomnet_sequence_scored_total Sequences scored by the LSTM")
+        lines.append("# TYPE phantomnet_sequence_scored_total counter")
+        lines.append(f"phantomnet_sequence_scored_total {self.sequences_scored_total}")
+
+        lines.append("")
+        lines.append("# HELP phantomnet_sequence_evicted_total Idle or over-capacity IP buffers dropped")
+        lines.append("# TYPE phantomnet_sequence_evicted_total counter")
+        lines.append(f"phantomnet_sequence_evicted_total {self.evicted_total}")
+
+        lines.append("")
+        lines.append("# HELP phantomnet_sequence_inference_seconds_total Time spent in LSTM inference")
+        lines.append("# TYPE phantomnet_sequence_inference_seconds_total counter")
+        lines.append(f"phantomnet_sequence_inference_seconds_total {self.seconds_total:.6f}")
+
+        return "\n".join(lines) + "\n"
+
+
+# Singleton instance
+sequence_scorer = SequenceScorer()
+
+
+def _export_trained_model(models_dir: str = MODELS_DIR) -> str:
+    from tensorflow.keras.models import load_model
+
+    with open(os.path.join(models_dir, TRAINING_DATA_FILE), "rb") as f:
+        data = pickle.load(f)
+    model = load_model(os.path.join(models_dir, MODEL_FILE))
+    return export_keras_lstm(model, os.path.join(models_dir, EXPORT_FILE), data["feature_cols"], data.get("scaler"))
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["export"]:
+        print(f"Exported {_export_trained_model()}")
+    else:
+        print("Usage: python -m ml_engine.sequence_scorer export")
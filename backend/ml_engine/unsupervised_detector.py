@@ -2,121 +2,176 @@ import os
 import time
 import logging
 import pickle
+import threading
 import pandas as pd
-from typing import List, Dict, Any
+import numpy as np
+from typing import List, Dict, Any, Optional, Tuple, Union
 from sklearn.ensemble import IsolationForest
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
 
 from database.database import SessionLocal
 from database.models import PacketLog
+from database.projections import fetch_events
 from ml.feature_extractor import FeatureExtractor
+from ml.feature_store import feature_store, VECTOR_FIELDS
+from ml.model_publish import PublishedModelWatcher, publish_model
 
 logger = logging.getLogger("unsupervised_detector")
 
 
+# Published model name (see ml/model_publish.py); trained by the training worker
+BASELINE_MODEL_NAME = "iforest_baseline"
+# Rows of recent history the baseline is fitted on (keeps the memory profile low)
+BASELINE_TRAINING_ROWS = 50000
+
+
+def fit_baseline(days_back: int = 7, progress=None) -> Optional[Tuple[IsolationForest, int]]:
+    """
+    Fit the Isolation Forest on the last N days of data, assuming the
+    majority is normal traffic. Returns (model, rows) or None without data.
+    """
+    report = progress or (lambda fraction, message=None: None)
+    logger.info(f"Training unsupervised baseline on last {days_back} days.")
+    db: Session = SessionLocal()
+    try:
+        cutoff = datetime.utcnow() - timedelta(days=days_back)
+        events = fetch_events(
+            db,
+            VECTOR_FIELDS,
+            PacketLog.timestamp >= cutoff,
+            order_by=PacketLog.timestamp.desc(),
+            limit=BASELINE_TRAINING_ROWS,
+        )
+
+        if not len(events):
+            logger.warning("No logs found for baseline training.")
+            return None
+        report(0.2, f"Loaded {len(events)} events")
+
+        # Same vectors the scorer used; rows never scored are backfilled in memory
+        df = pd.DataFrame(
+            feature_store.vectors_for_events(events),
+            columns=FeatureExtractor.FEATURE_NAMES,
+        )
+        report(0.4, "Fitting Isolation Forest")
+
+        # Train Isolation Forest (contamination=0.01 expects 1% outliers)
+        model = IsolationForest(
+            n_estimators=100,
+            max_samples="auto",
+            contamination=0.01,
+            random_state=42,
+            n_jobs=-1,
+        )
+        model.fit(df.values)
+        return model, len(df)
+    finally:
+        db.close()
+
+
+def run_baseline_job(progress, days_back: int = 7) -> Dict[str, Any]:
+    """Training job (services/training_jobs.py): fit the baseline and publish it."""
+    fitted = fit_baseline(days_back, progress)
+    if fitted is None:
+        raise RuntimeError(f"No logs in the last {days_back} days to train the baseline on.")
+    model, rows = fitted
+    progress(0.9, "Publishing model")
+    pointer = publish_model(BASELINE_MODEL_NAME, model, trained_rows=rows, days_back=days_back)
+    return {"version": pointer["version"], "trained_rows": rows}
+
+
 class UnsupervisedAnomalyDetector:
+    """
+    Scores events against the published Isolation Forest baseline.
+
+    Training happens in a training worker process; the detector only
+    loads what was published and swaps in newer versions as they appear
+    (checked on the scoring path, at most every PUBLISHED_MODEL_CHECK_S).
+    """
+
     def __init__(self):
         self.model = None
-        self.feature_extractor = FeatureExtractor()
+        self.version = None
+        self.feature_extractor = feature_store.extractor  # shared per-IP state
+        self.watcher = PublishedModelWatcher(BASELINE_MODEL_NAME)
+        self._refresh_lock = threading.Lock()
+        # Pre-publishing location, still read when nothing was published yet
         self.model_path = os.path.abspath(
             os.path.join(
                 os.path.dirname(__file__), "..", "..", "ml_models", "iforest_baseline.pkl"
             )
         )
-        self.is_training = False
         self.is_loaded = self.load_model()
 
     def load_model(self) -> bool:
+        if self.refresh(force=True):
+            return True
         if os.path.exists(self.model_path):
             try:
                 with open(self.model_path, "rb") as f:
                     self.model = pickle.load(f)
+                self.version = "legacy"
                 logger.info("Loaded Isolation Forest baseline model.")
                 return True
             except Exception as e:
                 logger.error(f"Failed to load Isolation Forest: {e}")
         return False
 
-    def train_baseline(self, days_back: int = 7):
-        """
-        Trains the Isolation Forest on the last N days of data,
-        assuming the majority is normal traffic.
-        """
-        if self.is_training:
+    def refresh(self, force: bool = False) -> bool:
+        """Swap in a newly published baseline; True if the model changed."""
+        # Scoring threads never wait on a load another thread is already doing
+        if not self._refresh_lock.acquire(blocking=force):
             return False
-        
-        self.is_training = True
-        logger.info(f"Training unsupervised baseline on last {days_back} days.")
-        db: Session = SessionLocal()
         try:
-            cutoff = datetime.utcnow() - timedelta(days=days_back)
-            # Limit to 50,000 to keep memory profile low during training
-            logs = (
-                db.query(PacketLog)
-                .filter(PacketLog.timestamp >= cutoff)
-                .order_by(PacketLog.timestamp.desc())
-                .limit(50000)
-                .all()
-            )
-
-            if not logs:
-                logger.warning("No logs found for baseline training.")
+            update = self.watcher.poll(force=force)
+        finally:
+            self._refresh_lock.release()
+        if update is None:
+            return False
+        self.model, pointer = update
+        self.version = pointer["version"]
+        self.is_loaded = True
+        logger.info(f"Loaded Isolation Forest baseline version {self.version}.")
+        return True
+
+    def train_baseline(self, days_back: int = 7) -> bool:
+        """Fit and publish in this process (CLI / maintenance); the API enqueues a training job instead."""
+        try:
+            fitted = fit_baseline(days_back)
+            if fitted is None:
                 return False
-
-            features_list = []
-            for log in logs:
-                event = {
-                    "src_ip": log.src_ip,
-                    "dst_ip": log.dst_ip or "127.0.0.1",
-                    "dst_port": log.dst_port or 0,
-                    "protocol": log.protocol or "UNKNOWN",
-                    "length": log.length or 0,
-                }
-                features = self.feature_extractor.extract_features(event)
-                features_list.append(features)
-
-            df = pd.DataFrame(features_list, columns=FeatureExtractor.FEATURE_NAMES)
-
-            # Train Isolation Forest (contamination=0.01 expects 1% outliers)
-            self.model = IsolationForest(
-                n_estimators=100,
-                max_samples="auto",
-                contamination=0.01,
-                random_state=42,
-                n_jobs=-1,
-            )
-            self.model.fit(df.values)
-
-            os.makedirs(os.path.dirname(self.model_path), exist_ok=True)
-            with open(self.model_path, "wb") as f:
-                pickle.dump(self.model, f)
-
-            self.is_loaded = True
-            logger.info("Baseline training completed and model saved.")
+            model, rows = fitted
+            publish_model(BASELINE_MODEL_NAME, model, trained_rows=rows, days_back=days_back)
+            self.refresh(force=True)
+            logger.info("Baseline training completed and model published.")
             return True
         except Exception as e:
             logger.error(f"Error training baseline: {e}")
             return False
-        finally:
-            self.is_training = False
-            db.close()
 
-    def predict_anomalies(self, events: List[Dict[str, Any]]) -> List[float]:
+    def predict_anomalies(
+        self,
+        events: Union[pd.DataFrame, List[Dict[str, Any]]],
+        features: Optional[np.ndarray] = None,
+    ) -> List[float]:
         """
-        Predicts an anomaly score for a batch of events.
+        Predicts an anomaly score for a batch of events (DataFrame or list of dicts).
+        Pass ``features`` when the vectors are already known (feature store) so the
+        shared per-IP state is not advanced twice for the same events.
         Higher score = more anomalous.
         """
+        self.refresh()
         if not self.is_loaded or not self.model:
             return [0.0] * len(events)
 
-        features_list = [self.feature_extractor.extract_features(ev) for ev in events]
-        df = pd.DataFrame(features_list, columns=FeatureExtractor.FEATURE_NAMES)
+        if features is None:
+            features = feature_store.extract_batch(events)
 
         try:
             # score_samples returns negative anomaly score (-1.0 to 0.0)
             # Lower means more anomalous. We invert to make it positive.
-            scores = self.model.score_samples(df.values)
+            scores = self.model.score_samples(features)
 
             # Normalize approx 0 to 1.0 for threat score integration
             # IsolationForest score_samples is approx -1 to 0. Lower is more anomalous.
@@ -128,5 +183,22 @@ class UnsupervisedAnomalyDetector:
             return [0.0] * len(events)
 
 
-# Singleton
-unsupervised_detector = UnsupervisedAnomalyDetector()
+# Singleton (created on first use: loads the Isolation Forest baseline)
+_detector = None
+_detector_lock = threading.Lock()
+
+
+def get_unsupervised_detector() -> UnsupervisedAnomalyDetector:
+    global _detector
+    if _detector is None:
+        with _detector_lock:
+            if _detector is None:
+                _detector = UnsupervisedAnomalyDetector()
+    return _detector
+
+
+def __getattr__(name):
+    # Keeps ``from ml_engine.unsupervised_detector import unsupervised_detector`` working
+    if name == "unsupervised_detector":
+        return get_unsupervised_detector()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,127 @@
+"""
+Worker-thread -> event loop hand-off benchmark.
+
+Runs a server event loop in one thread with a few in-memory TOPOLOGY
+subscribers, and emits events from a worker thread the way the threat
+analyzer does:
+
+    asyncio.run   asyncio.run(push_topology_event(...)) per event
+                  (a new event loop created and closed each time)
+    bridge        event_bridge.emit(...) per event
+                  (queued; one call_soon_threadsafe per burst)
+
+Reports worker-side cost per event, how many events reached the hub and
+how many times the server loop was woken up.
+
+Usage:
+    python backend/scripts/benchmark_event_bridge.py [events]
+"""
+import os
+import sys
+import time
+import asyncio
+import threading
+
+# Ensure absolute path to the backend directory is in sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from services.ws_hub import WebSocketHub, TOPOLOGY
+from services.event_bridge import EventBridge
+
+SUBSCRIBERS = 10
+
+
+class NullWebSocket:
+    async def accept(self):
+        pass
+
+    async def send_text(self, text):
+        pass
+
+    async def close(self, code=1000):
+        pass
+
+
+def start_server_loop(hub: WebSocketHub):
+    loop = asyncio.new_event_loop()
+    ready = threading.Event()
+
+    async def setup():
+        for _ in range(SUBSCRIBERS):
+            await hub.connect(NullWebSocket(), [TOPOLOGY])
+        ready.set()
+
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    asyncio.run_coroutine_threadsafe(setup(), loop)
+    ready.wait()
+    return loop, thread
+
+
+def stop_server_loop(hub: WebSocketHub, loop, thread) -> None:
+    async def teardown():
+        for websocket in hub.connections:
+            await hub.disconnect(websocket)
+        await asyncio.sleep(0)
+
+    asyncio.run_coroutine_threadsafe(teardown(), loop).result()
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    loop.close()
+
+
+def wait_for(predicate, timeout=30.0):
+    deadline = time.perf_counter() + timeout
+    while not predicate() and time.perf_counter() < deadline:
+        time.sleep(0.001)
+
+
+def run_asyncio_run(events: int) -> dict:
+    hub = WebSocketHub()
+    loop, thread = start_server_loop(hub)
+
+    async def push(i):
+        hub.publish(TOPOLOGY, "THREAT_DETECTED", {"attacker_ip": "203.0.113.7", "n": i})
+
+    started = time.perf_counter()
+    for i in range(events):
+        asyncio.run(push(i))
+    worker = time.perf_counter() - started
+    wait_for(lambda: hub.published_total >= events)
+
+    stop_server_loop(hub, loop, thread)
+    return {"worker_s": worker, "published": hub.published_total, "wakeups": events, "loops_created": events}
+
+
+def run_bridge(events: int) -> dict:
+    hub = WebSocketHub()
+    loop, thread = start_server_loop(hub)
+    bridge = EventBridge(hub, max_pending=events)
+    bridge.bind(loop)
+
+    started = time.perf_counter()
+    for i in range(events):
+        bridge.emit(TOPOLOGY, "THREAT_DETECTED", {"attacker_ip": "203.0.113.7", "n": i})
+    worker = time.perf_counter() - started
+    wait_for(lambda: hub.published_total >= events)
+
+    stop_server_loop(hub, loop, thread)
+    return {"worker_s": worker, "published": hub.published_total, "wakeups": bridge.wakeups_total, "loops_created": 0}
+
+
+def run_benchmark(events: int = 20000) -> None:
+    results = [("asyncio.run", run_asyncio_run(events)), ("bridge", run_bridge(events))]
+    baseline = results[0][1]["worker_s"]
+
+    print(f"{events} events from one worker thread, {SUBSCRIBERS} subscribers")
+    print(f"{'path':>12} | {'us/event':>9} | {'speedup':>7} | {'published':>9} | {'wakeups':>8} | {'loops':>6}")
+    print("-" * 68)
+    for name, r in results:
+        print(
+            f"{name:>12} | {r['worker_s'] / events * 1e6:>9.2f} | {baseline / r['worker_s']:>6.1f}x | "
+            f"{r['published']:>9} | {r['wakeups']:>8} | {r['loops_created']:>6}"
+        )
+
+
+if __name__ == "__main__":
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
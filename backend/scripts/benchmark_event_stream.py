@@ -0,0 +1,143 @@
+"""
+Live event stream load test.
+
+Feeds scored events into the event stream broadcaster at a fixed rate from
+a worker thread (as the threat analyzer does) while N dashboard clients
+are connected to a WebSocketHub on a server loop in another thread.
+
+The old poller read at most 5 new rows every 3 seconds (~1.7 events/s)
+no matter how many arrived. This checks that at high ingest rates every
+event is either forwarded or accounted for in a suppressed summary, and
+that no client receives more than its per-client cap.
+
+Usage:
+    python backend/scripts/benchmark_event_stream.py [events_per_s] [seconds] [clients]
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import threading
+from datetime import datetime
+from types import SimpleNamespace
+
+# Ensure absolute path to the backend directory is in sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from services.ws_hub import WebSocketHub, EVENT_STREAM, WS_CLIENT_MAX_EVENTS_PER_S
+from services.event_bridge import EventBridge
+from services.event_stream import EventStreamBroadcaster, EVENT_STREAM_MAX_RATE
+
+BATCH_SIZE = 100  # ThreatAnalyzerService scoring batch
+POLL_EVENTS_PER_S = 5 / 3
+
+
+class CountingClient:
+    def __init__(self):
+        self.events = 0
+        self.critical = 0
+        self.suppressed_notices = 0
+        self.summaries = 0
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text):
+        data = json.loads(text)
+        for message in data["payload"] if data["type"] == "BATCH" else [data]:
+            if message["type"] in ("EVENT_STREAM", "THREAT_ALERT"):
+                self.events += 1
+                self.critical += message["payload"]["threat_level"] == "CRITICAL"
+            elif message["type"] == "EVENTS_SUPPRESSED":
+                self.suppressed_notices += 1
+            else:
+                self.summaries += 1
+
+    async def close(self, code=1000):
+        pass
+
+
+def make_log(i):
+    return SimpleNamespace(
+        id=i,
+        src_ip=f"203.0.113.{i % 250}",
+        dst_ip="10.0.0.5",
+        protocol="TCP",
+        length=60 + i % 1400,
+        threat_score=(i % 100) / 100,
+        threat_level="CRITICAL" if i % 500 == 0 else "LOW",
+        attack_type="BENIGN",
+        timestamp=datetime.utcnow(),
+        src_port=40000 + i % 20000,
+        country="Unknown",
+    )
+
+
+def run_benchmark(rate: int = 10000, seconds: float = 5.0, clients: int = 100) -> None:
+    hub = WebSocketHub()
+    loop = asyncio.new_event_loop()
+    server = threading.Thread(target=loop.run_forever, daemon=True)
+    server.start()
+    dashboards = [CountingClient() for _ in range(clients)]
+
+    async def setup():
+        for client in dashboards:
+            await hub.connect(client, [EVENT_STREAM])
+
+    asyncio.run_coroutine_threadsafe(setup(), loop).result()
+    bridge = EventBridge(hub, max_pending=rate)
+    bridge.bind(loop)
+    stream = EventStreamBroadcaster(bridge)
+
+    started = time.perf_counter()
+    produced = 0
+    busy = 0.0
+    while time.perf_counter() - started < seconds:
+        due = int((time.perf_counter() - started) * rate)
+        while produced + BATCH_SIZE <= due:
+            t0 = time.perf_counter()
+            stream.observe_logs([make_log(produced + i) for i in range(BATCH_SIZE)])
+            busy += time.perf_counter() - t0
+            produced += BATCH_SIZE
+        time.sleep(0.005)
+    elapsed = time.perf_counter() - started
+    # One more batch after the summary interval flushes the last window
+    time.sleep(stream.summary_interval)
+    stream.observe_logs([])
+    time.sleep(0.5)
+
+    async def teardown():
+        for websocket in hub.connections:
+            await hub.disconnect(websocket)
+        await asyncio.sleep(0)
+
+    asyncio.run_coroutine_threadsafe(teardown(), loop).result()
+    loop.call_soon_threadsafe(loop.stop)
+    server.join()
+    loop.close()
+
+    stats = stream.stats
+    per_client = [c.events for c in dashboards]
+    critical = sum(1 for i in range(produced) if i % 500 == 0)
+    print(f"{produced / elapsed:.0f} events/s for {seconds:.0f}s, {clients} clients "
+          f"(stream cap {EVENT_STREAM_MAX_RATE:.0f}/s, client cap {WS_CLIENT_MAX_EVENTS_PER_S:.0f}/s)")
+    print(f"old DB poller       : {POLL_EVENTS_PER_S:.1f} events/s max, no suppressed count")
+    print(f"observed            : {stats['observed_total']}")
+    print(f"forwarded           : {stats['forwarded_total']} "
+          f"({stats['forwarded_total'] / elapsed:.0f}/s)")
+    print(f"suppressed (summary): {stats['suppressed_total']}")
+    print(f"accounted for       : {stats['forwarded_total'] + stats['suppressed_total'] == produced}")
+    print(f"per client          : min {min(per_client)}, max {max(per_client)} events "
+          f"({max(per_client) / elapsed:.0f}/s), critical {min(c.critical for c in dashboards)}/{critical}")
+    print(f"hub rate-limited    : {hub.stats['rate_limited_total']} "
+          f"(notices per client: {dashboards[0].suppressed_notices})")
+    print(f"producer cost       : {busy / produced * 1e6:.2f} us/event")
+
+
+if __name__ == "__main__":
+    run_benchmark(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 10000,
+        float(sys.argv[2]) if len(sys.argv) > 2 else 5.0,
+        int(sys.argv[3]) if len(sys.argv) > 3 else 100,
+    )
@@ -0,0 +1,59 @@
+"""
+FeatureExtractor per-event cost benchmark.
+
+Feeds a single long-lived attacker IP through FeatureExtractor and reports
+the mean per-event latency for each history segment. With the streaming
+state the cost should stay flat as the history grows. The same events are
+then pushed through the vectorized extract_batch path for comparison.
+
+Usage:
+    python backend/scripts/benchmark_feature_extractor.py [total_events]
+"""
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+# Ensure absolute path to the backend directory is in sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from ml.feature_extractor import FeatureExtractor
+
+SEGMENT = 10000
+
+
+def run_benchmark(total_events: int = 100000) -> None:
+    extractor = FeatureExtractor()
+    base = datetime(2026, 1, 1)
+    events = [
+        {
+            "src_ip": "203.0.113.7",
+            "dst_ip": f"10.0.0.{i % 32}",
+            "dst_port": 22,
+            "protocol": "TCP",
+            "length": 60 + (i % 200),
+            "attack_type": "bruteforce" if i % 3 else "scan",
+            "is_malicious": i % 5 == 0,
+            "timestamp": base + timedelta(milliseconds=100 * i),
+        }
+        for i in range(total_events)
+    ]
+
+    print(f"{'history':>10} | {'us/event':>9}")
+    print("-" * 23)
+    for offset in range(0, total_events, SEGMENT):
+        segment = events[offset : offset + SEGMENT]
+        start = time.perf_counter()
+        for event in segment:
+            extractor.extract_features(event)
+        elapsed = time.perf_counter() - start
+        print(f"{offset + len(segment):>10} | {elapsed / len(segment) * 1e6:>9.2f}")
+
+    start = time.perf_counter()
+    FeatureExtractor().extract_batch(events)
+    elapsed = time.perf_counter() - start
+    print(f"{'batch':>10} | {elapsed / total_events * 1e6:>9.2f}")
+
+
+if __name__ == "__main__":
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,132 @@
+"""
+Prediction cache per-event overhead benchmark.
+
+Compares the cache bookkeeping score_threat_batch pays per event, excluding
+inference:
+
+    json    key = md5(json.dumps(model_dump(exclude=timestamp), sort_keys))
+            value = ThreatResponse JSON, decoded with json.loads + validation
+    binary  key = model version + quantized feature vector (local) /
+            xxh3-128 of it (Redis); value = (score, confidence) struct,
+            level / decision mapped per input
+
+Each scheme runs the key-building and the hit path over the same batches of
+events (500 per poll by default), so the result is microseconds per event.
+Feature extraction is excluded: the feature-keyed cache needs the vectors,
+but scoring extracts them for every event anyway to keep per-IP state
+current.
+
+Usage:
+    python backend/scripts/benchmark_prediction_cache.py [events] [batch]
+"""
+import os
+import sys
+import hashlib
+import json
+import time
+
+import numpy as np
+
+# Ensure absolute path to the backend directory is in sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from schemas.threat_schema import ThreatInput, ThreatResponse
+import ml.threat_scoring_service as tss
+
+REPEATS = 5
+
+
+def make_inputs(count: int):
+    return [
+        ThreatInput(
+            src_ip=f"203.0.113.{i % 250}",
+            dst_ip="10.0.0.5",
+            dst_port=(22, 80, 443, 2121)[i % 4],
+            protocol="TCP",
+            length=60 + i % 1400,
+            timestamp="2026-03-14T03:00:00Z",
+            threat_score=float(i % 100),
+            attack_type="bruteforce",
+            honeypot_type="SSH",
+        )
+        for i in range(count)
+    ]
+
+
+def json_scheme(batch, store):
+    keys = [
+        "pred_cache:" + hashlib.md5(
+            json.dumps(inp.model_dump(exclude={"timestamp"}), sort_keys=True).encode()
+        ).hexdigest()
+        for inp in batch
+    ]
+    return [ThreatResponse(**json.loads(store[k])) for k in keys]
+
+
+def binary_local_scheme(batch, store):
+    inputs, matrix = batch
+    keys = tss.feature_cache_keys(matrix, "bench")
+    return [tss._build_response(*tss.unpack_prediction(store[k]), inp) for k, inp in zip(keys, inputs)]
+
+
+def binary_redis_scheme(batch, store):
+    inputs, matrix = batch
+    keys = [tss.redis_cache_key(k) for k in tss.feature_cache_keys(matrix, "bench")]
+    return [tss._build_response(*tss.unpack_prediction(store[k]), inp) for k, inp in zip(keys, inputs)]
+
+
+def build_stores(inputs, matrix, response):
+    json_store, local_store, redis_store = {}, {}, {}
+    packed = tss.pack_prediction(response.score, response.confidence)
+    for inp in inputs:
+        event_str = json.dumps(inp.model_dump(exclude={"timestamp"}), sort_keys=True)
+        json_store["pred_cache:" + hashlib.md5(event_str.encode()).hexdigest()] = response.model_dump_json()
+    for key in tss.feature_cache_keys(matrix, "bench"):
+        local_store[key] = packed
+        redis_store[tss.redis_cache_key(key)] = packed
+    return json_store, local_store, redis_store
+
+
+def time_scheme(fn, inputs, store, batch_size, matrix=None):
+    best = float("inf")
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        for offset in range(0, len(inputs), batch_size):
+            batch = inputs[offset : offset + batch_size]
+            if matrix is not None:
+                batch = (batch, matrix[offset : offset + batch_size])
+            fn(batch, store)
+        best = min(best, time.perf_counter() - start)
+    return best / len(inputs) * 1e6
+
+
+def run_benchmark(events: int = 20000, batch_size: int = 500) -> None:
+    inputs = make_inputs(events)
+    rng = np.random.default_rng(7)
+    matrix = rng.random((events, len(tss.FeatureExtractor.FEATURE_NAMES))) * 100
+    response = ThreatResponse(score=0.87, threat_level="HIGH", confidence=0.91, decision="BLOCK")
+    json_store, local_store, redis_store = build_stores(inputs, matrix, response)
+
+    results = [
+        ("json (before)", time_scheme(json_scheme, inputs, json_store, batch_size)),
+        ("binary local", time_scheme(binary_local_scheme, inputs, local_store, batch_size, matrix)),
+        ("binary redis", time_scheme(binary_redis_scheme, inputs, redis_store, batch_size, matrix)),
+    ]
+    baseline = results[0][1]
+
+    print(f"{events} events, batches of {batch_size}, xxhash={'yes' if tss.xxhash else 'no (blake2b)'}")
+    print(f"{'scheme':>14} | {'us/event':>9} | {'speedup':>7}")
+    print("-" * 37)
+    for name, us in results:
+        print(f"{name:>14} | {us:>9.2f} | {baseline / us:>6.1f}x")
+    print(
+        f"value size: json={len(response.model_dump_json())} bytes, "
+        f"binary={len(tss.pack_prediction(response.score, response.confidence))} bytes"
+    )
+
+
+if __name__ == "__main__":
+    run_benchmark(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 20000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 500,
+    )
@@ -0,0 +1,117 @@
+"""
+Training fetch benchmark: ORM rows vs column projection.
+
+Builds a throwaway SQLite database with N packet_logs rows (feature vectors
+already stored, as they are once events have been scored) and loads the
+retraining input both ways:
+
+    orm        db.query(PacketLog).all() + feature_store.vectors_for_logs
+    projection fetch_events(VECTOR_FIELDS + attack_type) + vectors_for_events
+
+Reports wall time and peak Python memory (tracemalloc, separate run) for each.
+
+Usage:
+    python backend/scripts/benchmark_training_fetch.py [rows]
+"""
+import os
+import sys
+import time
+import tempfile
+import tracemalloc
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+# Ensure absolute path to the backend directory is in sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from database.models import Base, PacketLog
+from database.projections import fetch_events
+from ml.feature_extractor import FeatureExtractor
+from ml.feature_store import FeatureStore, VECTOR_FIELDS
+
+INSERT_BATCH = 50000
+
+
+def seed(engine, rows: int) -> None:
+    rng = np.random.default_rng(0)
+    vectors = rng.random((INSERT_BATCH, len(FeatureExtractor.FEATURE_NAMES))).astype("<f4")
+    start = datetime.utcnow() - timedelta(days=1)
+    with engine.begin() as connection:
+        for offset in range(0, rows, INSERT_BATCH):
+            connection.execute(
+                insert(PacketLog),
+                [
+                    {
+                        "timestamp": start + timedelta(milliseconds=i),
+                        "src_ip": f"203.0.113.{i % 250}",
+                        "dst_ip": "10.0.0.5",
+                        "src_port": 40000 + i % 20000,
+                        "dst_port": (22, 80, 443)[i % 3],
+                        "protocol": "TCP",
+                        "length": 60 + i % 1400,
+                        "attack_type": "BENIGN" if i % 4 else "BRUTE_FORCE",
+                        "threat_score": (i % 100) / 100,
+                        "threat_level": "LOW",
+                        "country": "Unknown",
+                        "feature_vector": vectors[i % INSERT_BATCH].tobytes(),
+                    }
+                    for i in range(offset, min(rows, offset + INSERT_BATCH))
+                ],
+            )
+
+
+def measure(label, fn):
+    # Timed and traced separately: tracemalloc slows allocation-heavy code
+    started = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - started
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<11}: {elapsed:6.2f} s, peak {peak / 2**20:7.1f} MiB")
+    return result, elapsed, peak
+
+
+def run_benchmark(rows: int = 500000) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'fetch.db')}")
+        Base.metadata.create_all(bind=engine)
+        seed(engine, rows)
+        Session = sessionmaker(bind=engine)
+        cutoff = datetime.utcnow() - timedelta(days=30)
+
+        def orm():
+            db = Session()
+            try:
+                logs = db.query(PacketLog).filter(PacketLog.timestamp >= cutoff).all()
+                matrix = FeatureStore(FeatureExtractor()).vectors_for_logs(logs)
+                labels = [1 if log.attack_type and log.attack_type != "BENIGN" else 0 for log in logs]
+                return matrix, labels
+            finally:
+                db.close()
+
+        def projection():
+            db = Session()
+            try:
+                events = fetch_events(db, VECTOR_FIELDS + ("attack_type",), PacketLog.timestamp >= cutoff)
+                matrix = FeatureStore(FeatureExtractor()).vectors_for_events(events)
+                labels = [1 if a and a != "BENIGN" else 0 for a in events["attack_type"]]
+                return matrix, labels
+            finally:
+                db.close()
+
+        print(f"{rows} rows, feature vectors stored")
+        (old_matrix, old_labels), old_time, old_peak = measure("orm", orm)
+        (new_matrix, new_labels), new_time, new_peak = measure("projection", projection)
+        engine.dispose()
+
+    print(f"speedup    : {old_time / new_time:.1f}x time, {old_peak / new_peak:.1f}x memory")
+    print(f"identical  : {np.array_equal(old_matrix, new_matrix) and old_labels == new_labels}")
+
+
+if __name__ == "__main__":
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 500000)
@@ -0,0 +1,150 @@
+"""
+WebSocket hub fan-out load test.
+
+Connects N in-memory dashboard clients to a WebSocketHub and publishes
+EVENT_STREAM events at a fixed rate, plus a LIVE_METRICS snapshot every
+2 seconds, as the API does. A few clients never finish a send (stalled
+browsers); they must be disconnected without slowing anyone else down.
+
+Reports:
+    - events published per second and events delivered per second (all clients)
+    - delivery ratio for the healthy clients (1.0 = nothing dropped)
+    - publish -> receive latency p50 / p99, measured by probe clients
+    - slow consumers disconnected
+
+Clients are in-memory (send_text yields to the loop once), so the numbers
+are the hub's own cost: serialization, queueing and per-client sends.
+
+Usage:
+    python backend/scripts/benchmark_ws_hub.py [clients] [events_per_s] [seconds]
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+
+import numpy as np
+
+# Ensure absolute path to the backend directory is in sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from services.ws_hub import WebSocketHub, EVENT_STREAM, LIVE_METRICS
+
+STALLED_CLIENTS = 5
+PROBE_CLIENTS = 5
+
+
+class FakeClient:
+    def __init__(self, loop, probe=False, stalled=False):
+        self.loop = loop
+        self.probe = probe
+        self.stalled = stalled
+        self.frames = 0
+        self.latencies = []
+        self.closed_with = None
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text):
+        if self.stalled:
+            await asyncio.Event().wait()
+        self.frames += 1
+        if self.probe:
+            now = self.loop.time()
+            data = json.loads(text)
+            for message in data["payload"] if data["type"] == "BATCH" else [data]:
+                self.latencies.append(now - message["timestamp"])
+        await asyncio.sleep(0)
+
+    async def close(self, code=1000):
+        self.closed_with = code
+
+
+def make_event(i):
+    return {
+        "id": i,
+        "src_ip": f"203.0.113.{i % 250}",
+        "dst_ip": "10.0.0.5",
+        "protocol": "TCP",
+        "length": 60 + i % 1400,
+        "threat_score": (i % 100) / 100,
+        "threat_level": "LOW",
+        "attack_type": "BENIGN",
+        "timestamp": "2026-03-14T03:00:00",
+        "src_port": 40000 + i % 20000,
+        "country": "Unknown",
+    }
+
+
+async def run_load(clients: int, rate: int, seconds: float) -> dict:
+    loop = asyncio.get_running_loop()
+    # No per-client cap: this measures raw fan-out
+    hub = WebSocketHub(send_timeout=1.0, client_max_rate=0)
+    healthy = [FakeClient(loop, probe=i < PROBE_CLIENTS) for i in range(clients)]
+    stalled = [FakeClient(loop, stalled=True) for _ in range(STALLED_CLIENTS)]
+    for client in healthy + stalled:
+        await hub.connect(client, [EVENT_STREAM, LIVE_METRICS])
+
+    tick = 0.01
+    published = 0
+    started = loop.time()
+    next_metrics = started
+    while loop.time() - started < seconds:
+        due = int((loop.time() - started) * rate)
+        while published < due:
+            hub.publish(EVENT_STREAM, "EVENT_STREAM", make_event(published))
+            published += 1
+        if loop.time() >= next_metrics:
+            hub.publish(LIVE_METRICS, "LIVE_METRICS", {"totalEvents": published})
+            next_metrics += 2.0
+        await asyncio.sleep(tick)
+    publish_elapsed = loop.time() - started
+
+    # Let queues drain
+    await asyncio.sleep(max(0.5, hub.flush_interval * 4))
+    elapsed = loop.time() - started
+    latencies = np.array([lat for c in healthy if c.probe for lat in c.latencies]) * 1000
+    stats = hub.stats
+    for client in list(hub.connections):
+        await hub.disconnect(client)
+
+    return {
+        "published": published,
+        "publish_elapsed": publish_elapsed,
+        "elapsed": elapsed,
+        "delivered": stats["messages_sent_total"],
+        "frames": stats["frames_sent_total"],
+        "expected": published * clients,
+        "p50_ms": float(np.percentile(latencies, 50)) if len(latencies) else 0.0,
+        "p99_ms": float(np.percentile(latencies, 99)) if len(latencies) else 0.0,
+        "slow_disconnects": sum(1 for c in stalled if c.closed_with is not None),
+        "dropped": stats["dropped_total"],
+    }
+
+
+def run_benchmark(clients: int = 1000, rate: int = 1000, seconds: float = 10.0) -> None:
+    wall = time.perf_counter()
+    r = asyncio.run(run_load(clients, rate, seconds))
+    wall = time.perf_counter() - wall
+
+    # LIVE_METRICS snapshots are counted in delivered but not in expected
+    ratio = min(1.0, r["delivered"] / r["expected"]) if r["expected"] else 0.0
+    print(f"{clients} clients (+{STALLED_CLIENTS} stalled), {rate} events/s for {seconds:.0f}s")
+    print(f"published        : {r['published'] / r['publish_elapsed']:.0f} events/s")
+    print(f"delivered        : {r['delivered'] / r['elapsed']:.0f} events/s "
+          f"in {r['frames'] / r['elapsed']:.0f} frames/s")
+    print(f"delivery ratio   : {ratio:.4f}")
+    print(f"latency          : p50 {r['p50_ms']:.1f} ms, p99 {r['p99_ms']:.1f} ms")
+    print(f"slow disconnects : {r['slow_disconnects']}/{STALLED_CLIENTS} "
+          f"({r['dropped']} frames dropped)")
+    print(f"wall time        : {wall:.1f}s")
+
+
+if __name__ == "__main__":
+    run_benchmark(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 1000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 1000,
+        float(sys.argv[3]) if len(sys.argv) > 3 else 10.0,
+    )
@@ -0,0 +1,115 @@
+"""
+API cold-start import-time check.
+
+Imports backend/main.py in a fresh interpreter under ``python -X importtime``
+and reports:
+
+    - cumulative import time of ``main`` (best of N runs), against a budget
+      derived from a bare ``import fastapi, sqlalchemy`` on the same machine
+    - the slowest modules imported directly by main
+    - heavy stacks that must stay out of the import path (ML, packet capture,
+      explainability, STIX / PDF rendering, Redis / MLflow clients); they are
+      imported by lazily registered routers or on first use
+
+Exits non-zero if a heavy stack is imported, so it can run as a CI gate.
+Import time depends on the runner, so going over the budget is reported as
+a warning only.
+
+Usage:
+    python backend/scripts/check_import_time.py [budget_ms] [runs]
+
+The budget defaults to IMPORT_TIME_BUDGET_MS when set, otherwise to
+IMPORT_TIME_FACTOR (3.0) times the framework baseline.
+"""
+import os
+import sys
+import subprocess
+from typing import Optional
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+IMPORT_TIME_BUDGET_MS = float(os.getenv("IMPORT_TIME_BUDGET_MS", "0")) or None
+IMPORT_TIME_FACTOR = float(os.getenv("IMPORT_TIME_FACTOR", "3.0"))
+
+# What any FastAPI + SQLAlchemy app pays before importing its own code
+BASELINE_MODULES = ("fastapi", "sqlalchemy")
+
+HEAVY_MODULES = (
+    "pandas", "sklearn", "scipy", "scapy", "tensorflow", "keras", "shap",
+    "matplotlib", "stix2", "xhtml2pdf", "reportlab", "jinja2", "redis",
+    "mlflow", "pymisp", "geoip2",
+)
+
+
+def measure_import(*modules: str) -> dict:
+    """One cold import of ``modules`` (default main): cumulative ms, per-module timings, top-level packages."""
+    modules = modules or ("main",)
+    statement = f"import {', '.join(modules)}"
+    env = dict(os.environ, ENVIRONMENT=os.getenv("ENVIRONMENT", "test"))
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"{statement} failed:\n{proc.stderr[-2000:]}")
+
+    timings = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        # "import time: <self us> | <cumulative us> | <indent><module>"
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        self_us = int(self_us)
+        name = name[1:]
+        depth = (len(name) - len(name.lstrip())) // 2
+        timings.append((name.strip(), depth, self_us, int(cumulative_us)))
+
+    total = sum(cum for name, depth, _, cum in timings if name in modules and depth == 0)
+    return {
+        "total_ms": total / 1000,
+        # Direct imports of the module (depth 1 in importtime's tree)
+        "direct": sorted(
+            ((name, cum / 1000) for name, depth, _, cum in timings if depth == 1),
+            key=lambda item: item[1], reverse=True,
+        ),
+        "packages": {name.split(".")[0] for name, _, _, _ in timings},
+    }
+
+
+def check_import_time(budget_ms: Optional[float] = IMPORT_TIME_BUDGET_MS, runs: int = 3, top: int = 10) -> bool:
+    runs = max(1, runs)
+    results = [measure_import() for _ in range(runs)]
+    best = min(results, key=lambda r: r["total_ms"])
+    heavy = sorted(best["packages"].intersection(HEAVY_MODULES))
+
+    if budget_ms is None:
+        baseline_ms = min(measure_import(*BASELINE_MODULES)["total_ms"] for _ in range(runs))
+        budget_ms = baseline_ms * IMPORT_TIME_FACTOR
+        print(f"import {', '.join(BASELINE_MODULES)}: best {baseline_ms:.0f} ms, "
+              f"budget {IMPORT_TIME_FACTOR:g}x = {budget_ms:.0f} ms")
+
+    runs_ms = ", ".join(f"{r['total_ms']:.0f}" for r in results)
+    print(f"import main: best {best['total_ms']:.0f} ms of {len(results)} runs "
+          f"({runs_ms} ms), budget {budget_ms:.0f} ms")
+    print(f"\n{'slowest direct imports':<40} {'ms':>8}")
+    print("-" * 49)
+    for name, ms in best["direct"][:top]:
+        print(f"{name:<40} {ms:>8.1f}")
+
+    ok = True
+    if heavy:
+        print(f"\nFAIL: heavy modules imported at startup: {', '.join(heavy)}")
+        ok = False
+    if best["total_ms"] > budget_ms:
+        print(f"\nWARN: import main took {best['total_ms']:.0f} ms (budget {budget_ms:.0f} ms)")
+    if ok:
+        print("\nPASS")
+    return ok
+
+
+if __name__ == "__main__":
+    passed = check_import_time(
+        float(sys.argv[1]) if len(sys.argv) > 1 else IMPORT_TIME_BUDGET_MS,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 3,
+    )
+    sys.exit(0 if passed else 1)
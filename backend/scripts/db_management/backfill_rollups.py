@@ -0,0 +1,49 @@
+"""
+Backfill / verify packet_log_rollups.
+
+Rebuilds the per-minute rollup tables used by StatsService from packet_logs,
+or (with --check) only compares them against a direct aggregate.
+
+Usage:
+    python backend/scripts/db_management/backfill_rollups.py           # rebuild
+    python backend/scripts/db_management/backfill_rollups.py --check   # verify only
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from database.database import SessionLocal, engine
+from database.models import Base
+from database.rollups import rollup_store
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--check", action="store_true", help="only run the consistency check")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        if not args.check:
+            print("🔄 Rebuilding packet_log_rollups from packet_logs...")
+            rollup_store.rebuild(db)
+            print("✅ Rollups rebuilt.")
+
+        report = rollup_store.check_consistency(db)
+        if report["consistent"]:
+            print("✅ Rollups are consistent with packet_logs.")
+            return 0
+
+        print("❌ Rollups drifted from packet_logs:")
+        for name, (expected, actual) in report["mismatches"].items():
+            print(f"   - {name}: expected {expected}, rollups {actual}")
+        return 1
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
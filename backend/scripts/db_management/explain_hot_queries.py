@@ -0,0 +1,74 @@
+"""
+EXPLAIN the hot packet_logs queries and fail on sequential scans.
+
+Runs every query registered in database/query_plans.py through the service
+code that issues it and checks the captured plans. By default it seeds a
+standalone SQLite database with 5M synthetic rows (reused on later runs);
+pass --database-url to check an existing database instead (no seeding).
+
+Usage:
+    python backend/scripts/db_management/explain_hot_queries.py
+    python backend/scripts/db_management/explain_hot_queries.py --rows 500000 --verbose
+    python backend/scripts/db_management/explain_hot_queries.py --database-url postgresql://...
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from database.database import upgrade_db_schema
+from database.models import Base, PacketLog
+from database.query_plans import check_query_plans, seed_packet_logs
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=5_000_000, help="rows to seed (default 5M)")
+    parser.add_argument(
+        "--db-file",
+        default=os.path.join(tempfile.gettempdir(), "phantomnet_explain.db"),
+        help="seeded SQLite database file",
+    )
+    parser.add_argument("--database-url", help="check this database instead of a seeded one")
+    parser.add_argument("--verbose", action="store_true", help="print every plan")
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url or f"sqlite:///{args.db_file}")
+    Base.metadata.create_all(bind=engine)
+    upgrade_db_schema(engine)
+    db = sessionmaker(bind=engine)()
+    try:
+        if not args.database_url:
+            existing = db.query(PacketLog).count()
+            if existing < args.rows:
+                print(f"🌱 Seeding {args.rows - existing:,} rows into {args.db_file}...")
+                seed_packet_logs(db, args.rows - existing)
+
+        report = check_query_plans(db)
+        for name, query in report["queries"].items():
+            if "skipped" in query:
+                print(f"⏭️  {name}: skipped ({query['skipped']})")
+                continue
+            status = "❌" if any(s["full_scans"] for s in query["statements"]) else "✅"
+            print(f"{status} {name} ({query['source']}, {len(query['statements'])} statements)")
+            if args.verbose or status == "❌":
+                for statement in query["statements"]:
+                    for line in statement["plan"]:
+                        print(f"     {line}")
+
+        if report["failures"]:
+            print(f"❌ {len(report['failures'])} plan(s) degraded to a sequential scan.")
+            return 1
+        print("✅ All hot queries use indexes.")
+        return 0
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
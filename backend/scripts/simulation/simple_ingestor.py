@@ -15,6 +15,11 @@ from dotenv import load_dotenv
 # Import your actual models
 from database.models import Base, PacketLog
 
+# Push ingested rows to the threat analyzer (crosses processes when
+# INGESTION_REDIS_STREAM_ENABLED=true, otherwise the API's reconcile sweep
+# picks them up)
+from services.ingestion_queue import ingestion_queue
+
 # Setup Logging
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
@@ -117,7 +122,11 @@ def ingest_logs():
                         count += 1
 
                 if count > 0:
+                    pending = list(db.new)
+                    db.flush()
+                    log_ids = [entry.id for entry in pending]
                     db.commit()
+                    ingestion_queue.publish_many(log_ids)
                     logger.info(f"Ingested {count} {proto} logs.")
 
     except Exception as e:
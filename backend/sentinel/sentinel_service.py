@@ -317,9 +317,11 @@ class SentinelService:
         source_ips: List[str],
         target_ports: List[int],
         time_range: Optional[Dict[str, Any]] = None,
-    ) -> List[PacketLog]:
+    ) -> List[Any]:
         """Query PacketLog rows that match the campaign's source IPs and ports.
 
+        Only the columns later steps read are selected (no ORM objects).
+
         Args:
             source_ips:   List of attacker source IP strings.
             target_ports: List of destination port integers.
@@ -327,9 +329,11 @@ class SentinelService:
                           (ISO-8601 strings or datetime objects).
 
         Returns:
-            List of matching PacketLog ORM objects.
+            List of rows with ``id``, ``threat_score`` and ``detected_signatures``.
         """
-        query = self.db.query(PacketLog).filter(
+        query = self.db.query(
+            PacketLog.id, PacketLog.threat_score, PacketLog.detected_signatures,
+        ).filter(
             PacketLog.src_ip.in_(source_ips),
         )
 
@@ -489,13 +493,13 @@ class SentinelService:
     # ------------------------------------------------------------------
     def _store_signatures(
         self,
-        packet_logs: List[PacketLog],
+        packet_logs: List[Any],
         signature_names: List[str],
     ) -> int:
         """Write detected signature names into PacketLog.detected_signatures.
 
         Args:
-            packet_logs:     List of PacketLog ORM objects to update.
+            packet_logs:     Rows from ``_query_packet_logs`` (or PacketLog objects).
             signature_names: List of signature name strings to store.
 
         Returns:
@@ -505,15 +509,15 @@ class SentinelService:
             return 0
 
         sig_str = ",".join(sorted(set(signature_names)))
-        updated = 0
-
-        for pkt in packet_logs:
-            if pkt.detected_signatures != sig_str:
-                pkt.detected_signatures = sig_str
-                updated += 1
+        stale_ids = [pkt.id for pkt in packet_logs if pkt.detected_signatures != sig_str]
+        updated = len(stale_ids)
 
         if updated > 0:
             try:
+                # One UPDATE for all rows instead of loading and dirtying each one
+                self.db.query(PacketLog).filter(PacketLog.id.in_(stale_ids)).update(
+                    {PacketLog.detected_signatures: sig_str},
+                )
                 self.db.commit()
                 logger.info(
                     "Stored detected_signatures on %d PacketLog rows: %s",
@@ -530,14 +534,14 @@ class SentinelService:
     # Collect ML anomaly scores from matched packet logs
     # ------------------------------------------------------------------
     @staticmethod
-    def _collect_ml_scores(packet_logs: List[PacketLog]) -> List[float]:
+    def _collect_ml_scores(packet_logs: List[Any]) -> List[float]:
         """Extract all non-None, positive threat_score values from PacketLog rows.
 
         These are used as the ``ml_scores`` input to ``calculate_confidence()``.
         Scores are expected on the 0–100 scale (PacketLog.threat_score convention).
 
         Args:
-            packet_logs: List of PacketLog ORM objects from Step 2 query.
+            packet_logs: Rows from the Step 2 query.
 
         Returns:
             List of float threat scores.  Empty list when no valid scores exist.
@@ -552,7 +556,7 @@ class SentinelService:
     # Extract average threat score from matched logs
     # ------------------------------------------------------------------
     @staticmethod
-    def _avg_threat_score(packet_logs: List[PacketLog]) -> float:
+    def _avg_threat_score(packet_logs: List[Any]) -> float:
         """Compute the average threat_score from matched PacketLog rows."""
         scores = [
             p.threat_score for p in packet_logs
@@ -1,23 +1,114 @@
+"""
+PhantomNet Alert Manager
+========================
+
+Persists security alerts and dispatches automated responses.
+
+Two entry points:
+    submit()        non-blocking. Deduplicates, buffers the alert and
+                    returns; a writer thread bulk-inserts buffered alerts
+                    (one commit per batch) and hands them to the response
+                    worker pool. Used by the correlation / baseline loops so
+                    alert storms never stall detection threads.
+    create_alert()  synchronous insert that returns the Alert row (for
+                    callers that need it, e.g. playbooks). Its response is
+                    dispatched to the same worker pool.
+
+Deduplication keys ("type:source_ip") live in a bounded TTL cache
+(services.memory_cache) that expires them with the deduplication window,
+so memory is bounded by the alert rate, not by the number of IPs ever seen.
+
+Configuration (env):
+    ALERT_BATCH_SIZE            alerts per bulk insert (default 200)
+    ALERT_FLUSH_INTERVAL_MS     max time an alert waits in the buffer (default 200)
+    ALERT_MAX_QUEUE             buffered alerts before submit() drops (default 50000)
+    ALERT_RESPONSE_WORKERS      automated response worker threads (default 4)
+"""
+
+import os
+import time
+import atexit
 import logging
 import json
-from datetime import datetime, timedelta
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 from typing import Optional, Dict, Any
 from sqlalchemy.orm import Session
 from database.database import SessionLocal
 from database.models import Alert
+from services.memory_cache import ShardedTTLCache
 
 logger = logging.getLogger("alert_manager")
 
+ALERT_BATCH_SIZE = int(os.getenv("ALERT_BATCH_SIZE", 200))
+ALERT_FLUSH_INTERVAL_MS = int(os.getenv("ALERT_FLUSH_INTERVAL_MS", 200))
+ALERT_MAX_QUEUE = int(os.getenv("ALERT_MAX_QUEUE", 50000))
+ALERT_RESPONSE_WORKERS = int(os.getenv("ALERT_RESPONSE_WORKERS", 4))
+DEDUP_MAX_KEYS = 200000
+DEDUP_MAX_BYTES = int(os.getenv("ALERT_DEDUP_MAX_BYTES", 16 * 1024 * 1024))
+
 
 class AlertManager:
-    def __init__(self, deduplication_window: int = 300):
+    def __init__(
+        self,
+        deduplication_window: int = 300,
+        batch_size: int = ALERT_BATCH_SIZE,
+        flush_interval_ms: int = ALERT_FLUSH_INTERVAL_MS,
+        max_queue: int = ALERT_MAX_QUEUE,
+        response_workers: int = ALERT_RESPONSE_WORKERS,
+        session_factory=None,
+    ):
         """
         :param deduplication_window: Time in seconds to ignore duplicate alerts (default 5 mins)
+        :param batch_size: Alerts written per bulk insert
+        :param flush_interval_ms: Max time a submitted alert waits before a partial batch is written
+        :param max_queue: Buffered alerts before submit() starts dropping
+        :param response_workers: Threads running automated responses
+        :param session_factory: Session factory (default: database.SessionLocal)
         """
         self.deduplication_window = deduplication_window
-        self._last_alerts: Dict[str, datetime] = (
-            {}
-        )  # Key: "type:source_ip", Value: last_timestamp
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = max(0.001, flush_interval_ms / 1000.0)
+        self.max_queue = max_queue
+        self.response_workers = max(1, response_workers)
+        self.max_pending_responses = self.max_queue
+        self.session_factory = session_factory
+
+        # Key: "type:source_ip", Value: last_timestamp (oldest first)
+        self._last_alerts = ShardedTTLCache(
+            "alert_dedup",
+            max_entries=DEDUP_MAX_KEYS,
+            default_ttl=deduplication_window,
+            max_bytes=DEDUP_MAX_BYTES,
+        )
+
+        self._pending = deque()
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._writer = None
+        self._stopping = False
+
+        self._responses = None
+        self._responses_lock = threading.Lock()
+        self._responses_pending = 0
+
+        # Metrics
+        self.submitted_total = 0
+        self.persisted_total = 0
+        self.deduplicated_total = 0
+        self.dropped_total = 0
+        self.responses_dropped_total = 0
+        self.last_flush_ms = 0.0
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._pending)
+
+    # --------------------------------------------------
+    # Synchronous API
+    # --------------------------------------------------
 
     def create_alert(
         self,
@@ -30,81 +121,285 @@ class AlertManager:
         """
         Creates and saves a security alert with deduplication logic.
         """
-        if self._is_duplicate(alert_type, source_ip):
+        if not self._claim(alert_type, source_ip):
             logger.debug(f"Deduplicating alert: {alert_type} from {source_ip}")
             return None
 
-        db: Session = SessionLocal()
+        db: Session = (self.session_factory or SessionLocal)()
         try:
-            # Convert details to JSON string if it's a dict/list
-            details_str = details
-            if isinstance(details, (dict, list)):
-                details_str = json.dumps(details)
-
-            new_alert = Alert(
-                level=level,
-                type=alert_type,
-                source_ip=source_ip,
-                description=description,
-                details=details_str,
-                timestamp=datetime.utcnow(),
-                is_resolved=False,
-            )
+            new_alert = Alert(**self._row(level, alert_type, description, source_ip, details))
             db.add(new_alert)
             db.commit()
             db.refresh(new_alert)
-
-            # Update last alert cache
-            self._update_cache(alert_type, source_ip)
+            self.persisted_total += 1
 
             logger.info(
                 f"🚨 ALERT [{level}] {alert_type}: {description} (IP: {source_ip})"
             )
 
             # TRIGGER AUTOMATED RESPONSE
-            try:
-                from .response_executor import response_executor
-
-                response_executor.execute(
-                    ip=source_ip or "unknown",
-                    threat_score=0.0,
-                    threat_level=level,
-                )
-            except Exception as e:
-                logger.error(f"Failed to execute automated response: {e}")
-
+            self._dispatch_response(source_ip, level)
             return new_alert
         except Exception as e:
             logger.error(f"Failed to create alert: {e}")
             db.rollback()
+            self._release(alert_type, source_ip)
             return None
         finally:
             db.close()
 
-    def _is_duplicate(self, alert_type: str, source_ip: Optional[str]) -> bool:
+    # --------------------------------------------------
+    # Non-blocking API
+    # --------------------------------------------------
+
+    def submit(
+        self,
+        level: str,
+        alert_type: str,
+        description: str,
+        source_ip: Optional[str] = None,
+        details: Optional[Any] = None,
+    ) -> bool:
         """
-        Checks if a similar alert was recently sent.
+        Queue an alert for batched persistence. Never blocks on the database.
+
+        Returns False when the alert was deduplicated or the buffer is full.
         """
-        if not source_ip:
+        if not self._claim(alert_type, source_ip):
             return False
 
-        key = f"{alert_type}:{source_ip}"
-        if key in self._last_alerts:
-            last_time = self._last_alerts[key]
-            if datetime.utcnow() - last_time < timedelta(
-                seconds=self.deduplication_window
-            ):
-                return True
-        return False
+        row = self._row(level, alert_type, description, source_ip, details)
+        with self._cond:
+            if len(self._pending) >= self.max_queue:
+                self.dropped_total += 1
+                self._release(alert_type, source_ip)
+                return False
+            self._pending.append(row)
+            self.submitted_total += 1
+            # Wake the writer when the buffer goes non-empty (it then waits
+            # up to flush_interval for more) or a full batch is ready
+            if len(self._pending) == 1 or len(self._pending) >= self.batch_size:
+                self._cond.notify()
+        if self._stopping:
+            self.flush()
+        else:
+            self._ensure_writer()
+        return True
 
-    def _update_cache(self, alert_type: str, source_ip: Optional[str]):
-        """
-        Updates the deduplication cache.
-        """
+    def flush(self) -> int:
+        """Synchronously persist every submitted alert. Returns alerts written."""
+        written = 0
+        while True:
+            # Taking the batch under the write lock also waits out a batch the
+            # writer thread is committing, so everything submitted is visible on return
+            with self._write_lock:
+                batch = self._take()
+                if not batch:
+                    return written
+                written += self._write_batch(batch)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Stop the writer thread, persist what is buffered and drain responses."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._writer is not None:
+            self._writer.join(timeout)
+            self._writer = None
+        self.flush()
+        with self._responses_lock:
+            pool, self._responses = self._responses, None
+        if pool is not None:
+            pool.shutdown(wait=True)
+
+    # --------------------------------------------------
+    # Writer thread
+    # --------------------------------------------------
+
+    def _ensure_writer(self) -> None:
+        if self._writer is not None:
+            return
+        with self._cond:
+            if self._writer is None and not self._stopping:
+                self._writer = threading.Thread(target=self._run_writer, name="alert-writer", daemon=True)
+                self._writer.start()
+
+    def _run_writer(self) -> None:
+        while True:
+            with self._cond:
+                if not self._pending and not self._stopping:
+                    self._cond.wait()
+                deadline = time.monotonic() + self.flush_interval
+                while len(self._pending) < self.batch_size and not self._stopping:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                if self._stopping:
+                    return
+            with self._write_lock:
+                self._write_batch(self._take())
+
+    def _take(self) -> list:
+        with self._cond:
+            batch = []
+            while self._pending and len(batch) < self.batch_size:
+                batch.append(self._pending.popleft())
+            return batch
+
+    def _write_batch(self, rows: list) -> int:
+        """Bulk-insert one batch (caller holds the write lock)."""
+        if not rows:
+            return 0
+        started = time.perf_counter()
+        db: Session = (self.session_factory or SessionLocal)()
+        try:
+            db.bulk_insert_mappings(Alert, rows)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Failed to persist {len(rows)} alerts: {e}")
+            for row in rows:
+                self._release(row["type"], row["source_ip"])
+            return 0
+        finally:
+            db.close()
+
+        self.persisted_total += len(rows)
+        self.last_flush_ms = round((time.perf_counter() - started) * 1000, 2)
+        for row in rows:
+            logger.info(
+                f"🚨 ALERT [{row['level']}] {row['type']}: {row['description']} (IP: {row['source_ip']})"
+            )
+            self._dispatch_response(row["source_ip"], row["level"])
+        return len(rows)
+
+    # --------------------------------------------------
+    # Automated response
+    # --------------------------------------------------
+
+    def _dispatch_response(self, source_ip: Optional[str], level: str) -> None:
+        """Run the automated response on the worker pool (bounded backlog)."""
+        with self._responses_lock:
+            if self._responses_pending >= self.max_pending_responses:
+                self.responses_dropped_total += 1
+                return
+            if self._responses is None:
+                self._responses = ThreadPoolExecutor(
+                    max_workers=self.response_workers, thread_name_prefix="alert-response"
+                )
+            self._responses_pending += 1
+            pool = self._responses
+        try:
+            pool.submit(self._execute_response, source_ip, level)
+        except RuntimeError:
+            # Pool shut down concurrently
+            with self._responses_lock:
+                self._responses_pending -= 1
+
+    def _execute_response(self, source_ip: Optional[str], level: str) -> None:
+        try:
+            from .response_executor import response_executor
+
+            response_executor.execute(
+                ip=source_ip or "unknown",
+                threat_score=0.0,
+                threat_level=level,
+            )
+        except Exception as e:
+            logger.error(f"Failed to execute automated response: {e}")
+        finally:
+            with self._responses_lock:
+                self._responses_pending -= 1
+
+    # --------------------------------------------------
+    # Deduplication index
+    # --------------------------------------------------
+
+    @staticmethod
+    def _row(level, alert_type, description, source_ip, details) -> dict:
+        # Convert details to JSON string if it's a dict/list
+        details_str = details
+        if isinstance(details, (dict, list)):
+            details_str = json.dumps(details)
+        return {
+            "level": level,
+            "type": alert_type,
+            "source_ip": source_ip,
+            "description": description,
+            "details": details_str,
+            "timestamp": datetime.utcnow(),
+            "is_resolved": False,
+        }
+
+    def _claim(self, alert_type: str, source_ip: Optional[str]) -> bool:
+        """Atomically check the dedup index and record the alert. False for duplicates."""
+        if not source_ip:
+            return True
+        if not self._last_alerts.add(f"{alert_type}:{source_ip}", datetime.utcnow()):
+            self.deduplicated_total += 1
+            return False
+        return True
+
+    def _release(self, alert_type: str, source_ip: Optional[str]) -> None:
+        """Forget a claim whose alert was never persisted."""
         if source_ip:
-            key = f"{alert_type}:{source_ip}"
-            self._last_alerts[key] = datetime.utcnow()
+            self._last_alerts.pop(f"{alert_type}:{source_ip}")
+
+    # --------------------------------------------------
+    # Metrics
+    # --------------------------------------------------
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self.queue_depth,
+            "submitted_total": self.submitted_total,
+            "persisted_total": self.persisted_total,
+            "deduplicated_total": self.deduplicated_total,
+            "dropped_total": self.dropped_total,
+            "dedup_keys": len(self._last_alerts),
+            "responses_pending": self._responses_pending,
+            "responses_dropped_total": self.responses_dropped_total,
+            "last_flush_ms": self.last_flush_ms,
+        }
+
+    def to_prometheus(self) -> str:
+        """Generate Prometheus text format for the alert pipeline."""
+        lines = []
+
+        lines.append("# HELP phantomnet_alerts_persisted_total Alerts written to the alerts table")
+        lines.append("# TYPE phantomnet_alerts_persisted_total counter")
+        lines.append(f"phantomnet_alerts_persisted_total {self.persisted_total}")
+
+        lines.append("")
+        lines.append("# HELP phantomnet_alerts_deduplicated_total Alerts suppressed by the dedup window")
+        lines.append("# TYPE phantomnet_alerts_deduplicated_total counter")
+        lines.append(f"phantomnet_alerts_deduplicated_total {self.deduplicated_total}")
+
+        lines.append("")
+        lines.append("# HELP phantomnet_alerts_dropped_total Alerts rejected by a full buffer")
+        lines.append("# TYPE phantomnet_alerts_dropped_total counter")
+        lines.append(f"phantomnet_alerts_dropped_total {self.dropped_total}")
+
+        lines.append("")
+        lines.append("# HELP phantomnet_alerts_queue_depth Submitted alerts waiting to be written")
+        lines.append("# TYPE phantomnet_alerts_queue_depth gauge")
+        lines.append(f"phantomnet_alerts_queue_depth {self.queue_depth}")
+
+        lines.append("")
+        lines.append("# HELP phantomnet_alerts_responses_pending Automated responses queued or running")
+        lines.append("# TYPE phantomnet_alerts_responses_pending gauge")
+        lines.append(f"phantomnet_alerts_responses_pending {self._responses_pending}")
+
+        lines.append("")
+        lines.append("# HELP phantomnet_alerts_flush_latency_ms Duration of the last batch write")
+        lines.append("# TYPE phantomnet_alerts_flush_latency_ms gauge")
+        lines.append(f"phantomnet_alerts_flush_latency_ms {self.last_flush_ms}")
+
+        return "\n".join(lines) + "\n"
 
 
 # Singleton instance
 alert_manager = AlertManager()
+atexit.register(alert_manager.stop)
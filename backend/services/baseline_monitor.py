@@ -86,7 +86,7 @@ class BaselineMonitor:
             threshold = max(self.average_events_per_minute * 5, 20)
 
             if current_activity > threshold:
-                alert_manager.create_alert(
+                alert_manager.submit(
                     level="CRITICAL" if current_activity > threshold * 2 else "WARNING",
                     alert_type="BASELINE",
                     description=f"Traffic spike detected: {current_activity} events/min (Baseline: {self.average_events_per_minute:.2f})",
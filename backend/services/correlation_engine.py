@@ -1,23 +1,186 @@
+"""
+PhantomNet Correlation Engine
+=============================
+
+Cross-event correlation per source IP over a sliding window.
+
+Streaming (default):
+    ThreatAnalyzerService hands every freshly scored PacketLog to
+    ``correlation_engine.observe_logs``. Each source keeps time-bucketed
+    event counts and protocol counts for the last ``window_minutes``;
+    every registered ``CorrelationRule`` is evaluated on the updated
+    window and fires a CORRELATION alert the moment its threshold is
+    crossed. Events are consumed exactly once; nothing re-aggregates
+    ``packet_logs``.
+
+Polling (fallback, ``start()``):
+    Every ``check_interval`` seconds, rebuilds each source's window from one
+    GROUP BY over the last ``window_minutes`` and runs the same rules on it
+    (with the same once-per-crossing dedup), for deployments where events
+    bypass the analyzer.
+
+Adding a rule:
+    class MyRule(CorrelationRule):
+        name = "my_rule"
+        def measure(self, window): ...
+        def describe(self, value, window_minutes): ...
+
+    correlation_engine.register_rule(MyRule())
+"""
+
 import time
 import logging
 import threading
+from abc import ABC, abstractmethod
+from collections import Counter, OrderedDict, deque
 from datetime import datetime, timedelta
+from typing import Iterable, List, Optional
 from sqlalchemy import func
 from sqlalchemy.orm import Session
 from database.database import SessionLocal
 from database.models import PacketLog
+from database.query_plans import window_group
 from .alert_manager import alert_manager
 
 logger = logging.getLogger("correlation_engine")
 
+_EPOCH = datetime(1970, 1, 1)
+
+
+class SourceWindow:
+    """
+    Sliding-window counters of one source IP, in fixed time buckets.
+
+    ``events`` and ``protocols`` always hold the totals of the buckets
+    currently in the window, so rules read them in O(1).
+    """
+
+    __slots__ = ("buckets", "events", "protocols", "last_seen")
+
+    def __init__(self):
+        self.buckets = deque()  # [bucket_start, event_count, Counter(protocol)]
+        self.events = 0
+        self.protocols = Counter()
+        self.last_seen = 0.0
+
+    def add(self, bucket_start: float, protocol: str) -> None:
+        if not self.buckets or self.buckets[-1][0] < bucket_start:
+            self.buckets.append([bucket_start, 0, Counter()])
+            bucket = self.buckets[-1]
+        else:
+            # Late event: fold into its bucket, or the nearest earlier one
+            bucket = next((b for b in reversed(self.buckets) if b[0] <= bucket_start), self.buckets[0])
+        bucket[1] += 1
+        bucket[2][protocol] += 1
+        self.events += 1
+        self.protocols[protocol] += 1
+
+    def evict(self, horizon: float) -> None:
+        """Drop buckets that ended before ``horizon``."""
+        while self.buckets and self.buckets[0][0] < horizon:
+            _, count, protocols = self.buckets.popleft()
+            self.events -= count
+            self.protocols.subtract(protocols)
+            for protocol in protocols:
+                if self.protocols[protocol] <= 0:
+                    del self.protocols[protocol]
+
+
+class CorrelationRule(ABC):
+    """
+    A streaming correlation rule: a measure of a source's window and the
+    threshold it must exceed to raise an alert.
+    """
+
+    name = "rule"
+    level = "WARNING"
+    threshold = 0
+
+    @abstractmethod
+    def measure(self, window: SourceWindow) -> int:
+        """Value of the rule's measure on ``window``."""
+
+    @abstractmethod
+    def describe(self, value: int, window_minutes: int):
+        """Return (description, details) for an alert."""
+
+
+class MultiProtocolRule(CorrelationRule):
+    """Vertical scanning: one IP touching more than ``min_protocols`` protocols."""
+
+    name = "multi_protocol"
+    level = "CRITICAL"
+
+    def __init__(self, min_protocols: int = 2):
+        self.threshold = min_protocols
+
+    def measure(self, window: SourceWindow) -> int:
+        return len(window.protocols)
+
+    def describe(self, value: int, window_minutes: int):
+        return (
+            f"Multi-protocol attack detected: {value} distinct protocols from same IP.",
+            {"protocols_count": value, "window_minutes": window_minutes},
+        )
+
+
+class HighFrequencyRule(CorrelationRule):
+    """Flooding: more than ``min_events`` events from one IP in the window."""
+
+    name = "high_frequency"
+    level = "WARNING"
+
+    def __init__(self, min_events: int = 50):
+        self.threshold = min_events
+
+    def measure(self, window: SourceWindow) -> int:
+        return window.events
+
+    def describe(self, value: int, window_minutes: int):
+        return (
+            f"High frequency activity: {value} events in {window_minutes} minutes.",
+            {"event_count": value, "window_minutes": window_minutes},
+        )
+
 
 class CorrelationEngine:
-    def __init__(self, check_interval: int = 10, window_minutes: int = 5):
+    def __init__(
+        self,
+        check_interval: int = 10,
+        window_minutes: int = 5,
+        bucket_seconds: int = 10,
+        max_sources: int = 100000,
+    ):
+        """
+        :param check_interval: Seconds between polling cycles (fallback mode only)
+        :param window_minutes: Sliding window length
+        :param bucket_seconds: Granularity of the streaming window
+        :param max_sources: Tracked source IPs before the least recently seen are evicted
+        """
         self.check_interval = check_interval
         self.window_minutes = window_minutes
+        self.bucket_seconds = bucket_seconds
+        self.max_sources = max_sources
+        self.rules: List[CorrelationRule] = [MultiProtocolRule(), HighFrequencyRule()]
         self._stop_event = threading.Event()
         self.running = False
 
+        # Streaming state
+        self._windows: "OrderedDict[str, SourceWindow]" = OrderedDict()
+        self._firing = set()  # (rule name, ip) currently above threshold
+        self._lock = threading.Lock()
+        self._watermark = 0.0  # newest event time seen (epoch seconds)
+        self._since_sweep = 0
+
+        # Metrics
+        self.events_total = 0
+        self.alerts_total = 0
+        self.last_detection_latency_ms = 0.0
+
+    def register_rule(self, rule: CorrelationRule) -> None:
+        """Add a streaming rule; it is evaluated on every subsequent event."""
+        self.rules.append(rule)
+
     def start(self):
         if self.running:
             return
@@ -34,6 +197,135 @@ class CorrelationEngine:
             self.thread.join(timeout=2)
         logger.info("Correlation Engine stopped.")
 
+    # --------------------------------------------------
+    # Streaming API
+    # --------------------------------------------------
+
+    def observe_logs(self, logs: Iterable[PacketLog]) -> int:
+        """Feed freshly written PacketLogs (each exactly once). Returns alerts raised."""
+        return sum(
+            self.observe(log.src_ip, log.protocol, log.timestamp) for log in logs if log.src_ip
+        )
+
+    def observe(self, src_ip: str, protocol: Optional[str], timestamp: Optional[datetime] = None) -> int:
+        """Fold one event into its source window and raise any alert whose threshold it crosses."""
+        ts = self._epoch(timestamp)
+        window_seconds = self.window_minutes * 60
+        with self._lock:
+            self.events_total += 1
+            self._watermark = max(self._watermark, ts)
+            horizon = self._watermark - window_seconds
+            if ts < horizon:
+                return 0  # older than the whole window
+
+            window = self._windows.get(src_ip)
+            if window is None:
+                window = self._windows[src_ip] = SourceWindow()
+                if len(self._windows) > self.max_sources:
+                    evicted, _ = self._windows.popitem(last=False)
+                    self._clear_firing(evicted)
+            else:
+                self._windows.move_to_end(src_ip)
+            window.add(ts - ts % self.bucket_seconds, protocol or "UNKNOWN")
+            window.last_seen = max(window.last_seen, ts)
+            window.evict(horizon)
+            fired = self._evaluate(src_ip, window)
+
+            self._since_sweep += 1
+            if self._since_sweep >= 1000:
+                self._sweep(horizon)
+
+        for rule, value in fired:
+            self._raise(rule, src_ip, value, ts)
+        return len(fired)
+
+    def _evaluate(self, src_ip: str, window: SourceWindow) -> list:
+        """(rule, value) for every rule that just crossed its threshold (caller holds the lock)."""
+        fired = []
+        for rule in self.rules:
+            value = rule.measure(window)
+            key = (rule.name, src_ip)
+            if value > rule.threshold:
+                if key not in self._firing:
+                    self._firing.add(key)
+                    fired.append((rule, value))
+            else:
+                self._firing.discard(key)
+        return fired
+
+    def _raise(self, rule: CorrelationRule, src_ip: str, value: int, ts: Optional[float] = None) -> None:
+        """Submit a CORRELATION alert; ``ts`` is the triggering event's time (None for the polled check)."""
+        description, details = rule.describe(value, self.window_minutes)
+        details["rule"] = rule.name
+        alert_manager.submit(
+            level=rule.level,
+            alert_type="CORRELATION",
+            source_ip=src_ip,
+            description=description,
+            details=details,
+        )
+        if ts is None:
+            return
+        self.alerts_total += 1
+        self.last_detection_latency_ms = round(max(0.0, time.time() - ts) * 1000, 2)
+
+    def _sweep(self, horizon: float) -> None:
+        """Forget sources with no event inside the window (caller holds the lock)."""
+        self._since_sweep = 0
+        for ip in [ip for ip, w in self._windows.items() if w.last_seen < horizon]:
+            del self._windows[ip]
+            self._clear_firing(ip)
+
+    def _clear_firing(self, ip: str) -> None:
+        for rule in self.rules:
+            self._firing.discard((rule.name, ip))
+
+    @staticmethod
+    def _epoch(timestamp: Optional[datetime]) -> float:
+        if timestamp is None:
+            return time.time()
+        if timestamp.tzinfo is not None:
+            return timestamp.timestamp()
+        return (timestamp - _EPOCH).total_seconds()  # naive UTC, like PacketLog.timestamp
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "events_total": self.events_total,
+            "alerts_total": self.alerts_total,
+            "tracked_sources": len(self._windows),
+            "last_detection_latency_ms": self.last_detection_latency_ms,
+        }
+
+    def to_prometheus(self) -> str:
+        """Generate Prometheus text format for streaming correlation metrics."""
+        lines = []
+
+        lines.append("# HELP phantomnet_correlation_events_total Events folded into correlation windows")
+        lines.append("# TYPE phantomnet_correlation_events_total counter")
+        lines.append(f"phantomnet_correlation_events_total {self.events_total}")
+
+        lines.append("")
+        lines.append("# HELP phantomnet_correlation_alerts_total CORRELATION alerts raised by streaming rules")
+        lines.append("# TYPE phantomnet_correlation_alerts_total counter")
+        lines.append(f"phantomnet_correlation_alerts_total {self.alerts_total}")
+
+        lines.append("")
+        lines.append("# HELP phantomnet_correlation_tracked_sources Source IPs with live window state")
+        lines.append("# TYPE phantomnet_correlation_tracked_sources gauge")
+        lines.append(f"phantomnet_correlation_tracked_sources {len(self._windows)}")
+
+        lines.append("")
+        lines.append("# HELP phantomnet_correlation_detection_latency_ms Event time to alert for the last detection")
+        lines.append("# TYPE phantomnet_correlation_detection_latency_ms gauge")
+        lines.append(f"phantomnet_correlation_detection_latency_ms {self.last_detection_latency_ms}")
+
+        return "\n".join(lines) + "\n"
+
+    # --------------------------------------------------
+    # Polling fallback
+    # --------------------------------------------------
+
     def _run_loop(self):
         while not self._stop_event.is_set():
             try:
@@ -43,59 +335,39 @@ class CorrelationEngine:
 
             time.sleep(self.check_interval)
 
+    @staticmethod
+    def window_source_protocols(db: Session, since: datetime):
+        """(src_ip, protocol, event_count) for every source with events since ``since``."""
+        return (
+            db.query(PacketLog.src_ip, PacketLog.protocol, func.count(PacketLog.id))
+            .filter(PacketLog.timestamp >= since, PacketLog.src_ip.isnot(None))
+            .group_by(window_group(PacketLog.src_ip), window_group(PacketLog.protocol))
+            .all()
+        )
+
     def _correlate_events(self):
         db: Session = SessionLocal()
         try:
             time_threshold = datetime.utcnow() - timedelta(minutes=self.window_minutes)
 
-            # 1. Detect Multi-Protocol Attacks (Vertical Scanning)
-            # Find IPs that have accessed > 2 different protocols in the last window
-            multi_protocol_ips = (
-                db.query(
-                    PacketLog.src_ip,
-                    func.count(func.distinct(PacketLog.protocol)).label("proto_count"),
-                )
-                .filter(PacketLog.timestamp >= time_threshold)
-                .group_by(PacketLog.src_ip)
-                .having(func.count(func.distinct(PacketLog.protocol)) > 2)
-                .all()
-            )
-
-            for ip, count in multi_protocol_ips:
-                alert_manager.create_alert(
-                    level="CRITICAL",
-                    alert_type="CORRELATION",
-                    source_ip=ip,
-                    description=f"Multi-protocol attack detected: {count} distinct protocols from same IP.",
-                    details={
-                        "protocols_count": count,
-                        "window_minutes": self.window_minutes,
-                    },
-                )
-
-            # 2. Detect High-Frequency Attacks
-            # Find IPs with more than 50 events in the last window
-            high_freq_ips = (
-                db.query(
-                    PacketLog.src_ip, func.count(PacketLog.id).label("event_count")
-                )
-                .filter(PacketLog.timestamp >= time_threshold)
-                .group_by(PacketLog.src_ip)
-                .having(func.count(PacketLog.id) > 50)
-                .all()
-            )
-
-            for ip, count in high_freq_ips:
-                alert_manager.create_alert(
-                    level="WARNING",
-                    alert_type="CORRELATION",
-                    source_ip=ip,
-                    description=f"High frequency activity: {count} events in {self.window_minutes} minutes.",
-                    details={
-                        "event_count": count,
-                        "window_minutes": self.window_minutes,
-                    },
-                )
+            # One window per source, holding its totals for the whole period
+            windows = {}
+            for ip, protocol, count in self.window_source_protocols(db, time_threshold):
+                window = windows.get(ip)
+                if window is None:
+                    window = windows[ip] = SourceWindow()
+                window.events += count
+                window.protocols[protocol or "UNKNOWN"] += count
+
+            fired = []
+            with self._lock:
+                for ip, window in windows.items():
+                    fired.extend((ip, rule, value) for rule, value in self._evaluate(ip, window))
+                # Sources with nothing left in the window re-arm every rule
+                self._firing = {key for key in self._firing if key[1] in windows}
+
+            for ip, rule, value in fired:
+                self._raise(rule, ip, value)
 
         except Exception as e:
             logger.error(f"Database error in CorrelationEngine: {e}")
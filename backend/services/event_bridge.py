@@ -0,0 +1,178 @@
+"""
+PhantomNet Event Bridge
+=======================
+
+Hands dashboard events from worker threads (threat analyzer, packet
+sniffer, scheduler jobs) to the WebSocket hub on the server's event loop.
+
+The loop is captured once at startup (bind()). emit() appends to a bounded
+queue and, if no drain is pending, schedules one with call_soon_threadsafe,
+so a burst of events costs a single loop wake-up instead of one
+asyncio.run() (a new event loop, torn down again) per event. The drain
+publishes everything queued, in order, on the loop thread that owns the
+WebSocket connections.
+
+emit() never blocks the caller:
+    - events for topics without subscribers are skipped
+    - before bind() / after unbind() events are dropped (counted)
+    - beyond EVENT_BRIDGE_MAX_PENDING queued events the oldest are dropped
+
+Usage:
+    from services.event_bridge import event_bridge
+    from services.ws_hub import TOPOLOGY
+
+    event_bridge.bind(asyncio.get_running_loop())          # lifespan startup
+    event_bridge.emit(TOPOLOGY, "TRAFFIC_TICK", {"count": 12})  # any thread
+"""
+
+import os
+import time
+import asyncio
+import logging
+import threading
+from collections import deque
+from typing import Any, Optional
+
+from services.ws_hub import ws_hub, WebSocketHub
+
+logger = logging.getLogger("event_bridge")
+
+EVENT_BRIDGE_MAX_PENDING = int(os.getenv("EVENT_BRIDGE_MAX_PENDING", "10000"))
+
+
+class EventBridge:
+    """
+    Thread-safe, batching hand-off from worker threads to the server event loop.
+    """
+
+    def __init__(self, hub: WebSocketHub = ws_hub, max_pending: int = EVENT_BRIDGE_MAX_PENDING):
+        self.hub = hub
+        self.max_pending = max(1, max_pending)
+        self._pending: deque = deque()  # (topic, message_type, payload, emitted_at)
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._scheduled = False
+
+        self.emitted_total = 0
+        self.delivered_total = 0
+        self.dropped_total = 0
+        self.wakeups_total = 0
+        self.max_batch = 0
+        self.lag_seconds_total = 0.0
+
+    def bind(self, loop: Optional[asyncio.AbstractEventLoop] = None) -> None:
+        """Capture the server loop (defaults to the running loop)."""
+        self._loop = loop or asyncio.get_running_loop()
+
+    def unbind(self) -> None:
+        with self._lock:
+            self._loop = None
+            self.dropped_total += len(self._pending)
+            self._pending.clear()
+            self._scheduled = False
+
+    @property
+    def is_bound(self) -> bool:
+        return self._loop is not None and not self._loop.is_closed()
+
+    def emit(self, topic: str, message_type: str, payload: Any) -> bool:
+        """
+        Queue an event for the hub from any thread. Returns False if it was not queued.
+        """
+        if not self.hub.has_subscribers(topic):
+            return False
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            self.dropped_total += 1
+            return False
+
+        with self._lock:
+            if len(self._pending) >= self.max_pending:
+                self._pending.popleft()
+                self.dropped_total += 1
+            self._pending.append((topic, message_type, payload, time.monotonic()))
+            self.emitted_total += 1
+            if self._scheduled:
+                return True
+            self._scheduled = True
+
+        try:
+            loop.call_soon_threadsafe(self._drain)
+            self.wakeups_total += 1
+        except RuntimeError:
+            # Loop closed between the check and the call (shutdown)
+            self.unbind()
+            return False
+        return True
+
+    def _drain(self) -> None:
+        with self._lock:
+            batch, self._pending = self._pending, deque()
+            self._scheduled = False
+
+        now = time.monotonic()
+        for topic, message_type, payload, emitted_at in batch:
+            try:
+                self.hub.publish(topic, message_type, payload)
+            except Exception as e:
+                logger.debug(f"Event bridge publish failed: {e}")
+            self.lag_seconds_total += now - emitted_at
+        self.delivered_total += len(batch)
+        self.max_batch = max(self.max_batch, len(batch))
+
+    # --------------------------------------------------
+    # Metrics
+    # --------------------------------------------------
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "bound": self.is_bound,
+            "pending": len(self._pending),
+            "emitted_total": self.emitted_total,
+            "delivered_total": self.delivered_total,
+            "dropped_total": self.dropped_total,
+            "wakeups_total": self.wakeups_total,
+            "events_per_wakeup": round(self.delivered_total / self.wakeups_total, 2) if self.wakeups_total else 0.0,
+            "max_batch": self.max_batch,
+            "avg_lag_ms": round(self.lag_seconds_total / self.delivered_total * 1000, 3) if self.delivered_total else 0.0,
+        }
+
+    def to_prometheus(self) -> str:
+        """Generate Prometheus text format for event bridge metrics."""
+        lines = []
+
+        lines.append("# HELP phantomnet_event_bridge_pending Events waiting for the server event loop")
+        lines.append("# TYPE phantomnet_event_bridge_pending gauge")
+        lines.append(f"phantomnet_event_bridge_pending {len(self._pending)}")
+
+        lines.append("")
+        lines.append("# HELP phantomnet_event_bridge_emitted_total Events queued by worker threads")
+        lines.append("# TYPE phantomnet_event_bridge_emitted_total counter")
+        lines.append(f"phantomnet_event_bridge_emitted_total {self.emitted_total}")
+
+        lines.append("")
+        lines.append("# HELP phantomnet_event_bridge_delivered_total Events published to the WebSocket hub")
+        lines.append("# TYPE phantomnet_event_bridge_delivered_total counter")
+        lines.append(f"phantomnet_event_bridge_delivered_total {self.delivered_total}")
+
+        lines.append("")
+        lines.append("# HELP phantomnet_event_bridge_dropped_total Events dropped (no loop bound or queue full)")
+        lines.append("# TYPE phantomnet_event_bridge_dropped_total counter")
+        lines.append(f"phantomnet_event_bridge_dropped_total {self.dropped_total}")
+
+        lines.append("")
+        lines.append("# HELP phantomnet_event_bridge_wakeups_total Event loop wake-ups (call_soon_threadsafe)")
+        lines.append("# TYPE phantomnet_event_bridge_wakeups_total counter")
+        lines.append(f"phantomnet_event_bridge_wakeups_total {self.wakeups_total}")
+
+        lines.append("")
+        lines.append("# HELP phantomnet_event_bridge_lag_seconds_total Summed emit-to-publish delay")
+        lines.append("# TYPE phantomnet_event_bridge_lag_seconds_total counter")
+        lines.append(f"phantomnet_event_bridge_lag_seconds_total {self.lag_seconds_total:.6f}")
+
+        return "\n".join(lines) + "\n"
+
+
+# Singleton instance
+event_bridge = EventBridge()
@@ -0,0 +1,198 @@
+"""
+PhantomNet Event Stream
+=======================
+
+Feeds the dashboard's live EVENT_STREAM from the ingestion path instead of
+polling ``packet_logs``.
+
+ThreatAnalyzerService hands every freshly scored PacketLog to
+``event_stream.observe_logs`` (on its worker thread). Each event is turned
+into the same payload the dashboard always received and queued on the
+event bridge, so nothing is missed between polls and nothing is read back
+from the database.
+
+Sampling keeps the stream useful under load:
+    - HIGH / CRITICAL events are always forwarded, as THREAT_ALERT messages
+      on the same topic (the hub never rate-caps those)
+    - other events share a token bucket of EVENT_STREAM_MAX_RATE events/s
+    - events held back are counted per threat level, and every
+      EVENT_STREAM_SUMMARY_INTERVAL_S an EVENT_STREAM_SUMMARY message
+      ("N events suppressed") is published with the counts
+
+Each client is additionally capped by the hub (WS_CLIENT_MAX_EVENTS_PER_S,
+see services.ws_hub), so a slow dashboard gets fewer events, never a
+backlog. With no EVENT_STREAM subscribers nothing is built at all.
+
+Usage:
+    from services.event_stream import event_stream
+
+    event_stream.observe_logs(scored_logs)   # any thread
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import Counter
+from typing import Iterable, Optional
+
+from database.models import PacketLog
+from services.ws_hub import EVENT_STREAM
+from services.event_bridge import event_bridge, EventBridge
+
+logger = logging.getLogger("event_stream")
+
+# Non-critical events forwarded per second across all clients (0 = unlimited)
+EVENT_STREAM_MAX_RATE = float(os.getenv("EVENT_STREAM_MAX_RATE", "1000"))
+EVENT_STREAM_SUMMARY_INTERVAL_S = float(os.getenv("EVENT_STREAM_SUMMARY_INTERVAL_S", "1"))
+
+# Threat levels that bypass sampling
+ALWAYS_FORWARD_LEVELS = frozenset({"HIGH", "CRITICAL"})
+
+ALERT_TYPE = "THREAT_ALERT"
+SUMMARY_TYPE = "EVENT_STREAM_SUMMARY"
+
+
+def to_payload(log: PacketLog) -> dict:
+    """EVENT_STREAM payload for one scored PacketLog."""
+    return {
+        "id": log.id,
+        "src_ip": log.src_ip,
+        "dst_ip": log.dst_ip,
+        "protocol": log.protocol,
+        "length": log.length,
+        "threat_score": log.threat_score or 0,
+        "threat_level": log.threat_level or "LOW",
+        "attack_type": log.attack_type or "BENIGN",
+        "timestamp": log.timestamp.isoformat() if log.timestamp else None,
+        "src_port": getattr(log, "src_port", None),
+        "country": getattr(log, "country", None) or "Unknown",
+    }
+
+
+class EventStreamBroadcaster:
+    """
+    Sampled, ingestion-driven publisher of the live event stream.
+    """
+
+    def __init__(
+        self,
+        bridge: EventBridge = event_bridge,
+        max_rate: float = EVENT_STREAM_MAX_RATE,
+        summary_interval: float = EVENT_STREAM_SUMMARY_INTERVAL_S,
+    ):
+        self.bridge = bridge
+        self.max_rate = max(0.0, max_rate)
+        self.summary_interval = max(0.0, summary_interval)
+        self._lock = threading.Lock()
+
+        # Token bucket for sampled levels (burst of one second)
+        self._tokens = self.max_rate
+        self._refilled_at = time.monotonic()
+
+        # Current summary window
+        self._window_started = self._refilled_at
+        self._window_forwarded = 0
+        self._window_suppressed: Counter = Counter()
+
+        self.observed_total = 0
+        self.forwarded_total = 0
+        self.suppressed_total = 0
+        self.summaries_total = 0
+
+    def observe_logs(self, logs: Iterable[PacketLog], now: Optional[float] = None) -> int:
+        """
+        Forward freshly scored logs to EVENT_STREAM subscribers. Returns how many were forwarded.
+        """
+        if not self.bridge.hub.has_subscribers(EVENT_STREAM):
+            return 0
+        now = time.monotonic() if now is None else now
+
+        forwarded = []
+        with self._lock:
+            if self.max_rate:
+                self._tokens = min(self.max_rate, self._tokens + (now - self._refilled_at) * self.max_rate)
+                self._refilled_at = now
+            for log in logs:
+                self.observed_total += 1
+                level = log.threat_level or "LOW"
+                if level in ALWAYS_FORWARD_LEVELS or not self.max_rate:
+                    forwarded.append(log)
+                elif self._tokens >= 1:
+                    self._tokens -= 1
+                    forwarded.append(log)
+                else:
+                    self._window_suppressed[level] += 1
+            self._window_forwarded += len(forwarded)
+            self.forwarded_total += len(forwarded)
+            summary = self._close_window(now)
+
+        for log in forwarded:
+            message_type = ALERT_TYPE if log.threat_level in ALWAYS_FORWARD_LEVELS else EVENT_STREAM
+            try:
+                self.bridge.emit(EVENT_STREAM, message_type, to_payload(log))
+            except Exception as e:
+                logger.debug(f"Event stream emit failed: {e}")
+        if summary:
+            self.bridge.emit(EVENT_STREAM, SUMMARY_TYPE, summary)
+        return len(forwarded)
+
+    def _close_window(self, now: float) -> Optional[dict]:
+        """Summary of the current window once it is due and anything was suppressed (lock held)."""
+        elapsed = now - self._window_started
+        if elapsed < self.summary_interval:
+            return None
+        suppressed = sum(self._window_suppressed.values())
+        summary = None
+        if suppressed:
+            summary = {
+                "suppressed": suppressed,
+                "by_level": dict(self._window_suppressed),
+                "forwarded": self._window_forwarded,
+                "window_s": round(elapsed, 3),
+            }
+            self.suppressed_total += suppressed
+            self.summaries_total += 1
+        self._window_started = now
+        self._window_forwarded = 0
+        self._window_suppressed = Counter()
+        return summary
+
+    # --------------------------------------------------
+    # Metrics
+    # --------------------------------------------------
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "max_rate": self.max_rate,
+            "observed_total": self.observed_total,
+            "forwarded_total": self.forwarded_total,
+            "suppressed_total": self.suppressed_total + sum(self._window_suppressed.values()),
+            "summaries_total": self.summaries_total,
+        }
+
+    def to_prometheus(self) -> str:
+        """Generate Prometheus text format for event stream metrics."""
+        stats = self.stats
+        lines = []
+
+        lines.append("# HELP phantomnet_event_stream_observed_total Scored events seen while clients were subscribed")
+        lines.append("# TYPE phantomnet_event_stream_observed_total counter")
+        lines.append(f"phantomnet_event_stream_observed_total {stats['observed_total']}")
+
+        lines.append("")
+        lines.append("# HELP phantomnet_event_stream_forwarded_total Events published to the live event stream")
+        lines.append("# TYPE phantomnet_event_stream_forwarded_total counter")
+        lines.append(f"phantomnet_event_stream_forwarded_total {stats['forwarded_total']}")
+
+        lines.append("")
+        lines.append("# HELP phantomnet_event_stream_suppressed_total Events held back by server-side sampling")
+        lines.append("# TYPE phantomnet_event_stream_suppressed_total counter")
+        lines.append(f"phantomnet_event_stream_suppressed_total {stats['suppressed_total']}")
+
+        return "\n".join(lines) + "\n"
+
+
+# Singleton instance
+event_stream = EventStreamBroadcaster()
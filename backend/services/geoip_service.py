@@ -21,13 +21,10 @@ Usage:
 import os
 import logging
 import json
-try:
-    import redis
-except ImportError:
-    redis = None
 from typing import Optional
 from datetime import datetime
-import time
+
+from services.memory_cache import ShardedTTLCache
 
 logger = logging.getLogger(__name__)
 
@@ -79,7 +76,7 @@ class GeoIPService:
     """
 
     _instance = None
-    _cache = {}
+    _cache = ShardedTTLCache("geoip", max_entries=50000, default_ttl=3600)
     _redis = None
     _reader = None
     _maxmind_available = False
@@ -93,6 +90,11 @@ class GeoIPService:
 
     def _initialize(self):
         """Load MaxMind database if available and initialize Redis."""
+        # Imported here: the client is only needed once the service is first used
+        try:
+            import redis
+        except ImportError:
+            redis = None
         if redis:
             try:
                 self._redis = redis.Redis(
@@ -149,12 +151,9 @@ class GeoIPService:
             except Exception:
                 pass
         
-        if ip in self._cache:
-            entry = self._cache[ip]
-            if time.time() < entry['exp']:
-                return entry['data']
-            else:
-                del self._cache[ip]
+        cached = self._cache.get(ip)
+        if cached is not None:
+            return cached
 
         # 3. Try MaxMind (offline, fast)
         if self._maxmind_available:
@@ -177,7 +176,7 @@ class GeoIPService:
                 pass
         
         # Local cache fallback (1 hour TTL)
-        self._cache[ip] = {'data': result, 'exp': time.time() + 3600}
+        self._cache.set(ip, result)
 
     def _is_private_ip(self, ip: str) -> bool:
         """Check if IP is private, loopback, or reserved."""
@@ -316,6 +315,18 @@ class GeoIPService:
 
 
 # ──────────────────────────────────────────────
-# Module-level singleton for easy import
+# Lazy module-level singleton
 # ──────────────────────────────────────────────
-geoip_service = GeoIPService()
+def get_geoip_service() -> GeoIPService:
+    """
+    Shared GeoIP service. Created on first use, since initialisation pings
+    Redis and opens the MaxMind database.
+    """
+    return GeoIPService()
+
+
+def __getattr__(name):
+    # Keeps ``from services.geoip_service import geoip_service`` working
+    if name == "geoip_service":
+        return get_geoip_service()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,279 @@
+"""
+PhantomNet Ingestion Queue
+==========================
+
+Push-based hand-off between the PacketLog write path and the
+ThreatAnalyzerService scoring workers.
+
+Producers (honeypot ``db_logger``, ``RealTimeSniffer`` and the honeypot
+JSONL ingestor) publish the id of every freshly committed PacketLog row.
+The analyzer drains those ids in micro-batches, so new events are scored
+as soon as they land instead of waiting for the next poll of
+``packet_logs``.
+
+Backends:
+    1. In-process bounded deque (default, zero dependencies)
+    2. Redis Streams (opt-in via INGESTION_REDIS_STREAM_ENABLED=true) so
+       producers running in other processes / containers can feed the API.
+
+Backpressure:
+    The local queue is bounded. When it is full ``publish`` returns False
+    and the id is dropped; the row stays unscored (threat_level IS NULL)
+    and is picked up by the analyzer's reconcile sweep.
+
+Usage:
+    from services.ingestion_queue import ingestion_queue
+
+    ingestion_queue.publish(log.id)
+    log_ids = ingestion_queue.consume_batch(max_items=500, timeout=2.0)
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import deque
+from typing import Iterable, List, Optional
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+logger = logging.getLogger("ingestion_queue")
+
+STREAM_KEY = os.getenv("INGESTION_REDIS_STREAM", "phantomnet:ingest")
+STREAM_GROUP = "threat_analyzer"
+STREAM_MAXLEN = 100000
+
+
+class IngestionQueue:
+    """
+    Bounded multi-producer / single-consumer queue of PacketLog ids.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 10000,
+        linger_ms: int = 25,
+        use_redis: Optional[bool] = None,
+    ):
+        """
+        :param maxsize: Max ids held in the local queue before producers are rejected
+        :param linger_ms: How long a consumer waits for a batch to fill once the first id arrived
+        :param use_redis: Force the Redis Streams backend on/off (default: env flag)
+        """
+        self.maxsize = maxsize
+        self.linger_ms = linger_ms
+        self._items = deque()  # (log_id, enqueued_at)
+        self._cond = threading.Condition()
+
+        # Metrics
+        self.published_total = 0
+        self.consumed_total = 0
+        self.dropped_total = 0
+        self.batches_total = 0
+        self.last_batch_size = 0
+        self.last_queue_wait_ms = 0.0
+        self.last_batch_latency_ms = 0.0
+
+        if use_redis is None:
+            use_redis = (
+                os.getenv("INGESTION_REDIS_STREAM_ENABLED", "false").lower() == "true"
+            )
+        self._redis = self._connect_redis() if use_redis else None
+
+    def _connect_redis(self):
+        """Connect to Redis and make sure the consumer group exists."""
+        if not redis:
+            logger.info("Redis module not found. Using in-process ingestion queue.")
+            return None
+        try:
+            client = redis.Redis(
+                host=os.getenv("REDIS_HOST", "localhost"),
+                port=int(os.getenv("REDIS_PORT", 6379)),
+                db=0,
+                decode_responses=True,
+                socket_connect_timeout=1.0,
+                socket_timeout=5.0,
+            )
+            client.ping()
+            try:
+                client.xgroup_create(STREAM_KEY, STREAM_GROUP, id="0", mkstream=True)
+            except Exception:
+                pass  # BUSYGROUP: group already exists
+            logger.info(f"Ingestion queue using Redis Stream '{STREAM_KEY}'.")
+            return client
+        except Exception as e:
+            logger.info(f"Redis unavailable for ingestion ({e}). Using in-process queue.")
+            return None
+
+    # --------------------------------------------------
+    # Producer API
+    # --------------------------------------------------
+
+    def publish(self, log_id: int) -> bool:
+        """
+        Enqueue a committed PacketLog id for scoring. Never blocks.
+
+        Returns False when the id was dropped because the queue is full.
+        """
+        if log_id is None:
+            return False
+
+        if self._redis:
+            try:
+                self._redis.xadd(
+                    STREAM_KEY, {"id": str(log_id)}, maxlen=STREAM_MAXLEN, approximate=True
+                )
+                with self._cond:
+                    self.published_total += 1
+                return True
+            except Exception as e:
+                logger.debug(f"Redis XADD failed, falling back to local queue: {e}")
+
+        with self._cond:
+            if len(self._items) >= self.maxsize:
+                self.dropped_total += 1
+                return False
+            self._items.append((log_id, time.monotonic()))
+            self.published_total += 1
+            self._cond.notify()
+        return True
+
+    def publish_many(self, log_ids: Iterable[int]) -> int:
+        """Enqueue several ids. Returns how many were accepted."""
+        return sum(1 for log_id in log_ids if self.publish(log_id))
+
+    # --------------------------------------------------
+    # Consumer API
+    # --------------------------------------------------
+
+    def consume_batch(self, max_items: int = 500, timeout: float = 2.0) -> List[int]:
+        """
+        Block up to ``timeout`` seconds for ids, then return a micro-batch of
+        at most ``max_items``. Returns an empty list on timeout.
+        """
+        log_ids = self._drain_local(max_items, timeout if not self._redis else 0.0)
+
+        if self._redis and len(log_ids) < max_items:
+            log_ids.extend(self._read_stream(max_items - len(log_ids), timeout))
+
+        if log_ids:
+            with self._cond:
+                self.consumed_total += len(log_ids)
+        return log_ids
+
+    def _drain_local(self, max_items: int, timeout: float) -> List[int]:
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while not self._items:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return []
+                self._cond.wait(remaining)
+
+            # Linger briefly so a burst is scored as one batch, not many
+            if len(self._items) < max_items and self.linger_ms > 0:
+                self._cond.wait(self.linger_ms / 1000.0)
+
+            batch = []
+            oldest = self._items[0][1]
+            while self._items and len(batch) < max_items:
+                batch.append(self._items.popleft()[0])
+
+        self.last_queue_wait_ms = round((time.monotonic() - oldest) * 1000, 2)
+        return batch
+
+    def _read_stream(self, max_items: int, timeout: float) -> List[int]:
+        try:
+            response = self._redis.xreadgroup(
+                STREAM_GROUP,
+                "api",
+                {STREAM_KEY: ">"},
+                count=max_items,
+                block=int(timeout * 1000) or None,
+                noack=True,
+            )
+        except Exception as e:
+            logger.debug(f"Redis XREADGROUP failed: {e}")
+            return []
+
+        log_ids = []
+        for _stream, entries in response or []:
+            for _entry_id, fields in entries:
+                try:
+                    log_ids.append(int(fields["id"]))
+                except (KeyError, ValueError):
+                    continue
+        return log_ids
+
+    def record_batch(self, size: int, latency_ms: float) -> None:
+        """Called by the consumer after a batch has been scored and committed."""
+        with self._cond:
+            self.batches_total += 1
+            self.last_batch_size = size
+            self.last_batch_latency_ms = round(latency_ms, 2)
+
+    # --------------------------------------------------
+    # Metrics
+    # --------------------------------------------------
+
+    @property
+    def depth(self) -> int:
+        """Ids currently waiting in the local queue."""
+        return len(self._items)
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "backend": "redis_stream" if self._redis else "memory",
+            "depth": self.depth,
+            "maxsize": self.maxsize,
+            "published_total": self.published_total,
+            "consumed_total": self.consumed_total,
+            "dropped_total": self.dropped_total,
+            "batches_total": self.batches_total,
+            "last_batch_size": self.last_batch_size,
+            "last_queue_wait_ms": self.last_queue_wait_ms,
+            "last_batch_latency_ms": self.last_batch_latency_ms,
+        }
+
+    def to_prometheus(self) -> str:
+        """Generate Prometheus text format for ingestion metrics."""
+        lines = []
+
+        lines.append("# HELP phantomnet_ingest_published_total PacketLog ids published for scoring")
+        lines.append("# TYPE phantomnet_ingest_published_total counter")
+        lines.append(f"phantomnet_ingest_published_total {self.published_total}")
+
+        lines.append("")
+        lines.append("# HELP phantomnet_ingest_dropped_total PacketLog ids rejected by a full queue")
+        lines.append("# TYPE phantomnet_ingest_dropped_total counter")
+        lines.append(f"phantomnet_ingest_dropped_total {self.dropped_total}")
+
+        lines.append("")
+        lines.append("# HELP phantomnet_ingest_consumed_total PacketLog ids handed to scoring workers")
+        lines.append("# TYPE phantomnet_ingest_consumed_total counter")
+        lines.append(f"phantomnet_ingest_consumed_total {self.consumed_total}")
+
+        lines.append("")
+        lines.append("# HELP phantomnet_ingest_queue_depth Ids waiting in the local ingestion queue")
+        lines.append("# TYPE phantomnet_ingest_queue_depth gauge")
+        lines.append(f"phantomnet_ingest_queue_depth {self.depth}")
+
+        lines.append("")
+        lines.append("# HELP phantomnet_ingest_queue_wait_ms Age of the oldest id in the last batch")
+        lines.append("# TYPE phantomnet_ingest_queue_wait_ms gauge")
+        lines.append(f"phantomnet_ingest_queue_wait_ms {self.last_queue_wait_ms}")
+
+        lines.append("")
+        lines.append("# HELP phantomnet_ingest_batch_latency_ms Scoring time of the last micro-batch")
+        lines.append("# TYPE phantomnet_ingest_batch_latency_ms gauge")
+        lines.append(f"phantomnet_ingest_batch_latency_ms {self.last_batch_latency_ms}")
+
+        return "\n".join(lines) + "\n"
+
+
+# Singleton instance
+ingestion_queue = IngestionQueue()
@@ -0,0 +1,355 @@
+"""
+PhantomNet In-Process Cache
+===========================
+
+Bounded, thread-safe LRU + TTL cache shared by the services that keep
+per-IP / per-event state in memory (predictions, GeoIP, alert dedup,
+rate limits, API responses).
+
+Design:
+    - Keys are hashed onto N shards, each with its own lock, so hot caches
+      are not serialized behind one mutex.
+    - Each shard is an OrderedDict in LRU order: get() moves the key to the
+      end, set() evicts from the front. Both are O(1).
+    - Expiry uses a coarse timing wheel per shard (expiry tick -> keys).
+      Every operation advances the wheel and drops the buckets that have
+      passed, so expired entries are reclaimed without scanning the store
+      and without waiting for the key to be read again.
+    - Each namespace has an entry budget and an optional byte budget
+      (approximate, via sys.getsizeof); the least recently used entries are
+      evicted when either is exceeded.
+
+Usage:
+    from services.memory_cache import ShardedTTLCache
+
+    geo_cache = ShardedTTLCache("geoip", max_entries=50000, default_ttl=3600)
+    geo_cache.set(ip, result)
+    geo_cache.get(ip)
+
+Hit / miss / eviction / expiry counters for every live cache are exported
+through ``cache_registry.to_prometheus()`` (part of ``/metrics``).
+"""
+
+import sys
+import time
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Any, Callable, Iterator, Optional, Tuple
+
+_MISSING = object()
+
+MIN_SHARD_ENTRIES = 64
+
+
+def approx_size(key: Any, value: Any) -> int:
+    """Shallow size of key + value, one level deep for containers (and tuple keys)."""
+    size = sys.getsizeof(key) + sys.getsizeof(value)
+    if isinstance(key, tuple):
+        size += sum(sys.getsizeof(k) for k in key)
+    if isinstance(value, dict):
+        size += sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(sys.getsizeof(v) for v in value)
+    return size
+
+
+class _Shard:
+    __slots__ = (
+        "lock", "entries", "wheel", "cursor", "bytes",
+        "hits", "misses", "evictions", "expirations",
+    )
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # key -> [value, expires_at, size]
+        self.wheel = {}  # expiry tick -> set of keys
+        self.cursor = None
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+
+class ShardedTTLCache:
+    """
+    Sharded LRU cache with per-entry TTL and entry / byte budgets.
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        max_entries: int = 10000,
+        default_ttl: Optional[float] = 300,
+        max_bytes: Optional[int] = None,
+        shards: int = 16,
+        resolution: float = 1.0,
+        sizeof: Callable[[Any, Any], int] = approx_size,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        :param namespace: Name used in metrics (caches sharing a name are summed)
+        :param max_entries: Entry budget for the whole cache
+        :param default_ttl: Seconds an entry lives when set() gets no ttl (None = no expiry)
+        :param max_bytes: Optional approximate memory budget for the whole cache
+        :param shards: Max number of lock shards (rounded down to a power of two)
+        :param resolution: Timing wheel tick in seconds
+        :param sizeof: Size estimate used for the byte budget
+        :param clock: Monotonic time source
+        """
+        # Power of two, and small caches get few shards so per-shard LRU stays meaningful
+        count = 1
+        while count * 2 <= min(shards, max(1, max_entries // MIN_SHARD_ENTRIES)):
+            count <<= 1
+        self.namespace = namespace
+        self.max_entries = max(1, max_entries)
+        self.default_ttl = default_ttl
+        self.max_bytes = max_bytes
+        self.resolution = resolution
+        self._sizeof = sizeof
+        self._clock = clock
+        self._mask = count - 1
+        self._shards = [_Shard() for _ in range(count)]
+        # Budgets are enforced per shard; keys spread evenly across shards
+        self._shard_entries = max(1, -(-self.max_entries // count))
+        self._shard_bytes = None if max_bytes is None else max(1, max_bytes // count)
+        cache_registry.register(self)
+
+    # --------------------------------------------------
+    # Public API
+    # --------------------------------------------------
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        """Return the cached value (refreshing its LRU position) or ``default``."""
+        shard = self._shard(key)
+        now = self._clock()
+        with shard.lock:
+            self._advance(shard, now)
+            entry = shard.entries.get(key)
+            if entry is None:
+                shard.misses += 1
+                return default
+            if entry[1] is not None and now >= entry[1]:
+                self._remove(shard, key)
+                shard.expirations += 1
+                shard.misses += 1
+                return default
+            shard.entries.move_to_end(key)
+            shard.hits += 1
+            return entry[0]
+
+    def set(self, key: Any, value: Any, ttl: Optional[float] = _MISSING) -> None:
+        """Store ``value``; ``ttl`` overrides the default (None = never expires)."""
+        shard = self._shard(key)
+        now = self._clock()
+        with shard.lock:
+            self._advance(shard, now)
+            self._put(shard, key, value, ttl, now)
+
+    def add(self, key: Any, value: Any, ttl: Optional[float] = _MISSING) -> bool:
+        """Store ``value`` only if ``key`` is absent or expired. Atomic; True if stored."""
+        shard = self._shard(key)
+        now = self._clock()
+        with shard.lock:
+            self._advance(shard, now)
+            entry = shard.entries.get(key)
+            if entry is not None and (entry[1] is None or now < entry[1]):
+                shard.hits += 1
+                return False
+            shard.misses += 1
+            self._put(shard, key, value, ttl, now)
+            return True
+
+    def pop(self, key: Any, default: Any = None) -> Any:
+        shard = self._shard(key)
+        with shard.lock:
+            entry = shard.entries.get(key)
+            if entry is None:
+                return default
+            self._remove(shard, key)
+            return entry[0]
+
+    def __contains__(self, key: Any) -> bool:
+        shard = self._shard(key)
+        now = self._clock()
+        with shard.lock:
+            entry = shard.entries.get(key)
+            return entry is not None and (entry[1] is None or now < entry[1])
+
+    def __len__(self) -> int:
+        now = self._clock()
+        total = 0
+        for shard in self._shards:
+            with shard.lock:
+                self._advance(shard, now)
+                total += len(shard.entries)
+        return total
+
+    def items(self) -> Iterator[Tuple[Any, Any]]:
+        """Snapshot of live (key, value) pairs. O(n); meant for status endpoints."""
+        now = self._clock()
+        snapshot = []
+        for shard in self._shards:
+            with shard.lock:
+                self._advance(shard, now)
+                snapshot.extend(
+                    (k, e[0]) for k, e in shard.entries.items() if e[1] is None or now < e[1]
+                )
+        return iter(snapshot)
+
+    def invalidate_prefix(self, prefix: str) -> int:
+        """Drop every string key starting with ``prefix``. O(n). Returns entries removed."""
+        removed = 0
+        for shard in self._shards:
+            with shard.lock:
+                for key in [k for k in shard.entries if isinstance(k, str) and k.startswith(prefix)]:
+                    self._remove(shard, key)
+                    removed += 1
+        return removed
+
+    def clear(self) -> None:
+        """Drop all entries and reset counters."""
+        for shard in self._shards:
+            with shard.lock:
+                shard.entries.clear()
+                shard.wheel.clear()
+                shard.cursor = None
+                shard.bytes = 0
+                shard.hits = shard.misses = shard.evictions = shard.expirations = 0
+
+    @property
+    def stats(self) -> dict:
+        totals = self._totals()
+        lookups = totals["hits"] + totals["misses"]
+        totals.update(
+            namespace=self.namespace,
+            max_entries=self.max_entries,
+            max_bytes=self.max_bytes,
+            hit_rate=round(totals["hits"] / lookups * 100, 1) if lookups else 0.0,
+        )
+        return totals
+
+    def _totals(self) -> dict:
+        now = self._clock()
+        totals = {"size": 0, "bytes": 0, "hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+        for shard in self._shards:
+            with shard.lock:
+                self._advance(shard, now)
+                totals["size"] += len(shard.entries)
+                totals["bytes"] += shard.bytes
+                totals["hits"] += shard.hits
+                totals["misses"] += shard.misses
+                totals["evictions"] += shard.evictions
+                totals["expirations"] += shard.expirations
+        return totals
+
+    # --------------------------------------------------
+    # Shard internals (caller holds shard.lock)
+    # --------------------------------------------------
+
+    def _shard(self, key: Any) -> _Shard:
+        return self._shards[hash(key) & self._mask]
+
+    def _put(self, shard: _Shard, key: Any, value: Any, ttl, now: float) -> None:
+        if ttl is _MISSING:
+            ttl = self.default_ttl
+        if key in shard.entries:
+            self._remove(shard, key)
+        expires_at = None if ttl is None else now + ttl
+        size = self._sizeof(key, value) if self._shard_bytes is not None else 0
+        shard.entries[key] = [value, expires_at, size]
+        shard.bytes += size
+        if expires_at is not None:
+            shard.wheel.setdefault(self._tick(expires_at), set()).add(key)
+
+        while shard.entries and (
+            len(shard.entries) > self._shard_entries
+            or (self._shard_bytes is not None and shard.bytes > self._shard_bytes and len(shard.entries) > 1)
+        ):
+            oldest = next(iter(shard.entries))
+            self._remove(shard, oldest)
+            shard.evictions += 1
+
+    def _remove(self, shard: _Shard, key: Any) -> None:
+        value, expires_at, size = shard.entries.pop(key)
+        shard.bytes -= size
+        if expires_at is not None:
+            bucket = shard.wheel.get(self._tick(expires_at))
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del shard.wheel[self._tick(expires_at)]
+
+    def _advance(self, shard: _Shard, now: float) -> None:
+        """Expire every wheel bucket whose tick has fully passed."""
+        current = self._tick(now)
+        if shard.cursor is None or not shard.wheel:
+            shard.cursor = current
+            return
+        if current <= shard.cursor:
+            return
+        if current - shard.cursor <= len(shard.wheel):
+            ticks = range(shard.cursor, current)
+        else:
+            # Long idle gap: walk the occupied buckets instead of every tick
+            ticks = sorted(t for t in shard.wheel if t < current)
+        for tick in ticks:
+            for key in shard.wheel.pop(tick, ()):
+                entry = shard.entries.pop(key, None)
+                if entry is not None:
+                    shard.bytes -= entry[2]
+                    shard.expirations += 1
+        shard.cursor = current
+
+    def _tick(self, t: float) -> int:
+        # Bucket by ceiling so a bucket is only dropped once all its keys expired
+        return -int(-t // self.resolution)
+
+
+class CacheRegistry:
+    """Tracks live caches for /metrics; caches with the same namespace are summed."""
+
+    def __init__(self):
+        self._caches = weakref.WeakSet()
+        self._lock = threading.Lock()
+
+    def register(self, cache: ShardedTTLCache) -> None:
+        with self._lock:
+            self._caches.add(cache)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            caches = list(self._caches)
+        namespaces = {}
+        for cache in caches:
+            totals = cache._totals()
+            agg = namespaces.setdefault(cache.namespace, dict.fromkeys(totals, 0))
+            for field, value in totals.items():
+                agg[field] += value
+        return namespaces
+
+    def to_prometheus(self) -> str:
+        """Generate Prometheus text format for every registered cache namespace."""
+        namespaces = self.snapshot()
+        metrics = [
+            ("hits_total", "counter", "hits", "Cache lookups that found a live entry"),
+            ("misses_total", "counter", "misses", "Cache lookups that found nothing"),
+            ("evictions_total", "counter", "evictions", "Entries evicted by the LRU budget"),
+            ("expirations_total", "counter", "expirations", "Entries dropped by TTL"),
+            ("entries", "gauge", "size", "Live entries"),
+            ("bytes", "gauge", "bytes", "Approximate bytes held (namespaces with a byte budget)"),
+        ]
+        lines = []
+        for suffix, kind, field, help_text in metrics:
+            if lines:
+                lines.append("")
+            lines.append(f"# HELP phantomnet_cache_{suffix} {help_text}")
+            lines.append(f"# TYPE phantomnet_cache_{suffix} {kind}")
+            for name in sorted(namespaces):
+                lines.append(f'phantomnet_cache_{suffix}{{namespace="{name}"}} {namespaces[name][field]}')
+        return "\n".join(lines) + "\n"
+
+
+# Singleton instance
+cache_registry = CacheRegistry()
@@ -0,0 +1,365 @@
+"""
+PhantomNet Metrics Snapshot
+===========================
+
+Background-computed LIVE_METRICS snapshot.
+
+The dashboard's live metrics are made of components with very different
+costs and rates of change: rollup stats, honeypot port probes (blocking
+connects with a 1s timeout), psutil readings, the unscored-log backlog and
+the events-per-minute count. Each component is computed on its own daemon
+thread at its own cadence and cached with the time it was computed; the
+server loop only ever reads the cached values.
+
+    component      interval (env)                   default
+    stats          METRICS_STATS_INTERVAL_S         2s
+    honeypots      METRICS_HONEYPOTS_INTERVAL_S     15s
+    system_health  METRICS_SYSTEM_INTERVAL_S        5s
+    ml_status      METRICS_ML_INTERVAL_S            5s
+    throughput     METRICS_THROUGHPUT_INTERVAL_S    15s
+
+A component whose value is older than METRICS_MAX_AGE_FACTOR x its
+interval (slow probe, failing query) keeps its last value but is listed in
+the snapshot's ``stale`` field.
+
+Every change to any component bumps ``snapshot_version``. delta() encodes
+the fields that changed between two versions, so LIVE_METRICS_DELTA
+subscribers receive only those (see LiveMetricsPublisher).
+
+Usage:
+    from services.metrics_snapshot import metrics_snapshot
+
+    metrics_snapshot.start()          # lifespan startup
+    payload = metrics_snapshot.snapshot()
+"""
+
+import os
+import time
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from services.ws_hub import LIVE_METRICS, LIVE_METRICS_DELTA
+
+logger = logging.getLogger("metrics_snapshot")
+
+METRICS_STATS_INTERVAL_S = float(os.getenv("METRICS_STATS_INTERVAL_S", "2"))
+METRICS_HONEYPOTS_INTERVAL_S = float(os.getenv("METRICS_HONEYPOTS_INTERVAL_S", "15"))
+METRICS_SYSTEM_INTERVAL_S = float(os.getenv("METRICS_SYSTEM_INTERVAL_S", "5"))
+METRICS_ML_INTERVAL_S = float(os.getenv("METRICS_ML_INTERVAL_S", "5"))
+METRICS_THROUGHPUT_INTERVAL_S = float(os.getenv("METRICS_THROUGHPUT_INTERVAL_S", "15"))
+METRICS_MAX_AGE_FACTOR = float(os.getenv("METRICS_MAX_AGE_FACTOR", "3"))
+
+# Broadcast cadence and how often delta subscribers get a full snapshot
+LIVE_METRICS_INTERVAL_S = float(os.getenv("LIVE_METRICS_INTERVAL_S", "2"))
+LIVE_METRICS_KEYFRAME_S = float(os.getenv("LIVE_METRICS_KEYFRAME_S", "30"))
+
+_MISSING = object()
+
+
+class SnapshotComponent:
+    """
+    One cached part of the snapshot. ``compute`` returns a dict of top-level fields.
+    """
+
+    def __init__(self, name: str, compute: Callable[[], Dict[str, Any]], interval: float, max_age: Optional[float] = None):
+        self.name = name
+        self.compute = compute
+        self.interval = max(0.1, interval)
+        self.max_age = max_age if max_age is not None else self.interval * METRICS_MAX_AGE_FACTOR
+        self.fields: Dict[str, Any] = {}
+        self.updated_at: Optional[float] = None
+        self.last_duration_ms = 0.0
+        self.refreshes_total = 0
+        self.errors_total = 0
+
+    def age(self, now: float) -> Optional[float]:
+        return None if self.updated_at is None else now - self.updated_at
+
+    def is_stale(self, now: float) -> bool:
+        return self.updated_at is None or now - self.updated_at > self.max_age
+
+
+class MetricsSnapshotService:
+    """
+    Per-component background refresh with a cached, versioned snapshot.
+    """
+
+    def __init__(self):
+        self._components: Dict[str, SnapshotComponent] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self.version = 0
+
+    def register(
+        self, name: str, compute: Callable[[], Dict[str, Any]], interval: float, max_age: Optional[float] = None
+    ) -> SnapshotComponent:
+        component = SnapshotComponent(name, compute, interval, max_age)
+        self._components[name] = component
+        return component
+
+    @property
+    def components(self) -> List[SnapshotComponent]:
+        return list(self._components.values())
+
+    # --------------------------------------------------
+    # Refresh
+    # --------------------------------------------------
+
+    def refresh(self, name: Optional[str] = None) -> None:
+        """Recompute one component (or all of them) on the calling thread."""
+        for component in [self._components[name]] if name else self.components:
+            self._refresh(component)
+
+    def _refresh(self, component: SnapshotComponent) -> None:
+        started = time.monotonic()
+        try:
+            fields = component.compute()
+        except Exception as e:
+            component.errors_total += 1
+            logger.warning(f"Metrics component '{component.name}' failed: {e}")
+            return
+        finished = time.monotonic()
+        component.last_duration_ms = (finished - started) * 1000
+        component.refreshes_total += 1
+        with self._lock:
+            if fields != component.fields:
+                component.fields = fields
+                self.version += 1
+            component.updated_at = finished
+
+    def start(self) -> None:
+        """Start one refresh thread per component."""
+        if self._threads:
+            return
+        self._stop.clear()
+        for component in self.components:
+            thread = threading.Thread(
+                target=self._run, args=(component,), name=f"metrics-{component.name}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"Metrics snapshot started ({len(self._threads)} components)")
+
+    def stop(self) -> None:
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout=2)
+        self._threads = []
+
+    def _run(self, component: SnapshotComponent) -> None:
+        while not self._stop.is_set():
+            self._refresh(component)
+            self._stop.wait(component.interval)
+
+    # --------------------------------------------------
+    # Snapshot
+    # --------------------------------------------------
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Latest value of every component merged into one dict, plus
+        ``snapshot_version`` and ``stale`` (components past their max age).
+        """
+        now = time.monotonic()
+        with self._lock:
+            merged: Dict[str, Any] = {}
+            for component in self._components.values():
+                merged.update(component.fields)
+            merged["snapshot_version"] = self.version
+            merged["stale"] = [c.name for c in self._components.values() if c.is_stale(now)]
+        return merged
+
+    @staticmethod
+    def delta(previous: Dict[str, Any], current: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Top-level fields of ``current`` that differ from ``previous``
+        (nested values are sent whole), with the versions they bridge.
+        """
+        changed = {
+            key: value
+            for key, value in current.items()
+            if key != "snapshot_version" and previous.get(key, _MISSING) != value
+        }
+        return {
+            "base_version": previous.get("snapshot_version"),
+            "snapshot_version": current.get("snapshot_version"),
+            "changed": changed,
+            "removed": [key for key in previous if key not in current],
+        }
+
+    # --------------------------------------------------
+    # Metrics
+    # --------------------------------------------------
+
+    @property
+    def stats(self) -> dict:
+        now = time.monotonic()
+        return {
+            "version": self.version,
+            "running": bool(self._threads),
+            "components": {
+                c.name: {
+                    "interval_s": c.interval,
+                    "age_s": round(c.age(now), 3) if c.updated_at is not None else None,
+                    "stale": c.is_stale(now),
+                    "last_duration_ms": round(c.last_duration_ms, 3),
+                    "refreshes_total": c.refreshes_total,
+                    "errors_total": c.errors_total,
+                }
+                for c in self.components
+            },
+        }
+
+    def to_prometheus(self) -> str:
+        """Generate Prometheus text format for metrics snapshot components."""
+        now = time.monotonic()
+        lines = []
+
+        lines.append("# HELP phantomnet_metrics_snapshot_age_seconds Age of each cached LIVE_METRICS component")
+        lines.append("# TYPE phantomnet_metrics_snapshot_age_seconds gauge")
+        for c in self.components:
+            age = c.age(now)
+            lines.append(f'phantomnet_metrics_snapshot_age_seconds{{component="{c.name}"}} {age if age is not None else -1:.3f}')
+
+        lines.append("")
+        lines.append("# HELP phantomnet_metrics_snapshot_duration_ms Last compute time of each component")
+        lines.append("# TYPE phantomnet_metrics_snapshot_duration_ms gauge")
+        for c in self.components:
+            lines.append(f'phantomnet_metrics_snapshot_duration_ms{{component="{c.name}"}} {c.last_duration_ms:.3f}')
+
+        lines.append("")
+        lines.append("# HELP phantomnet_metrics_snapshot_errors_total Failed component refreshes")
+        lines.append("# TYPE phantomnet_metrics_snapshot_errors_total counter")
+        for c in self.components:
+            lines.append(f'phantomnet_metrics_snapshot_errors_total{{component="{c.name}"}} {c.errors_total}')
+
+        return "\n".join(lines) + "\n"
+
+
+class LiveMetricsPublisher:
+    """
+    Turns snapshots into hub messages: the full snapshot for LIVE_METRICS
+    subscribers, and deltas (with a periodic full keyframe) for
+    LIVE_METRICS_DELTA subscribers. Nothing is sent while nothing changed.
+    """
+
+    def __init__(self, service: MetricsSnapshotService, keyframe_interval: float = LIVE_METRICS_KEYFRAME_S):
+        self.service = service
+        self.keyframe_interval = keyframe_interval
+        self._last: Optional[Dict[str, Any]] = None
+        self._last_keyframe = 0.0
+
+    @property
+    def last_snapshot(self) -> Optional[Dict[str, Any]]:
+        """The snapshot the next delta will be based on (None before the first broadcast)."""
+        return self._last
+
+    def messages(self, now: Optional[float] = None) -> List[Tuple[str, str, Dict[str, Any]]]:
+        """(topic, message_type, payload) to publish for the current snapshot."""
+        now = time.monotonic() if now is None else now
+        current = self.service.snapshot()
+        previous = self._last
+        if previous is not None and previous == current:
+            return []
+        self._last = current
+
+        out = [(LIVE_METRICS, LIVE_METRICS, current)]
+        if previous is None or now - self._last_keyframe >= self.keyframe_interval:
+            self._last_keyframe = now
+            out.append((LIVE_METRICS_DELTA, LIVE_METRICS, current))
+        else:
+            out.append((LIVE_METRICS_DELTA, LIVE_METRICS_DELTA, self.service.delta(previous, current)))
+        return out
+
+
+# --------------------------------------------------
+# Default components
+# --------------------------------------------------
+
+
+def _stats_fields() -> Dict[str, Any]:
+    from database.database import SessionLocal
+    from services.stats_aggregator import StatsService
+
+    db = SessionLocal()
+    try:
+        return StatsService(db).calculate_stats()
+    finally:
+        db.close()
+
+
+def _honeypot_fields() -> Dict[str, Any]:
+    from api.honeypots import get_honeypot_status
+
+    return {"honeypots": [h.model_dump() for h in get_honeypot_status(None)]}
+
+
+def _system_health_fields() -> Dict[str, Any]:
+    import psutil
+
+    # Root of the current drive on Windows, "/" elsewhere
+    drive = os.path.splitdrive(os.getcwd())[0]
+    try:
+        disk_percent = psutil.disk_usage(drive + "\\" if drive else "/").percent
+    except Exception:
+        disk_percent = 0
+
+    return {
+        "system_health": {
+            "cpu": psutil.cpu_percent(),
+            "memory": psutil.virtual_memory().percent,
+            "disk": disk_percent,
+        }
+    }
+
+
+def _ml_status_fields() -> Dict[str, Any]:
+    from database.database import SessionLocal
+    from database.models import PacketLog
+    from services.threat_analyzer import threat_analyzer
+
+    db = SessionLocal()
+    try:
+        unscored_count = db.query(PacketLog).filter(PacketLog.threat_level.is_(None)).count()
+    finally:
+        db.close()
+    return {
+        "ml_status": {
+            "inference_time": f"{threat_analyzer.last_inference_ms}ms",
+            "queue_depth": unscored_count,
+            "status": "online" if threat_analyzer.running else "offline",
+        }
+    }
+
+
+def _throughput_fields() -> Dict[str, Any]:
+    from sqlalchemy import func
+    from database.database import SessionLocal
+    from database.models import PacketLog
+
+    # Events per minute over the last 5 minutes
+    five_min_ago = datetime.utcnow() - timedelta(minutes=5)
+    db = SessionLocal()
+    try:
+        epm_count = db.query(func.count(PacketLog.id)).filter(PacketLog.timestamp >= five_min_ago).scalar() or 0
+    finally:
+        db.close()
+    return {"events_per_minute": round(epm_count / 5, 1)}
+
+
+def build_default_service() -> MetricsSnapshotService:
+    service = MetricsSnapshotService()
+    service.register("stats", _stats_fields, METRICS_STATS_INTERVAL_S)
+    service.register("honeypots", _honeypot_fields, METRICS_HONEYPOTS_INTERVAL_S)
+    service.register("system_health", _system_health_fields, METRICS_SYSTEM_INTERVAL_S)
+    service.register("ml_status", _ml_status_fields, METRICS_ML_INTERVAL_S)
+    service.register("throughput", _throughput_fields, METRICS_THROUGHPUT_INTERVAL_S)
+    return service
+
+
+# Singleton instance
+metrics_snapshot = build_default_service()
+live_metrics_publisher = LiveMetricsPublisher(metrics_snapshot)
@@ -12,10 +12,10 @@ Response Actions Matrix:
     CRITICAL (90+):  Log + Alert + IP Block (permanent) + Scale + Notify admin
 
 Usage:
-    from services.response_executor import response_executor
+    from services.response_executor import get_response_executor
 
     # Trigger response based on threat score
-    response_executor.execute(ip="1.2.3.4", threat_score=85, threat_level="HIGH")
+    get_response_executor().execute(ip="1.2.3.4", threat_score=85, threat_level="HIGH")
 """
 
 import time
@@ -504,6 +504,18 @@ class ResponseExecutor:
 
 
 # ──────────────────────────────────────────────
-# Module-level singleton
+# Lazy module-level singleton
 # ──────────────────────────────────────────────
-response_executor = ResponseExecutor()
+def get_response_executor() -> ResponseExecutor:
+    """
+    Shared executor. Created on first use, since initialisation starts the
+    block-expiry cleanup thread.
+    """
+    return ResponseExecutor()
+
+
+def __getattr__(name):
+    # Keeps ``from services.response_executor import response_executor`` working
+    if name == "response_executor":
+        return get_response_executor()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -280,6 +280,57 @@ class SchedulerService:
             db.close()
         logger.info("[Sentinel Retention] Cycle complete")
 
+    # ------------------------------------------------------------------
+    # PacketLog Partition Rotation Scheduler
+    # ------------------------------------------------------------------
+    def start_packet_log_partitioning(self) -> bool:
+        """Register the periodic packet_logs partition rotation job."""
+        from database.partitioning import (
+            PARTITIONING_ENABLED,
+            ROTATION_INTERVAL_HOURS,
+        )
+
+        if not PARTITIONING_ENABLED:
+            logger.info("[Partitioning] Disabled (PACKET_LOG_PARTITIONING_ENABLED=false)")
+            return False
+
+        if self.scheduler.get_job("packet_log_partitioning") is not None:
+            return True
+
+        self.scheduler.add_job(
+            self._run_partition_rotation_cycle,
+            trigger=IntervalTrigger(hours=max(1, ROTATION_INTERVAL_HOURS)),
+            id="packet_log_partitioning",
+            name="PacketLog Partition Rotation",
+            replace_existing=True,
+            max_instances=1,
+            next_run_time=datetime.now(),
+        )
+
+        logger.info("[Partitioning] Registered — interval=%d hours", ROTATION_INTERVAL_HOURS)
+        return True
+
+    def stop_packet_log_partitioning(self) -> bool:
+        """Remove the partition rotation job if it exists."""
+        if self.scheduler.get_job("packet_log_partitioning") is None:
+            return False
+        self.scheduler.remove_job("packet_log_partitioning")
+        logger.info("[Partitioning] Job removed")
+        return True
+
+    def _run_partition_rotation_cycle(self) -> None:
+        """Execute one packet_logs partition rotation."""
+        from database.partitioning import partition_manager
+
+        db = SessionLocal()
+        try:
+            partition_manager.rotate(db)
+        except Exception as exc:
+            db.rollback()
+            logger.error("[Partitioning] Rotation failed: %s", exc)
+        finally:
+            db.close()
+
     # ------------------------------------------------------------------
     # Pre-seed dedup hashes from DB (survives process restarts)
     # ------------------------------------------------------------------
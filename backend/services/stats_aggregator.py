@@ -1,8 +1,8 @@
 from sqlalchemy.orm import Session
 from sqlalchemy import func
-from datetime import datetime, timedelta
 
-from database.models import PacketLog, TrafficStats
+from database.models import PacketLog
+from database.rollups import rollup_store
 
 
 class StatsService:
@@ -17,12 +17,37 @@ class StatsService:
 
     def calculate_stats(self) -> dict:
         """
-        Calculates and aggregates network activity statistics from the database.
+        Calculates and aggregates network activity statistics.
+
+        Served from the packet_log_rollups mirror (constant time); falls back
+        to querying packet_logs directly when rollups are unavailable.
 
         Returns:
             dict: Aggregated metrics including total events, unique IPs, 
                   active honeypots, average threat score, and critical alerts.
         """
+        totals = rollup_store.snapshot(self.db)
+        if totals is None:
+            return self.calculate_stats_from_logs()
+
+        scored = totals["scored_count"]
+        avg_threat = totals["threat_score_sum"] / scored if scored else 0.0
+
+        return self._format_stats(
+            total_events=totals["event_count"],
+            unique_ips=totals["unique_src_ips"],
+            active_honeypots=totals["unique_protocols"],
+            avg_threat=avg_threat,
+            critical_alerts=totals["critical_count"],
+            malicious_count=totals["malicious_count"],
+            suspicious_count=totals["suspicious_count"],
+            benign_count=totals["benign_count"],
+        )
+
+    def calculate_stats_from_logs(self) -> dict:
+        """
+        Calculates the same statistics with direct queries over packet_logs.
+        """
         # Total events
         total_events = self.db.query(PacketLog).count()
 
@@ -54,6 +79,28 @@ class StatsService:
             self.db.query(PacketLog).filter(PacketLog.threat_score < 0.4).count()
         )
 
+        return self._format_stats(
+            total_events=total_events,
+            unique_ips=unique_ips,
+            active_honeypots=active_honeypots,
+            avg_threat=avg_threat,
+            critical_alerts=critical_alerts,
+            malicious_count=malicious_count,
+            suspicious_count=suspicious_count,
+            benign_count=benign_count,
+        )
+
+    @staticmethod
+    def _format_stats(
+        total_events: int,
+        unique_ips: int,
+        active_honeypots: int,
+        avg_threat: float,
+        critical_alerts: int,
+        malicious_count: int,
+        suspicious_count: int,
+        benign_count: int,
+    ) -> dict:
         return {
             "totalEvents": total_events,
             "uniqueIPs": unique_ips,
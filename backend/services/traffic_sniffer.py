@@ -5,9 +5,8 @@ from datetime import datetime
 
 from database.database import SessionLocal
 from database.models import PacketLog
-import asyncio
-from api.realtime import push_realtime_event
 from sqlalchemy.orm import Session
+from services.ingestion_queue import ingestion_queue
 
 # ✅ WEEK 6 ML PIPELINE
 from ml.threat_correlation import ThreatCorrelator
@@ -103,46 +102,14 @@ class RealTimeSniffer:
                 attack_type=attack_label,
             )
             db.add(new_log)
+            db.flush()
+            log_id = new_log.id
             db.commit()
             db.close()
 
-            # -----------------------------
-            # 3.5️⃣ PUSH TO REAL-TIME WS
-            # -----------------------------
-            try:
-                loop = asyncio.get_event_loop()
-                if loop.is_running():
-                    loop.create_task(
-                        push_realtime_event(
-                            "EVENT_STREAM",
-                            {
-                                "src_ip": src_ip,
-                                "dst_ip": dst_ip,
-                                "protocol": protocol,
-                                "length": length,
-                                "threat_score": risk_score,
-                                "attack_type": attack_label,
-                                "timestamp": datetime.utcnow().isoformat(),
-                            },
-                        )
-                    )
-                else:
-                    asyncio.run(
-                        push_realtime_event(
-                            "EVENT_STREAM",
-                            {
-                                "src_ip": src_ip,
-                                "dst_ip": dst_ip,
-                                "protocol": protocol,
-                                "length": length,
-                                "threat_score": risk_score,
-                                "attack_type": attack_label,
-                                "timestamp": datetime.utcnow().isoformat(),
-                            },
-                        )
-                    )
-            except Exception as e:
-                pass  # Non-blocking for sniffer
+            # Hand off to the threat analyzer for immediate scoring; it also
+            # publishes the event to the live dashboard stream once scored
+            ingestion_queue.publish(log_id)
 
             # -----------------------------
             # 4️⃣ CONSOLE OUTPUT
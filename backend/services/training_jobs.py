@@ -0,0 +1,503 @@
+"""
+PhantomNet Training Jobs
+========================
+
+Model training runs outside the API process. Callers enqueue a job in the
+``training_jobs`` table; a training worker claims it and runs it in a child
+process started with ``spawn``, at reduced priority:
+
+    enqueue_job()    training_jobs row, status queued
+    TrainingWorker   claims it (queued -> running) and submits it to a
+                     ProcessPoolExecutor; each child runs one job and exits,
+                     so the memory a fit used is returned to the OS
+    child            reports progress + heartbeat on the row, publishes the
+                     model (ml/model_publish.py), records succeeded / failed
+    scoring path     hot-reloads the published model
+
+JOB_KINDS maps a kind to "module:function". The function is called as
+``fn(progress, **params)``, where ``progress(fraction, message=None)``
+records progress on the job row, and returns a JSON-able result. A kind
+already queued or running is not queued twice.
+
+The child is kept off the API's CPUs and below its priority:
+
+    TRAINING_NICENESS   added to the child's niceness (default 10)
+    TRAINING_CPUS       CPUs the child may run on, e.g. "2-3" or "1,3"
+                        (default: all); OpenMP / BLAS / joblib thread pools
+                        are capped to that many CPUs
+
+TRAINING_WORKER_MODE selects who runs the worker:
+
+    process    (default) the API hosts the dispatcher thread, jobs run in
+               its child process
+    external   the API only enqueues; run ``python -m services.training_jobs
+               worker`` elsewhere (another container / host, same database)
+
+A worker that dies mid-job stops heartbeating; running jobs whose heartbeat
+is older than TRAINING_JOB_STALE_S are marked failed.
+
+Usage:
+    from services.training_jobs import enqueue_job, training_worker
+
+    job_id = enqueue_job("unsupervised_baseline", {"days_back": 7})
+    training_worker.start()           # lifespan startup (process mode)
+
+    python -m services.training_jobs worker
+    python -m services.training_jobs enqueue random_forest --param days=30
+    python -m services.training_jobs status
+"""
+
+import os
+import json
+import time
+import socket
+import logging
+import argparse
+import importlib
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import update
+
+from database.database import SessionLocal
+from database.models import TrainingJob
+
+logger = logging.getLogger("training_jobs")
+
+TRAINING_WORKER_MODE = os.getenv("TRAINING_WORKER_MODE", "process").lower()
+TRAINING_NICENESS = int(os.getenv("TRAINING_NICENESS", "10"))
+TRAINING_CPUS = os.getenv("TRAINING_CPUS", "")
+TRAINING_POLL_INTERVAL_S = float(os.getenv("TRAINING_POLL_INTERVAL_S", "5"))
+TRAINING_HEARTBEAT_S = float(os.getenv("TRAINING_HEARTBEAT_S", "30"))
+TRAINING_JOB_STALE_S = float(os.getenv("TRAINING_JOB_STALE_S", "300"))
+
+# Minimum seconds between progress writes that only move the fraction
+PROGRESS_INTERVAL_S = 1.0
+# Thread pools sized from the environment in the training child
+THREAD_LIMIT_VARS = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS", "LOKY_MAX_CPU_COUNT")
+
+JOB_KINDS = {
+    "unsupervised_baseline": "ml_engine.unsupervised_detector:run_baseline_job",
+    "random_forest": "ml_engine.retraining_pipeline:run_retraining_job",
+}
+ACTIVE_STATUSES = ("queued", "running")
+
+
+def parse_cpus(spec: str) -> List[int]:
+    """CPU list syntax ("0-2,5") to CPU numbers ([0, 1, 2, 5])."""
+    cpus = set()
+    for part in filter(None, (part.strip() for part in spec.split(","))):
+        first, _, last = part.partition("-")
+        cpus.update(range(int(first), int(last or first) + 1))
+    return sorted(cpus)
+
+
+def job_to_dict(job: TrainingJob) -> Dict[str, Any]:
+    return {
+        "id": job.id,
+        "kind": job.kind,
+        "params": json.loads(job.params) if job.params else {},
+        "status": job.status,
+        "progress": job.progress,
+        "message": job.message,
+        "worker": job.worker,
+        "result": json.loads(job.result) if job.result else None,
+        "error": job.error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "heartbeat_at": job.heartbeat_at.isoformat() if job.heartbeat_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+# --------------------------------------------------
+# Queue
+# --------------------------------------------------
+
+
+def enqueue_job(kind: str, params: Optional[Dict[str, Any]] = None) -> int:
+    """Queue a ``kind`` job and return its id (the existing one if that kind is queued or running)."""
+    if kind not in JOB_KINDS:
+        raise ValueError(f"Unknown training job kind: {kind}")
+    db = SessionLocal()
+    try:
+        existing = (
+            db.query(TrainingJob.id)
+            .filter(TrainingJob.kind == kind, TrainingJob.status.in_(ACTIVE_STATUSES))
+            .order_by(TrainingJob.id)
+            .first()
+        )
+        if existing is not None:
+            return existing.id
+        job = TrainingJob(kind=kind, params=json.dumps(params or {}), status="queued", progress=0.0)
+        db.add(job)
+        db.commit()
+        logger.info("Queued training job %d (%s)", job.id, kind)
+        return job.id
+    finally:
+        db.close()
+
+
+def get_job(job_id: int) -> Optional[Dict[str, Any]]:
+    db = SessionLocal()
+    try:
+        job = db.get(TrainingJob, job_id)
+        return job_to_dict(job) if job is not None else None
+    finally:
+        db.close()
+
+
+def list_jobs(limit: int = 20, status: Optional[str] = None) -> List[Dict[str, Any]]:
+    db = SessionLocal()
+    try:
+        query = db.query(TrainingJob)
+        if status:
+            query = query.filter(TrainingJob.status == status)
+        return [job_to_dict(job) for job in query.order_by(TrainingJob.id.desc()).limit(limit)]
+    finally:
+        db.close()
+
+
+def claim_next(worker: str) -> Optional[Tuple[int, str]]:
+    """
+    Move the oldest queued job to running for ``worker``; returns (id, kind).
+    The UPDATE is conditional on the job still being queued, so two workers
+    never claim the same job.
+    """
+    db = SessionLocal()
+    try:
+        while True:
+            job = (
+                db.query(TrainingJob.id, TrainingJob.kind)
+                .filter(TrainingJob.status == "queued")
+                .order_by(TrainingJob.id)
+                .first()
+            )
+            if job is None:
+                return None
+            now = datetime.utcnow()
+            claimed = db.execute(
+                update(TrainingJob)
+                .where(TrainingJob.id == job.id, TrainingJob.status == "queued")
+                .values(status="running", worker=worker, started_at=now, heartbeat_at=now, message="Starting")
+            ).rowcount
+            db.commit()
+            if claimed:
+                return job.id, job.kind
+    finally:
+        db.close()
+
+
+def fail_stale_jobs(stale_after_s: float = TRAINING_JOB_STALE_S) -> int:
+    """Mark running jobs whose worker stopped heartbeating as failed; returns how many."""
+    now = datetime.utcnow()
+    db = SessionLocal()
+    try:
+        failed = db.execute(
+            update(TrainingJob)
+            .where(
+                TrainingJob.status == "running",
+                TrainingJob.heartbeat_at < now - timedelta(seconds=stale_after_s),
+            )
+            .values(status="failed", error="Worker stopped heartbeating", finished_at=now)
+        ).rowcount
+        db.commit()
+    finally:
+        db.close()
+    if failed:
+        logger.warning("Marked %d stale training job(s) failed", failed)
+    return failed
+
+
+def _update_running(job_id: int, **values) -> int:
+    """Update a job that is still running (a stale or requeued job is left alone)."""
+    db = SessionLocal()
+    try:
+        updated = db.execute(
+            update(TrainingJob)
+            .where(TrainingJob.id == job_id, TrainingJob.status == "running")
+            .values(**values)
+        ).rowcount
+        db.commit()
+        return updated
+    finally:
+        db.close()
+
+
+def _finish(job_id: int, status: str, result: Any = None, error: Optional[str] = None) -> None:
+    values = {"status": status, "finished_at": datetime.utcnow(), "error": error}
+    if status == "succeeded":
+        values.update(progress=1.0, message="Done", result=json.dumps(result, default=str))
+    _update_running(job_id, **values)
+
+
+def _requeue(job_id: int) -> None:
+    _update_running(job_id, status="queued", worker=None, started_at=None, progress=0.0, message="Requeued")
+
+
+# --------------------------------------------------
+# Execution (training child process)
+# --------------------------------------------------
+
+
+class JobProgress:
+    """``progress(fraction, message=None)`` callback handed to job functions."""
+
+    def __init__(self, job_id: int):
+        self.job_id = job_id
+        self._message = None
+        self._last_write = 0.0
+
+    def __call__(self, fraction: float, message: Optional[str] = None) -> None:
+        now = time.monotonic()
+        changed = message is not None and message != self._message
+        if not changed and now - self._last_write < PROGRESS_INTERVAL_S:
+            return
+        values = {"progress": max(0.0, min(1.0, float(fraction))), "heartbeat_at": datetime.utcnow()}
+        if changed:
+            values["message"] = self._message = message
+        self._write(values)
+        self._last_write = now
+
+    def heartbeat(self) -> None:
+        self._write({"heartbeat_at": datetime.utcnow()})
+
+    def _write(self, values: Dict[str, Any]) -> None:
+        # Losing a progress update must not fail the training run
+        try:
+            _update_running(self.job_id, **values)
+        except Exception as e:
+            logger.warning("Progress update for job %d failed: %s", self.job_id, e)
+
+
+def resolve_target(target: str) -> Callable:
+    module, _, attr = target.partition(":")
+    return getattr(importlib.import_module(module), attr)
+
+
+def execute_job(job_id: int, target: Optional[str] = None) -> str:
+    """Run a claimed job in this process and record its outcome; returns the final status."""
+    db = SessionLocal()
+    try:
+        job = db.get(TrainingJob, job_id)
+        kind, params = job.kind, json.loads(job.params or "{}")
+    finally:
+        db.close()
+
+    progress = JobProgress(job_id)
+    stop = threading.Event()
+    heartbeat = threading.Thread(target=_heartbeat_loop, args=(progress, stop), daemon=True)
+    heartbeat.start()
+    started = time.monotonic()
+    try:
+        result = resolve_target(target or JOB_KINDS[kind])(progress, **params)
+    except Exception as e:
+        logger.error("Training job %d (%s) failed: %s", job_id, kind, e, exc_info=True)
+        _finish(job_id, "failed", error=f"{type(e).__name__}: {e}")
+        return "failed"
+    finally:
+        stop.set()
+    _finish(job_id, "succeeded", result=result)
+    logger.info("Training job %d (%s) succeeded in %.1fs", job_id, kind, time.monotonic() - started)
+    return "succeeded"
+
+
+def _heartbeat_loop(progress: JobProgress, stop: threading.Event) -> None:
+    while not stop.wait(TRAINING_HEARTBEAT_S):
+        progress.heartbeat()
+
+
+def _init_training_process(niceness: int, cpus: List[int]) -> None:
+    """
+    Pool initializer: runs in the child before any job module is imported,
+    so thread pools sized at import (OpenMP, BLAS, joblib) see the limits.
+    """
+    if cpus and hasattr(os, "sched_setaffinity"):
+        try:
+            os.sched_setaffinity(0, cpus)
+        except OSError as e:
+            logger.warning("Could not pin training process to CPUs %s: %s", cpus, e)
+    if hasattr(os, "sched_getaffinity"):
+        allowed = len(os.sched_getaffinity(0))
+    else:
+        allowed = os.cpu_count() or 1
+    for var in THREAD_LIMIT_VARS:
+        os.environ.setdefault(var, str(allowed))
+    if niceness and hasattr(os, "nice"):
+        try:
+            os.nice(niceness)
+        except OSError as e:
+            logger.warning("Could not lower training process priority: %s", e)
+
+
+# --------------------------------------------------
+# Worker (dispatcher)
+# --------------------------------------------------
+
+
+class TrainingWorker:
+    """Claims queued jobs and runs each in a spawned, low-priority child process."""
+
+    def __init__(
+        self,
+        processes: int = 1,
+        niceness: int = TRAINING_NICENESS,
+        cpus: Optional[List[int]] = None,
+        poll_interval_s: float = TRAINING_POLL_INTERVAL_S,
+    ):
+        self.processes = processes
+        self.niceness = niceness
+        self.cpus = parse_cpus(TRAINING_CPUS) if cpus is None else list(cpus)
+        self.poll_interval_s = poll_interval_s
+        self.name = f"{socket.gethostname()}:{os.getpid()}"
+        self._pool = None
+        self._running = {}  # future -> job id
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self) -> bool:
+        """Run the dispatcher on a daemon thread (no-op if already running)."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return False
+            self._stop.clear()
+            self._thread = threading.Thread(target=self.run_forever, name="training-worker", daemon=True)
+            self._thread.start()
+        return True
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Stop dispatching; jobs still running are terminated and requeued."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        for future, job_id in list(self._running.items()):
+            if not future.done():
+                _requeue(job_id)
+        self._running.clear()
+        self._shutdown_pool(terminate=True)
+
+    def run_forever(self) -> None:
+        logger.info(
+            "Training worker %s started (processes=%d, niceness=%d, cpus=%s)",
+            self.name, self.processes, self.niceness, self.cpus or "all",
+        )
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error("Training worker cycle failed: %s", e)
+            self._stop.wait(self.poll_interval_s)
+
+    def run_once(self) -> int:
+        """Reap finished jobs, fail stale ones, start queued ones; returns the jobs in flight."""
+        self._reap()
+        fail_stale_jobs()
+        while len(self._running) < self.processes:
+            claimed = claim_next(self.name)
+            if claimed is None:
+                break
+            job_id, kind = claimed
+            try:
+                future = self._executor().submit(execute_job, job_id, JOB_KINDS[kind])
+            except (BrokenProcessPool, RuntimeError) as e:
+                _finish(job_id, "failed", error=f"Could not start training process: {e}")
+                self._shutdown_pool()
+                break
+            self._running[future] = job_id
+            logger.info("Training job %d (%s) started", job_id, kind)
+        return len(self._running)
+
+    def _reap(self) -> None:
+        for future in [future for future in self._running if future.done()]:
+            job_id = self._running.pop(future)
+            error = future.exception()
+            if error is not None:
+                # The child died (killed, out of memory) before recording an outcome
+                _finish(job_id, "failed", error=f"Training process died: {error!r}")
+                if isinstance(error, BrokenProcessPool):
+                    self._shutdown_pool()
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.processes,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_training_process,
+                initargs=(self.niceness, self.cpus),
+                max_tasks_per_child=1,
+            )
+        return self._pool
+
+    def _shutdown_pool(self, terminate: bool = False) -> None:
+        pool, self._pool = self._pool, None
+        if pool is None:
+            return
+        if terminate:
+            # ProcessPoolExecutor has no public way to stop a running task
+            for process in list((pool._processes or {}).values()):
+                process.terminate()
+        pool.shutdown(wait=terminate, cancel_futures=True)
+
+
+training_worker = TrainingWorker()
+
+
+# --------------------------------------------------
+# CLI
+# --------------------------------------------------
+
+
+def _parse_param(item: str) -> Tuple[str, Any]:
+    key, _, value = item.partition("=")
+    try:
+        return key, json.loads(value)
+    except ValueError:
+        return key, value
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="PhantomNet training jobs")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    worker_cmd = commands.add_parser("worker", help="Run queued training jobs until interrupted")
+    worker_cmd.add_argument("--processes", type=int, default=1, help="Jobs run concurrently")
+    worker_cmd.add_argument("--niceness", type=int, default=TRAINING_NICENESS)
+    worker_cmd.add_argument("--cpus", default=TRAINING_CPUS, help='CPU list, e.g. "2-3"')
+
+    enqueue_cmd = commands.add_parser("enqueue", help="Queue a training job")
+    enqueue_cmd.add_argument("kind", choices=sorted(JOB_KINDS))
+    enqueue_cmd.add_argument("--param", action="append", default=[], metavar="KEY=VALUE")
+
+    status_cmd = commands.add_parser("status", help="Show recent training jobs")
+    status_cmd.add_argument("--limit", type=int, default=20)
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    if args.command == "worker":
+        worker = TrainingWorker(args.processes, args.niceness, parse_cpus(args.cpus))
+        try:
+            worker.run_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            worker.stop()
+    elif args.command == "enqueue":
+        print(enqueue_job(args.kind, dict(_parse_param(item) for item in args.param)))
+    else:
+        for job in list_jobs(args.limit):
+            print(
+                f"{job['id']:>6}  {job['kind']:<22} {job['status']:<10} {job['progress'] or 0:>5.0%}  "
+                f"{job['message'] or ''}{'  ' + job['error'] if job['error'] else ''}"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,523 @@
+"""
+PhantomNet WebSocket Hub
+========================
+
+Pub/sub fan-out for the dashboard WebSockets (api/realtime.py, api/topology.py).
+
+Producers publish to a topic (EVENT_STREAM, LIVE_METRICS, TOPOLOGY, ...)
+without awaiting any client:
+
+    - every message is serialized once, however many clients receive it
+    - messages published within WS_FLUSH_INTERVAL_MS are sent as one frame
+      per topic; more than one message goes out as
+      {"type": "BATCH", "topic": ..., "payload": [message, ...]}
+    - snapshot types (LIVE_METRICS, TRAFFIC_TICK) are coalesced: only the
+      latest one is kept, per flush and in each client's queue
+
+Clients can be capped on EVENT_STREAM (WS_CLIENT_MAX_EVENTS_PER_S, or
+lower via connect(max_rate=...)). Over the cap a client gets the newest
+messages of each flush (THREAT_ALERT and summaries always go through),
+and at most once a second an EVENTS_SUPPRESSED message with how many it
+missed.
+
+Each connection has a bounded queue (WS_QUEUE_SIZE frames, oldest dropped
+first) drained by its own sender task, so a slow browser only delays
+itself. A client whose send has been blocked for WS_SEND_TIMEOUT_S, or
+that has lost more than WS_MAX_DROPPED frames since its last successful
+send, is disconnected (close code 1013, try again later).
+
+publish() may be called from any thread; calls from outside the server's
+event loop are handed to it with call_soon_threadsafe.
+
+Usage:
+    from services.ws_hub import ws_hub, EVENT_STREAM
+
+    await ws_hub.connect(websocket, topics=[EVENT_STREAM])
+    ws_hub.publish(EVENT_STREAM, "EVENT_STREAM", payload)
+"""
+
+import os
+import json
+import asyncio
+import logging
+import threading
+from collections import defaultdict, deque
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger("ws_hub")
+
+WS_QUEUE_SIZE = int(os.getenv("WS_QUEUE_SIZE", "256"))
+WS_FLUSH_INTERVAL_MS = float(os.getenv("WS_FLUSH_INTERVAL_MS", "50"))
+WS_SEND_TIMEOUT_S = float(os.getenv("WS_SEND_TIMEOUT_S", "5"))
+WS_MAX_DROPPED = int(os.getenv("WS_MAX_DROPPED", "1000"))
+# Per-client cap on EVENT_STREAM messages per second (0 = unlimited); clients may ask for less
+WS_CLIENT_MAX_EVENTS_PER_S = float(os.getenv("WS_CLIENT_MAX_EVENTS_PER_S", "200"))
+
+# Topics
+EVENT_STREAM = "EVENT_STREAM"
+LIVE_METRICS = "LIVE_METRICS"
+LIVE_METRICS_DELTA = "LIVE_METRICS_DELTA"  # changed fields only, with periodic full LIVE_METRICS keyframes
+TOPOLOGY = "TOPOLOGY"
+
+# Message types where only the latest value matters
+COALESCE_TYPES = frozenset({"LIVE_METRICS", "TRAFFIC_TICK"})
+
+# Topics subject to per-client rate caps, and message types that are never capped
+RATE_LIMITED_TOPICS = frozenset({EVENT_STREAM})
+UNCAPPED_TYPES = frozenset({"THREAT_ALERT", "EVENT_STREAM_SUMMARY"})
+
+# Sent to a rate-capped client (at most once a second) when messages were held back
+SUPPRESSED_TYPE = "EVENTS_SUPPRESSED"
+
+# WebSocket close code 1013: Try Again Later
+SLOW_CONSUMER_CLOSE_CODE = 1013
+
+
+class _Subscriber:
+    __slots__ = (
+        "websocket", "topics", "queue", "keyed", "wakeup", "dropped", "sending_since", "task", "closed",
+        "max_rate", "tokens", "refilled_at", "suppressed", "suppressed_total", "notified_at",
+    )
+
+    def __init__(self, websocket, topics: Set[str], max_rate: float = 0.0, now: float = 0.0):
+        self.websocket = websocket
+        self.topics = topics
+        # Slots are [frame, coalesce_key, message_count]; coalesced slots are updated in place
+        self.queue: deque = deque()
+        self.keyed: Dict[Tuple[str, str], list] = {}
+        self.wakeup = asyncio.Event()
+        self.dropped = 0
+        self.sending_since: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+        self.closed = False
+        # Token bucket for rate-limited topics (burst of one second)
+        self.max_rate = max_rate
+        self.tokens = max_rate
+        self.refilled_at = now
+        self.suppressed = 0  # held back since the last EVENTS_SUPPRESSED notice
+        self.suppressed_total = 0
+        self.notified_at = now
+
+    def take(self, wanted: int, now: float) -> int:
+        """Messages of ``wanted`` this client may receive now."""
+        if not self.max_rate:
+            return wanted
+        self.tokens = min(self.max_rate, self.tokens + (now - self.refilled_at) * self.max_rate)
+        self.refilled_at = now
+        allowed = min(wanted, int(self.tokens))
+        self.tokens -= allowed
+        return allowed
+
+
+class WebSocketHub:
+    """
+    Topic-based WebSocket broadcaster with per-connection send queues.
+    """
+
+    def __init__(
+        self,
+        queue_size: int = WS_QUEUE_SIZE,
+        flush_interval_ms: float = WS_FLUSH_INTERVAL_MS,
+        send_timeout: float = WS_SEND_TIMEOUT_S,
+        max_dropped: int = WS_MAX_DROPPED,
+        coalesce_types: Iterable[str] = COALESCE_TYPES,
+        client_max_rate: float = WS_CLIENT_MAX_EVENTS_PER_S,
+        rate_limited_topics: Iterable[str] = RATE_LIMITED_TOPICS,
+        uncapped_types: Iterable[str] = UNCAPPED_TYPES,
+    ):
+        self.queue_size = max(1, queue_size)
+        self.flush_interval = max(0.0, flush_interval_ms / 1000)
+        self.send_timeout = send_timeout
+        self.max_dropped = max_dropped
+        self.coalesce_types = frozenset(coalesce_types)
+        self.client_max_rate = max(0.0, client_max_rate)
+        self.rate_limited_topics = frozenset(rate_limited_topics)
+        self.uncapped_types = frozenset(uncapped_types)
+
+        self._subscribers: Dict[Any, _Subscriber] = {}
+        self._by_topic: Dict[str, Set[_Subscriber]] = defaultdict(set)
+        self._pending: Dict[str, List[str]] = {}  # topic -> serialized messages
+        self._latest: Dict[Tuple[str, str], str] = {}  # (topic, type) -> latest serialized message
+        self._uncapped: Dict[str, List[int]] = {}  # topic -> indexes in _pending exempt from rate caps
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[int] = None
+        self._flush_handle = None
+
+        self.published_total = 0
+        self.frames_sent_total = 0
+        self.messages_sent_total = 0
+        self.dropped_total = 0
+        self.coalesced_total = 0
+        self.slow_disconnects_total = 0
+        self.rate_limited_total = 0
+
+    # --------------------------------------------------
+    # Connections
+    # --------------------------------------------------
+
+    async def connect(
+        self, websocket, topics: Iterable[str], accept: bool = True, max_rate: Optional[float] = None
+    ) -> None:
+        """
+        Accept ``websocket`` (unless already accepted) and subscribe it to ``topics``.
+        ``max_rate`` lowers the client's cap on rate-limited topics (messages/s);
+        it cannot raise it above ``client_max_rate``.
+        """
+        if accept:
+            await websocket.accept()
+        self._bind_loop()
+        rate = self.client_max_rate
+        if max_rate is not None and max_rate > 0:
+            rate = min(rate, max_rate) if rate else max_rate
+        sub = _Subscriber(websocket, set(), rate, self._loop.time())
+        self._subscribers[websocket] = sub
+        self.subscribe(websocket, topics)
+        sub.task = asyncio.get_running_loop().create_task(self._sender(sub))
+        logger.info(f"WebSocket client connected to {sorted(sub.topics)}. Total: {len(self._subscribers)}")
+
+    async def disconnect(self, websocket) -> None:
+        sub = self._subscribers.get(websocket)
+        if sub is None:
+            return
+        self._remove(sub)
+        if sub.task is not None and sub.task is not asyncio.current_task():
+            sub.task.cancel()
+        logger.info(f"WebSocket client disconnected. Total: {len(self._subscribers)}")
+
+    def subscribe(self, websocket, topics: Iterable[str]) -> None:
+        sub = self._subscribers.get(websocket)
+        if sub is None:
+            return
+        for topic in topics:
+            sub.topics.add(topic)
+            self._by_topic[topic].add(sub)
+
+    def unsubscribe(self, websocket, topics: Iterable[str]) -> None:
+        sub = self._subscribers.get(websocket)
+        if sub is None:
+            return
+        for topic in topics:
+            sub.topics.discard(topic)
+            self._by_topic[topic].discard(sub)
+
+    def handle_client_message(self, websocket, text: str) -> None:
+        """Apply {"action": "subscribe" | "unsubscribe", "topics": [...]} sent by a client."""
+        try:
+            message = json.loads(text)
+        except ValueError:
+            return
+        if not isinstance(message, dict) or not isinstance(message.get("topics"), list):
+            return
+        if message.get("action") == "subscribe":
+            self.subscribe(websocket, message["topics"])
+        elif message.get("action") == "unsubscribe":
+            self.unsubscribe(websocket, message["topics"])
+
+    @property
+    def connections(self) -> List[Any]:
+        return list(self._subscribers)
+
+    def has_subscribers(self, topic: str) -> bool:
+        return bool(self._by_topic.get(topic))
+
+    def subscribers(self, *topics: str) -> List[Any]:
+        """Connections subscribed to any of ``topics``."""
+        return list({sub.websocket: None for topic in topics for sub in self._by_topic.get(topic, ())})
+
+    # --------------------------------------------------
+    # Publishing
+    # --------------------------------------------------
+
+    def publish(self, topic: str, message_type: str, payload: Any) -> None:
+        """
+        Queue ``payload`` for every subscriber of ``topic``. Never blocks on clients.
+        """
+        loop = self._loop
+        if loop is None or not self._by_topic.get(topic):
+            return
+        if threading.get_ident() != self._loop_thread:
+            try:
+                loop.call_soon_threadsafe(self.publish, topic, message_type, payload)
+            except RuntimeError:
+                # Server loop already closed (shutdown)
+                pass
+            return
+
+        message = json.dumps({"type": message_type, "payload": payload, "timestamp": loop.time()})
+        self.published_total += 1
+        if message_type in self.coalesce_types:
+            if (topic, message_type) in self._latest:
+                self.coalesced_total += 1
+            self._latest[(topic, message_type)] = message
+        else:
+            messages = self._pending.setdefault(topic, [])
+            if message_type in self.uncapped_types and topic in self.rate_limited_topics:
+                self._uncapped.setdefault(topic, []).append(len(messages))
+            messages.append(message)
+        self._schedule_flush()
+
+    def send_to(self, websocket, topic: str, message_type: str, payload: Any) -> bool:
+        """
+        Queue a message for one connection only (e.g. the current snapshot
+        right after it connects). Must be called on the server loop.
+        """
+        sub = self._subscribers.get(websocket)
+        if sub is None or self._loop is None:
+            return False
+        message = json.dumps({"type": message_type, "payload": payload, "timestamp": self._loop.time()})
+        key = (topic, message_type) if message_type in self.coalesce_types else None
+        self._enqueue(sub, message, key, 1)
+        return True
+
+    def flush(self) -> None:
+        """Hand everything published since the last flush to the subscriber queues."""
+        self._flush_handle = None
+        pending, self._pending = self._pending, {}
+        latest, self._latest = self._latest, {}
+
+        uncapped, self._uncapped = self._uncapped, {}
+
+        now = self._loop.time()
+        for topic, messages in pending.items():
+            frame = self._frame(topic, messages)
+            limited = topic in self.rate_limited_topics
+            exempt = uncapped.get(topic, ())
+            capped = len(messages) - len(exempt)
+            sampled: Dict[int, str] = {}  # allowed count -> frame, shared by clients with the same budget
+            for sub in list(self._by_topic.get(topic, ())):
+                allowed = sub.take(capped, now) if limited else capped
+                if allowed == capped:
+                    self._enqueue(sub, frame, None, len(messages))
+                    continue
+                # Over the client's cap: keep uncapped and the newest messages, count the rest
+                if allowed not in sampled:
+                    kept = self._sample(messages, exempt, allowed)
+                    sampled[allowed] = self._frame(topic, kept) if kept else ""
+                if sampled[allowed]:
+                    self._enqueue(sub, sampled[allowed], None, allowed + len(exempt))
+                sub.suppressed += capped - allowed
+                sub.suppressed_total += capped - allowed
+                self.rate_limited_total += capped - allowed
+
+        for sub in list(self._subscribers.values()):
+            if sub.suppressed and now - sub.notified_at >= 1.0:
+                self._notify_suppressed(sub, now)
+
+        for key, frame in latest.items():
+            for sub in list(self._by_topic.get(key[0], ())):
+                self._enqueue(sub, frame, key, 1)
+
+        self._check_stalled()
+
+    @staticmethod
+    def _frame(topic: str, messages: List[str]) -> str:
+        if len(messages) == 1:
+            return messages[0]
+        # Messages are already JSON; splice them instead of re-serializing
+        return '{"type": "BATCH", "topic": %s, "payload": [%s]}' % (json.dumps(topic), ", ".join(messages))
+
+    @staticmethod
+    def _sample(messages: List[str], exempt: Iterable[int], allowed: int) -> List[str]:
+        """``exempt`` messages plus the newest ``allowed`` others, in publish order."""
+        exempt = set(exempt)
+        kept = []
+        for i in range(len(messages) - 1, -1, -1):
+            if i in exempt:
+                kept.append(messages[i])
+            elif allowed:
+                kept.append(messages[i])
+                allowed -= 1
+        kept.reverse()
+        return kept
+
+    def _notify_suppressed(self, sub: _Subscriber, now: float) -> None:
+        notice = json.dumps({
+            "type": SUPPRESSED_TYPE,
+            "payload": {
+                "suppressed": sub.suppressed,
+                "suppressed_total": sub.suppressed_total,
+                "window_s": round(now - sub.notified_at, 3),
+                "max_rate": sub.max_rate,
+            },
+            "timestamp": now,
+        })
+        sub.suppressed = 0
+        sub.notified_at = now
+        self._enqueue(sub, notice, None, 0)
+
+    def _schedule_flush(self) -> None:
+        if self._flush_handle is not None:
+            return
+        if self.flush_interval:
+            self._flush_handle = self._loop.call_later(self.flush_interval, self.flush)
+        else:
+            self._flush_handle = self._loop.call_soon(self.flush)
+
+    def _enqueue(self, sub: _Subscriber, frame: str, key, count: int) -> None:
+        if sub.closed:
+            return
+        if key is not None:
+            slot = sub.keyed.get(key)
+            if slot is not None:
+                slot[0] = frame
+                self.coalesced_total += 1
+                return
+        if len(sub.queue) >= self.queue_size:
+            oldest = sub.queue.popleft()
+            if oldest[1] is not None:
+                sub.keyed.pop(oldest[1], None)
+            sub.dropped += 1
+            self.dropped_total += 1
+            if sub.dropped > self.max_dropped:
+                self._drop_slow_consumer(sub, f"{sub.dropped} frames dropped")
+                return
+        slot = [frame, key, count]
+        sub.queue.append(slot)
+        if key is not None:
+            sub.keyed[key] = slot
+        sub.wakeup.set()
+
+    # --------------------------------------------------
+    # Delivery
+    # --------------------------------------------------
+
+    async def _sender(self, sub: _Subscriber) -> None:
+        loop = asyncio.get_running_loop()
+        try:
+            while not sub.closed:
+                if not sub.queue:
+                    sub.wakeup.clear()
+                    await sub.wakeup.wait()
+                    continue
+                frame, key, count = sub.queue.popleft()
+                if key is not None:
+                    sub.keyed.pop(key, None)
+                sub.sending_since = loop.time()
+                await sub.websocket.send_text(frame)
+                sub.sending_since = None
+                sub.dropped = 0
+                self.frames_sent_total += 1
+                self.messages_sent_total += count
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.debug(f"WebSocket send failed, dropping client: {e}")
+        finally:
+            self._remove(sub)
+
+    def _check_stalled(self) -> None:
+        if not self.send_timeout:
+            return
+        now = self._loop.time()
+        for sub in list(self._subscribers.values()):
+            if sub.sending_since is not None and now - sub.sending_since > self.send_timeout:
+                self._drop_slow_consumer(sub, f"send blocked for {now - sub.sending_since:.1f}s")
+
+    def _drop_slow_consumer(self, sub: _Subscriber, reason: str) -> None:
+        logger.warning(f"Disconnecting slow WebSocket consumer ({reason})")
+        self.slow_disconnects_total += 1
+        self._remove(sub)
+        if sub.task is not None:
+            sub.task.cancel()
+        self._loop.create_task(self._close(sub.websocket))
+
+    @staticmethod
+    async def _close(websocket) -> None:
+        try:
+            await websocket.close(code=SLOW_CONSUMER_CLOSE_CODE)
+        except Exception:
+            pass
+
+    def _remove(self, sub: _Subscriber) -> None:
+        sub.closed = True
+        sub.queue.clear()
+        sub.keyed.clear()
+        if self._subscribers.get(sub.websocket) is sub:
+            del self._subscribers[sub.websocket]
+        for topic in sub.topics:
+            self._by_topic[topic].discard(sub)
+
+    def _bind_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # First connection (or a new server loop, e.g. in tests): drop state tied to the old one
+            self._loop = loop
+            self._loop_thread = threading.get_ident()
+            self._flush_handle = None
+            self._pending.clear()
+            self._latest.clear()
+            self._uncapped.clear()
+
+    # --------------------------------------------------
+    # Metrics
+    # --------------------------------------------------
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "connections": len(self._subscribers),
+            "subscribers": {topic: len(subs) for topic, subs in self._by_topic.items() if subs},
+            "queued_frames": sum(len(sub.queue) for sub in self._subscribers.values()),
+            "published_total": self.published_total,
+            "frames_sent_total": self.frames_sent_total,
+            "messages_sent_total": self.messages_sent_total,
+            "dropped_total": self.dropped_total,
+            "coalesced_total": self.coalesced_total,
+            "slow_disconnects_total": self.slow_disconnects_total,
+            "rate_limited_total": self.rate_limited_total,
+        }
+
+    def to_prometheus(self) -> str:
+        """Generate Prometheus text format for WebSocket hub metrics."""
+        lines = []
+
+        lines.append("# HELP phantomnet_ws_connections Connected WebSocket clients")
+        lines.append("# TYPE phantomnet_ws_connections gauge")
+        lines.append(f"phantomnet_ws_connections {len(self._subscribers)}")
+
+        lines.append("")
+        lines.append("# HELP phantomnet_ws_subscribers WebSocket clients subscribed per topic")
+        lines.append("# TYPE phantomnet_ws_subscribers gauge")
+        for topic, subs in sorted(self._by_topic.items()):
+            lines.append(f'phantomnet_ws_subscribers{{topic="{topic}"}} {len(subs)}')
+
+        lines.append("")
+        lines.append("# HELP phantomnet_ws_published_total Messages published to the hub")
+        lines.append("# TYPE phantomnet_ws_published_total counter")
+        lines.append(f"phantomnet_ws_published_total {self.published_total}")
+
+        lines.append("")
+        lines.append("# HELP phantomnet_ws_frames_sent_total WebSocket frames sent to clients")
+        lines.append("# TYPE phantomnet_ws_frames_sent_total counter")
+        lines.append(f"phantomnet_ws_frames_sent_total {self.frames_sent_total}")
+
+        lines.append("")
+        lines.append("# HELP phantomnet_ws_messages_sent_total Messages delivered to clients (batched frames count each message)")
+        lines.append("# TYPE phantomnet_ws_messages_sent_total counter")
+        lines.append(f"phantomnet_ws_messages_sent_total {self.messages_sent_total}")
+
+        lines.append("")
+        lines.append("# HELP phantomnet_ws_dropped_total Frames dropped from full client queues")
+        lines.append("# TYPE phantomnet_ws_dropped_total counter")
+        lines.append(f"phantomnet_ws_dropped_total {self.dropped_total}")
+
+        lines.append("")
+        lines.append("# HELP phantomnet_ws_coalesced_total Snapshot messages replaced by a newer one before sending")
+        lines.append("# TYPE phantomnet_ws_coalesced_total counter")
+        lines.append(f"phantomnet_ws_coalesced_total {self.coalesced_total}")
+
+        lines.append("")
+        lines.append("# HELP phantomnet_ws_slow_disconnects_total Clients disconnected as slow consumers")
+        lines.append("# TYPE phantomnet_ws_slow_disconnects_total counter")
+        lines.append(f"phantomnet_ws_slow_disconnects_total {self.slow_disconnects_total}")
+
+        lines.append("")
+        lines.append("# HELP phantomnet_ws_rate_limited_total Messages held back by per-client rate caps")
+        lines.append("# TYPE phantomnet_ws_rate_limited_total counter")
+        lines.append(f"phantomnet_ws_rate_limited_total {self.rate_limited_total}")
+
+        return "\n".join(lines) + "\n"
+
+
+# Singleton instance
+ws_hub = WebSocketHub()
@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+from unittest.mock import MagicMock, patch
+from sklearn.ensemble import ExtraTreesClassifier, IsolationForest, RandomForestClassifier
+from sklearn.tree import DecisionTreeClassifier
+
+import ml.threat_scoring_service as tss
+from ml.feature_extractor import FeatureExtractor
+from ml.inference_engine import CompiledForest, InferenceEngine
+from schemas.threat_schema import ThreatInput
+
+N_FEATURES = len(FeatureExtractor.FEATURE_NAMES)
+
+
+@pytest.fixture(scope="module")
+def data():
+    rng = np.random.default_rng(3)
+    X = (rng.random((2000, N_FEATURES)) * 100).astype(np.float32)
+    y = (X[:, 0] + X[:, 4] > 100).astype(int) + (X[:, 2] > 80)
+    return X, y
+
+
+@pytest.mark.parametrize(
+    "model",
+    [
+        RandomForestClassifier(n_estimators=40, random_state=0),
+        ExtraTreesClassifier(n_estimators=20, max_depth=6, random_state=0),
+        DecisionTreeClassifier(random_state=0),
+    ],
+)
+def test_compiled_probabilities_match_sklearn(model, data):
+    X, y = data
+    model.fit(X, y)
+    compiled = CompiledForest.from_sklearn(model)
+
+    assert compiled.n_trees == getattr(model, "n_estimators", 1)
+    np.testing.assert_array_equal(compiled.predict_proba(X), model.predict_proba(X))
+    np.testing.assert_array_equal(compiled.classes, model.classes_)
+
+
+def test_engine_chunks_on_worker_pool_and_skips_other_models(data):
+    X, y = data
+    model = RandomForestClassifier(n_estimators=10, random_state=0).fit(X, y)
+    engine = InferenceEngine(workers=2, chunk_rows=300)
+
+    compiled = engine.compile(model)
+    assert engine.compile(model) is compiled and engine.compiled_total == 1
+    np.testing.assert_array_equal(engine.predict_proba(compiled, X.astype(np.float64)), model.predict_proba(X))
+    assert engine.stats["rows_total"] == len(X)
+
+    with pytest.raises(ValueError):
+        engine.predict_proba(compiled, X[:, :5])
+    assert engine.compile(IsolationForest(n_estimators=5).fit(X)) is None
+    assert engine.compile(MagicMock()) is None
+    assert InferenceEngine(enabled=False).compile(model) is None
+    engine.stop()
+
+
+@patch("ml.threat_scoring_service.model_loader.load_model")
+def test_batch_scoring_uses_compiled_engine(mock_load_model, data):
+    X, y = data
+    model = RandomForestClassifier(n_estimators=25, random_state=0).fit(X, (X[:, 0] > 50).astype(int))
+    mock_load_model.return_value = model
+    tss._LOCAL_PRED_CACHE.clear()
+    inputs = [
+        ThreatInput(
+            src_ip=f"203.0.113.{i}", dst_ip="10.0.0.5", dst_port=22, protocol="TCP",
+            length=100 + 40 * i, timestamp="2026-03-14T03:00:00Z", threat_score=float(10 * i),
+            attack_type="bruteforce", honeypot_type="SSH",
+        )
+        for i in range(8)
+    ]
+    matrix = (np.random.default_rng(1).random((len(inputs), N_FEATURES)) * 100)
+
+    with patch.object(model, "predict_proba", wraps=model.predict_proba) as sklearn_proba:
+        responses = tss.score_threat_batch(inputs, features=matrix)
+        sklearn_proba.assert_not_called()
+
+    expected = model.predict_proba(matrix.astype(np.float32))
+    assert [r.score for r in responses] == pytest.approx(expected[:, 1].tolist())
+    assert [r.confidence for r in responses] == pytest.approx(expected.max(axis=1).tolist())
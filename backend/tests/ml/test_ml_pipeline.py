@@ -6,6 +6,7 @@ import pytest
 from unittest.mock import patch, MagicMock
 from schemas.threat_schema import ThreatInput, ThreatResponse
 import ml.threat_scoring_service as tss
+import numpy as np
 import pandas as pd
 
 @pytest.fixture
@@ -139,7 +140,7 @@ def test_score_threat_batch(mock_load_model, mock_feature_extractor):
     
     from ml.feature_extractor import FeatureExtractor
     mock_feature_extractor.FEATURE_NAMES = FeatureExtractor.FEATURE_NAMES
-    mock_feature_extractor.extract_features.side_effect = lambda ev: {k: 0 for k in FeatureExtractor.FEATURE_NAMES}
+    mock_feature_extractor.extract_batch.side_effect = lambda events: np.zeros((len(events), len(FeatureExtractor.FEATURE_NAMES)))
     
     inputs = [
         ThreatInput(src_ip="1.1.1.1", dst_ip="2.2.2.2", dst_port=80, protocol="TCP", length=100),
@@ -153,3 +154,88 @@ def test_score_threat_batch(mock_load_model, mock_feature_extractor):
         assert response.score == 0.8
         assert response.threat_level == "HIGH"
         assert response.decision == "BLOCK"
+
+def test_feature_cache_keys_follow_features_and_model_version():
+    base = np.zeros((1, 15))
+    near = base + 1e-5  # below every feature's bucket
+    rising = base.copy()
+    rising[0, 8] = 5.0  # e.g. burst rate went up
+    longer = base.copy()
+    longer[0, 11] = 120.0  # session duration is keyed in coarse log buckets
+    slightly_longer = longer.copy()
+    slightly_longer[0, 11] = 125.0
+    faster = base.copy()
+    faster[0, 2] = 60.0  # per-minute event rate escalates
+
+    assert tss.feature_cache_keys(base, "v1") == tss.feature_cache_keys(near, "v1")
+    assert tss.feature_cache_keys(base, "v1") != tss.feature_cache_keys(rising, "v1")
+    assert tss.feature_cache_keys(base, "v1") != tss.feature_cache_keys(longer, "v1")
+    assert tss.feature_cache_keys(longer, "v1") == tss.feature_cache_keys(slightly_longer, "v1")
+    assert tss.feature_cache_keys(base, "v1") != tss.feature_cache_keys(faster, "v1")
+    assert tss.feature_cache_keys(base, "v1") != tss.feature_cache_keys(base, "v2")
+
+    model = MockModelPredictProba()
+    with patch('ml.model_loader._MODEL', model), patch('ml.model_loader._MODEL_VERSION', "mlflow:m/2"):
+        assert tss.model_cache_tag(model) == "mlflow:m/2"
+        # Unversioned models are tagged by content, so every worker agrees on the tag
+        assert tss.model_cache_tag(MockModelPredictProba()).startswith("obj-")
+        assert tss.model_cache_tag(MockModelPredictProba()) == tss.model_cache_tag(MockModelPredictProba())
+        unpicklable = MagicMock(spec=["predict_proba"])
+        assert tss.model_cache_tag(unpicklable).startswith(tss.LOCAL_MODEL_TAG_PREFIX)
+        assert tss.model_cache_tag(unpicklable) == tss.model_cache_tag(unpicklable)
+        assert tss.model_cache_tag(unpicklable) != tss.model_cache_tag(MagicMock(spec=["predict_proba"]))
+    key = tss.feature_cache_keys(base, "mlflow:m/2")[0]
+    assert tss.redis_cache_key(key).startswith(tss.PRED_CACHE_PREFIX + b"mlflow:m/2:")
+
+@patch('ml.threat_scoring_service.model_loader.load_model')
+@pytest.mark.usefixtures("mock_redis")
+def test_repeated_traffic_hits_prediction_cache(mock_load_model):
+    from datetime import datetime, timedelta
+    from ml.feature_extractor import FeatureExtractor
+    model = MagicMock(spec=["predict_proba"])
+    model.predict_proba.side_effect = lambda X: [[0.2, 0.8]] * len(X)
+    mock_load_model.return_value = model
+
+    # 500 identical packets from one IP, two per second, scored as they arrive
+    start = datetime(2026, 10, 18, 12, 0, 0)
+    inputs = [
+        ThreatInput(src_ip="198.51.100.9", dst_ip="10.0.0.5", dst_port=22, protocol="TCP", length=60,
+                    timestamp=(start + timedelta(seconds=i / 2)).isoformat())
+        for i in range(500)
+    ]
+    with patch('ml.threat_scoring_service._FEATURE_EXTRACTOR', FeatureExtractor()):
+        for i in range(0, len(inputs), 10):
+            tss.score_threat_batch(inputs[i:i + 10])
+
+    scored = sum(len(call.args[0]) for call in model.predict_proba.call_args_list)
+    assert scored < 50
+
+def test_model_change_clears_local_prediction_cache():
+    tss._LOCAL_PRED_CACHE.set(("old", b"x"), tss.pack_prediction(0.9, 0.9))
+    with patch('ml.model_loader._MODEL_VERSION', "file:a.pkl@1"):
+        tss.model_loader._set_version("file:b.pkl@2")
+    assert len(tss._LOCAL_PRED_CACHE) == 0
+
+@patch('ml.threat_scoring_service.model_loader.load_model')
+@pytest.mark.usefixtures("mock_redis")
+def test_score_threat_batch_cache_hits_still_update_feature_state(mock_load_model, mock_feature_extractor):
+    from ml.feature_extractor import FeatureExtractor
+    model = MagicMock(spec=["predict_proba"])
+    model.predict_proba.side_effect = lambda X: [[0.2, 0.8]] * len(X)
+    mock_load_model.return_value = model
+    mock_feature_extractor.FEATURE_NAMES = FeatureExtractor.FEATURE_NAMES
+    mock_feature_extractor.extract_batch.side_effect = lambda events: np.zeros((len(events), len(FeatureExtractor.FEATURE_NAMES)))
+
+    inputs = [
+        ThreatInput(src_ip="1.1.1.1", dst_ip="2.2.2.2", dst_port=80, protocol="TCP", length=100),
+        ThreatInput(src_ip="1.1.1.2", dst_ip="2.2.2.2", dst_port=80, protocol="TCP", length=200, is_malicious=True)
+    ]
+    first = tss.score_threat_batch(inputs)
+    second = tss.score_threat_batch(inputs)
+
+    # Same feature vector -> one model call for one row; state updated every time
+    assert model.predict_proba.call_count == 1
+    assert mock_feature_extractor.extract_batch.call_count == 2
+    assert second == first
+    # Level is still mapped per input context
+    assert [r.threat_level for r in second] == ["HIGH", "CRITICAL"]
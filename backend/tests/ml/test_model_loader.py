@@ -0,0 +1,97 @@
+import subprocess
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import joblib
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+
+import ml.model_loader as loader
+from ml.model_publish import PublishedModelWatcher, publish_model
+
+BACKEND_DIR = Path(__file__).resolve().parents[2]
+
+
+@pytest.fixture
+def fresh_loader(tmp_path, monkeypatch):
+    """Loader state as in a new process, with its own snapshot dir and bundled model."""
+    X = np.random.default_rng(0).random((200, 4))
+    bundled = RandomForestClassifier(n_estimators=5, random_state=0).fit(X, (X[:, 0] > 0.5).astype(int))
+    joblib.dump(bundled, tmp_path / "bundled.pkl", compress=3)
+
+    monkeypatch.setattr(loader, "MODEL_SNAPSHOT_DIR", tmp_path / "snapshots")
+    monkeypatch.setattr(loader, "LOCAL_MODEL_PATH", tmp_path / "bundled.pkl")
+    monkeypatch.setattr(loader, "MODEL_REFRESH_ENABLED", False)
+    monkeypatch.setattr(loader, "_REFRESH_STATE", {"last_refresh": None, "last_error": None})
+    monkeypatch.setattr(loader, "_PUBLISHED", PublishedModelWatcher(loader.RF_MODEL_NAME, tmp_path / "published", interval_s=0))
+    for name in ("_MODEL", "_MODEL_VERSION", "_MODEL_SOURCE", "_REGISTRY_VERSION"):
+        monkeypatch.setattr(loader, name, None)
+    return X
+
+
+def test_first_load_uses_bundled_file_when_registry_is_down(fresh_loader, monkeypatch):
+    def unreachable():
+        raise ConnectionError("tracking server down")
+
+    monkeypatch.setattr(loader, "_resolve_registry_version", unreachable)
+    model = loader.load_model()
+
+    assert model is not None and loader.readiness()["source"] == "file"
+    assert loader.refresh_model() is model
+    status = loader.readiness()
+    assert status["ready"] and status["last_refresh_error"] == "tracking server down"
+
+
+def test_refresh_snapshots_new_version_for_the_next_start(fresh_loader, monkeypatch):
+    X = fresh_loader
+    registry_model = RandomForestClassifier(n_estimators=7, random_state=1).fit(X, (X[:, 1] > 0.5).astype(int))
+    monkeypatch.setattr(loader, "_resolve_registry_version", lambda: "4")
+    fake_mlflow = SimpleNamespace(sklearn=SimpleNamespace(load_model=lambda uri: registry_model))
+    monkeypatch.setattr(loader, "_mlflow", lambda: fake_mlflow)
+    changes = []
+    monkeypatch.setattr(loader, "_CHANGE_CALLBACKS", [changes.append])
+
+    loader.load_model()
+    assert loader.refresh_model() is registry_model
+    assert changes == [f"mlflow:{loader.MODEL_NAME}/4"]
+    assert loader.read_manifest()["version"] == f"mlflow:{loader.MODEL_NAME}/4"
+
+    # Next start: served from the mmap-able snapshot, no registry lookup
+    monkeypatch.setattr(loader, "_resolve_registry_version", lambda: pytest.fail("registry contacted"))
+    monkeypatch.setattr(loader, "_MODEL", None)
+    restored = loader.load_model()
+    assert loader.readiness()["source"] == "snapshot"
+    np.testing.assert_array_equal(restored.predict_proba(X), registry_model.predict_proba(X))
+
+
+def test_scorer_hot_reloads_published_random_forest(fresh_loader, tmp_path, monkeypatch):
+    X = fresh_loader
+    changes = []
+    monkeypatch.setattr(loader, "_CHANGE_CALLBACKS", [changes.append])
+    assert loader.readiness()["ready"] is False
+    loader.load_model()
+    assert loader.readiness()["source"] == "file"
+
+    retrained = RandomForestClassifier(n_estimators=6, random_state=2).fit(X, (X[:, 2] > 0.5).astype(int))
+    pointer = publish_model(loader.RF_MODEL_NAME, retrained, directory=tmp_path / "published")
+    served = loader.load_model()
+    tag = f"published:{loader.RF_MODEL_NAME}/{pointer['version']}"
+    assert loader.readiness()["source"] == "published" and changes == [tag]
+    np.testing.assert_array_equal(served.predict_proba(X), retrained.predict_proba(X))
+
+    # A registry version already resolved on this host does not replace it
+    monkeypatch.setattr(loader, "_resolve_registry_version", lambda: "4")
+    monkeypatch.setattr(loader, "_REGISTRY_VERSION", f"mlflow:{loader.MODEL_NAME}/4")
+    assert loader.refresh_model() is served
+
+    # Next start: the published model is resolved first
+    monkeypatch.setattr(loader, "_MODEL", None)
+    loader.load_model()
+    assert loader.model_version() == tag and loader.readiness()["published_version"] == pointer["version"]
+
+
+def test_scoring_service_import_does_not_import_mlflow():
+    code = "import sys, ml.threat_scoring_service; sys.exit('mlflow' in sys.modules)"
+    assert subprocess.run([sys.executable, "-c", code], cwd=BACKEND_DIR).returncode == 0
@@ -0,0 +1,127 @@
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import numpy as np
+
+from ml_engine.sequence_scorer import (
+    EXPORT_FILE,
+    NumpyLSTM,
+    SequenceFeatureEncoder,
+    SequenceScorer,
+    export_keras_lstm,
+)
+
+FEATURE_COLS = [
+    "length", "inter_arrival_time", "failed_auth_count", "unique_ports_accessed",
+    "proto_TCP", "proto_UDP", "atk_DOS", "atk_OTHER",
+]
+BASE_TIME = datetime(2026, 3, 14, 3, 0, 0)
+
+
+def make_log(ip, i, **overrides):
+    fields = dict(
+        src_ip=ip, timestamp=BASE_TIME + timedelta(seconds=2 * i), protocol="TCP",
+        dst_port=22 + i % 3, length=100 + i, event="Test", attack_type=None,
+    )
+    fields.update(overrides)
+    return SimpleNamespace(**fields)
+
+
+def make_scorer(model=None, **kwargs):
+    scorer = SequenceScorer(seq_len=5, **kwargs)
+    scorer.encoder = SequenceFeatureEncoder(FEATURE_COLS)
+    scorer.model = model or MagicMock(backend="mock", predict_proba=lambda X: np.tile([0.0, 0.0, 1.0], (len(X), 1)))
+    return scorer
+
+
+def test_encoder_tracks_per_ip_state():
+    scorer = make_scorer()
+    scorer.observe_logs([
+        make_log("1.1.1.1", 0),
+        make_log("1.1.1.1", 1, event="Failed password", protocol="UDP", attack_type="DOS"),
+    ])
+    window = scorer._sequences["1.1.1.1"].window()
+
+    np.testing.assert_array_equal(window[-2], [100, 0, 0, 1, 1, 0, 0, 1])
+    np.testing.assert_array_equal(window[-1], [101, 2, 1, 2, 0, 1, 1, 0])
+
+
+def test_ring_buffer_keeps_last_events_in_order():
+    scorer = make_scorer()
+    scorer.observe_logs(make_log("1.1.1.1", i) for i in range(12))
+    state = scorer._sequences["1.1.1.1"]
+
+    assert state.full and state.count == 12
+    np.testing.assert_array_equal(state.window()[:, 0], [107, 108, 109, 110, 111])
+
+
+def test_full_buffers_scored_in_one_call():
+    model = MagicMock(backend="mock")
+    model.predict_proba.side_effect = lambda X: np.tile([0.0, 1.0, 0.0], (len(X), 1))
+    scorer = make_scorer(model)
+    scorer.observe_logs([make_log(ip, i) for i in range(5) for ip in ("1.1.1.1", "2.2.2.2")])
+    scorer.observe_logs([make_log("3.3.3.3", 0)])
+
+    scores = scorer.score_ips(["1.1.1.1", "2.2.2.2", "1.1.1.1", "3.3.3.3", "9.9.9.9"])
+
+    assert scores == {"1.1.1.1": 0.6, "2.2.2.2": 0.6}
+    assert model.predict_proba.call_count == 1
+    assert model.predict_proba.call_args[0][0].shape == (2, 5, len(FEATURE_COLS))
+
+
+def test_idle_and_excess_ips_evicted():
+    scorer = make_scorer(max_ips=2, idle_ttl=60)
+    scorer.observe_logs([make_log(ip, 0) for ip in ("1.1.1.1", "2.2.2.2", "3.3.3.3")])
+    assert list(scorer._sequences) == ["2.2.2.2", "3.3.3.3"]
+
+    scorer._sequences["2.2.2.2"].last_seen -= 120
+    scorer.observe_logs([make_log("3.3.3.3", 1)])
+    assert list(scorer._sequences) == ["3.3.3.3"]
+    assert scorer.stats["evicted_total"] == 2
+
+
+def _reference_lstm(seq, kernel, recurrent, bias):
+    units = recurrent.shape[0]
+    h, c, outputs = np.zeros(units), np.zeros(units), []
+    sig = lambda x: 1 / (1 + np.exp(-x))
+    for x in seq:
+        z = x @ kernel + h @ recurrent + bias
+        i, f, g, o = sig(z[:units]), sig(z[units:2 * units]), np.tanh(z[2 * units:3 * units]), sig(z[3 * units:])
+        c = f * c + i * g
+        h = o * np.tanh(c)
+        outputs.append(h)
+    return np.array(outputs)
+
+
+def test_numpy_export_matches_reference_lstm(tmp_path):
+    rng = np.random.default_rng(0)
+    F, U = len(FEATURE_COLS), 6
+    w1 = [rng.normal(size=(F, 4 * U)), rng.normal(size=(U, 4 * U)), rng.normal(size=4 * U)]
+    w2 = [rng.normal(size=(U, 4 * U)), rng.normal(size=(U, 4 * U)), rng.normal(size=4 * U)]
+    w3 = [rng.normal(size=(U, 3)), rng.normal(size=3)]
+
+    def layer(kind, weights=None, **attrs):
+        cls = type(kind, (), {"get_weights": lambda self: weights, **attrs})
+        return cls()
+
+    keras_model = SimpleNamespace(layers=[
+        layer("LSTM", w1, return_sequences=True),
+        layer("Dropout"),
+        layer("LSTM", w2, return_sequences=False),
+        layer("Dense", w3, activation=SimpleNamespace(__name__="softmax")),
+    ])
+    scaler = SimpleNamespace(mean_=np.array([100.0, 1.0, 0.0, 1.0]), scale_=np.array([10.0, 1.0, 1.0, 1.0]))
+    export_keras_lstm(keras_model, str(tmp_path / EXPORT_FILE), FEATURE_COLS, scaler)
+
+    scorer = SequenceScorer(seq_len=5, models_dir=str(tmp_path))
+    assert scorer.load() and scorer.backend == "numpy"
+    assert scorer.encoder.feature_cols == FEATURE_COLS
+
+    X = rng.normal(size=(4, 5, F)).astype(np.float32)
+    probs = scorer.model.predict_proba(X)
+    for seq, p in zip(X, probs):
+        h = _reference_lstm(_reference_lstm(seq, *w1), *w2)[-1]
+        logits = h @ w3[0] + w3[1]
+        np.testing.assert_allclose(p, np.exp(logits) / np.exp(logits).sum(), rtol=1e-4, atol=1e-6)
+    assert isinstance(scorer.model, NumpyLSTM)
@@ -0,0 +1,130 @@
+import threading
+import time
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from database.models import Alert, Base
+from services.alert_manager import AlertManager
+from services.memory_cache import ShardedTTLCache
+from services.response_executor import response_executor
+
+
+@pytest.fixture
+def session_factory(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'alerts.db'}")
+    Base.metadata.create_all(bind=engine)
+    responses = []
+    monkeypatch.setattr(
+        response_executor, "execute", lambda ip, threat_score, threat_level: responses.append((ip, threat_level))
+    )
+    factory = sessionmaker(bind=engine)
+    factory.responses = responses
+    yield factory
+    engine.dispose()
+
+
+def submit(manager, i):
+    return manager.submit(
+        level="WARNING",
+        alert_type="CORRELATION",
+        description=f"alert {i}",
+        source_ip=f"203.0.113.{i}",
+        details={"n": i},
+    )
+
+
+def test_submitted_alerts_are_batched_in_background(session_factory):
+    manager = AlertManager(batch_size=50, flush_interval_ms=5000, session_factory=session_factory)
+    for i in range(100):
+        assert submit(manager, i)
+
+    deadline = time.monotonic() + 5
+    while manager.persisted_total < 100 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    manager.stop()
+
+    db = session_factory()
+    assert db.query(Alert).count() == 100
+    assert db.query(Alert).filter(Alert.source_ip == "203.0.113.7").one().details == '{"n": 7}'
+    db.close()
+    assert len(session_factory.responses) == 100
+    assert manager.stats["responses_pending"] == 0
+
+
+def test_submit_does_not_wait_for_the_database(session_factory):
+    manager = AlertManager(batch_size=10, flush_interval_ms=10, session_factory=session_factory)
+    release = threading.Event()
+    real_write = manager._write_batch
+
+    def slow_write(rows):
+        release.wait(5)
+        return real_write(rows)
+
+    manager._write_batch = slow_write
+    started = time.perf_counter()
+    for i in range(200):
+        submit(manager, i)
+    assert time.perf_counter() - started < 1.0
+    assert manager.queue_depth > 0
+
+    release.set()
+    manager.stop()
+    assert manager.persisted_total == 200 and manager.queue_depth == 0
+
+
+def test_partial_batches_are_written_within_the_flush_interval(session_factory):
+    manager = AlertManager(batch_size=200, flush_interval_ms=50, session_factory=session_factory)
+
+    # Alerts spaced apart never fill a batch; each is written on the interval
+    for i in range(2):
+        assert submit(manager, i)
+        deadline = time.monotonic() + 2
+        while manager.persisted_total < i + 1 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert manager.persisted_total == i + 1 and manager.queue_depth == 0
+        time.sleep(0.2)
+
+    assert len(session_factory.responses) == 2
+    manager.stop()
+
+
+def test_duplicates_and_full_buffer_are_rejected(session_factory):
+    manager = AlertManager(batch_size=100, flush_interval_ms=60000, max_queue=2, session_factory=session_factory)
+    assert submit(manager, 1) and submit(manager, 2)
+    assert not submit(manager, 1)  # deduplicated
+    assert not submit(manager, 3)  # buffer full
+    assert manager.deduplicated_total == 1 and manager.dropped_total == 1
+
+    manager.stop()
+    # The dropped alert did not claim its dedup slot
+    assert submit(manager, 3)
+    assert "phantomnet_alerts_persisted_total 3" in manager.to_prometheus()
+
+
+def test_dedup_index_evicts_expired_keys(session_factory):
+    now = [1000.0]
+    manager = AlertManager(deduplication_window=60, session_factory=session_factory)
+    manager._last_alerts = ShardedTTLCache("alert_dedup_test", default_ttl=60, clock=lambda: now[0])
+    for i in range(900):
+        assert manager._claim("CORRELATION", f"10.0.{i // 256}.{i % 256}")
+    now[0] += 30
+    for i in range(100):
+        assert manager._claim("CORRELATION", f"10.1.0.{i}")
+
+    now[0] += 45
+    assert not manager._claim("CORRELATION", "10.1.0.99")  # still inside its window
+    assert manager.stats["dedup_keys"] == 100
+    assert manager._claim("CORRELATION", "10.0.0.1")  # expired, claimed again
+    assert manager.deduplicated_total == 1
+
+
+def test_create_alert_returns_row_and_responds_off_thread(session_factory):
+    manager = AlertManager(session_factory=session_factory)
+    alert = manager.create_alert(level="HIGH", alert_type="PLAYBOOK", description="x", source_ip="192.0.2.1")
+    assert alert is not None and alert.id is not None
+    assert manager.create_alert(level="HIGH", alert_type="PLAYBOOK", description="x", source_ip="192.0.2.1") is None
+
+    manager.stop()
+    assert session_factory.responses == [("192.0.2.1", "HIGH")]
@@ -2,17 +2,32 @@ import sys
 import os
 from datetime import datetime, timedelta, timezone
 import pytest
-from sqlalchemy.orm import Session
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
 
 # Add project root to sys.path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
-from database.database import SessionLocal, engine
 from database.models import Base, PacketLog
+from ml.feature_extractor import FeatureExtractor
+from ml.feature_store import FeatureStore
+from ml_engine import campaign_clustering
 from ml_engine.campaign_clustering import CampaignClusterer
 
 
-def test_campaign_clustering_non_utc_timezone(monkeypatch):
+@pytest.fixture
+def campaign_db(tmp_path, monkeypatch):
+    """A private database and feature store, so no other test's rows or per-IP state leak in."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'campaigns.db'}")
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    monkeypatch.setattr(campaign_clustering, "SessionLocal", Session)
+    monkeypatch.setattr(campaign_clustering, "feature_store", FeatureStore(FeatureExtractor()))
+    yield Session
+    engine.dispose()
+
+
+def test_campaign_clustering_non_utc_timezone(campaign_db, monkeypatch):
     """
     Verify that CampaignClusterer correctly identifies campaigns even when the host system
     is running in a non-UTC timezone (e.g., UTC+5:30).
@@ -20,16 +35,10 @@ def test_campaign_clustering_non_utc_timezone(monkeypatch):
     If the code used datetime.now(), the cutoff calculated would be in the future relative to UTC,
     causing recent naive UTC timestamps to be missed. Standardizing on datetime.utcnow() ensures correct query filtering.
     """
-    # 1. Initialize DB tables
-    Base.metadata.create_all(bind=engine)
-    db: Session = SessionLocal()
+    db: Session = campaign_db()
     
     try:
-        # Clean up database
-        db.query(PacketLog).delete()
-        db.commit()
-        
-        # 2. Seed mock PacketLog entries with high threat levels
+        # 1. Seed mock PacketLog entries with high threat levels
         # These logs are generated in naive UTC.
         now_utc = datetime.utcnow()
         mock_logs = []
@@ -50,7 +59,7 @@ def test_campaign_clustering_non_utc_timezone(monkeypatch):
         db.add_all(mock_logs)
         db.commit()
         
-        # 3. Simulate a host system in UTC+5:30 timezone by mocking datetime.now
+        # 2. Simulate a host system in UTC+5:30 timezone by mocking datetime.now
         # datetime.now() will return a timezone-naive local time that is 5.5 hours ahead of UTC.
         simulated_local_time = now_utc + timedelta(hours=5, minutes=30)
         
@@ -74,11 +83,11 @@ def test_campaign_clustering_non_utc_timezone(monkeypatch):
         # Patch datetime in the campaign_clustering module
         monkeypatch.setattr("ml_engine.campaign_clustering.datetime", MockedDatetime)
         
-        # 4. Execute CampaignClusterer
+        # 3. Execute CampaignClusterer
         clusterer = CampaignClusterer()
         result = clusterer.identify_campaigns(hours_back=2)
         
-        # 5. Assertions
+        # 4. Assertions
         assert "error" not in result, f"Clustering failed with error: {result.get('error')}"
         assert result["campaign_count"] == 1, f"Expected 1 campaign, found {result['campaign_count']}"
         assert len(result["campaigns"]) == 1
@@ -88,6 +97,47 @@ def test_campaign_clustering_non_utc_timezone(monkeypatch):
         assert campaign["event_count"] == 6
         
     finally:
-        db.query(PacketLog).delete()
+        db.close()
+
+
+def test_campaign_id_stable_across_incremental_updates(campaign_db):
+    """
+    A second call only loads the events added since the first one, and the
+    growing campaign keeps its campaign_id.
+    """
+    db: Session = campaign_db()
+
+    def seed(count, offset):
+        now_utc = datetime.utcnow()
+        db.add_all([
+            PacketLog(
+                src_ip=f"192.168.30.{10 + offset + i}",
+                dst_ip="10.0.0.5",
+                dst_port=80,
+                protocol="TCP",
+                length=150,
+                threat_score=0.85,
+                threat_level="HIGH",
+                attack_type="scan",
+                timestamp=now_utc - timedelta(minutes=i),
+            )
+            for i in range(count)
+        ])
         db.commit()
+
+    try:
+        clusterer = CampaignClusterer()
+
+        seed(6, 0)
+        first = clusterer.identify_campaigns(hours_back=2)
+        assert first["campaign_count"] == 1
+
+        seed(4, 6)
+        second = clusterer.identify_campaigns(hours_back=2)
+        assert second["campaign_count"] == 1
+        assert second["campaigns"][0]["campaign_id"] == first["campaigns"][0]["campaign_id"]
+        assert second["campaigns"][0]["event_count"] == 10
+        assert clusterer._windows[2].engine.last_region_size < 10
+
+    finally:
         db.close()
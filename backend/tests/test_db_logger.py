@@ -0,0 +1,129 @@
+import time
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from database.models import Base, PacketLog
+from database.rollups import rollup_store
+from honeypots import db_logger
+from honeypots.db_logger import BufferedPacketLogWriter
+from services.stats_aggregator import StatsService
+
+
+@pytest.fixture
+def session_factory(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'honeypot.db'}")
+    Base.metadata.create_all(bind=engine)
+    published = []
+    monkeypatch.setattr(db_logger.geoip_service, "lookup", lambda ip: {"country": "Testland", "city": "X"})
+    monkeypatch.setattr(db_logger.ingestion_queue, "publish_many", lambda ids: published.extend(ids))
+    factory = sessionmaker(bind=engine)
+    factory.published = published
+    rollup_store.invalidate()
+    yield factory
+    rollup_store.invalidate()
+    engine.dispose()
+
+
+def row(i):
+    return {
+        "timestamp": db_logger.datetime.utcnow(),
+        "src_ip": f"198.51.100.{i % 4}",
+        "dst_ip": "127.0.0.1",
+        "protocol": "SSH",
+        "length": 0,
+        "is_malicious": False,
+        "threat_score": 0.0,
+        "attack_type": "LOGIN_ATTEMPT",
+    }
+
+
+def test_full_batches_are_bulk_written_in_background(session_factory):
+    writer = BufferedPacketLogWriter(batch_size=50, flush_interval_ms=5000, session_factory=session_factory)
+    for i in range(100):
+        assert writer.submit(row(i))
+
+    deadline = time.monotonic() + 5
+    while writer.written_total < 100 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    writer.stop()
+
+    db = session_factory()
+    assert db.query(PacketLog).count() == 100
+    assert db.query(PacketLog).filter(PacketLog.country == "Testland").count() == 100
+    assert writer.flushes_total == 2
+    assert sorted(session_factory.published) == [log.id for log in db.query(PacketLog).order_by(PacketLog.id)]
+    db.close()
+
+
+def test_partial_batch_flushes_after_interval_and_on_stop(session_factory):
+    writer = BufferedPacketLogWriter(batch_size=1000, flush_interval_ms=20, session_factory=session_factory)
+    writer.submit(row(0))
+    deadline = time.monotonic() + 5
+    while writer.written_total < 1 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert writer.written_total == 1
+
+    slow = BufferedPacketLogWriter(batch_size=1000, flush_interval_ms=60000, session_factory=session_factory)
+    for i in range(3):
+        slow.submit(row(i))
+    slow.stop()
+    assert slow.written_total == 3 and slow.queue_depth == 0
+    writer.stop()
+
+    assert "phantomnet_db_logger_flush_latency_ms" in slow.to_prometheus()
+
+
+def test_low_rate_events_keep_flushing_after_the_first_batch(session_factory):
+    writer = BufferedPacketLogWriter(batch_size=200, flush_interval_ms=50, session_factory=session_factory)
+
+    # Steady state: each event arrives after the previous flush, none fills a batch
+    for i in range(3):
+        assert writer.submit(row(i))
+        deadline = time.monotonic() + 2
+        while writer.written_total < i + 1 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert writer.written_total == i + 1 and writer.queue_depth == 0
+        time.sleep(0.2)
+
+    assert len(session_factory.published) == 3
+    writer.stop()
+
+
+def test_bulk_inserts_keep_rollups_consistent(session_factory):
+    db = session_factory()
+    StatsService(db).calculate_stats()  # build the rollup mirror first
+
+    writer = BufferedPacketLogWriter(batch_size=10, flush_interval_ms=60000, session_factory=session_factory)
+    for i in range(25):
+        writer.submit(row(i))
+    writer.stop()
+
+    assert rollup_store.check_consistency(db)["consistent"]
+    assert StatsService(db).calculate_stats() == StatsService(db).calculate_stats_from_logs()
+    db.close()
+
+
+def test_full_buffer_drops_instead_of_blocking(session_factory):
+    writer = BufferedPacketLogWriter(batch_size=100, flush_interval_ms=60000, max_queue=2, session_factory=session_factory)
+    assert writer.submit(row(0)) and writer.submit(row(1))
+    assert not writer.submit(row(2))
+    assert writer.dropped_total == 1
+    writer.stop()
+
+
+def test_healthcheck_resolution_is_cached(monkeypatch):
+    calls = []
+
+    def fake_resolve(name):
+        calls.append(name)
+        return "172.18.0.5"
+
+    monkeypatch.setattr(db_logger.socket, "gethostbyname", fake_resolve)
+    monkeypatch.setitem(db_logger._api_ip_cache, "expires", 0.0)
+
+    assert db_logger.is_healthcheck("172.18.0.5")
+    assert not db_logger.is_healthcheck("203.0.113.9")
+    assert db_logger.is_healthcheck("127.0.0.1")
+    assert calls == ["api"]
@@ -0,0 +1,97 @@
+import asyncio
+import threading
+import time
+
+from services.event_bridge import EventBridge
+
+
+class RecordingHub:
+    def __init__(self, topics=("TOPOLOGY",)):
+        self.topics = set(topics)
+        self.published = []
+        self.threads = set()
+
+    def has_subscribers(self, topic):
+        return topic in self.topics
+
+    def publish(self, topic, message_type, payload):
+        self.threads.add(threading.get_ident())
+        self.published.append((topic, message_type, payload))
+
+
+def _run_loop():
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    return loop, thread
+
+
+def _stop_loop(loop, thread):
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    loop.close()
+
+
+def _wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.001)
+
+
+def test_events_from_worker_threads_published_on_loop_thread_in_order():
+    hub = RecordingHub()
+    bridge = EventBridge(hub)
+    loop, thread = _run_loop()
+    bridge.bind(loop)
+
+    def worker(name):
+        for i in range(500):
+            assert bridge.emit("TOPOLOGY", "THREAT_DETECTED", (name, i))
+
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(4)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    _wait_for(lambda: len(hub.published) == 2000)
+    _stop_loop(loop, thread)
+
+    assert hub.threads == {thread.ident}
+    for n in range(4):
+        assert [p[2][1] for p in hub.published if p[2][0] == n] == list(range(500))
+    stats = bridge.stats
+    assert stats["delivered_total"] == 2000
+    assert stats["wakeups_total"] < 2000
+
+
+def test_unbound_or_unsubscribed_events_are_not_queued():
+    hub = RecordingHub()
+    bridge = EventBridge(hub)
+
+    assert bridge.emit("TOPOLOGY", "TRAFFIC_TICK", {}) is False
+    assert bridge.stats["dropped_total"] == 1
+
+    loop, thread = _run_loop()
+    bridge.bind(loop)
+    assert bridge.emit("EVENT_STREAM", "EVENT_STREAM", {}) is False
+    assert bridge.stats["emitted_total"] == 0
+    _stop_loop(loop, thread)
+
+    assert bridge.emit("TOPOLOGY", "TRAFFIC_TICK", {}) is False
+    assert hub.published == []
+
+
+def test_bounded_queue_drops_oldest():
+    hub = RecordingHub()
+    bridge = EventBridge(hub, max_pending=3)
+    loop = asyncio.new_event_loop()
+    bridge.bind(loop)
+
+    # The loop is not running yet, so everything stays queued
+    for i in range(5):
+        bridge.emit("TOPOLOGY", "THREAT_DETECTED", i)
+    loop.run_until_complete(asyncio.sleep(0))
+    loop.close()
+
+    assert [p[2] for p in hub.published] == [2, 3, 4]
+    assert bridge.stats["dropped_total"] == 2
@@ -0,0 +1,54 @@
+from datetime import datetime
+from types import SimpleNamespace
+
+from services.event_stream import EventStreamBroadcaster, ALERT_TYPE, SUMMARY_TYPE, to_payload
+
+
+class RecordingBridge:
+    def __init__(self, subscribed=True):
+        self.hub = SimpleNamespace(has_subscribers=lambda topic: subscribed)
+        self.emitted = []
+
+    def emit(self, topic, message_type, payload):
+        self.emitted.append((message_type, payload))
+        return True
+
+
+def _log(i, level="LOW"):
+    return SimpleNamespace(
+        id=i, src_ip="203.0.113.7", dst_ip="10.0.0.5", protocol="TCP", length=60,
+        threat_score=0.1, threat_level=level, attack_type="BENIGN",
+        timestamp=datetime(2026, 3, 14, 3, 0, 0), src_port=40000, country=None,
+    )
+
+
+def test_payload_matches_dashboard_shape():
+    payload = to_payload(_log(1))
+    assert payload["id"] == 1 and payload["timestamp"] == "2026-03-14T03:00:00"
+    assert payload["country"] == "Unknown"
+
+
+def test_sampling_keeps_critical_events_and_summarizes_the_rest():
+    bridge = RecordingBridge()
+    stream = EventStreamBroadcaster(bridge, max_rate=10, summary_interval=1.0)
+    stream._refilled_at = stream._window_started = 0.0
+
+    logs = [_log(i, "HIGH" if i % 100 == 0 else "LOW") for i in range(1000)]
+    assert stream.observe_logs(logs, now=0.5) == 20
+    # The next batch closes the window and publishes the summary
+    stream.observe_logs([_log(1000, "CRITICAL")], now=1.0)
+
+    alerts = [p for t, p in bridge.emitted if t == ALERT_TYPE]
+    assert len(alerts) == 11
+    assert len([t for t, p in bridge.emitted if t == "EVENT_STREAM"]) == 10
+    summaries = [p for t, p in bridge.emitted if t == SUMMARY_TYPE]
+    assert summaries == [{"suppressed": 980, "by_level": {"LOW": 980}, "forwarded": 21, "window_s": 1.0}]
+    assert stream.stats["observed_total"] == 1001
+    assert stream.stats["forwarded_total"] + stream.stats["suppressed_total"] == 1001
+
+
+def test_nothing_built_without_subscribers():
+    bridge = RecordingBridge(subscribed=False)
+    stream = EventStreamBroadcaster(bridge)
+    assert stream.observe_logs([_log(1)]) == 0
+    assert bridge.emitted == [] and stream.stats["observed_total"] == 0
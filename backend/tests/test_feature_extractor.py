@@ -88,3 +88,183 @@ def test_packet_size_variance_and_zscore():
 
     assert features["packet_size_variance"] > 0
     assert isinstance(features["z_score_anomaly"], float)
+
+
+def _reference_features(history, event, window_seconds=60):
+    """Original list-rescanning definitions from the feature spec."""
+    import statistics
+
+    now = datetime.fromisoformat(event["timestamp"])
+    same_ip = [e for e in history if e["src_ip"] == event["src_ip"]]
+    ts = [datetime.fromisoformat(e["timestamp"]) for e in same_ip]
+    sizes = [e["length"] for e in same_ip]
+    attacks = [e["attack_type"] for e in same_ip]
+    ref = {
+        "source_ip_event_rate": len([t for t in ts if t >= now - timedelta(seconds=window_seconds)]) * (60 / window_seconds),
+        "burst_rate": float(len([t for t in ts if t >= now - timedelta(seconds=10)])),
+        "malicious_flag_ratio": sum(e["is_malicious"] for e in same_ip) / len(same_ip),
+        "attack_type_frequency": max(attacks.count(a) for a in set(attacks)),
+        "packet_size_variance": float(statistics.variance(sizes)) if len(sizes) >= 2 else 0.0,
+        "session_duration_estimate": (max(ts) - min(ts)).total_seconds() if len(ts) >= 2 else 0.0,
+        "unique_destination_count": len({e["dst_ip"] for e in same_ip}),
+        "rolling_average_deviation": float(sizes[-1] - sum(sizes) / len(sizes)),
+    }
+    if len(sizes) >= 2 and statistics.stdev(sizes) != 0:
+        ref["z_score_anomaly"] = (sizes[-1] - statistics.mean(sizes)) / statistics.stdev(sizes)
+    else:
+        ref["z_score_anomaly"] = 0.0
+    return ref
+
+
+def test_streaming_state_matches_reference_definitions():
+    import random
+
+    rng = random.Random(7)
+    extractor = FeatureExtractor()
+    history = []
+    t = datetime(2026, 1, 1, 12, 0, 0)
+
+    for _ in range(400):
+        t += timedelta(seconds=rng.choice([0.2, 1, 3, 15]))
+        event = sample_event(
+            src_ip=rng.choice(["10.0.0.1", "10.0.0.2", "10.0.0.3"]),
+            dst_ip=rng.choice(["192.168.1.1", "192.168.1.2", "192.168.1.3", "192.168.1.4"]),
+            length=rng.randint(40, 1500),
+            attack_type=rng.choice(["bruteforce", "scan", "sqli"]),
+            is_malicious=rng.random() < 0.3,
+            timestamp=t.isoformat(),
+        )
+        history.append(event)
+        features = extractor.extract_features(event)
+
+        for name, expected in _reference_features(history, event).items():
+            assert abs(features[name] - expected) <= 1e-6 * max(1.0, abs(expected)), name
+
+
+def test_late_events_match_reference_and_window_stays_bounded():
+    import random
+
+    rng = random.Random(3)
+    extractor = FeatureExtractor()
+    history = []
+    t0 = datetime(2026, 1, 1, 12, 0, 0)
+
+    # Mostly in-order, with some events arriving up to two minutes late
+    for i in range(600):
+        t = t0 + timedelta(milliseconds=700 * i)
+        if rng.random() < 0.2:
+            t -= timedelta(seconds=rng.uniform(0.1, 120))
+        event = sample_event(timestamp=t.isoformat())
+        history.append(event)
+        features = extractor.extract_features(event)
+
+        expected = _reference_features(history, event)
+        assert features["source_ip_event_rate"] == expected["source_ip_event_rate"]
+        assert features["burst_rate"] == expected["burst_rate"]
+
+    # Timestamps far behind the newest event are pruned
+    for i in range(5000):
+        extractor.extract_features(sample_event(timestamp=(t0 + timedelta(hours=1, milliseconds=100 * i)).isoformat()))
+    window = extractor._ip_state["192.168.1.10"].window
+    assert len(window) <= 2 * (60 + FeatureExtractor.LATE_EVENT_GRACE_SECONDS) * 10
+
+
+def test_lru_bound_evicts_least_recent_ip():
+    extractor = FeatureExtractor(max_tracked_ips=2)
+    extractor.extract_features(sample_event(src_ip="1.1.1.1"))
+    extractor.extract_features(sample_event(src_ip="2.2.2.2"))
+    extractor.extract_features(sample_event(src_ip="1.1.1.1"))
+    extractor.extract_features(sample_event(src_ip="3.3.3.3"))
+
+    assert extractor.tracked_ips == 2
+    assert extractor.evicted_ips == 1
+    # 2.2.2.2 was evicted, so its history restarts from scratch
+    assert extractor.extract_features(sample_event(src_ip="2.2.2.2"))["burst_rate"] == 1.0
+
+
+def test_idle_ttl_evicts_state():
+    extractor = FeatureExtractor(idle_ttl_seconds=0)
+    extractor.extract_features(sample_event(src_ip="1.1.1.1"))
+    features = extractor.extract_features(sample_event(src_ip="1.1.1.1"))
+
+    assert features["burst_rate"] == 1.0
+    assert extractor.tracked_ips == 1
+
+
+def _random_events(rng, count, start):
+    events = []
+    for _ in range(count):
+        start += timedelta(seconds=rng.choice([0.2, 1, 3, 15]))
+        events.append(
+            sample_event(
+                src_ip=rng.choice(["10.0.0.1", "10.0.0.2", "10.0.0.3"]),
+                dst_ip=rng.choice(["192.168.1.1", "192.168.1.2", "192.168.1.3"]),
+                dst_port=rng.choice([22, 80, 8080, 60000]),
+                protocol=rng.choice(["TCP", "UDP", "ICMP"]),
+                length=rng.randint(40, 1500),
+                attack_type=rng.choice(["bruteforce", "scan", "sqli"]),
+                honeypot_type=rng.choice(["ssh", "http"]),
+                is_malicious=rng.random() < 0.3,
+                timestamp=start.isoformat(),
+            )
+        )
+    rng.shuffle(events)
+    return events, start
+
+
+def test_extract_batch_matches_sequential_extraction():
+    import random
+
+    rng = random.Random(11)
+    sequential = FeatureExtractor()
+    batched = FeatureExtractor()
+    t = datetime(2026, 1, 1, 12, 0, 0)
+
+    # Two batches so the second one builds on the state left by the first
+    for _ in range(2):
+        events, t = _random_events(rng, 200, t)
+        matrix = batched.extract_batch(events)
+        assert matrix.shape == (len(events), len(FeatureExtractor.FEATURE_NAMES))
+
+        # extract_batch orders each IP's events by timestamp
+        for idx in sorted(range(len(events)), key=lambda i: (events[i]["src_ip"], events[i]["timestamp"])):
+            expected = sequential.extract_features(events[idx])
+            for col, name in enumerate(FeatureExtractor.FEATURE_NAMES):
+                assert abs(matrix[idx, col] - expected[name]) <= 1e-6 * max(1.0, abs(expected[name])), name
+
+    # Streaming after a batch continues from the same state
+    event = sample_event(src_ip="10.0.0.1", timestamp=(t + timedelta(seconds=1)).isoformat())
+    streamed, expected = batched.extract_features(event), sequential.extract_features(event)
+    for name in FeatureExtractor.FEATURE_NAMES:
+        assert abs(streamed[name] - expected[name]) <= 1e-6 * max(1.0, abs(expected[name])), name
+
+
+def test_extract_batch_counts_prior_window_with_late_events():
+    sequential = FeatureExtractor()
+    batched = FeatureExtractor()
+    t0 = datetime(2026, 1, 1, 12, 0, 0)
+    first = [sample_event(timestamp=(t0 + timedelta(seconds=s)).isoformat()) for s in (0, 4.5, 9.9, 30)]
+    # The second batch arrives late: its events predate the end of the first
+    late = [sample_event(timestamp=(t0 + timedelta(seconds=s)).isoformat()) for s in (2, 20.5, 29)]
+
+    for batch in (first, late):
+        matrix = batched.extract_batch(batch)
+        for idx, event in enumerate(batch):
+            expected = sequential.extract_features(event)
+            for col, name in enumerate(FeatureExtractor.FEATURE_NAMES):
+                assert abs(matrix[idx, col] - expected[name]) <= 1e-6 * max(1.0, abs(expected[name])), name
+
+    burst = matrix[:, FeatureExtractor.FEATURE_NAMES.index("burst_rate")]
+    assert burst.tolist() == [5.0, 2.0, 3.0]
+
+
+def test_extract_batch_accepts_dataframe_with_missing_columns():
+    import pandas as pd
+
+    extractor = FeatureExtractor()
+    matrix = extractor.extract_batch(pd.DataFrame({"src_ip": ["1.1.1.1", "1.1.1.1"], "length": [100, 300]}))
+
+    assert matrix.shape == (2, len(FeatureExtractor.FEATURE_NAMES))
+    assert matrix[1, FeatureExtractor.FEATURE_NAMES.index("burst_rate")] == 2.0
+    assert matrix[1, FeatureExtractor.FEATURE_NAMES.index("rolling_average_deviation")] == 100.0
+    assert extractor.extract_batch([]).shape == (0, len(FeatureExtractor.FEATURE_NAMES))
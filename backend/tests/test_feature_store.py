@@ -0,0 +1,97 @@
+import os
+import sys
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from ml.feature_extractor import FeatureExtractor
+from ml.feature_store import FeatureStore
+
+
+def make_log(i, src_ip="10.0.0.1"):
+    return SimpleNamespace(
+        id=i,
+        src_ip=src_ip,
+        dst_ip=f"192.168.1.{i % 3}",
+        dst_port=22,
+        protocol="TCP",
+        length=100 + i,
+        timestamp=datetime(2026, 1, 1, 12, 0, 0) + timedelta(seconds=i),
+        feature_vector=None,
+    )
+
+
+def test_vectors_are_computed_once_and_reused():
+    store = FeatureStore(FeatureExtractor())
+    logs = [make_log(i) for i in range(5)]
+
+    first = store.vectors_for_logs(logs, live=True)
+    assert first.shape == (5, len(FeatureExtractor.FEATURE_NAMES))
+    assert all(log.feature_vector is not None for log in logs)
+    assert store.computed_total == 5
+
+    # A second consumer gets the stored vectors, and per-IP state is not advanced again
+    second = store.vectors_for_logs(logs)
+    np.testing.assert_allclose(first, second, rtol=1e-6)
+    assert store.computed_total == 5
+    assert store.reused_total == 5
+    assert store.extractor._ip_state["10.0.0.1"].count == 5
+
+
+def test_backfill_leaves_live_state_alone():
+    store = FeatureStore(FeatureExtractor())
+    live = [make_log(i) for i in range(10800, 10802)]
+    store.vectors_for_logs(live, live=True)
+    before = store.vectors_for_logs([make_log(10802)], live=True)[0]
+
+    # Rows from three hours earlier, never scored
+    history = [make_log(i) for i in range(30)]
+    backfilled = store.vectors_for_logs(history)
+    assert all(log.feature_vector is None for log in history)
+    np.testing.assert_allclose(backfilled, FeatureExtractor().extract_batch(store.events_frame(history)))
+
+    after = store.vectors_for_logs([make_log(10803)], live=True)[0]
+    names = FeatureExtractor.FEATURE_NAMES
+    for name in ("source_ip_event_rate", "burst_rate", "session_duration_estimate"):
+        assert after[names.index(name)] - before[names.index(name)] <= 1.0, name
+    assert store.extractor._ip_state["10.0.0.1"].count == 4
+
+
+def test_uncommitted_live_vectors_are_reused_on_retry():
+    store = FeatureStore(FeatureExtractor())
+    first = store.vectors_for_logs([make_log(i) for i in range(3)], live=True)
+
+    # Commit never happened: the reloaded rows have no stored vector
+    retry = [make_log(i) for i in range(3)]
+    np.testing.assert_array_equal(store.vectors_for_logs(retry, live=True), first.astype(np.float32))
+    assert all(log.feature_vector is not None for log in retry)
+    assert store.extractor._ip_state["10.0.0.1"].count == 3
+
+    store.mark_persisted(retry)
+    assert not store._unpersisted
+    store.vectors_for_logs([make_log(3)], live=True)
+    assert store.extractor._ip_state["10.0.0.1"].count == 4
+
+
+def test_encode_decode_roundtrip():
+    vector = np.arange(len(FeatureExtractor.FEATURE_NAMES), dtype=np.float64) / 3
+    blob = FeatureStore.encode(vector)
+
+    assert len(blob) == len(FeatureExtractor.FEATURE_NAMES) * 4
+    np.testing.assert_allclose(FeatureStore.decode(blob), vector, rtol=1e-6)
+    assert FeatureStore.decode(b"") is None
+    assert FeatureStore.decode(b"\x00" * 8) is None
+
+
+def test_models_share_one_extractor():
+    import ml.threat_scoring_service as tss
+    from ml.feature_store import feature_store
+    from ml_engine.campaign_clustering import CampaignClusterer
+    from ml_engine.unsupervised_detector import unsupervised_detector
+
+    assert tss._FEATURE_EXTRACTOR is feature_store.extractor
+    assert unsupervised_detector.feature_extractor is feature_store.extractor
+    assert CampaignClusterer().feature_extractor is feature_store.extractor
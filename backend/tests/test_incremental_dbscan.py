@@ -0,0 +1,79 @@
+import numpy as np
+from sklearn.cluster import DBSCAN
+from sklearn.metrics import adjusted_rand_score
+
+from ml_engine.incremental_dbscan import IncrementalDBSCAN, NOISE
+
+
+def _blobs(rng, centers, n, spread=0.08):
+    return centers[rng.integers(0, len(centers), n)] + rng.normal(0, spread, (n, centers.shape[1]))
+
+
+def _labels_for(engine, ids):
+    by_id = dict(zip(engine.ids.tolist(), engine.labels.tolist()))
+    return np.array([by_id[i] for i in ids])
+
+
+def _chain(start, stop, step=0.3):
+    x = np.arange(start, stop, step)
+    return np.column_stack([x, np.zeros_like(x)]).repeat(3, axis=0)
+
+
+def test_sliding_window_matches_full_refit():
+    rng = np.random.default_rng(0)
+    centers = rng.uniform(0, 20, (6, 4))
+    engine = IncrementalDBSCAN(eps=0.5, min_samples=5)
+    window, next_id = [], 0
+
+    for _ in range(8):
+        X = np.vstack([_blobs(rng, centers, 150), rng.uniform(0, 20, (20, 4))])
+        ids = np.arange(next_id, next_id + len(X))
+        next_id += len(X)
+        window.append((ids, X))
+        expired = window.pop(0)[0] if len(window) > 3 else []
+        engine.update(X, ids, remove_ids=expired)
+
+        window_ids = np.concatenate([w[0] for w in window])
+        expected = DBSCAN(eps=0.5, min_samples=5).fit_predict(np.vstack([w[1] for w in window]))
+        labels = _labels_for(engine, window_ids)
+        assert adjusted_rand_score(expected, labels) == 1.0
+        assert ((expected == NOISE) == (labels == NOISE)).all()
+
+
+def test_campaign_keeps_label_while_points_expire():
+    rng = np.random.default_rng(1)
+    center = np.array([[5.0, 5.0]])
+    engine = IncrementalDBSCAN(eps=0.5, min_samples=5)
+    engine.update(_blobs(rng, center, 20), range(20))
+    label = int(engine.labels[0])
+    assert label == 0  # smallest core point id
+
+    # The window slides until none of the original points is left
+    for start in range(20, 100, 10):
+        changed = engine.update(_blobs(rng, center, 10), range(start, start + 10), remove_ids=range(start - 20, start - 10))
+        assert set(engine.labels.tolist()) == {label}
+        assert changed == {label}
+    assert engine.last_region_size < len(engine)
+
+
+def test_split_keeps_label_on_larger_piece_and_merge_keeps_larger_label():
+    engine = IncrementalDBSCAN(eps=0.5, min_samples=5)
+    left, right = _chain(0, 6), _chain(6, 9)
+    engine.update(np.vstack([left, right]), range(len(left) + len(right)))
+    (label,) = set(engine.labels.tolist())
+
+    # Expiring the links in the middle splits the chain in two
+    middle = [i for i, x in enumerate(np.vstack([left, right])[:, 0]) if 5.0 < x < 7.0]
+    changed = engine.update(np.empty((0, 2)), [], remove_ids=middle)
+    clusters = engine.clusters()
+    assert len(clusters) == 2
+    larger = max(clusters, key=lambda k: len(clusters[k]))
+    assert larger == label
+    (other,) = set(clusters) - {label}
+    assert changed == {label, other}
+
+    # Bridging them again merges the smaller piece into the larger one
+    bridge = _chain(5.0, 7.0)
+    changed = engine.update(bridge, range(1000, 1000 + len(bridge)))
+    assert set(engine.labels.tolist()) == {label}
+    assert changed == {label, other}
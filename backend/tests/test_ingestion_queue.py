@@ -0,0 +1,48 @@
+import threading
+import time
+
+from services.ingestion_queue import IngestionQueue
+
+
+def test_publish_and_consume_batch_in_order():
+    q = IngestionQueue(maxsize=100, linger_ms=0, use_redis=False)
+    for log_id in range(1, 6):
+        assert q.publish(log_id)
+
+    assert q.consume_batch(max_items=3, timeout=0.1) == [1, 2, 3]
+    assert q.consume_batch(max_items=3, timeout=0.1) == [4, 5]
+    assert q.stats["published_total"] == 5
+    assert q.stats["consumed_total"] == 5
+    assert q.depth == 0
+
+
+def test_consume_batch_times_out_when_empty():
+    q = IngestionQueue(linger_ms=0, use_redis=False)
+    start = time.monotonic()
+    assert q.consume_batch(timeout=0.05) == []
+    assert time.monotonic() - start >= 0.04
+
+
+def test_full_queue_drops_instead_of_blocking():
+    q = IngestionQueue(maxsize=2, linger_ms=0, use_redis=False)
+    assert q.publish(1)
+    assert q.publish(2)
+    assert not q.publish(3)
+    assert q.stats["dropped_total"] == 1
+    assert q.consume_batch(max_items=10, timeout=0.1) == [1, 2]
+
+
+def test_consumer_wakes_up_on_publish():
+    q = IngestionQueue(linger_ms=0, use_redis=False)
+    threading.Timer(0.05, q.publish, args=(42,)).start()
+    assert q.consume_batch(timeout=2.0) == [42]
+
+
+def test_prometheus_output_contains_queue_metrics():
+    q = IngestionQueue(use_redis=False)
+    q.publish(7)
+    q.record_batch(1, 3.5)
+    text = q.to_prometheus()
+    assert "phantomnet_ingest_published_total 1" in text
+    assert "phantomnet_ingest_queue_depth 1" in text
+    assert "phantomnet_ingest_batch_latency_ms 3.5" in text
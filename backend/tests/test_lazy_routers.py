@@ -0,0 +1,85 @@
+import os
+import sys
+import types
+import subprocess
+
+from fastapi import APIRouter, FastAPI
+from fastapi.testclient import TestClient
+
+from middleware.lazy_routers import LazyRouters, LazyRouterMiddleware
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def _register_router_module(monkeypatch, name, prefix, paths):
+    router = APIRouter(prefix=prefix)
+    for path in paths:
+        router.add_api_route(path, lambda path=path: {"path": prefix + path}, methods=["GET"])
+    module = types.ModuleType(name)
+    module.router = router
+    monkeypatch.setitem(sys.modules, name, module)
+
+
+def _build_app(lazy):
+    app = FastAPI()
+    routers = LazyRouters(app, lazy=lazy)
+    routers.add("lazy_test_generic", "/api/items")
+    routers.add("lazy_test_specific", "/api/items/special")
+    app.add_middleware(LazyRouterMiddleware, routers=routers)
+    return app, routers
+
+
+def test_lazy_router_loaded_on_first_request(monkeypatch):
+    _register_router_module(monkeypatch, "lazy_test_generic", "/api/items", ["/{item_id}"])
+    _register_router_module(monkeypatch, "lazy_test_specific", "/api/items/special", [""])
+
+    app, routers = _build_app(lazy=True)
+    assert len(routers.pending) == 2
+
+    client = TestClient(app)
+    assert client.get("/health-unrelated").status_code == 404
+    assert len(routers.pending) == 2
+
+    response = client.get("/api/items/special")
+    assert response.status_code == 200
+    assert routers.pending == []
+
+
+def test_lazy_routes_keep_registration_order(monkeypatch):
+    _register_router_module(monkeypatch, "lazy_test_generic", "/api/items", ["/{item_id}"])
+    _register_router_module(monkeypatch, "lazy_test_specific", "/api/items/special", [""])
+
+    eager_app, _ = _build_app(lazy=False)
+    lazy_app, routers = _build_app(lazy=True)
+    # Load the later router first; it must still land after the earlier one
+    routers.include(routers.pending_for("/api/items/special/x")[-1:], [sys.modules["lazy_test_specific"].router])
+    routers.load_all()
+
+    assert [r.path for r in lazy_app.router.routes] == [r.path for r in eager_app.router.routes]
+    # The generic route registered first wins, as with eager include_router
+    assert TestClient(lazy_app).get("/api/items/special").json() == {"path": "/api/items/{item_id}"}
+
+
+def test_openapi_schema_loads_all_routers(monkeypatch):
+    _register_router_module(monkeypatch, "lazy_test_generic", "/api/items", ["/{item_id}"])
+    _register_router_module(monkeypatch, "lazy_test_specific", "/api/items/special", [""])
+
+    app, routers = _build_app(lazy=True)
+    schema = TestClient(app).get("/openapi.json").json()
+
+    assert routers.pending == []
+    assert "/api/items/{item_id}" in schema["paths"]
+    assert "/api/items/special" in schema["paths"]
+
+
+def test_main_import_skips_heavy_stacks():
+    heavy = ["pandas", "sklearn", "scapy", "shap", "stix2", "xhtml2pdf", "mlflow", "redis"]
+    code = (
+        "import sys, main; "
+        f"print(','.join(m for m in {heavy!r} if m in sys.modules))"
+    )
+    env = dict(os.environ, ENVIRONMENT="test")
+    proc = subprocess.run([sys.executable, "-c", code], cwd=BACKEND_DIR, env=env, capture_output=True, text=True)
+
+    assert proc.returncode == 0, proc.stderr[-2000:]
+    assert proc.stdout.strip().splitlines()[-1:] in ([], [""])
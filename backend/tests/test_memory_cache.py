@@ -0,0 +1,94 @@
+import threading
+
+from middleware.cache import TTLCache
+from services.memory_cache import ShardedTTLCache, cache_registry
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_lru_eviction_keeps_recently_used_entries():
+    cache = ShardedTTLCache("test_lru", max_entries=3, shards=1, default_ttl=None)
+    for key in "abc":
+        cache.set(key, key.upper())
+    assert cache.get("a") == "A"  # a becomes most recently used
+    cache.set("d", "D")
+
+    assert "b" not in cache
+    assert [cache.get(k) for k in "acd"] == ["A", "C", "D"]
+    assert cache.stats["evictions"] == 1
+
+
+def test_expired_entries_are_reclaimed_without_being_read():
+    clock = Clock()
+    cache = ShardedTTLCache("test_ttl", max_entries=1000, default_ttl=10, clock=clock)
+    for i in range(500):
+        cache.set(i, i)
+    cache.set("long", 1, ttl=60)
+    cache.set("forever", 1, ttl=None)
+
+    clock.now += 11
+    assert len(cache) == 2
+    assert cache.stats["expirations"] == 500
+
+    clock.now += 3600  # long idle gap
+    assert cache.get("long") is None
+    assert cache.get("forever") == 1
+
+
+def test_byte_budget_bounds_memory():
+    cache = ShardedTTLCache("test_bytes", max_entries=10000, max_bytes=20000, shards=4)
+    for i in range(1000):
+        cache.set(f"key-{i}", "x" * 200)
+
+    stats = cache.stats
+    assert stats["bytes"] <= 20000
+    assert stats["size"] < 1000 and stats["evictions"] == 1000 - stats["size"]
+
+
+def test_byte_budget_counts_tuple_keys():
+    cache = ShardedTTLCache("test_tuple_bytes", max_entries=10000, max_bytes=20000, shards=1)
+    for i in range(1000):
+        cache.set(("model-tag", b"q" * 200 + str(i).encode()), b"v")
+
+    stats = cache.stats
+    assert stats["bytes"] <= 20000 and stats["size"] < 100
+
+
+def test_add_is_atomic_across_threads():
+    cache = ShardedTTLCache("test_add", max_entries=100)
+    won = []
+    barrier = threading.Barrier(8)
+
+    def claim():
+        barrier.wait()
+        if cache.add("alert:203.0.113.1", True):
+            won.append(1)
+
+    threads = [threading.Thread(target=claim) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert won == [1]
+
+
+def test_api_cache_keeps_its_interface_and_metrics_are_exported():
+    cache = TTLCache(default_ttl=30, max_size=2, namespace="test_api")
+    cache.set("/api/stats:1", {"a": 1})
+    cache.set("/api/stats:2", {"a": 2})
+    cache.set("/api/events:1", [])
+    assert cache.get("/api/stats:1") is None  # evicted (LRU)
+    assert cache.get("/api/stats:2") == {"a": 2}
+
+    cache.invalidate("/api/stats")
+    assert cache.stats["size"] == 1 and cache.stats["max_size"] == 2
+
+    text = cache_registry.to_prometheus()
+    assert 'phantomnet_cache_hits_total{namespace="test_api"} 1' in text
+    assert 'phantomnet_cache_evictions_total{namespace="test_api"} 1' in text
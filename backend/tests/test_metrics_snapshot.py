@@ -0,0 +1,97 @@
+import time
+from types import SimpleNamespace
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from services.metrics_snapshot import MetricsSnapshotService, LiveMetricsPublisher
+from services.ws_hub import WebSocketHub, LIVE_METRICS, LIVE_METRICS_DELTA
+
+
+def _wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_components_refresh_at_their_own_cadence_and_flag_stale():
+    calls = {"fast": 0, "slow": 0}
+
+    def fast():
+        calls["fast"] += 1
+        return {"cpu": calls["fast"]}
+
+    def slow():
+        calls["slow"] += 1
+        if calls["slow"] > 1:
+            raise RuntimeError("probe failed")
+        return {"honeypots": ["SSH"]}
+
+    service = MetricsSnapshotService()
+    service.register("fast", fast, interval=0.1)
+    service.register("slow", slow, interval=0.2, max_age=0.3)
+    service.start()
+    try:
+        _wait_for(lambda: calls["fast"] >= 5 and calls["slow"] >= 3)
+        snapshot = service.snapshot()
+    finally:
+        service.stop()
+
+    assert calls["fast"] > calls["slow"]
+    # The failing component keeps its last value but is reported stale
+    assert snapshot["honeypots"] == ["SSH"] and snapshot["stale"] == ["slow"]
+    assert snapshot["cpu"] >= 5
+    assert service.stats["components"]["slow"]["errors_total"] >= 2
+
+
+def test_version_bumps_only_on_change():
+    value = {"n": 1}
+    service = MetricsSnapshotService()
+    service.register("c", lambda: dict(value), interval=10)
+
+    service.refresh()
+    service.refresh()
+    assert service.version == 1
+    value["n"] = 2
+    service.refresh()
+    assert service.version == 2
+
+
+def test_publisher_sends_deltas_between_keyframes():
+    value = {"totalEvents": 10, "system_health": {"cpu": 5}}
+    service = MetricsSnapshotService()
+    service.register("c", lambda: dict(value), interval=10)
+    service.refresh()
+    publisher = LiveMetricsPublisher(service, keyframe_interval=30)
+
+    first = publisher.messages(now=0)
+    assert [(t, m) for t, m, _ in first] == [(LIVE_METRICS, LIVE_METRICS), (LIVE_METRICS_DELTA, LIVE_METRICS)]
+    assert publisher.messages(now=2) == []
+
+    value["totalEvents"] = 11
+    service.refresh()
+    topic, message_type, delta = publisher.messages(now=4)[1]
+    assert (topic, message_type) == (LIVE_METRICS_DELTA, LIVE_METRICS_DELTA)
+    assert delta["changed"] == {"totalEvents": 11}
+    assert delta["base_version"] == 1 and delta["snapshot_version"] == 2
+
+    value["totalEvents"] = 12
+    service.refresh()
+    assert publisher.messages(now=31)[1][1] == LIVE_METRICS
+
+
+def test_new_delta_subscriber_gets_last_snapshot_on_connect(monkeypatch):
+    import api.realtime as realtime
+
+    monkeypatch.setattr(realtime.realtime_manager, "hub", WebSocketHub(flush_interval_ms=0))
+    monkeypatch.setattr(
+        realtime, "live_metrics_publisher", SimpleNamespace(last_snapshot={"totalEvents": 3, "snapshot_version": 7})
+    )
+    app = FastAPI()
+    app.include_router(realtime.router)
+
+    with TestClient(app) as client:
+        with client.websocket_connect("/api/v1/realtime/ws?topics=LIVE_METRICS_DELTA") as ws:
+            message = ws.receive_json()
+
+    assert message["type"] == LIVE_METRICS and message["payload"]["snapshot_version"] == 7
@@ -0,0 +1,90 @@
+import os
+import sys
+from datetime import datetime, timedelta
+
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from database.models import Base, PacketLog
+from database.partitioning import PacketLogPartitionManager
+
+NOW = datetime(2026, 3, 10, 12, 0, 0)
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'hot.db'}")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    # 10 days of traffic, 3 rows per day
+    session.add_all(
+        PacketLog(src_ip="203.0.113.5", protocol="TCP", length=60, timestamp=NOW - timedelta(days=d, hours=h))
+        for d in range(10)
+        for h in (1, 5, 9)
+    )
+    session.commit()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def test_sqlite_rotation_archives_days_past_retention(db, tmp_path):
+    manager = PacketLogPartitionManager(retention_days=6, partition_dir=str(tmp_path / "parts"))
+
+    summary = manager.rotate(db, now=NOW)
+
+    # Everything inside the retention window is still readable from packet_logs
+    cutoff = (NOW - timedelta(days=6)).date()
+    oldest = db.query(PacketLog.timestamp).order_by(PacketLog.timestamp).first()[0]
+    assert oldest.date() == cutoff
+    assert db.query(PacketLog).count() == 21
+
+    archives = sorted(os.listdir(tmp_path / "parts"))
+    assert archives and all(name.endswith(".parquet") for name in archives)
+
+    # No row is lost between packet_logs and the Parquet archives
+    archived_rows = sum(day["rows"] for day in summary["archived"])
+    assert archived_rows + db.query(PacketLog).count() == 30
+    assert len(pd.read_parquet(tmp_path / "parts" / archives[0])) == 3
+
+
+def test_late_rows_are_appended_to_the_day_archive(db, tmp_path):
+    manager = PacketLogPartitionManager(retention_days=6, partition_dir=str(tmp_path / "parts"))
+    manager.rotate(db, now=NOW)
+
+    db.add(PacketLog(src_ip="203.0.113.9", protocol="UDP", length=80, timestamp=NOW - timedelta(days=9, hours=2)))
+    db.commit()
+    manager.rotate(db, now=NOW)
+
+    day = (NOW - timedelta(days=9)).strftime("%Y%m%d")
+    assert len(pd.read_parquet(tmp_path / "parts" / f"packet_logs_{day}.parquet")) == 4
+    assert db.query(PacketLog).count() == 21
+
+
+def test_drop_before_removes_whole_days(db, tmp_path):
+    manager = PacketLogPartitionManager(retention_days=6, partition_dir=str(tmp_path / "parts"))
+    manager.rotate(db, now=NOW)
+
+    dropped = manager.drop_before(db, NOW - timedelta(days=8))
+
+    remaining = [n for n in os.listdir(tmp_path / "parts")]
+    # Those rows were archived by the rotation, not deleted from packet_logs now
+    assert dropped == {"packet_logs": 0, "archived": 3}
+    assert db.query(PacketLog).count() == 21
+    assert all(
+        datetime.strptime(n.split("_")[-1].split(".")[0], "%Y%m%d").date() >= (NOW - timedelta(days=8)).date()
+        for n in remaining
+    )
+
+
+def test_rotation_skips_in_memory_sqlite():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+
+    assert PacketLogPartitionManager().rotate(session)["skipped"]
+    session.close()
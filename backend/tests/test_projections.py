@@ -0,0 +1,133 @@
+import os
+import sys
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine, update
+from sqlalchemy.orm import sessionmaker
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from database.models import Base, PacketLog
+from database.projections import fetch_events, iter_event_windows, iter_events, to_dataframe
+from database.rollups import rollup_store
+from ml.feature_extractor import FeatureExtractor
+from ml.feature_store import FeatureStore, VECTOR_FIELDS
+from services.stats_aggregator import StatsService
+
+START = datetime(2026, 1, 1, 12, 0, 0)
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'projections.db'}")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    rollup_store.invalidate()
+    yield session
+    session.close()
+    rollup_store.invalidate()
+    engine.dispose()
+
+
+def seed(db, count=25):
+    db.add_all(
+        PacketLog(
+            src_ip=f"203.0.113.{i % 4}",
+            dst_ip=None if i % 5 == 0 else "10.0.0.1",
+            dst_port=None if i % 6 == 0 else 22,
+            protocol="TCP",
+            length=100 + i,
+            threat_score=None if i % 7 == 0 else 0.5,
+            attack_type="BENIGN" if i % 2 else "BRUTE_FORCE",
+            timestamp=START + timedelta(seconds=i),
+        )
+        for i in range(count)
+    )
+    db.commit()
+
+
+def test_fetch_events_returns_typed_columns(db):
+    seed(db)
+    frame = fetch_events(
+        db,
+        ("id", "dst_ip", "dst_port", "threat_score", "timestamp"),
+        PacketLog.length >= 110,
+        order_by=PacketLog.id,
+    )
+
+    assert frame.dtype["dst_port"] == np.int64
+    assert frame.dtype["timestamp"] == np.dtype("datetime64[us]")
+    assert frame["id"].tolist() == list(range(11, 26))
+    # NULLs: numeric fields take the column default, strings keep None
+    assert frame["dst_port"][frame["id"] == 13][0] == 0
+    assert frame["threat_score"][frame["id"] == 15][0] == 0.0
+    assert frame["dst_ip"][frame["id"] == 11][0] is None
+    assert frame["timestamp"][0].astype(datetime) == START + timedelta(seconds=10)
+
+    assert list(to_dataframe(frame).columns) == list(frame.dtype.names)
+    with pytest.raises(ValueError):
+        fetch_events(db, ("id", "no_such_column"))
+
+
+def test_iter_events_streams_in_batches(db):
+    seed(db)
+    chunks = list(iter_events(db, ("id", "src_ip"), order_by=PacketLog.id, batch_size=10))
+
+    assert [len(chunk) for chunk in chunks] == [10, 10, 5]
+    assert np.concatenate(chunks)["id"].tolist() == list(range(1, 26))
+    assert len(fetch_events(db, ("id",), batch_size=10)) == 25
+    assert len(fetch_events(db, ("id",), PacketLog.id < 0)) == 0
+
+
+def test_iter_event_windows_resume_after_last_key(db):
+    seed(db)
+    # Equal timestamps across a window boundary are ordered (and resumed) by id
+    db.query(PacketLog).filter(PacketLog.id.in_([9, 10, 11, 12])).update({PacketLog.timestamp: START})
+    db.commit()
+
+    by_id = list(iter_event_windows(db, ("id",), PacketLog.id != 3, window=10))
+    assert [len(frame) for frame in by_id] == [10, 10, 4]
+    assert np.concatenate(by_id)["id"].tolist() == [i for i in range(1, 26) if i != 3]
+
+    by_time = np.concatenate(list(iter_event_windows(db, ("id", "timestamp"), by_time=True, window=5)))
+    assert by_time["id"].tolist() == [1, 9, 10, 11, 12] + [i for i in range(2, 26) if i not in (9, 10, 11, 12)]
+    with pytest.raises(ValueError):
+        next(iter_event_windows(db, ("src_ip",)))
+
+
+def test_vectors_for_events_match_orm_path_and_keep_rollups(db):
+    seed(db)
+    service = StatsService(db)
+    service.calculate_stats()
+    rebuilds = rollup_store.rebuilds_total
+
+    # Same rows through the ORM path, on detached copies
+    rows = [
+        SimpleNamespace(**{name: getattr(log, name) for name in VECTOR_FIELDS})
+        for log in db.query(PacketLog).order_by(PacketLog.id).all()
+    ]
+    expected = FeatureStore(FeatureExtractor()).vectors_for_logs(rows)
+
+    frame = fetch_events(db, VECTOR_FIELDS, order_by=PacketLog.id)
+    vectors = FeatureStore(FeatureExtractor()).vectors_for_events(frame)
+    np.testing.assert_allclose(vectors, expected, rtol=1e-5)
+    # Backfilled vectors stay in memory
+    db.expire_all()
+    assert all(log.feature_vector is None for log in db.query(PacketLog).all())
+
+    # Stored vectors are reused on the next fetch
+    db.execute(
+        update(PacketLog),
+        [{"id": int(i), "feature_vector": FeatureStore.encode(v)} for i, v in zip(frame["id"], vectors)],
+    )
+    db.commit()
+    store = FeatureStore(FeatureExtractor())
+    np.testing.assert_allclose(store.vectors_for_events(fetch_events(db, VECTOR_FIELDS)), vectors, rtol=1e-6)
+    assert store.computed_total == 0
+
+    # A bulk UPDATE of feature_vector does not touch the rollup columns
+    assert service.calculate_stats() == service.calculate_stats_from_logs()
+    assert rollup_store.rebuilds_total == rebuilds
@@ -0,0 +1,56 @@
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from database.models import Base, PacketLog
+from database.query_plans import check_query_plans, full_scans, hot_queries, seed_packet_logs
+
+
+@pytest.fixture(scope="module")
+def db(tmp_path_factory):
+    engine = create_engine(f"sqlite:///{tmp_path_factory.mktemp('plans') / 'plans.db'}")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    seed_packet_logs(session, 20000, chunk=5000)
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def test_hot_queries_avoid_sequential_scans(db):
+    report = check_query_plans(db)
+
+    assert not report["failures"], report["failures"]
+    # Every hot query really went through packet_logs
+    for name, query in report["queries"].items():
+        assert query["statements"], f"{name} issued no packet_logs SELECT"
+
+
+def test_losing_the_window_indexes_is_reported(db):
+    # Every index that can serve a timestamp range (SQLite skip-scans the later columns)
+    dropped = {ix.name for ix in PacketLog.__table__.indexes if "timestamp" in ix.columns.keys()}
+    for name in dropped:
+        db.execute(text(f"DROP INDEX {name}"))
+    db.commit()
+    # New connection: pysqlite's statement cache would replay the old EXPLAIN
+    db.get_bind().dispose()
+    try:
+        queries = [q for q in hot_queries() if q.name == "low_and_slow_scan"]
+        report = check_query_plans(db, queries)
+        assert [f["query"] for f in report["failures"]] == ["low_and_slow_scan"]
+    finally:
+        for index in PacketLog.__table__.indexes:
+            if index.name in dropped:
+                index.create(db.connection())
+        db.commit()
+        db.get_bind().dispose()
+
+
+def test_full_scan_rules():
+    assert full_scans("sqlite", ["SCAN packet_logs"])
+    assert full_scans("sqlite", ["SCAN packet_logs USING INDEX ix_packet_logs_src_ip"])
+    assert not full_scans("sqlite", ["SCAN packet_logs USING INDEX ix_packet_logs_unscored"])
+    assert not full_scans("sqlite", ["SCAN packet_logs USING COVERING INDEX ix_packet_logs_src_ip"], windowed=False)
+    assert not full_scans("sqlite", ["SEARCH packet_logs USING INDEX ix_packet_logs_level_ts (threat_level=?)"])
+    assert full_scans("postgresql", ["Aggregate", "Parallel Seq Scan on packet_logs_p20260301"])
+    assert not full_scans("postgresql", ["Index Only Scan on packet_logs"])
@@ -75,6 +75,7 @@ class TestSecurityMonitoring(unittest.TestCase):
 
         engine = CorrelationEngine()
         engine._correlate_events()
+        alert_manager.flush()
 
         # Close and reopen session to see commits from CorrelationEngine's separate session
         self.db.close()
@@ -108,6 +109,7 @@ class TestSecurityMonitoring(unittest.TestCase):
         self.db.commit()
 
         monitor._analyze_baseline()
+        alert_manager.flush()
 
         # Close and reopen session to see commits from BaselineMonitor's separate session
         self.db.close()
@@ -0,0 +1,172 @@
+import os
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from database.models import Base, PacketLog, PacketLogRollup
+from database.partitioning import PacketLogPartitionManager
+from database.rollups import ROLLUP_SHARDS, rollup_store
+from services.stats_aggregator import StatsService
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'rollups.db'}")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    rollup_store.invalidate()
+    yield session
+    session.close()
+    rollup_store.invalidate()
+    engine.dispose()
+
+
+def seed(db, count=20, start=None):
+    start = start or datetime(2026, 1, 1, 12, 0, 0)
+    db.add_all(
+        PacketLog(
+            src_ip=f"203.0.113.{i % 7}",
+            dst_ip="10.0.0.1",
+            protocol=["TCP", "UDP", "ICMP"][i % 3],
+            length=100,
+            threat_score=[0.1, 0.5, 0.76, 0.9][i % 4],
+            timestamp=start + timedelta(seconds=17 * i),
+        )
+        for i in range(count)
+    )
+    db.commit()
+
+
+def test_rollup_stats_match_direct_queries(db):
+    seed(db)
+    service = StatsService(db)
+
+    assert service.calculate_stats() == service.calculate_stats_from_logs()
+    assert rollup_store.check_consistency(db)["consistent"]
+
+    # Inserts after the mirror is built are applied incrementally, without a rebuild
+    rebuilds = rollup_store.rebuilds_total
+    seed(db, count=5, start=datetime(2026, 1, 2))
+    assert service.calculate_stats() == service.calculate_stats_from_logs()
+    assert rollup_store.rebuilds_total == rebuilds
+
+
+def test_threat_score_updates_move_buckets(db):
+    seed(db)
+    service = StatsService(db)
+    service.calculate_stats()
+
+    for log in db.query(PacketLog).filter(PacketLog.threat_score < 0.4).all():
+        log.threat_score = 0.92
+    db.commit()
+
+    stats = service.calculate_stats()
+    assert stats == service.calculate_stats_from_logs()
+    assert stats["distribution"]["benign"] == 0
+    assert rollup_store.check_consistency(db)["consistent"]
+
+
+def test_deletes_and_raw_sql_are_reconciled(db):
+    seed(db)
+    service = StatsService(db)
+    service.calculate_stats()
+    rebuilds = rollup_store.rebuilds_total
+
+    # Deletes are subtracted, and keys no row uses any more go away
+    db.query(PacketLog).filter(PacketLog.protocol == "UDP").delete()
+    db.commit()
+    assert service.calculate_stats() == service.calculate_stats_from_logs()
+    for log in db.query(PacketLog).filter(PacketLog.src_ip == "203.0.113.0").all():
+        db.delete(log)
+    db.commit()
+    stats = service.calculate_stats()
+    assert stats == service.calculate_stats_from_logs()
+    assert stats["activeHoneypots"] == 2 and stats["uniqueIPs"] == 6
+    assert rollup_store.check_consistency(db)["consistent"]
+
+    # Bulk threat_score updates are diffed, not rebuilt
+    db.query(PacketLog).filter(PacketLog.threat_score < 0.4).update({PacketLog.threat_score: 0.95})
+    db.commit()
+    assert service.calculate_stats() == service.calculate_stats_from_logs()
+    assert rollup_store.rebuilds_total == rebuilds
+
+    # Raw SQL bypasses the hooks: the checker reports it and a rebuild repairs it
+    db.execute(text("UPDATE packet_logs SET threat_score = 0.0"))
+    db.commit()
+    report = rollup_store.check_consistency(db)
+    assert not report["consistent"]
+    assert "threat_score_sum" in report["mismatches"]
+
+    rollup_store.rebuild(db)
+    assert rollup_store.check_consistency(db)["consistent"]
+
+
+def test_sessions_write_their_own_shard_of_a_minute(db):
+    seed(db, count=2)
+    service = StatsService(db)
+    service.calculate_stats()
+    other = sessionmaker(bind=db.get_bind())()
+    other.info["rollup_shard"] = (db.info["rollup_shard"] + 1) % ROLLUP_SHARDS
+    other.add(PacketLog(src_ip="198.51.100.1", protocol="TCP", length=60, threat_score=0.9,
+                        timestamp=datetime(2026, 1, 1, 12, 0, 30)))
+    other.commit()
+    other.close()
+
+    assert db.query(PacketLogRollup).filter(PacketLogRollup.bucket_start == datetime(2026, 1, 1, 12, 0)).count() == 2
+    assert service.calculate_stats() == service.calculate_stats_from_logs()
+    assert rollup_store.check_consistency(db)["consistent"]
+
+
+def test_rotation_subtracts_archived_days(db, tmp_path):
+    seed(db, count=40, start=datetime(2026, 1, 1))
+    seed(db, count=10, start=datetime(2026, 3, 1))
+    service = StatsService(db)
+    service.calculate_stats()
+    rebuilds = rollup_store.rebuilds_total
+
+    manager = PacketLogPartitionManager(retention_days=30, partition_dir=str(tmp_path / "parts"))
+    manager.rotate(db, now=datetime(2026, 3, 2))
+
+    assert db.query(PacketLog).count() == 10
+    assert service.calculate_stats() == service.calculate_stats_from_logs()
+    assert rollup_store.check_consistency(db)["consistent"]
+    assert rollup_store.rebuilds_total == rebuilds
+
+
+def test_orm_changes_to_bucket_and_keys_move_counters(db):
+    seed(db)
+    service = StatsService(db)
+    service.calculate_stats()
+    rebuilds = rollup_store.rebuilds_total
+
+    for log in db.query(PacketLog).filter(PacketLog.src_ip == "203.0.113.1").all():
+        log.timestamp = datetime(2026, 2, 1, 8, 30)
+        log.src_ip = "198.51.100.9"
+        log.protocol = "SCTP"
+    db.commit()
+
+    stats = service.calculate_stats()
+    assert stats == service.calculate_stats_from_logs()
+    assert rollup_store.check_consistency(db)["consistent"]
+    assert rollup_store.rebuilds_total == rebuilds
+    assert db.query(PacketLogRollup).filter(PacketLogRollup.bucket_start == datetime(2026, 2, 1, 8, 30)).count() == 1
+
+
+def test_bulk_update_of_rollup_columns_forces_rebuild(db):
+    seed(db)
+    service = StatsService(db)
+    service.calculate_stats()
+    rebuilds = rollup_store.rebuilds_total
+
+    # Row count is unchanged, so only the invalidation can trigger the rebuild
+    db.query(PacketLog).filter(PacketLog.protocol == "UDP").update({PacketLog.protocol: "TCP"})
+    db.commit()
+
+    assert service.calculate_stats() == service.calculate_stats_from_logs()
+    assert rollup_store.rebuilds_total == rebuilds + 1
+    assert rollup_store.check_consistency(db)["consistent"]
@@ -0,0 +1,136 @@
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock
+
+import pytest
+
+import services.correlation_engine as ce
+from services.correlation_engine import CorrelationEngine, CorrelationRule
+
+T0 = datetime(2026, 5, 1, 12, 0, 0)
+
+
+@pytest.fixture
+def alerts(monkeypatch):
+    raised = []
+    monkeypatch.setattr(ce.alert_manager, "submit", lambda **kw: raised.append(kw))
+    return raised
+
+
+def test_multi_protocol_fires_once_when_threshold_crossed(alerts):
+    engine = CorrelationEngine()
+    engine.observe("203.0.113.7", "SSH", T0)
+    engine.observe("203.0.113.7", "HTTP", T0 + timedelta(seconds=5))
+    assert alerts == []
+
+    assert engine.observe("203.0.113.7", "FTP", T0 + timedelta(seconds=9)) == 1
+    assert alerts[0]["level"] == "CRITICAL"
+    assert alerts[0]["description"].startswith("Multi-protocol attack detected: 3")
+
+    # Still above threshold: no repeat alert
+    engine.observe("203.0.113.7", "SMTP", T0 + timedelta(seconds=12))
+    assert len(alerts) == 1
+
+
+def test_high_frequency_uses_sliding_window(alerts):
+    engine = CorrelationEngine(window_minutes=5)
+    # 50 events spread over 10 minutes never exceed 50 inside any 5-minute window
+    for i in range(50):
+        engine.observe("198.51.100.2", "TCP", T0 + timedelta(seconds=12 * i))
+    assert alerts == []
+
+    burst = T0 + timedelta(minutes=10)
+    for i in range(51):
+        engine.observe("198.51.100.3", "TCP", burst + timedelta(seconds=i))
+    assert [a["source_ip"] for a in alerts] == ["198.51.100.3"]
+    assert alerts[0]["details"]["event_count"] == 51
+
+
+def test_rule_rearms_after_window_expires(alerts):
+    engine = CorrelationEngine(window_minutes=1)
+    for offset, proto in enumerate(["SSH", "HTTP", "FTP"]):
+        engine.observe("192.0.2.9", proto, T0 + timedelta(seconds=offset))
+    later = T0 + timedelta(minutes=3)
+    engine.observe("192.0.2.9", "SSH", later)
+    for offset, proto in enumerate(["HTTP", "FTP"], start=1):
+        engine.observe("192.0.2.9", proto, later + timedelta(seconds=offset))
+
+    assert len(alerts) == 2
+
+
+def test_custom_rules_are_pluggable(alerts):
+    class SmtpBurstRule(CorrelationRule):
+        name = "smtp_burst"
+        threshold = 2
+
+        def measure(self, window):
+            return window.protocols.get("SMTP", 0)
+
+        def describe(self, value, window_minutes):
+            return f"SMTP burst: {value}", {"smtp_events": value}
+
+    engine = CorrelationEngine()
+    engine.register_rule(SmtpBurstRule())
+    for i in range(3):
+        engine.observe("203.0.113.50", "SMTP", T0 + timedelta(seconds=i))
+
+    assert [a["details"]["rule"] for a in alerts] == ["smtp_burst"]
+    assert engine.stats["events_total"] == 3
+    assert "phantomnet_correlation_alerts_total 1" in engine.to_prometheus()
+
+
+def test_polled_check_runs_registered_rules_once_per_crossing(alerts, monkeypatch):
+    rows = [("192.0.2.1", "SSH", 1), ("192.0.2.1", "HTTP", 1), ("192.0.2.1", "FTP", 1),
+            ("192.0.2.2", "TCP", 60), ("192.0.2.3", "SMTP", 3)]
+    monkeypatch.setattr(ce, "SessionLocal", MagicMock)
+    monkeypatch.setattr(CorrelationEngine, "window_source_protocols", staticmethod(lambda db, since: rows))
+
+    class SmtpBurstRule(CorrelationRule):
+        name = "smtp_burst"
+        threshold = 2
+
+        def measure(self, window):
+            return window.protocols.get("SMTP", 0)
+
+        def describe(self, value, window_minutes):
+            return f"SMTP burst: {value}", {"smtp_events": value}
+
+    engine = CorrelationEngine()
+    engine.register_rule(SmtpBurstRule())
+    engine._correlate_events()
+
+    assert sorted((a["source_ip"], a["details"]["rule"]) for a in alerts) == [
+        ("192.0.2.1", "multi_protocol"),
+        ("192.0.2.2", "high_frequency"),
+        ("192.0.2.3", "smtp_burst"),
+    ]
+    # Only streaming detections feed the streaming metrics
+    assert engine.stats["alerts_total"] == 0
+
+    # Still above threshold on the next poll: no repeat alerts
+    engine._correlate_events()
+    assert len(alerts) == 3
+
+    # A source that left the window re-arms
+    rows[:] = [row for row in rows if row[0] != "192.0.2.2"]
+    engine._correlate_events()
+    rows.append(("192.0.2.2", "TCP", 60))
+    engine._correlate_events()
+    assert len(alerts) == 4
+
+
+def test_rules_must_implement_measure_and_describe():
+    class Incomplete(CorrelationRule):
+        name = "incomplete"
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_idle_sources_are_swept_and_bounded(alerts):
+    engine = CorrelationEngine(window_minutes=1, max_sources=100)
+    for i in range(150):
+        engine.observe(f"10.0.0.{i}", "TCP", T0)
+    assert engine.stats["tracked_sources"] == 100
+
+    engine._sweep(horizon=(T0 + timedelta(minutes=5) - datetime(1970, 1, 1)).total_seconds())
+    assert engine.stats["tracked_sources"] == 0
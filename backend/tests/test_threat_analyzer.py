@@ -0,0 +1,140 @@
+import os
+import sys
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from database.models import PacketLog
+from ml.feature_extractor import FeatureExtractor
+from ml import threat_scoring_service
+from ml.feature_store import FeatureStore
+from services import threat_analyzer as analyzer_module
+from services.threat_analyzer import ThreatAnalyzerService
+
+
+def make_logs(count, src_ip="203.0.113.7"):
+    start = datetime.utcnow() - timedelta(seconds=count)
+    return [
+        PacketLog(
+            id=i + 1,
+            timestamp=start + timedelta(seconds=i),
+            src_ip=src_ip,
+            dst_ip="10.0.0.5",
+            dst_port=22,
+            protocol="TCP",
+            length=100 + i,
+        )
+        for i in range(count)
+    ]
+
+
+def test_every_event_is_scored_on_its_stored_vector(monkeypatch):
+    store = FeatureStore(FeatureExtractor())
+    monkeypatch.setattr(analyzer_module, "feature_store", store)
+    scored = []
+
+    def fake_score_threat_batch(inputs, features=None):
+        scored.append(features)
+        return [SimpleNamespace(score=0.1, threat_level="LOW", confidence=0.9, decision="ALLOW") for _ in inputs]
+
+    monkeypatch.setattr(threat_scoring_service, "score_threat_batch", fake_score_threat_batch)
+    analyzer = ThreatAnalyzerService()
+    analyzer._maybe_train_baseline = lambda new_events: None
+
+    logs = make_logs(5)
+    analyzer._score_logs(MagicMock(), logs)
+    analyzer._score_logs(MagicMock(), make_logs(3))
+
+    assert all(log.threat_level == "LOW" for log in logs)
+    # Same IP again: no per-IP shortcut, every event is scored and stored
+    assert [len(features) for features in scored] == [5, 3]
+    stored = np.array([FeatureStore.decode(log.feature_vector) for log in logs])
+    assert np.allclose(stored, scored[0])
+    assert store.extractor._ip_state["203.0.113.7"].count == 8
+
+
+def test_retry_after_failed_scoring_or_commit_keeps_feature_state(monkeypatch):
+    import pytest
+
+    store = FeatureStore(FeatureExtractor())
+    monkeypatch.setattr(analyzer_module, "feature_store", store)
+    scored = []
+
+    def fake_score_threat_batch(inputs, features=None):
+        scored.append(features)
+        if len(scored) == 1:
+            raise RuntimeError("model unavailable")
+        return [SimpleNamespace(score=0.1, threat_level="LOW", confidence=0.9, decision="ALLOW") for _ in inputs]
+
+    monkeypatch.setattr(threat_scoring_service, "score_threat_batch", fake_score_threat_batch)
+    analyzer = ThreatAnalyzerService()
+    analyzer._maybe_train_baseline = lambda new_events: None
+    observed = []
+    analyzer.sequence_scorer = MagicMock()
+    analyzer.sequence_scorer.observe_logs.side_effect = lambda rows: observed.extend(rows)
+    analyzer.sequence_scorer.score_ips.return_value = {}
+
+    # Scoring fails: nothing is committed and the rows stay unscored
+    db = MagicMock()
+    analyzer._score_logs(db, make_logs(5))
+    db.commit.assert_not_called()
+
+    # The reconcile sweep reloads them; this time the commit fails
+    db = MagicMock()
+    db.commit.side_effect = RuntimeError("connection lost")
+    with pytest.raises(RuntimeError):
+        analyzer._score_logs(db, make_logs(5))
+
+    logs = make_logs(5)
+    analyzer._score_logs(MagicMock(), logs)
+
+    assert all(log.threat_level == "LOW" for log in logs)
+    # Every attempt scored the vectors of the first one, and state advanced once
+    assert np.allclose(scored[1], scored[0]) and np.allclose(scored[2], scored[0])
+    assert store.extractor._ip_state["203.0.113.7"].count == 5
+    assert not store._unpersisted
+    # LSTM sequences only take the committed rows, with their scored attack_type
+    assert observed == logs and {log.attack_type for log in observed} == {"ALLOW"}
+
+
+def test_failed_batch_forwards_nothing_downstream(monkeypatch):
+    store = FeatureStore(FeatureExtractor())
+    monkeypatch.setattr(analyzer_module, "feature_store", store)
+    correlated, streamed = [], []
+    monkeypatch.setattr(analyzer_module.correlation_engine, "observe_logs", correlated.extend)
+    monkeypatch.setattr(analyzer_module.event_stream, "observe_logs", streamed.extend)
+    monkeypatch.setattr(
+        threat_scoring_service,
+        "score_threat_batch",
+        lambda inputs, features=None: [
+            SimpleNamespace(score=0.1, threat_level="LOW", confidence=0.9, decision="ALLOW") for _ in inputs
+        ],
+    )
+    analyzer = ThreatAnalyzerService()
+    analyzer._maybe_train_baseline = lambda new_events: None
+    real_apply = analyzer._apply_threat_result
+    applied = []
+
+    def flaky_apply(log, result):
+        real_apply(log, result)
+        applied.append(log)
+        if len(applied) == 3:
+            raise RuntimeError("response executor down")
+
+    # The loop fails after some rows got an in-memory threat_level
+    analyzer._apply_threat_result = flaky_apply
+    db = MagicMock()
+    analyzer._score_logs(db, make_logs(5))
+    db.rollback.assert_called_once()
+    db.commit.assert_not_called()
+    assert correlated == [] and streamed == []
+
+    # The reconcile sweep retry forwards each row once
+    analyzer._apply_threat_result = real_apply
+    logs = make_logs(5)
+    analyzer._score_logs(MagicMock(), logs)
+    assert correlated == logs and streamed == logs
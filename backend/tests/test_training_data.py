@@ -0,0 +1,205 @@
+import os
+import sys
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import SGDClassifier
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from database.models import Base, PacketLog
+from ml.feature_extractor import FeatureExtractor
+from ml.feature_store import feature_store
+from ml.training_shards import TrainingShards, fit_incremental, score_shards
+from ml_engine import lstm_data_prep, retraining_pipeline, unsupervised_detector
+from ml_engine.lstm_data_prep import SEQ_LENGTH, SequenceBuilder, SequenceFeatureState
+
+START = datetime(2026, 1, 1, 12, 0, 0)
+
+
+def make_events(count=400, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame(
+        {
+            "id": np.arange(1, count + 1),
+            "timestamp": [START + timedelta(seconds=int(s)) for s in np.sort(rng.integers(0, 5000, count))],
+            "src_ip": [f"203.0.113.{i}" for i in rng.integers(0, 4, count)],
+            "dst_port": rng.choice([22, 80, 443, 8080], count),
+            "event": rng.choice(["login_failed", "connect", "brute_force", None], count),
+        }
+    )
+
+
+def reference_features(df):
+    """The original whole-history computation (groupby + expanding)."""
+
+    def per_ip(group):
+        group = group.sort_values("timestamp", kind="stable").copy()
+        group["inter_arrival_time"] = group["timestamp"].diff().dt.total_seconds().fillna(0)
+        failed = group["event"].astype(str).str.contains("fail|brute|unauthorized", case=False).astype(int)
+        group["failed_auth_count"] = failed.cumsum()
+        group["unique_ports_accessed"] = group["dst_port"].expanding().apply(lambda x: len(np.unique(x)))
+        return group
+
+    return pd.concat(per_ip(group) for _, group in df.groupby("src_ip")).sort_values("id")
+
+
+def test_windowed_features_match_whole_history():
+    events = make_events()
+    state = SequenceFeatureState()
+    windows = [state.extract(events.iloc[start:start + 37].copy()) for start in range(0, len(events), 37)]
+    streamed = pd.concat(windows).sort_values("id")
+    expected = reference_features(events)
+
+    for column in ("inter_arrival_time", "failed_auth_count", "unique_ports_accessed"):
+        np.testing.assert_allclose(streamed[column].to_numpy(float), expected[column].to_numpy(float))
+
+
+def test_sequences_span_window_boundaries(tmp_path):
+    rng = np.random.default_rng(1)
+    ips = np.array(["a"] * 130 + ["b"] * 40)
+    features = rng.random((len(ips), 3)).astype(np.float32)
+    labels = np.arange(len(ips))
+    splits = {name: TrainingShards(str(tmp_path / name)) for name in ("train", "val", "test")}
+
+    builder = SequenceBuilder(splits)
+    for chunk in (slice(0, 60), slice(60, 110), slice(110, 170)):
+        order = np.argsort(ips[chunk], kind="stable")
+        builder.add(ips[chunk][order], features[chunk][order], labels[chunk][order])
+    builder.close()
+
+    X = np.concatenate([np.asarray(part) for shards in splits.values() for part, _ in shards])
+    y = np.concatenate([shards.labels() for shards in splits.values()])
+    # IP "a": one window per event after its first SEQ_LENGTH; "b" never has enough events
+    assert sorted(y.tolist()) == list(range(SEQ_LENGTH, 130))
+    for window, target in zip(X, y):
+        np.testing.assert_array_equal(window, features[target - SEQ_LENGTH:target])
+
+
+def test_fit_incremental_paths(tmp_path):
+    rng = np.random.default_rng(2)
+    shards = TrainingShards(str(tmp_path / "train"))
+    for i in range(4):
+        X = rng.random((200, 3)).astype(np.float32)
+        y = (X[:, 0] > 0.5).astype(int)
+        # A shard with one class is merged into the next one
+        shards.append(X[y == 0] if i == 1 else X, y[y == 0] if i == 1 else y)
+    assert TrainingShards(str(tmp_path / "train")).rows == shards.rows
+
+    forest = fit_incremental(RandomForestClassifier(n_estimators=6, random_state=0), shards, classes=[0, 1])
+    assert len(forest.estimators_) == 6  # 2 trees for each of the 3 fits
+    assert score_shards(forest, shards) > 0.9
+
+    linear = fit_incremental(SGDClassifier(random_state=0), shards, classes=[0, 1])
+    assert set(linear.classes_) == {0, 1}
+
+    with pytest.raises(ValueError):
+        fit_incremental(RandomForestClassifier(), [(X[y == 0], y[y == 0])], classes=[0, 1])
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'training.db'}")
+    Base.metadata.create_all(bind=engine)
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+
+def seed_logs(Session, count, ips=7):
+    rng = np.random.default_rng(3)
+    now = datetime.utcnow()
+    db = Session()
+    db.add_all(
+        PacketLog(
+            timestamp=now - timedelta(minutes=count - i),
+            src_ip=f"198.51.100.{i % ips}",
+            dst_ip="10.0.0.5",
+            dst_port=int(rng.choice([22, 80])),
+            protocol="TCP",
+            length=int(rng.integers(60, 1500)),
+            attack_type="BENIGN" if i % 3 else "BRUTE_FORCE",
+            threat_level="LOW" if i % 3 else "HIGH",
+            event="login_failed" if i % 3 == 0 else "connect",
+        )
+        for i in range(count)
+    )
+    db.commit()
+    db.close()
+
+
+def test_retraining_spills_windows_to_shards(session_factory, tmp_path, monkeypatch):
+    seed_logs(session_factory, 250)
+    monkeypatch.setattr(retraining_pipeline, "SessionLocal", session_factory)
+    pipeline = retraining_pipeline.RetrainingPipeline()
+    pipeline.shard_dir = str(tmp_path / "shards")
+    pipeline.window_rows = 60
+
+    train, test = pipeline.spill_training_data(days=1)
+
+    assert train.rows + test.rows == 250
+    assert len(train) == 5  # one shard per database window
+    assert int(train.labels().sum() + test.labels().sum()) == 84
+    # Vectors backfilled for the spill are not written to the rows
+    db = session_factory()
+    assert db.query(PacketLog).filter(PacketLog.feature_vector.isnot(None)).count() == 0
+    db.close()
+
+
+def test_training_backfill_is_time_ordered_and_leaves_live_state_alone(session_factory, tmp_path, monkeypatch):
+    seed_logs(session_factory, 250)
+    db = session_factory()
+    # Ids out of timestamp order, as after late inserts
+    for log in db.query(PacketLog):
+        log.timestamp = datetime.utcnow() - timedelta(minutes=log.id if log.id % 2 else 500 - log.id)
+    db.commit()
+    events = pd.DataFrame(
+        [
+            {"src_ip": log.src_ip, "dst_ip": log.dst_ip, "dst_port": log.dst_port, "protocol": log.protocol,
+             "length": log.length, "timestamp": log.timestamp}
+            for log in db.query(PacketLog).order_by(PacketLog.timestamp, PacketLog.id)
+        ]
+    )
+    db.close()
+    monkeypatch.setattr(retraining_pipeline, "SessionLocal", session_factory)
+    monkeypatch.setattr(unsupervised_detector, "SessionLocal", session_factory)
+    monkeypatch.setattr(retraining_pipeline, "TEST_FRACTION", 0.0)
+    live_ips = feature_store.extractor.tracked_ips
+    pipeline = retraining_pipeline.RetrainingPipeline()
+    pipeline.shard_dir = str(tmp_path / "shards")
+    pipeline.window_rows = 60
+
+    train, _ = pipeline.spill_training_data(days=1)
+    model, rows = unsupervised_detector.fit_baseline(days_back=1)
+
+    # Windows carry the scratch state over: same vectors as one pass in timestamp order
+    expected = FeatureExtractor().extract_batch(events).astype(np.float32)
+    np.testing.assert_allclose(np.concatenate([np.asarray(X) for X, _ in train]), expected, rtol=1e-5)
+    assert rows == 250
+    assert feature_store.extractor.tracked_ips == live_ips
+    db = session_factory()
+    assert db.query(PacketLog).filter(PacketLog.feature_vector.isnot(None)).count() == 0
+    db.close()
+
+
+def test_lstm_prepare_data_streams_to_shards(session_factory, tmp_path, monkeypatch):
+    seed_logs(session_factory, 300, ips=3)
+    monkeypatch.setattr(lstm_data_prep, "create_engine", lambda url: session_factory.kw["bind"])
+
+    lstm_data_prep.prepare_data(window=70, shard_dir=str(tmp_path / "lstm"), out_dir=str(tmp_path))
+
+    data = pd.read_pickle(tmp_path / "lstm_training_data.pkl")
+    assert data["feature_cols"] == lstm_data_prep.NUMERIC_COLS + ["proto_TCP", "atk_BENIGN", "atk_BRUTE_FORCE"]
+    # 3 IPs with 100 events each: 50 sequences per IP
+    assert sum(data["sizes"].values()) == 150
+    train = TrainingShards(str(tmp_path / "lstm" / "train"))
+    assert train.rows == data["sizes"]["train"]
+    X, y = next(iter(train))
+    assert X.shape[1:] == (SEQ_LENGTH, len(data["feature_cols"]))
+    assert set(np.unique(y)) <= {0, 2}
+    # The Parquet event spill is scratch data
+    assert not os.path.exists(tmp_path / "lstm" / "events")
@@ -0,0 +1,156 @@
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sklearn.ensemble import IsolationForest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from database.models import Base, TrainingJob
+from ml import model_publish
+from ml.model_publish import PublishedModelWatcher, publish_model, read_pointer
+from ml_engine.unsupervised_detector import BASELINE_MODEL_NAME, UnsupervisedAnomalyDetector
+from services import training_jobs
+
+
+def echo_job(progress, value=None):
+    progress(0.5, "halfway")
+    return {
+        "value": value,
+        "pid": os.getpid(),
+        "niceness": os.nice(0),
+        "cpus": sorted(os.sched_getaffinity(0)),
+        "omp_threads": os.environ.get("OMP_NUM_THREADS"),
+    }
+
+
+def failing_job(progress):
+    raise RuntimeError("no data")
+
+
+@pytest.fixture
+def jobs_db(tmp_path, monkeypatch):
+    url = f"sqlite:///{tmp_path / 'jobs.db'}"
+    engine = create_engine(url)
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    monkeypatch.setattr(training_jobs, "SessionLocal", Session)
+    # Spawned training processes resolve the database from the environment
+    monkeypatch.setenv("DATABASE_URL", url)
+    monkeypatch.setitem(training_jobs.JOB_KINDS, "echo", f"{__name__}:echo_job")
+    monkeypatch.setitem(training_jobs.JOB_KINDS, "failing", f"{__name__}:failing_job")
+    yield Session
+    engine.dispose()
+
+
+def test_enqueue_dedupes_and_claims_once(jobs_db):
+    first = training_jobs.enqueue_job("echo", {"value": 1})
+    assert training_jobs.enqueue_job("echo", {"value": 2}) == first
+    other = training_jobs.enqueue_job("failing")
+    with pytest.raises(ValueError):
+        training_jobs.enqueue_job("no_such_kind")
+
+    assert training_jobs.claim_next("w1") == (first, "echo")
+    assert training_jobs.claim_next("w2") == (other, "failing")
+    assert training_jobs.claim_next("w1") is None
+    # Running jobs still dedupe
+    assert training_jobs.enqueue_job("echo") == first
+    job = training_jobs.get_job(first)
+    assert job["status"] == "running" and job["worker"] == "w1" and job["params"] == {"value": 1}
+
+
+def test_execute_job_records_progress_and_outcome(jobs_db):
+    ok = training_jobs.enqueue_job("echo", {"value": "x"})
+    training_jobs.claim_next("w")
+    assert training_jobs.execute_job(ok) == "succeeded"
+    job = training_jobs.get_job(ok)
+    assert job["status"] == "succeeded" and job["progress"] == 1.0
+    assert job["result"]["value"] == "x"
+    assert job["finished_at"] is not None
+
+    bad = training_jobs.enqueue_job("failing")
+    training_jobs.claim_next("w")
+    assert training_jobs.execute_job(bad) == "failed"
+    job = training_jobs.get_job(bad)
+    assert job["status"] == "failed" and job["error"] == "RuntimeError: no data"
+
+
+def test_stale_running_jobs_are_failed(jobs_db):
+    job_id = training_jobs.enqueue_job("echo")
+    training_jobs.claim_next("w")
+    db = jobs_db()
+    db.get(TrainingJob, job_id).heartbeat_at = datetime.utcnow() - timedelta(minutes=30)
+    db.commit()
+    db.close()
+
+    assert training_jobs.fail_stale_jobs(stale_after_s=300) == 1
+    assert training_jobs.get_job(job_id)["status"] == "failed"
+
+
+@pytest.mark.skipif(not hasattr(os, "sched_setaffinity"), reason="CPU affinity is Linux only")
+def test_worker_runs_jobs_in_low_priority_child_process(jobs_db):
+    job_id = training_jobs.enqueue_job("echo", {"value": 7})
+    worker = training_jobs.TrainingWorker(niceness=5, cpus=[0], poll_interval_s=0.1)
+    try:
+        deadline = time.monotonic() + 120
+        while training_jobs.get_job(job_id)["status"] in ("queued", "running"):
+            assert time.monotonic() < deadline, "training job did not finish"
+            worker.run_once()
+            time.sleep(0.1)
+    finally:
+        worker.stop()
+
+    job = training_jobs.get_job(job_id)
+    assert job["status"] == "succeeded", job["error"]
+    result = job["result"]
+    assert result["value"] == 7
+    assert result["pid"] != os.getpid()
+    assert result["niceness"] >= os.nice(0) + 5 or result["niceness"] == 19
+    assert result["cpus"] == [0]
+    assert result["omp_threads"] == os.environ.get("OMP_NUM_THREADS", "1")
+
+
+def test_parse_cpus():
+    assert training_jobs.parse_cpus("0-2, 5") == [0, 1, 2, 5]
+    assert training_jobs.parse_cpus("") == []
+
+
+def fitted_forest(seed):
+    X = np.random.default_rng(seed).normal(size=(200, 4))
+    return IsolationForest(n_estimators=10, random_state=seed).fit(X)
+
+
+def test_publish_swaps_pointer_and_prunes_artifacts(tmp_path):
+    watcher = PublishedModelWatcher("demo", directory=tmp_path, interval_s=0)
+    assert watcher.poll() is None
+
+    pointers = [publish_model("demo", fitted_forest(seed), directory=tmp_path, trained_rows=200) for seed in range(5)]
+    assert read_pointer("demo", tmp_path) == pointers[-1]
+    assert len(list((tmp_path / "demo").glob("*.joblib"))) == model_publish.PUBLISHED_KEEP_VERSIONS
+    assert not list(tmp_path.rglob("*.tmp"))
+
+    model, pointer = watcher.poll()
+    assert pointer["version"] == pointers[-1]["version"] and pointer["trained_rows"] == 200
+    assert hasattr(model, "score_samples")
+    # Unchanged pointer: nothing to reload
+    assert watcher.poll() is None
+
+
+def test_detector_hot_reloads_published_baseline(tmp_path, monkeypatch):
+    monkeypatch.setattr(model_publish, "PUBLISHED_MODELS_DIR", tmp_path)
+    detector = UnsupervisedAnomalyDetector()
+    detector.watcher.interval_s = 0
+    features = np.zeros((3, 4))
+
+    first = publish_model(BASELINE_MODEL_NAME, fitted_forest(1))
+    assert len(detector.predict_anomalies([{}] * 3, features=features)) == 3
+    assert detector.is_loaded and detector.version == first["version"]
+
+    second = publish_model(BASELINE_MODEL_NAME, fitted_forest(2))
+    detector.predict_anomalies([{}] * 3, features=features)
+    assert detector.version == second["version"]
@@ -0,0 +1,154 @@
+import asyncio
+import json
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from services.ws_hub import WebSocketHub, EVENT_STREAM, LIVE_METRICS, TOPOLOGY, SLOW_CONSUMER_CLOSE_CODE
+
+
+class FakeWebSocket:
+    def __init__(self, block=None):
+        self.sent = []
+        self.block = block
+        self.closed_with = None
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text):
+        if self.block is not None:
+            await self.block.wait()
+        self.sent.append(text)
+
+    async def close(self, code=1000):
+        self.closed_with = code
+
+
+async def _settle(hub):
+    hub.flush()
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_publish_serializes_once_and_batches_per_topic():
+    async def scenario():
+        hub = WebSocketHub(flush_interval_ms=1000)
+        a, b, topo = FakeWebSocket(), FakeWebSocket(), FakeWebSocket()
+        await hub.connect(a, [EVENT_STREAM])
+        await hub.connect(b, [EVENT_STREAM])
+        await hub.connect(topo, [TOPOLOGY])
+
+        hub.publish(EVENT_STREAM, "EVENT_STREAM", {"id": 1})
+        hub.publish(EVENT_STREAM, "EVENT_STREAM", {"id": 2})
+        await _settle(hub)
+        return a, b, topo
+
+    a, b, topo = asyncio.run(scenario())
+
+    assert len(a.sent) == 1 and a.sent[0] is b.sent[0]
+    frame = json.loads(a.sent[0])
+    assert frame["type"] == "BATCH" and frame["topic"] == EVENT_STREAM
+    assert [m["payload"]["id"] for m in frame["payload"]] == [1, 2]
+    assert topo.sent == []
+
+
+def test_snapshots_coalesce_and_slow_client_does_not_block_others():
+    async def scenario():
+        hub = WebSocketHub(flush_interval_ms=1000, queue_size=4)
+        gate = asyncio.Event()
+        fast, slow = FakeWebSocket(), FakeWebSocket(block=gate)
+        await hub.connect(fast, [EVENT_STREAM, LIVE_METRICS])
+        await hub.connect(slow, [EVENT_STREAM, LIVE_METRICS])
+
+        for i in range(10):
+            hub.publish(LIVE_METRICS, "LIVE_METRICS", {"n": i})
+            hub.publish(EVENT_STREAM, "EVENT_STREAM", {"id": i})
+            await _settle(hub)
+        gate.set()
+        await _settle(hub)
+        return hub, fast, slow
+
+    hub, fast, slow = asyncio.run(scenario())
+
+    assert len(fast.sent) == 20
+    # The slow client kept a bounded queue: the frame in flight + the newest 4,
+    # with LIVE_METRICS coalesced to the latest snapshot
+    received = [json.loads(f) for f in slow.sent]
+    assert len(received) == 5
+    assert [m["payload"] for m in received if m["type"] == "LIVE_METRICS"] == [{"n": 9}]
+    assert received[-1]["payload"] == {"id": 9}
+    assert hub.stats["dropped_total"] > 0
+
+
+def test_slow_consumer_disconnected():
+    async def scenario():
+        hub = WebSocketHub(flush_interval_ms=1000, queue_size=2, max_dropped=3, send_timeout=0)
+        stuck = FakeWebSocket(block=asyncio.Event())
+        await hub.connect(stuck, [EVENT_STREAM])
+        for i in range(10):
+            hub.publish(EVENT_STREAM, "EVENT_STREAM", {"id": i})
+            await _settle(hub)
+        return hub, stuck
+
+    hub, stuck = asyncio.run(scenario())
+
+    assert stuck.closed_with == SLOW_CONSUMER_CLOSE_CODE
+    assert hub.connections == []
+    assert hub.stats["slow_disconnects_total"] == 1
+
+
+def test_realtime_endpoint_topics_and_cross_thread_publish(monkeypatch):
+    import api.realtime as realtime
+
+    hub = WebSocketHub(flush_interval_ms=0)
+    monkeypatch.setattr(realtime.realtime_manager, "hub", hub)
+    app = FastAPI()
+    app.include_router(realtime.router)
+
+    with TestClient(app) as client:
+        with client.websocket_connect("/api/v1/realtime/ws?topics=LIVE_METRICS") as ws:
+            ws.send_text(json.dumps({"action": "subscribe", "topics": ["EVENT_STREAM"]}))
+            # Wait until the subscription has been applied on the server loop
+            deadline = time.monotonic() + 5
+            while hub.subscribers(EVENT_STREAM) == [] and time.monotonic() < deadline:
+                time.sleep(0.01)
+            hub.publish(EVENT_STREAM, "EVENT_STREAM", {"id": 7})
+            message = ws.receive_json()
+
+    assert message["type"] == "EVENT_STREAM" and message["payload"] == {"id": 7}
+    assert hub.connections == []
+
+
+def test_rate_capped_client_gets_newest_events_and_suppressed_notice():
+    async def scenario():
+        hub = WebSocketHub(flush_interval_ms=1000, client_max_rate=5)
+        capped, uncapped = FakeWebSocket(), FakeWebSocket()
+        await hub.connect(capped, [EVENT_STREAM])
+        await hub.connect(uncapped, [EVENT_STREAM], max_rate=1000)
+        for i in range(20):
+            hub.publish(EVENT_STREAM, "EVENT_STREAM", {"id": i})
+            if i == 3:
+                hub.publish(EVENT_STREAM, "THREAT_ALERT", {"id": "alert"})
+        await _settle(hub)
+        # A second later the bucket has refilled and the notice is due
+        for sub in hub._subscribers.values():
+            sub.refilled_at -= 1.0
+            sub.notified_at -= 1.0
+        hub.publish(EVENT_STREAM, "EVENT_STREAM", {"id": 20})
+        await _settle(hub)
+        return hub, capped, uncapped
+
+    hub, capped, uncapped = asyncio.run(scenario())
+
+    first = json.loads(capped.sent[0])
+    # Alerts are never capped
+    assert [m["payload"]["id"] for m in first["payload"]] == ["alert", 15, 16, 17, 18, 19]
+    messages = [json.loads(f) for f in capped.sent[1:]]
+    assert messages[0]["payload"] == {"id": 20}
+    assert messages[1]["type"] == "EVENTS_SUPPRESSED"
+    assert messages[1]["payload"]["suppressed"] == 15
+    # max_rate can lower the server cap, never raise it
+    assert len(json.loads(uncapped.sent[0])["payload"]) == 6
+    assert hub.stats["rate_limited_total"] == 30
@@ -205,49 +205,54 @@ const NetworkTopology = () => {
         };
         ws.current.onerror = () => ws.current.close();
 
+        const handleMessage = (msg) => {
+            if (msg.type === 'INIT' && msg.payload?.nodes) {
+                const validated = msg.payload.nodes.map(n => ({
+                    ...n,
+                    position: n.position || { x: Math.random() * 500, y: Math.random() * 400 }
+                }));
+                setNodes(validated);
+                setEdges(msg.payload.edges || []);
+            } else if (msg.type === 'THREAT_DETECTED' && msg.payload) {
+                const { attacker_ip, target_service, threat_score, attack_type } = msg.payload;
+                if (!attacker_ip) return;
+                const aid = `attacker_${attacker_ip.replace(/\./g, '_')}`;
+
+                setNodes(nds => {
+                    if (nds.find(n => n.id === aid)) return nds;
+                    setAttackCount(c => c + 1);
+                    return [...nds, {
+                        id: aid, type: 'attacker',
+                        position: { x: 100 + Math.random() * 600, y: 440 },
+                        data: { ip: attacker_ip, threat_score, attack_type }
+                    }];
+                });
+
+                setEdges(eds => {
+                    const eid = `e_attack_${aid}`;
+                    if (eds.find(e => e.id === eid)) return eds;
+                    const targetNode = nodesRef.current.find(n =>
+                        n.data?.port === target_service || n.id === target_service?.toLowerCase()
+                    );
+                    const targetId = targetNode?.id || 'ssh';
+                    return [...eds, {
+                        id: eid, source: aid, target: targetId,
+                        animated: true,
+                        style: { stroke: '#ef4444', strokeWidth: 3 },
+                        markerEnd: { type: MarkerType.ArrowClosed, color: '#ef4444' },
+                        className: 'attack-edge',
+                    }];
+                });
+            } else if (msg.type === 'TRAFFIC_TICK') {
+                setEdges(eds => eds.map(e => ({ ...e, animated: true })));
+            }
+        };
+
         ws.current.onmessage = (evt) => {
             try {
                 const msg = JSON.parse(evt.data);
-                if (msg.type === 'INIT' && msg.payload?.nodes) {
-                    const validated = msg.payload.nodes.map(n => ({
-                        ...n,
-                        position: n.position || { x: Math.random() * 500, y: Math.random() * 400 }
-                    }));
-                    setNodes(validated);
-                    setEdges(msg.payload.edges || []);
-                } else if (msg.type === 'THREAT_DETECTED' && msg.payload) {
-                    const { attacker_ip, target_service, threat_score, attack_type } = msg.payload;
-                    if (!attacker_ip) return;
-                    const aid = `attacker_${attacker_ip.replace(/\./g, '_')}`;
-
-                    setNodes(nds => {
-                        if (nds.find(n => n.id === aid)) return nds;
-                        setAttackCount(c => c + 1);
-                        return [...nds, {
-                            id: aid, type: 'attacker',
-                            position: { x: 100 + Math.random() * 600, y: 440 },
-                            data: { ip: attacker_ip, threat_score, attack_type }
-                        }];
-                    });
-
-                    setEdges(eds => {
-                        const eid = `e_attack_${aid}`;
-                        if (eds.find(e => e.id === eid)) return eds;
-                        const targetNode = nodesRef.current.find(n =>
-                            n.data?.port === target_service || n.id === target_service?.toLowerCase()
-                        );
-                        const targetId = targetNode?.id || 'ssh';
-                        return [...eds, {
-                            id: eid, source: aid, target: targetId,
-                            animated: true,
-                            style: { stroke: '#ef4444', strokeWidth: 3 },
-                            markerEnd: { type: MarkerType.ArrowClosed, color: '#ef4444' },
-                            className: 'attack-edge',
-                        }];
-                    });
-                } else if (msg.type === 'TRAFFIC_TICK') {
-                    setEdges(eds => eds.map(e => ({ ...e, animated: true })));
-                }
+                // Updates published together arrive as one BATCH frame
+                (msg.type === 'BATCH' ? msg.payload : [msg]).forEach(handleMessage);
             } catch (err) { console.error('[Topology] WS parse error:', err); }
         };
     }, [setEdges, setNodes]);
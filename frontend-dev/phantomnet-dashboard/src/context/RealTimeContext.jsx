@@ -5,14 +5,19 @@ const RealTimeContext = createContext(null);
 export const RealTimeProvider = ({ children }) => {
     const [events, setEvents] = useState([]);
     const [metrics, setMetrics] = useState(null);
+    // Events the server held back (sampling / per-client cap) since connecting
+    const [suppressedCount, setSuppressedCount] = useState(0);
     const [isConnected, setIsConnected] = useState(false);
     const [reconnectCount, setReconnectCount] = useState(0);
     const ws = useRef(null);
+    // snapshot_version of the metrics we hold; deltas only apply on top of it
+    const metricsVersion = useRef(null);
     const reconnectTimer = useRef(null);
 
     const connect = useCallback(() => {
         const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
-        const wsUrl = `${protocol}//${window.location.host}/api/v1/realtime/ws`;
+        // Metrics as deltas (changed fields only) with periodic full LIVE_METRICS keyframes
+        const wsUrl = `${protocol}//${window.location.host}/api/v1/realtime/ws?topics=EVENT_STREAM,LIVE_METRICS_DELTA`;
 
         try {
             ws.current = new WebSocket(wsUrl);
@@ -26,10 +31,35 @@ export const RealTimeProvider = ({ children }) => {
             ws.current.onmessage = (event) => {
                 try {
                     const data = JSON.parse(event.data);
-                    if (data.type === 'EVENT_STREAM' || data.type === 'THREAT_ALERT') {
-                        setEvents((prev) => [data.payload, ...prev].slice(0, 50));
-                    } else if (data.type === 'LIVE_METRICS') {
-                        setMetrics(data.payload);
+                    // Messages published together arrive as one BATCH frame (oldest first)
+                    const messages = data.type === 'BATCH' ? data.payload : [data];
+                    const newEvents = [];
+                    let suppressed = 0;
+                    messages.forEach((msg) => {
+                        if (msg.type === 'EVENT_STREAM' || msg.type === 'THREAT_ALERT') {
+                            newEvents.unshift(msg.payload);
+                        } else if (msg.type === 'LIVE_METRICS') {
+                            metricsVersion.current = msg.payload.snapshot_version;
+                            setMetrics(msg.payload);
+                        } else if (msg.type === 'LIVE_METRICS_DELTA') {
+                            // A delta for another base means one was missed: wait for the next keyframe
+                            if (msg.payload.base_version !== metricsVersion.current) return;
+                            metricsVersion.current = msg.payload.snapshot_version;
+                            const { changed, removed, snapshot_version } = msg.payload;
+                            setMetrics((prev) => {
+                                const next = { ...prev, ...changed, snapshot_version };
+                                removed.forEach((key) => delete next[key]);
+                                return next;
+                            });
+                        } else if (msg.type === 'EVENT_STREAM_SUMMARY' || msg.type === 'EVENTS_SUPPRESSED') {
+                            suppressed += msg.payload.suppressed || 0;
+                        }
+                    });
+                    if (suppressed) {
+                        setSuppressedCount((prev) => prev + suppressed);
+                    }
+                    if (newEvents.length) {
+                        setEvents((prev) => [...newEvents, ...prev].slice(0, 50));
                     }
                 } catch (err) {
                     console.error('Error parsing WebSocket message:', err);
@@ -64,7 +94,7 @@ export const RealTimeProvider = ({ children }) => {
     }, [connect]);
 
     return (
-        <RealTimeContext.Provider value={{ events, metrics, isConnected, reconnectCount }}>
+        <RealTimeContext.Provider value={{ events, metrics, suppressedCount, isConnected, reconnectCount }}>
             {children}
         </RealTimeContext.Provider>
     );
@@ -1,5 +1,7 @@
 import pytest
+import tempfile
 import time
+from pathlib import Path
 import numpy as np
 import pandas as pd
 from unittest.mock import patch, MagicMock
@@ -130,6 +132,7 @@ class TestModelRegistry:
         import ml.model_loader as loader
         loader._LOAD_ATTEMPTED = False
         loader._MODEL = None
+        loader._MODEL_VERSION = None
         
         mock_client = MagicMock()
         mock_mlflow.tracking.MlflowClient.return_value = mock_client
@@ -137,8 +140,9 @@ class TestModelRegistry:
         mock_version.version = "1"
         mock_client.get_latest_versions.return_value = [mock_version]
         
-        # Should load via MLflow
-        load_model()
+        # The registry refresh (not load_model) resolves versions via MLflow
+        with patch.object(loader, "MODEL_SNAPSHOT_DIR", Path(tempfile.mkdtemp())):
+            loader.refresh_model()
         mock_mlflow.sklearn.load_model.assert_called_with("models:/PhantomNet_Attack_Detector/1")
 
 def test_cross_validation(synthetic_data):
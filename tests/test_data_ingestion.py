@@ -59,7 +59,7 @@ class TestEventFlowHoneypotToDatabase:
         db_logger_path = BACKEND_DIR / "honeypots" / "db_logger.py"
         content = db_logger_path.read_text(errors="ignore")
         assert "PacketLog" in content, "Should reference PacketLog model"
-        assert "db.add" in content, "Should use db.add() to insert"
+        assert "db.bulk_insert_mappings" in content, "Should bulk insert buffered events"
         assert "db.commit" in content, "Should use db.commit() to persist"
         print("  [PASS] db_logger correctly writes to PacketLog via ORM")
 
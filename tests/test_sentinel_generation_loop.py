@@ -7,7 +7,7 @@ Validates:
   1. SENTINEL_ENABLED env var toggle (true/false)
   2. Dedup logic: processed campaigns are skipped on re-encounter
   3. Field mapping: campaign_clusterer output → SentinelService input
-  4. Hash-based dedup: identical campaigns produce same hash
+  4. Hash-based dedup: identical campaigns produce same hash (scheduler)
   5. Cycle logging: new vs skipped counts are tracked correctly
 
 Phase 5, Week 2 (Week 14), Day 4
@@ -302,17 +302,18 @@ class TestLifespanIntegration(unittest.TestCase):
         self.assertIn("sentinel_generation_loop", content)
         self.assertIn("asyncio.create_task(sentinel_generation_loop())", content)
 
-    def test_main_py_has_dedup_hash_logic(self):
-        """main.py sentinel_generation_loop should contain hash-based dedup."""
+    def test_main_py_has_stable_id_dedup_logic(self):
+        """main.py sentinel_generation_loop should dedup on stable campaign IDs."""
         main_path = os.path.join(
             os.path.dirname(__file__), "..", "backend", "main.py"
         )
         with open(main_path, "r", encoding="utf-8") as f:
             content = f.read()
 
-        self.assertIn("hashlib.sha256", content)
-        self.assertIn("_processed_hashes", content)
-        self.assertIn("campaign_hash", content)
+        self.assertIn("_processed_campaigns", content)
+        self.assertIn("campaign_id in _processed_campaigns", content)
+        self.assertIn("primary_source in _processed_sources", content)
+        self.assertNotIn("campaign_hash", content)
 
     def test_main_py_has_cycle_logging(self):
         """main.py should log cycle metrics (found, new, skipped, errors)."""
@@ -329,7 +330,7 @@ class TestLifespanIntegration(unittest.TestCase):
         self.assertIn("SUMMARY", content)
 
     def test_main_py_has_db_preseed(self):
-        """main.py should pre-seed processed hashes from DB on startup."""
+        """main.py should pre-seed processed sources from DB on startup."""
         main_path = os.path.join(
             os.path.dirname(__file__), "..", "backend", "main.py"
         )
@@ -338,6 +339,22 @@ class TestLifespanIntegration(unittest.TestCase):
 
         self.assertIn("Pre-seed", content)
         self.assertIn("existing_playbooks", content)
+        self.assertIn("SentinelPlaybook.src_ip", content)
+
+    def test_main_py_dedups_sources_within_clustering_window(self):
+        """Only playbooks from the clustering window block a source IP."""
+        main_path = os.path.join(
+            os.path.dirname(__file__), "..", "backend", "main.py"
+        )
+        with open(main_path, "r", encoding="utf-8") as f:
+            content = f.read()
+
+        self.assertIn(
+            "SentinelPlaybook.created_at >= datetime.utcnow() - timedelta(hours=window_hours)",
+            content,
+        )
+        self.assertIn("identify_campaigns, window_hours", content)
+        self.assertIn("if at < window_start", content)
 
     def test_main_py_maps_unique_sources_to_source_ips(self):
         """main.py should correctly map 'unique_sources' → 'source_ips'."""